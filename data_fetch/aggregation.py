@@ -0,0 +1,662 @@
+"""
+Incremental Multi-Timeframe Aggregation
+=======================================
+
+Keeps one open ("forming") bar per timeframe and folds only newly merged
+1-minute candles into it, instead of re-resampling the whole 1M buffer on
+every poll. A bar is emitted as closed once a candle from a later bucket
+arrives, so per-tick cost is O(new candles x timeframes).
+
+Output is identical to the reference pandas path in ``resample_ohlcv``:
+left-labelled buckets, ``W-MON`` weekly bins, the bucket holding the latest
+candle dropped as incomplete, and empty buckets removed.
+
+Full rebuilds (startup, recovery, rewritten buffers) use the NumPy bulk
+kernel ``aggregate_timeframes``, which derives every timeframe from a
+single pass over the 1M data. Integer volumes, and float volumes holding
+whole numbers, are summed in the same pass. Fractional float volumes are
+still summed by pandas, one resample per timeframe, because only its
+row-by-row compensated sum rounds identically, so that case is only about
+twice as fast as the pandas path.
+"""
+
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+OHLC_AGG = {
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'volume': 'sum'
+}
+
+OHLCV_COLUMNS = list(OHLC_AGG.keys())
+
+# Timeframe name -> pandas frequency, shared by the aggregator and its tests
+TIMEFRAMES = {
+    '15M': '15min',
+    '30M': '30min',
+    '1H': '1h',
+    '2H': '2h',
+    '4H': '4h',
+    'D': '1D',
+    'W': '1W'
+}
+
+_NS_PER_DAY = 86_400_000_000_000
+_NS_PER_WEEK = 7 * _NS_PER_DAY
+_FIRST_MONDAY_NS = 4 * _NS_PER_DAY  # 1970-01-05 00:00, the first Monday after epoch
+
+
+def resample_ohlcv(df: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """Aggregate 1-minute data to the given frequency with pandas resample."""
+    if df.empty:
+        return pd.DataFrame()
+
+    if freq == '1W':
+        df_resampled = df.resample('W-MON', label='left').agg(OHLC_AGG)
+    else:
+        df_resampled = df.resample(freq, label='left').agg(OHLC_AGG)
+
+    # Remove incomplete candles and NaN values
+    if not df_resampled.empty:
+        df_resampled = df_resampled[:-1].dropna()
+
+    return df_resampled
+
+
+def aggregate_columns(columns: Dict[str, np.ndarray], freq: str,
+                      end: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    OHLCV bars of one timeframe from sorted 1M columns.
+
+    Buckets follow the live aggregation (left labels, ``W-MON`` weeks for
+    '1W'). Only complete buckets are returned: the one holding the last
+    candle is dropped unless ``end`` (epoch ns) shows it has finished.
+
+    Returns:
+        Columns with ``ts`` holding bar labels
+    """
+    stamps = columns['ts']
+    if len(stamps) == 0:
+        return {col: values[:0] for col, values in columns.items()}
+
+    state = _TimeframeState(freq, 1)
+    labels, starts = _bucket_starts(stamps, state)
+    bars = {'ts': labels, **_reduce_buckets(columns, starts)}
+    if end is None or state.bounds(int(bars['ts'][-1]))[1] > end:
+        bars = {col: values[:-1] for col, values in bars.items()}
+    return bars
+
+
+def aggregate_timeframes(candles_1m: pd.DataFrame,
+                         timeframes: Dict[str, str]) -> Dict[str, pd.DataFrame]:
+    """
+    Bulk-aggregate a 1M frame to every timeframe in one pass.
+
+    Rows are scanned once, for the finest timeframe: bucket edges are
+    located in the int64 epoch timestamps with ``searchsorted`` and reduced
+    with ``ufunc.reduceat``. Coarser timeframes are folded from the bars of
+    the finest one whose buckets nest in theirs (15M -> 30M -> 1H -> 2H ->
+    4H -> D -> W), so the cost is one pass over the 1M data instead of one
+    ``resample`` per timeframe. Frequencies the kernel does not support
+    fall back to ``resample_ohlcv``.
+
+    Args:
+        candles_1m: Sorted 1-minute candles
+        timeframes: Dict mapping timeframe name to frequency (as TIMEFRAMES)
+
+    Returns:
+        Dict mapping timeframe name to its bars, identical to
+        ``resample_ohlcv(candles_1m, freq)``
+    """
+    if candles_1m.empty:
+        return {tf_name: pd.DataFrame() for tf_name in timeframes}
+
+    index = candles_1m.index
+    unit = np.datetime_data(index.dtype)[0]
+    scale = pd.Timedelta(1, unit).value
+    columns = dict(zip(OHLCV_COLUMNS, _column_arrays(candles_1m)))
+    exact_volume = columns['volume'].dtype.kind != 'f' or _exact_sums(columns['volume'])
+    if exact_volume and columns['volume'].dtype.kind == 'f':
+        # pandas skips NaN volumes, which adds the same as a 0 here
+        volume = columns['volume']
+        columns['volume'] = np.where(volume == volume, volume, 0.0)
+
+    states = {}
+    frames = {}
+    for tf_name, freq in timeframes.items():
+        try:
+            states[tf_name] = _TimeframeState(freq, 1)
+        except ValueError:
+            frames[tf_name] = resample_ohlcv(candles_1m, freq)
+
+    # Finest first, so every timeframe can be folded from a finer one
+    levels: List[Tuple[_TimeframeState, Dict[str, np.ndarray]]] = []
+    for tf_name, state in sorted(states.items(), key=lambda item: item[1].step):
+        source = next(((finer, bars) for finer, bars in reversed(levels)
+                       if not finer.weekly and (state.weekly or state.step % finer.step == 0)),
+                      None)
+        if source is None:
+            labels, starts = _bucket_starts(index.asi8, state, scale)
+            bars = {'ts': labels, **_reduce_buckets(columns, starts)}
+        else:
+            bars = _fold_bars(source[1], source[0], state)
+        if not exact_volume:
+            # Sums of float sums round differently from pandas' compensated
+            # sum over the rows, so take the sums from pandas itself
+            bars['volume'] = _resample_sum(candles_1m['volume'], state, bars['ts'], scale)
+        levels.append((state, bars))
+        frames[tf_name] = _bars_frame(bars, index, scale)
+
+    return {tf_name: frames[tf_name] for tf_name in timeframes}
+
+
+def _bucket_starts(stamps: np.ndarray, state: '_TimeframeState',
+                   scale: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Labels (epoch ns) and first positions of the non-empty buckets of
+    sorted epoch ``stamps`` in units of ``scale`` ns. Intraday bucket edges
+    are located with one ``searchsorted`` instead of labelling every row.
+    """
+    if state.weekly:
+        labels = state.label(stamps * scale)
+        starts = np.flatnonzero(np.concatenate([[True], labels[1:] != labels[:-1]]))
+        return labels[starts], starts
+
+    first = state.label(int(stamps[0]) * scale)
+    edges = first + state.step * np.arange((int(stamps[-1]) * scale - first) // state.step + 1)
+    positions = stamps.searchsorted(edges // scale)
+    filled = np.flatnonzero(np.diff(np.append(positions, len(stamps))) > 0)
+    return edges[filled], positions[filled]
+
+
+def _reduce_buckets(columns: Dict[str, np.ndarray], starts: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    OHLCV of the consecutive row segments starting at ``starts``, with
+    pandas' NaN-skipping semantics.
+    """
+    ends = np.append(starts[1:], len(columns['open']))
+    return {
+        'open': _first_valid(columns['open'], starts, ends),
+        'high': np.fmax.reduceat(columns['high'], starts),
+        'low': np.fmin.reduceat(columns['low'], starts),
+        'close': _last_valid(columns['close'], starts, ends),
+        'volume': np.add.reduceat(columns['volume'], starts)
+    }
+
+
+def _fold_bars(bars: Dict[str, np.ndarray], finer: '_TimeframeState',
+               state: '_TimeframeState') -> Dict[str, np.ndarray]:
+    """
+    Bars of ``state`` folded from the bars of a finer timeframe whose
+    buckets nest in its own.
+
+    Each fine bar gets a slot in a dense (slots x buckets) grid, so every
+    field is reduced with a few vectorized operations over the short slot
+    axis instead of a ``reduceat`` over many tiny segments.
+    """
+    labels = state.label(bars['ts'])
+    first = np.concatenate([[True], labels[1:] != labels[:-1]])
+    starts = np.flatnonzero(first)
+    count = len(starts)
+    width = state.step // finer.step
+    slot = (bars['ts'] - state.bounds(labels)[0]) // finer.step
+    cells = slot * count + np.cumsum(first) - 1
+
+    def grid(values: np.ndarray, fill) -> np.ndarray:
+        result = np.full(width * count, fill, dtype=values.dtype)
+        result[cells] = values
+        return result.reshape(width, count)
+
+    # First/last non-NaN slot: fill from the far end towards the near one
+    opens = grid(bars['open'], np.nan)
+    open_ = opens[-1]
+    for values in opens[-2::-1]:
+        open_ = np.where(values == values, values, open_)
+    closes = grid(bars['close'], np.nan)
+    close = closes[0]
+    for values in closes[1:]:
+        close = np.where(values == values, values, close)
+
+    return {
+        'ts': labels[starts],
+        'open': open_,
+        'high': np.fmax.reduce(grid(bars['high'], np.nan), axis=0),
+        'low': np.fmin.reduce(grid(bars['low'], np.nan), axis=0),
+        'close': close,
+        'volume': grid(bars['volume'], 0).sum(axis=0)
+    }
+
+
+def _first_valid(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """First non-NaN value of each segment [start, end) (NaN if none), like pandas 'first'."""
+    result = values[starts]
+    missing = np.flatnonzero(result != result)
+    if len(missing):
+        valid = np.flatnonzero(values == values)
+        pos = np.searchsorted(valid, starts[missing])
+        found = pos < len(valid)
+        found[found] = valid[pos[found]] < ends[missing[found]]
+        result[missing[found]] = values[valid[pos[found]]]
+    return result
+
+
+def _last_valid(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Last non-NaN value of each segment [start, end) (NaN if none), like pandas 'last'."""
+    result = values[ends - 1]
+    missing = np.flatnonzero(result != result)
+    if len(missing):
+        valid = np.flatnonzero(values == values)
+        pos = np.searchsorted(valid, ends[missing]) - 1
+        found = pos >= 0
+        found[found] = valid[pos[found]] >= starts[missing[found]]
+        result[missing[found]] = values[valid[pos[found]]]
+    return result
+
+
+def _exact_sums(values: np.ndarray) -> bool:
+    """
+    Whether the non-NaN float ``values`` are whole numbers totalling less
+    than 2**53, so every partial sum is exact and plain sums equal pandas'
+    compensated ones in any order.
+    """
+    valid = values[values == values]
+    return bool(np.all(np.trunc(valid) == valid)) and float(np.abs(valid).sum()) < 2.0 ** 53
+
+
+def _resample_sum(volume: pd.Series, state: '_TimeframeState', labels: np.ndarray,
+                  scale: int) -> np.ndarray:
+    """Float volume sums of the buckets ``labels`` (epoch ns), computed by pandas resample."""
+    rule = 'W-MON' if state.weekly else state.freq
+    sums = volume.resample(rule, label='left').sum()
+    first = sums.index[:1].asi8[0] * scale
+    return sums.to_numpy()[(labels - first) // state.step]
+
+
+def _bars_frame(bars: Dict[str, np.ndarray], index: pd.DatetimeIndex, scale: int) -> pd.DataFrame:
+    """Bars as a frame like ``resample_ohlcv``: last bucket and incomplete bars dropped."""
+    keep = np.ones(len(bars['ts']), dtype=bool)
+    for col in ('open', 'high', 'low', 'close'):
+        keep &= bars[col] == bars[col]
+    keep[-1] = False
+    if keep[:-1].all():
+        keep = slice(None, -1)
+    labels = bars['ts'][keep] // scale
+    frame_index = pd.DatetimeIndex(labels.view(index.dtype), name=index.name, copy=False)
+    return pd.DataFrame({col: bars[col][keep] for col in OHLCV_COLUMNS},
+                        index=frame_index, copy=False)
+
+
+def _column_arrays(candles_1m: pd.DataFrame) -> List[np.ndarray]:
+    """OHLCV columns of the buffer as NumPy arrays (views, no copy)."""
+    return [candles_1m[col].to_numpy() for col in OHLCV_COLUMNS]
+
+
+def _plain(row: Tuple) -> List:
+    """Row values as Python scalars (NumPy ints would not survive JSON)."""
+    return [value.item() if isinstance(value, np.generic) else value for value in row]
+
+
+class _Bar:
+    """Running OHLCV state for a single bucket."""
+
+    __slots__ = ('label', 'open', 'high', 'low', 'close', 'volume', '_comp')
+
+    def __init__(self, label: int):
+        self.label = label
+        self.open = np.nan
+        self.high = np.nan
+        self.low = np.nan
+        self.close = np.nan
+        self.volume = 0
+        self._comp = 0.0  # Kahan compensation, mirrors pandas group sum
+
+    def fold(self, o: float, h: float, l: float, c: float, v) -> None:
+        """Fold one candle into the bar with pandas' NaN-skipping semantics."""
+        if self.open != self.open:
+            self.open = o
+        if h == h and not h <= self.high:
+            self.high = h
+        if l == l and not l >= self.low:
+            self.low = l
+        if c == c:
+            self.close = c
+        self.add_volume(v)
+
+    def add_volume(self, v) -> None:
+        """Accumulate volume; floats use the same Kahan sum as pandas."""
+        if isinstance(v, float):
+            if v == v:
+                y = v - self._comp
+                t = self.volume + y
+                self._comp = t - self.volume - y
+                self.volume = t
+        else:
+            self.volume += v
+
+    def is_complete(self) -> bool:
+        """Whether the bar survives ``dropna`` (no missing OHLC fields)."""
+        return not (self.open != self.open or self.high != self.high or
+                    self.low != self.low or self.close != self.close)
+
+    def as_row(self) -> Tuple:
+        return (self.label, self.open, self.high, self.low, self.close, self.volume)
+
+
+class _TimeframeState:
+    """Closed bars plus the forming bar for one timeframe."""
+
+    def __init__(self, freq: str, max_bars: int):
+        self.freq = freq
+        self.weekly = freq == '1W'
+        if self.weekly:
+            self.step = _NS_PER_WEEK
+        else:
+            self.step = pd.Timedelta(freq).value
+            if self.step <= 0 or _NS_PER_DAY % self.step:
+                raise ValueError(
+                    f"Unsupported timeframe frequency for incremental aggregation: {freq}")
+
+        self.closed: Deque[Tuple] = deque(maxlen=max_bars)
+        self.forming: Optional[_Bar] = None
+        self.forming_stale = False  # head trimmed out of the forming bucket
+        self.frame: Optional[pd.DataFrame] = None
+
+    def label(self, ts: int) -> int:
+        """Bucket label (epoch ns) for a timestamp (epoch ns)."""
+        if self.weekly:
+            # W-MON bins cover Tuesday..Monday by calendar date, labelled
+            # with the Monday that opens the bin (pandas' closed='right').
+            day = ts - ts % _NS_PER_DAY - _NS_PER_DAY
+            return day - (day - _FIRST_MONDAY_NS) % _NS_PER_WEEK
+        return ts - ts % self.step
+
+    def bounds(self, label: int) -> Tuple[int, int]:
+        """Half-open timestamp range [start, end) covered by a bucket."""
+        start = label + _NS_PER_DAY if self.weekly else label
+        return start, start + self.step
+
+
+class IncrementalAggregator:
+    """
+    Incremental 1M -> multi-timeframe aggregator.
+
+    Call ``update`` with the full 1M buffer after each merge; only rows newer
+    than the last call are folded. Trimming the head of the buffer is handled
+    by recomputing the single bar whose bucket straddles the new head.
+    """
+
+    def __init__(self, timeframes: Dict[str, str], buffer_sizes: Dict[str, int]):
+        self.timeframes = dict(timeframes)
+        self.buffer_sizes = dict(buffer_sizes)
+        self._states: Dict[str, _TimeframeState] = {}
+        self._last_ts: Optional[pd.Timestamp] = None
+        self._head_ts: Optional[pd.Timestamp] = None
+        self._index_meta: Optional[Tuple] = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop all state; the next ``update`` rebuilds from the buffer."""
+        self._states = {
+            tf_name: _TimeframeState(freq, self.buffer_sizes.get(tf_name, 100))
+            for tf_name, freq in self.timeframes.items()
+        }
+        self._last_ts = None
+        self._head_ts = None
+        self._index_meta = None
+
+    def update(self, candles_1m: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """
+        Fold new 1M candles into every timeframe.
+
+        Args:
+            candles_1m: Sorted 1-minute buffer, as held by the aggregator
+
+        Returns:
+            Dict mapping timeframe name to its closed bars (most recent
+            ``buffer_sizes[tf]`` rows)
+        """
+        if candles_1m.empty:
+            self.reset()
+            return {tf_name: pd.DataFrame() for tf_name in self.timeframes}
+
+        index = candles_1m.index
+        meta = (index.dtype, index.name, tuple(candles_1m[col].dtype for col in OHLCV_COLUMNS))
+        head_ts = index[0]
+
+        if (self._last_ts is None or meta != self._index_meta or
+                index[-1] < self._last_ts or head_ts < self._head_ts or
+                index.searchsorted(self._last_ts) >= len(index) or
+                index[index.searchsorted(self._last_ts)] != self._last_ts):
+            # No usable state (first call, restored or rewritten buffer)
+            self._rebuild(candles_1m)
+        else:
+            start = index.searchsorted(self._last_ts, side='right')
+            self._fold_rows(candles_1m, start)
+            if head_ts != self._head_ts:
+                self._trim_head(candles_1m)
+
+        self._index_meta = meta
+        self._last_ts = index[-1]
+        self._head_ts = head_ts
+        return self.frames()
+
+    def revise(self, candles_1m: pd.DataFrame, since: pd.Timestamp) -> Dict[str, pd.Timestamp]:
+        """
+        Re-derive bars after 1M candles from ``since`` were overwritten in place.
+
+        Call before ``update`` folds the rows appended by the same merge.
+        Closed bars from the bucket holding ``since`` onwards are recomputed
+        from the buffer; the forming bar is rebuilt when it closes.
+
+        Returns:
+            Dict mapping timeframe name to the label of its earliest
+            recomputed closed bar
+        """
+        if self._last_ts is None or candles_1m.empty:
+            return {}
+
+        since_ns = pd.Timestamp(since).as_unit('ns').value
+        columns = _column_arrays(candles_1m)
+        revised = {}
+
+        for tf_name, state in self._states.items():
+            since_label = state.label(since_ns)
+
+            bars = []
+            while state.closed and state.closed[-1][0] >= since_label:
+                bars.append(state.closed.pop()[0])
+            for label in reversed(bars):
+                bar = self._recompute(candles_1m.index, columns, state, label)
+                if bar.is_complete():
+                    state.closed.append(bar.as_row())
+            if bars:
+                state.frame = None
+                revised[tf_name] = pd.Timestamp(bars[-1])
+
+            if state.forming is not None and state.forming.label >= since_label:
+                state.forming_stale = True
+
+        return revised
+
+    def frames(self) -> Dict[str, pd.DataFrame]:
+        """
+        Closed bars for every timeframe, materialized lazily.
+
+        Frames are read-only and replaced rather than modified when bars
+        close, so they can be handed to readers without copying.
+        """
+        result = {}
+        for tf_name, state in self._states.items():
+            if state.frame is None:
+                state.frame = self._to_frame(state.closed)
+            result[tf_name] = state.frame
+        return result
+
+    def export_state(self) -> Dict[str, Any]:
+        """Closed bars and forming bars as plain values, for a warm-restart snapshot."""
+        if self._last_ts is None:
+            return {}
+        state = {'last_ts': self._last_ts.value, 'head_ts': self._head_ts.value, 'timeframes': {}}
+        for tf_name, tf_state in self._states.items():
+            bar = tf_state.forming
+            state['timeframes'][tf_name] = {
+                'closed': [_plain(row) for row in tf_state.closed],
+                'forming': None if bar is None else _plain(bar.as_row() + (bar._comp,)),
+                'forming_stale': tf_state.forming_stale
+            }
+        return state
+
+    def restore_state(self, state: Dict[str, Any], candles_1m: pd.DataFrame) -> bool:
+        """
+        Restore ``export_state`` output taken when the buffer held ``candles_1m``.
+
+        Returns:
+            bool: False (state left reset) if it does not match the buffer or
+            the configured timeframes; the next ``update`` then rebuilds
+        """
+        self.reset()
+        if (not state or candles_1m.empty or set(state['timeframes']) != set(self._states) or
+                candles_1m.index[-1:].as_unit('ns').asi8[0] != state['last_ts'] or
+                candles_1m.index[:1].as_unit('ns').asi8[0] != state['head_ts']):
+            return False
+
+        for tf_name, saved in state['timeframes'].items():
+            tf_state = self._states[tf_name]
+            tf_state.closed.extend(tuple(row) for row in saved['closed'])
+            if saved['forming'] is not None:
+                label, o, h, l, c, v, comp = saved['forming']
+                bar = _Bar(label)
+                bar.open, bar.high, bar.low, bar.close, bar.volume, bar._comp = o, h, l, c, v, comp
+                tf_state.forming = bar
+            tf_state.forming_stale = saved['forming_stale']
+
+        index = candles_1m.index
+        self._index_meta = (index.dtype, index.name,
+                            tuple(candles_1m[col].dtype for col in OHLCV_COLUMNS))
+        self._last_ts = index[-1]
+        self._head_ts = index[0]
+        return True
+
+    def _fold_rows(self, candles_1m: pd.DataFrame, start: int) -> None:
+        rows = candles_1m.iloc[start:]
+        if rows.empty:
+            return
+
+        stamps = rows.index.as_unit('ns').asi8.tolist()
+        columns = [rows[col].tolist() for col in OHLCV_COLUMNS]
+
+        for state in self._states.values():
+            bar = state.forming
+            for ts, o, h, l, c, v in zip(stamps, *columns):
+                label = state.label(ts)
+                if bar is None or label != bar.label:
+                    if bar is not None:
+                        if state.forming_stale:
+                            bar = self._recompute(
+                                candles_1m.index, _column_arrays(candles_1m), state, bar.label)
+                            state.forming_stale = False
+                        self._close(state, bar)
+                    bar = _Bar(label)
+                bar.fold(o, h, l, c, v)
+            state.forming = bar
+
+    def _close(self, state: _TimeframeState, bar: _Bar) -> None:
+        if bar.is_complete():
+            state.closed.append(bar.as_row())
+            state.frame = None
+
+    def _rebuild(self, candles_1m: pd.DataFrame) -> None:
+        """Seed closed bars from the bulk kernel and the forming bar from its bucket."""
+        self.reset()
+        last_ns = candles_1m.index[-1:].as_unit('ns').asi8[0]
+        columns = _column_arrays(candles_1m)
+
+        frames = aggregate_timeframes(candles_1m, self.timeframes)
+
+        for tf_name, state in self._states.items():
+            closed = frames[tf_name]
+            if not closed.empty:
+                closed = closed.tail(state.closed.maxlen)
+                labels = closed.index.as_unit('ns').asi8.tolist()
+                state.closed.extend(zip(labels, *(closed[col].tolist() for col in OHLCV_COLUMNS)))
+            state.forming = self._recompute(
+                candles_1m.index, columns, state, state.label(last_ns))
+
+    def _trim_head(self, candles_1m: pd.DataFrame) -> None:
+        """Re-derive the bar straddling the buffer head after trimming."""
+        head_ns = candles_1m.index[:1].as_unit('ns').asi8[0]
+        columns = None
+
+        for state in self._states.values():
+            head_label = state.label(head_ns)
+
+            while state.closed and state.closed[0][0] < head_label:
+                state.closed.popleft()
+                state.frame = None
+
+            if state.closed and state.closed[0][0] == head_label:
+                if columns is None:
+                    columns = _column_arrays(candles_1m)
+                bar = self._recompute(candles_1m.index, columns, state, head_label)
+                state.closed.popleft()
+                if bar.is_complete():
+                    state.closed.appendleft(bar.as_row())
+                state.frame = None
+            elif state.forming is not None and state.forming.label == head_label:
+                # Not emitted until it closes, so defer the rebuild until then
+                state.forming_stale = True
+
+    def _recompute(self, index: pd.DatetimeIndex, columns: List[np.ndarray],
+                   state: _TimeframeState, label: int) -> _Bar:
+        """
+        Aggregate one bucket from the rows of the buffer that fall in it.
+
+        Vectorized, so the cost is bounded by the bucket length rather than
+        the buffer size.
+        """
+        start, end = state.bounds(label)
+        lo = index.searchsorted(pd.Timestamp(start))
+        hi = index.searchsorted(pd.Timestamp(end))
+
+        bar = _Bar(label)
+        if hi <= lo:
+            return bar
+
+        opens, highs, lows, closes, volumes = (values[lo:hi] for values in columns)
+
+        valid = np.flatnonzero(opens == opens)
+        if len(valid):
+            bar.open = opens[valid[0]].item()
+        bar.high = np.fmax.reduce(highs).item()
+        bar.low = np.fmin.reduce(lows).item()
+        valid = np.flatnonzero(closes == closes)
+        if len(valid):
+            bar.close = closes[valid[-1]].item()
+
+        if volumes.dtype.kind == 'f':
+            for v in volumes.tolist():
+                bar.add_volume(v)
+        else:
+            bar.volume = int(volumes.sum())
+        return bar
+
+    def _to_frame(self, closed: Deque[Tuple]) -> pd.DataFrame:
+        index_dtype, index_name, dtypes = self._index_meta
+        volume_dtype = np.int64 if np.issubdtype(dtypes[-1], np.integer) else np.float64
+
+        rows = list(zip(*closed)) if closed else [[] for _ in range(6)]
+        index = pd.DatetimeIndex(
+            np.asarray(rows[0], dtype='int64').view('datetime64[ns]').astype(index_dtype),
+            name=index_name)
+        data = {}
+        for col, values, dtype in zip(OHLCV_COLUMNS, rows[1:], list(dtypes[:-1]) + [volume_dtype]):
+            data[col] = np.asarray(values, dtype=dtype)
+            # Shared by every reader until the next bar closes
+            data[col].flags.writeable = False
+        return pd.DataFrame(data, index=index, copy=False)
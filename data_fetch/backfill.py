@@ -0,0 +1,221 @@
+"""
+Resumable Historical Backfill
+=============================
+
+Fills the candle database for an arbitrary date range, instead of the
+single ``yf.download(period=...)`` bootstrap that kept only the buffer tail.
+
+- The range is split into provider-legal windows (e.g. 7 days of 1m data
+  per yfinance request), aligned to UTC midnight so no intraday or daily
+  bar straddles two windows.
+- Windows are fetched on a thread pool; the window fetch function waits on
+  the provider's rate limit, so parallelism stays inside its budget.
+- Each finished window is written straight to SQLite (1M rows plus the
+  timeframes derivable from it) and recorded in a JSON checkpoint, so only
+  a few windows are ever in memory and an interrupted run resumes at the
+  first unfinished window. The 1M rows also go to the columnar history
+  store when one is given.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from aggregation import OHLC_AGG
+from history import HistoryStore
+from storage import CandleDatabase
+
+logger = logging.getLogger(__name__)
+
+# Called on a worker thread with (start, end, cancel); returns the 1M
+# candles in [start, end) and raises on provider errors so the window is retried
+WindowFetch = Callable[[pd.Timestamp, pd.Timestamp, threading.Event], pd.DataFrame]
+
+_DAY = pd.Timedelta(days=1)
+
+
+def plan_windows(start: pd.Timestamp, end: pd.Timestamp,
+                 window: pd.Timedelta) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """
+    Split [start, end) into consecutive windows of at most ``window``.
+
+    The first window starts at the UTC midnight on or before ``start``, and
+    whole-day windows keep every later boundary on a midnight too.
+    """
+    start = pd.Timestamp(start).floor('D')
+    end = pd.Timestamp(end)
+    windows = []
+    while start < end:
+        windows.append((start, min(start + window, end)))
+        start += window
+    return windows
+
+
+def window_bars(candles: pd.DataFrame, freq: str, end: pd.Timestamp,
+                start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """
+    Closed bars of one timeframe fully inside a backfill window.
+
+    Only timeframes that divide a day can be derived per window; the last
+    bucket is kept when it ends by ``end`` (unlike the live path, nothing
+    after it is still forming). Buckets opening before ``start`` would only
+    hold part of their candles and are dropped.
+    """
+    bars = candles.resample(freq, label='left').agg(OHLC_AGG).dropna()
+    keep = bars.index + pd.Timedelta(freq) <= end
+    if start is not None:
+        keep &= bars.index >= start
+    return bars[keep]
+
+
+class BackfillEngine:
+    """Windowed, parallel, checkpointed backfill into a CandleDatabase."""
+
+    def __init__(self, database: CandleDatabase, max_workers: int = 4, retries: int = 2,
+                 history: Optional[HistoryStore] = None):
+        """
+        Args:
+            database: Destination store; written from the calling thread only
+            max_workers: Windows fetched concurrently
+            retries: Extra attempts per window before giving up on it for this run
+            history: Columnar 1M store also written per window (optional)
+        """
+        self.database = database
+        self.history = history
+        self.max_workers = max_workers
+        self.retries = retries
+
+    def run(self, job: Dict[str, Any], fetch: WindowFetch, tables: Dict[str, str],
+            timeframes: Dict[str, str], checkpoint_file: str,
+            cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        Backfill one symbol from one provider.
+
+        Args:
+            job: 'start', 'end' and 'window' of the range plus identifying
+                fields (symbol, source); a checkpoint is only resumed for
+                an identical job
+            fetch: Window fetch function
+            tables: Table name per timeframe, including '1M'
+            timeframes: Timeframe frequencies (as in TIMEFRAMES) to derive
+            checkpoint_file: JSON file recording finished windows
+            cancel: Set to stop after the windows already in flight
+
+        Returns:
+            Dict of run statistics
+        """
+        cancel = cancel or threading.Event()
+        windows = plan_windows(job['start'], job['end'], job['window'])
+        derivable = {tf_name: freq for tf_name, freq in timeframes.items()
+                     if tf_name in tables and _DAY % pd.Timedelta(freq) == pd.Timedelta(0)}
+
+        key = {k: str(v) for k, v in job.items()}
+        done = self._load_checkpoint(checkpoint_file, key)
+        queue = [(start, end) for start, end in windows if str(start) not in done]
+        stats = {'windows': len(windows), 'resumed': len(windows) - len(queue),
+                 'fetched': 0, 'empty': 0, 'failed': 0, 'rows': 0, 'retries': 0}
+
+        started = time.monotonic()
+        attempts: Dict[pd.Timestamp, int] = {}
+        pending: Dict[Future, Tuple[pd.Timestamp, pd.Timestamp]] = {}
+        executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                      thread_name_prefix='backfill')
+        try:
+            while queue or pending:
+                # Keep only max_workers windows in flight to bound memory
+                while queue and len(pending) < self.max_workers and not cancel.is_set():
+                    bounds = queue.pop(0)
+                    pending[executor.submit(fetch, bounds[0], bounds[1], cancel)] = bounds
+                if not pending:
+                    break
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    start, end = pending.pop(future)
+                    try:
+                        candles = future.result()
+                    except Exception as e:
+                        attempts[start] = attempts.get(start, 0) + 1
+                        if attempts[start] <= self.retries and not cancel.is_set():
+                            logger.warning(f"Backfill window {start} failed ({e}), retrying")
+                            stats['retries'] += 1
+                            queue.insert(0, (start, end))
+                        else:
+                            logger.error(f"Backfill window {start} failed: {e}")
+                            stats['failed'] += 1
+                        continue
+
+                    if cancel.is_set() and candles.empty:
+                        continue  # cancelled mid-wait, not a genuinely empty window
+
+                    stats['rows'] += self._store(candles, start, end, job, tables, derivable)
+                    stats['fetched'] += 1
+                    stats['empty'] += candles.empty
+                    done[str(start)] = len(candles)
+                    self._save_checkpoint(checkpoint_file, key, done)
+
+        except KeyboardInterrupt:
+            cancel.set()
+            raise
+
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        stats['complete'] = len(done) == len(windows)
+        stats['elapsed'] = time.monotonic() - started
+        stats['rows_per_second'] = stats['rows'] / stats['elapsed'] if stats['elapsed'] else 0.0
+        return stats
+
+    def _store(self, candles: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp,
+               job: Dict[str, Any], tables: Dict[str, str], derivable: Dict[str, str]) -> int:
+        """
+        Write one window's 1M candles and derived bars in a single transaction.
+
+        The first window opens at midnight, so rows before the job's own
+        start are clipped off rather than written unasked.
+        """
+        if candles.empty:
+            return 0
+
+        start = max(start, pd.Timestamp(job['start']))
+        candles = candles[(candles.index >= start) & (candles.index < end)]
+        candles = candles[~candles.index.duplicated(keep='last')].sort_index()
+        source = job.get('source', 'unknown')
+
+        batches = {tables['1M']: (candles, source)}
+        for tf_name, freq in derivable.items():
+            batches[tables[tf_name]] = (window_bars(candles, freq, end, start), 'aggregated')
+        self.database.write_history(batches)
+        if self.history is not None:
+            self.history.write(job['symbol'], candles)
+        return len(candles)
+
+    @staticmethod
+    def _load_checkpoint(checkpoint_file: str, key: Dict[str, str]) -> Dict[str, int]:
+        if not os.path.exists(checkpoint_file):
+            return {}
+        try:
+            with open(checkpoint_file) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable backfill checkpoint: {e}")
+            return {}
+        if checkpoint.get('job') != key:
+            return {}
+        logger.info(f"Resuming backfill with {len(checkpoint['done'])} windows done")
+        return checkpoint['done']
+
+    @staticmethod
+    def _save_checkpoint(checkpoint_file: str, key: Dict[str, str], done: Dict[str, int]) -> None:
+        tmp_file = f"{checkpoint_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump({'job': key, 'done': done}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, checkpoint_file)
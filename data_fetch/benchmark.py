@@ -0,0 +1,2820 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the EUR/JPY data aggregator
+==================================================
+
+Runs against synthetic 1-minute candles only, so no API keys or network
+access are needed.
+
+Usage:
+    python benchmark.py aggregation [--buffer 500] [--ticks 2000]
+    python benchmark.py recovery [--buffer 500] [--tail 500]
+    python benchmark.py fetch [--minutes 500] [--hedge-delay 0.05] [--seed 0]
+    python benchmark.py symbols [--symbols 1 --symbols 10 --symbols 50]
+    python benchmark.py buffer [--buffer 500 --buffer 250000] [--ticks 500]
+    python benchmark.py reads [--buffer 1000 --buffer 250000] [--ticks 200]
+    python benchmark.py storage [--rows 1000000] [--batch 10000]
+    python benchmark.py backfill [--days 60] [--latency 0.05]
+    python benchmark.py quality [--buffer 1000 --buffer 250000] [--ticks 500]
+    python benchmark.py ratelimit [--hours 48] [--threads 16]
+    python benchmark.py delta [--minutes 200] [--window 2880] [--tls]
+    python benchmark.py pipeline [--buffer 500 --buffer 1000000] [--output results.json]
+    python benchmark.py metrics [--buffer 10000] [--ticks 1000]
+    python benchmark.py startup [--buffer 10000 --buffer 250000] [--runs 5]
+    python benchmark.py events [--ticks 300]
+    python benchmark.py history [--days 365]
+    python benchmark.py tiers [--days 300] [--cache-mb 8]
+    python benchmark.py replay [--days 365] [--minutes 3000]
+    python benchmark.py indicators [--days 120] [--ticks 600]
+    python benchmark.py shared [--readers 16] [--ticks 200] [--interval 0.1]
+    python benchmark.py schedule [--hours 72]
+    python benchmark.py health [--ticks 240]
+    python benchmark.py bulk [--rows 1000000 --rows 2000000] [--float-volume | --whole-float-volume]
+    python benchmark.py cache [--days 10] [--symbols 4] [--clients 8]
+    python benchmark.py compare baseline.json results.json [--threshold 1.2]
+    python benchmark.py record --db eurjpy_data.db --table EURJPY_1M --output fixture.csv
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import pickle
+import platform
+import sqlite3
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+import requests
+
+from aggregation import TIMEFRAMES, IncrementalAggregator, aggregate_timeframes, resample_ohlcv
+from backfill import window_bars
+from events import EventClient
+from health import HealthMonitor
+from history import HistoryStore, columns_frame
+from indicators import IndicatorSet
+from journal import CandleJournal
+from metrics import MetricsRegistry
+from quality import CandleValidator, invalid_ohlc, next_session_minute
+from ratelimit import RateLimiter
+from replay import ReplayEngine, SimulatedClock
+from respcache import ResponseCache
+from ringbuffer import CandleRingBuffer
+from scheduler import PollScheduler
+from storage import CandleDatabase
+from testing import FakeClock, inject_anomalies, synthetic_candles
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    values = np.asarray(samples) * 1e3
+    return {
+        'p50_ms': float(np.percentile(values, 50)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'mean_ms': float(values.mean())
+    }
+
+
+def bench_aggregation(buffer_size: int, ticks: int, seed: int = 0,
+                      float_volume: bool = False) -> Dict:
+    """
+    Drive a sliding 1M buffer tick by tick and compare the incremental
+    aggregator against a full resample of every timeframe.
+
+    Raises:
+        AssertionError: If the incremental output differs from resample
+    """
+    rng = np.random.default_rng(seed)
+    candles = synthetic_candles(buffer_size + ticks * 5, seed=seed,
+                                float_volume=float_volume)
+    sizes = {tf_name: 100 for tf_name in TIMEFRAMES}
+    aggregator = IncrementalAggregator(TIMEFRAMES, sizes)
+
+    incremental, full = [], []
+    end = buffer_size
+    aggregator.update(candles.iloc[:end])
+
+    for _ in range(ticks):
+        end = min(end + int(rng.integers(1, 6)), len(candles))
+        buffer = candles.iloc[max(0, end - buffer_size):end]
+
+        started = time.perf_counter()
+        result = aggregator.update(buffer)
+        incremental.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        reference = {tf_name: resample_ohlcv(buffer, freq).tail(sizes[tf_name])
+                     for tf_name, freq in TIMEFRAMES.items()}
+        full.append(time.perf_counter() - started)
+
+        for tf_name, expected in reference.items():
+            pd.testing.assert_frame_equal(
+                result[tf_name], expected, check_exact=True, check_freq=False)
+
+    return {
+        'buffer_size': buffer_size,
+        'ticks': ticks,
+        'incremental': _percentiles(incremental),
+        'resample': _percentiles(full)
+    }
+
+
+def bench_recovery(buffer_size: int, tail: int, ticks: int = 200,
+                   fsync: str = 'always') -> Dict:
+    """
+    Compare per-tick persistence and startup recovery of the legacy pickle
+    snapshot against checkpoint + journal replay.
+
+    Args:
+        buffer_size: 1M candles held in memory
+        tail: Candles in the journal since the last checkpoint at recovery
+        ticks: Single-candle saves to time
+        fsync: Journal fsync policy
+    """
+    candles = synthetic_candles(buffer_size + tail + ticks)
+    sizes = {tf_name: 100 for tf_name in TIMEFRAMES}
+    result = {'buffer_size': buffer_size, 'journal_tail': tail, 'fsync': fsync}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Legacy: pickle the whole buffer and every timeframe on each tick
+        state_file = os.path.join(tmp, 'state.pkl')
+        saves = []
+        for i in range(ticks):
+            buffer = candles.iloc[i + tail:i + tail + buffer_size]
+            timeframes = IncrementalAggregator(TIMEFRAMES, sizes).update(buffer) if i == 0 else timeframes
+            started = time.perf_counter()
+            with open(state_file, 'wb') as f:
+                pickle.dump({'candles_1m': buffer, 'timeframes': timeframes}, f)
+            saves.append(time.perf_counter() - started)
+        result['pickle_save'] = _percentiles(saves)
+
+        started = time.perf_counter()
+        with open(state_file, 'rb') as f:
+            pickle.load(f)
+        result['pickle_recover_ms'] = (time.perf_counter() - started) * 1e3
+
+        # Journal: checkpoint once, then append one candle per tick
+        journal = CandleJournal(os.path.join(tmp, 'candles.journal'),
+                                os.path.join(tmp, 'candles.checkpoint'),
+                                fsync=fsync, checkpoint_every=tail + ticks + 1)
+        journal.checkpoint(candles.iloc[:buffer_size], {})
+        saves = []
+        for i in range(tail + ticks):
+            buffer = candles.iloc[i + 1:i + 1 + buffer_size]
+            started = time.perf_counter()
+            journal.append(buffer, 'yfinance')
+            saves.append(time.perf_counter() - started)
+        journal.close()
+        result['journal_append'] = _percentiles(saves[tail:])
+
+        started = time.perf_counter()
+        recovered, _ = CandleJournal(journal.journal_file, journal.checkpoint_file).recover()
+        recovered = recovered.tail(buffer_size)
+        result['journal_recover_ms'] = (time.perf_counter() - started) * 1e3
+
+        started = time.perf_counter()
+        IncrementalAggregator(TIMEFRAMES, sizes).update(recovered)
+        result['timeframe_rebuild_ms'] = (time.perf_counter() - started) * 1e3
+
+        expected = candles.iloc[-buffer_size:]
+        pd.testing.assert_frame_equal(recovered, expected, check_freq=False)
+
+    return result
+
+
+CURRENCIES = ['EUR', 'USD', 'JPY', 'GBP', 'AUD', 'CAD', 'CHF', 'NZD', 'SEK', 'NOK']
+
+
+def fx_pairs(count: int) -> List[str]:
+    """First ``count`` distinct 'BASE/QUOTE' pairs built from CURRENCIES."""
+    pairs = [f"{base}/{quote}" for base in CURRENCIES for quote in CURRENCIES if base != quote]
+    return pairs[:count]
+
+
+@contextlib.contextmanager
+def offline_aggregator(workdir: str, symbols: Optional[List[str]] = None) -> Iterator:
+    """
+    MultiSourceForexAggregator whose state, database and log files live in
+    ``workdir``. Callers replace ``aggregator.providers`` with stubs.
+    """
+    cwd = os.getcwd()
+    module_dir = os.path.dirname(os.path.abspath(__file__))
+    if module_dir not in sys.path:
+        sys.path.insert(0, module_dir)
+    os.chdir(workdir)
+    try:
+        import data_fetch  # configures a log file in the working directory
+        logging.getLogger().setLevel(logging.ERROR)
+
+        aggregator = data_fetch.MultiSourceForexAggregator(symbols or ['EUR/JPY'])
+        for journal in aggregator.journals.values():
+            journal.fsync = 'never'
+        try:
+            yield aggregator
+        finally:
+            aggregator.close()
+    finally:
+        os.chdir(cwd)
+
+
+class StubProvider:
+    """
+    Offline provider serving the candles closed so far after an injected delay.
+
+    Args:
+        candles: Full candle history to serve from
+        delays: (probability, seconds) pairs; seconds=None means an empty answer
+        seed: RNG seed for delay sampling
+        window: Number of trailing candles per response
+        symbols: Symbol keys to answer for (one batched response)
+    """
+
+    def __init__(self, candles: pd.DataFrame, delays: List[Tuple[float, Optional[float]]],
+                 seed: int = 0, window: int = 100, symbols: Optional[List[str]] = None):
+        self.candles = candles
+        self.symbols = symbols or ['EURJPY']
+        self.probabilities = np.array([p for p, _ in delays])
+        self.delays = [d for _, d in delays]
+        self.rng = np.random.default_rng(seed)
+        self.window = window
+        self.visible = 0  # candles closed so far
+        self.calls = 0
+
+    def __call__(self, cancel: threading.Event) -> Dict[str, pd.DataFrame]:
+        self.calls += 1
+        delay = self.delays[self.rng.choice(len(self.delays), p=self.probabilities)]
+        if cancel.wait(delay or 0) or delay is None:
+            return {}
+        window = self.candles.iloc[max(0, self.visible - self.window):self.visible]
+        return {symbol: window for symbol in self.symbols}
+
+
+# Latency profiles scaled to milliseconds: a usually-fast primary with a
+# slow/empty tail, and backups that pay a rate-limit wait on every call.
+STUB_PROFILES = {
+    'yfinance': [(0.80, 0.02), (0.15, 0.4), (0.05, None)],
+    'alpha_vantage': [(0.95, 0.12), (0.05, None)],
+    'twelve_data': [(0.95, 0.08), (0.05, None)]
+}
+
+
+def bench_fetch(mode: str, minutes: int, hedge_delay: float, seed: int = 0) -> Dict:
+    """
+    Close one synthetic minute at a time and time fetch_latest_data until
+    the candle is merged, with stub providers from STUB_PROFILES.
+
+    The configuration is pinned (profiles, hedge delay, seed) and returned
+    with the result. p99 rests on the few polls where the fast provider is
+    slow and a backup is empty, so compare modes over at least 500 minutes.
+    """
+    candles = synthetic_candles(minutes + 500, seed=seed, gap_ratio=0)
+    latencies, missed = [], 0
+
+    with tempfile.TemporaryDirectory() as tmp, offline_aggregator(tmp) as aggregator:
+        stubs = {source: StubProvider(candles, profile, seed=seed + i)
+                 for i, (source, profile) in enumerate(STUB_PROFILES.items())}
+        aggregator.providers = dict(stubs)
+        aggregator.FETCH_MODE = mode
+        aggregator.HEDGE_DELAY = hedge_delay
+        aggregator.candles_1m = candles.iloc[:500]
+
+        for minute in range(500, 500 + minutes):
+            for stub in stubs.values():
+                stub.visible = minute + 1
+            started = time.perf_counter()
+            aggregator.fetch_latest_data()
+            if aggregator.candles_1m.index[-1] == candles.index[minute]:
+                latencies.append(time.perf_counter() - started)
+            else:
+                missed += 1
+                aggregator.candles_1m = candles.iloc[minute + 1 - 500:minute + 1]
+
+        calls = {source: stub.calls for source, stub in stubs.items()}
+
+    return {'mode': mode, 'minutes': minutes, 'missed': missed,
+            'config': {'hedge_delay': hedge_delay, 'seed': seed, 'profiles': STUB_PROFILES},
+            'provider_calls': calls, 'close_to_merge': _percentiles(latencies)}
+
+
+def bench_symbols(count: int, minutes: int = 100) -> Dict:
+    """
+    Poll throughput of one aggregator tracking ``count`` symbols, fed by a
+    single zero-latency batched stub provider.
+    """
+    candles = synthetic_candles(minutes + 500, gap_ratio=0)
+    polls = []
+
+    with tempfile.TemporaryDirectory() as tmp, offline_aggregator(tmp, fx_pairs(count)) as aggregator:
+        stub = StubProvider(candles, [(1.0, 0.0)], symbols=aggregator.symbols)
+        aggregator.providers = {'yfinance': stub}
+        for symbol in aggregator.symbols:
+            aggregator.buffers[symbol].load(candles.iloc[:500])
+            aggregator._update_all_timeframes(symbol)
+
+        for minute in range(500, 500 + minutes):
+            stub.visible = minute + 1
+            started = time.perf_counter()
+            aggregator.fetch_latest_data()
+            polls.append(time.perf_counter() - started)
+
+        assert all(aggregator.buffers[symbol].last_timestamp == candles.index[-1]
+                   for symbol in aggregator.symbols)
+
+    latency = _percentiles(polls)
+    return {
+        'symbols': count,
+        'poll': latency,
+        'candles_per_second': count / (latency['mean_ms'] / 1e3),
+        'provider_requests_per_poll': stub.calls / minutes
+    }
+
+
+def concat_merge(candles: pd.DataFrame, new_data: pd.DataFrame, buffer_size: int) -> pd.DataFrame:
+    """The pre-ring-buffer merge: concat, dedupe, tail and sort the whole frame."""
+    new_candles = new_data[new_data.index > candles.index[-1]]
+    if new_candles.empty:
+        return candles
+    candles = pd.concat([candles, new_candles])
+    candles = candles[~candles.index.duplicated(keep='last')]
+    return candles.tail(buffer_size).sort_index()
+
+
+def bench_buffer(buffer_size: int, ticks: int, window: int = 100,
+                 revise_ratio: float = 0.3, seed: int = 0) -> Dict:
+    """
+    Per-tick 1M merge cost of the ring buffer vs the old concat path, with
+    a full buffer, provider windows of ``window`` candles and the last
+    stored candle revised on ``revise_ratio`` of ticks.
+
+    Raises:
+        AssertionError: If the ring buffer differs from the expected window
+    """
+    rng = np.random.default_rng(seed)
+    history = synthetic_candles(buffer_size + ticks * 5, seed=seed)
+    ring = CandleRingBuffer(buffer_size)
+    end = buffer_size
+    ring.load(history.iloc[:end])
+    old = history.iloc[:end]
+
+    ring_times, concat_times, revised = [], [], 0
+    for _ in range(ticks):
+        if rng.random() < revise_ratio:
+            # Provider finalizes the minute it served as still forming
+            row = history.index[end - 1]
+            history.loc[row, 'close'] += 0.001
+            history.loc[row, 'high'] = max(history.at[row, 'high'], history.at[row, 'close'])
+            revised += 1
+        end = min(end + int(rng.integers(1, 4)), len(history))
+        new_data = history.iloc[max(0, end - window):end]
+
+        started = time.perf_counter()
+        ring.merge(new_data)
+        frame = ring.frame()
+        ring_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        old = concat_merge(old, new_data, buffer_size)
+        concat_times.append(time.perf_counter() - started)
+
+        pd.testing.assert_frame_equal(
+            frame, history.iloc[max(0, end - buffer_size):end],
+            check_exact=True, check_freq=False)
+
+    return {
+        'buffer_size': buffer_size,
+        'ticks': ticks,
+        'revised_ticks': revised,
+        'ring_buffer': _percentiles(ring_times),
+        'concat': _percentiles(concat_times)
+    }
+
+
+def bench_reads(buffer_size: int, ticks: int, last_n: int = 10) -> Dict:
+    """
+    Bytes allocated per get_timeframe_data call (tracemalloc peak) for the
+    old copying read vs read-only snapshots, with one merged candle per tick.
+    """
+    candles = synthetic_candles(buffer_size + ticks + 1, gap_ratio=0)
+    readers = {
+        'snapshot': lambda agg, tf, seen: agg.get_timeframe_data(tf),
+        'last_n': lambda agg, tf, seen: agg.get_timeframe_data(tf, last_n=last_n),
+        'since': lambda agg, tf, seen: agg.get_timeframe_data(tf, since=seen),
+        'copy': lambda agg, tf, seen: agg.get_timeframe_data(tf, copy=True)
+    }
+    allocated = {(name, tf): [] for name in readers for tf in ('1M', '1H')}
+
+    with tempfile.TemporaryDirectory() as tmp, offline_aggregator(tmp) as aggregator:
+        aggregator.buffers['EURJPY'] = CandleRingBuffer(buffer_size)
+        aggregator._merge_new_data(candles.iloc[:buffer_size], 'yfinance')
+        aggregator._update_all_timeframes()
+        seen = {tf: aggregator.get_timeframe_data(tf).index[-1] for tf in ('1M', '1H')}
+
+        tracemalloc.start()
+        try:
+            for end in range(buffer_size + 1, buffer_size + ticks + 1):
+                aggregator._merge_new_data(candles.iloc[end - 5:end], 'yfinance')
+                aggregator._update_all_timeframes()
+                for tf in ('1M', '1H'):
+                    for name, read in readers.items():
+                        baseline = tracemalloc.get_traced_memory()[0]
+                        tracemalloc.reset_peak()
+                        data = read(aggregator, tf, seen[tf])
+                        allocated[name, tf].append(tracemalloc.get_traced_memory()[1] - baseline)
+                        del data
+                    seen[tf] = aggregator.get_timeframe_data(tf).index[-1]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'buffer_size': buffer_size,
+        'bytes_per_call': {f"{tf}/{name}": float(np.median(values))
+                           for (name, tf), values in allocated.items()}
+    }
+
+
+def _text_schema_upsert(conn: sqlite3.Connection, rows: pd.DataFrame) -> None:
+    """The pre-integer schema write path: TEXT primary key from strftime."""
+    conn.executemany("""
+        INSERT INTO candles (timestamp, open, high, low, close, volume, source)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(timestamp) DO UPDATE SET
+            open = excluded.open, high = excluded.high, low = excluded.low,
+            close = excluded.close, volume = excluded.volume, source = excluded.source
+    """, zip(rows.index.strftime('%Y-%m-%d %H:%M:%S'), rows['open'].tolist(),
+             rows['high'].tolist(), rows['low'].tolist(), rows['close'].tolist(),
+             rows['volume'].tolist(), ['yfinance'] * len(rows)))
+
+
+def _text_schema_range(conn: sqlite3.Connection, start: pd.Timestamp,
+                       end: pd.Timestamp) -> Dict[str, np.ndarray]:
+    """Range read over TEXT timestamps: string comparison plus datetime parsing."""
+    rows = conn.execute("""
+        SELECT timestamp, open, high, low, close, volume FROM candles
+        WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp
+    """, (start.strftime('%Y-%m-%d %H:%M:%S'), end.strftime('%Y-%m-%d %H:%M:%S'))).fetchall()
+    columns = list(zip(*rows)) if rows else [[]] * 6
+    result = {'timestamp': pd.to_datetime(list(columns[0]), format='%Y-%m-%d %H:%M:%S').to_numpy()}
+    for col, values in zip(OHLCV, columns[1:]):
+        result[col] = np.asarray(values, dtype=np.float64)
+    return result
+
+
+OHLCV = ['open', 'high', 'low', 'close', 'volume']
+
+
+def bench_storage(rows: int, batch: int, reads: int = 50, seed: int = 0) -> Dict:
+    """
+    Write and range-read throughput of the integer-epoch WITHOUT ROWID
+    schema vs the old TEXT-timestamp schema, at ``rows`` 1M candles.
+
+    Raises:
+        AssertionError: If both schemas do not return the same rows
+    """
+    rng = np.random.default_rng(seed)
+    candles = synthetic_candles(rows, seed=seed)
+    windows = {'1 day': pd.Timedelta(days=1), '30 days': pd.Timedelta(days=30)}
+    result: Dict[str, Dict] = {'integer': {}, 'text': {}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        text_file = os.path.join(tmp, 'text.db')
+        conn = sqlite3.connect(text_file)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE candles (
+                timestamp TEXT PRIMARY KEY, open REAL NOT NULL, high REAL NOT NULL,
+                low REAL NOT NULL, close REAL NOT NULL, volume INTEGER DEFAULT 0,
+                source TEXT NOT NULL, created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        started = time.perf_counter()
+        for offset in range(0, rows, batch):
+            with conn:
+                _text_schema_upsert(conn, candles.iloc[offset:offset + batch])
+        result['text']['write_rows_per_s'] = rows / (time.perf_counter() - started)
+
+        int_file = os.path.join(tmp, 'integer.db')
+        database = CandleDatabase(int_file, ['EURJPY_1M'])
+        database.init_schema()
+        started = time.perf_counter()
+        for offset in range(0, rows, batch):
+            database.flush({'EURJPY_1M': (candles.iloc[offset:offset + batch], 'yfinance')})
+        result['integer']['write_rows_per_s'] = rows / (time.perf_counter() - started)
+
+        for schema, path in (('text', text_file), ('integer', int_file)):
+            sqlite3.connect(path).execute("PRAGMA wal_checkpoint(TRUNCATE)").close()
+            result[schema]['file_mb'] = os.path.getsize(path) / 2 ** 20
+
+        span = candles.index[-1] - candles.index[0]
+        for label, width in windows.items():
+            starts = [candles.index[0] + span * rng.random() * (1 - width / span)
+                      for _ in range(reads)]
+            for schema in ('text', 'integer'):
+                timings, fetched = [], 0
+                for start in starts:
+                    start, end = start.floor('min'), (start + width).floor('min')
+                    began = time.perf_counter()
+                    if schema == 'text':
+                        data = _text_schema_range(conn, start, end)
+                    else:
+                        data = database.query_range('EURJPY_1M', start, end)
+                    timings.append(time.perf_counter() - began)
+                    fetched += len(data['timestamp'])
+                result[schema][f'range {label}'] = {
+                    **_percentiles(timings),
+                    'rows_per_s': fetched / sum(timings)
+                }
+
+            expected = _text_schema_range(conn, starts[0].floor('min'), (starts[0] + width).floor('min'))
+            actual = database.query_range('EURJPY_1M', starts[0].floor('min'), (starts[0] + width).floor('min'))
+            assert np.array_equal(expected['timestamp'].astype('datetime64[s]'), actual['timestamp'])
+            for col in OHLCV:
+                assert np.array_equal(expected[col], actual[col])
+
+        conn.close()
+        database.close()
+
+    return {'rows': rows, 'batch': batch, **result}
+
+
+class RangeStubProvider:
+    """
+    Offline date-range provider for backfill runs.
+
+    Args:
+        candles: Full candle history to serve from
+        latency: Seconds per request
+        failure_rate: Probability that a request raises
+        stop_after: Set the cancel event after this many answered requests
+        seed: RNG seed for failure injection
+    """
+
+    def __init__(self, candles: pd.DataFrame, latency: float, failure_rate: float = 0.0,
+                 stop_after: Optional[int] = None, seed: int = 0):
+        self.candles = candles
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.stop_after = stop_after
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+        self.windows: List[pd.Timestamp] = []  # answered windows
+        self.failures = 0
+
+    def __call__(self, symbol: str, start: pd.Timestamp, end: pd.Timestamp,
+                 cancel: threading.Event) -> pd.DataFrame:
+        if cancel.wait(self.latency):
+            return pd.DataFrame()
+        with self.lock:
+            if self.rng.random() < self.failure_rate:
+                self.failures += 1
+                raise RuntimeError(f"injected failure for {start}")
+            self.windows.append(start)
+            if self.stop_after is not None and len(self.windows) >= self.stop_after:
+                cancel.set()
+        candles = self.candles
+        return candles.iloc[candles.index.searchsorted(start):candles.index.searchsorted(end)]
+
+
+def bench_backfill(days: int, latency: float, window_days: int = 1,
+                   failure_rate: float = 0.1, seed: int = 0) -> Dict:
+    """
+    Backfill ``days`` of synthetic candles through aggregator.backfill with
+    1 and 4 workers, then interrupt a run half way and resume it.
+
+    Checks that the database ends up holding exactly the synthetic 1M
+    candles and the resampled intraday/daily bars, and that the resumed run
+    only fetches windows the interrupted run had not finished.
+    """
+    start = pd.Timestamp('2024-01-01')
+    end = start + pd.Timedelta(days=days)
+    candles = synthetic_candles(int(days * 1440 * 0.9), start=str(start), seed=seed)
+    candles = candles[candles.index < end]
+    windows = days // window_days
+    result = {'days': days, 'rows': len(candles), 'windows': windows}
+
+    def run(tmp: str, stub: RangeStubProvider, workers: int,
+            cancel: Optional[threading.Event] = None) -> Dict:
+        with offline_aggregator(tmp) as aggregator:
+            aggregator.backfill_providers['stub'] = stub
+            aggregator.BACKFILL_WINDOWS['stub'] = pd.Timedelta(days=window_days)
+            aggregator.BACKFILL_WORKERS = workers
+            stats = aggregator.backfill(start, end, source='stub', cancel=cancel)[aggregator.primary_symbol]
+
+            # Database must hold exactly the requested history
+            if stats['complete']:
+                stored = aggregator.query_range('1M', start, end)
+                assert len(stored) == len(candles)
+                assert np.array_equal(stored['timestamp'], candles.index.values.astype('datetime64[s]'))
+                for col in ['open', 'high', 'low', 'close', 'volume']:
+                    assert np.array_equal(stored[col], candles[col].to_numpy(dtype=np.float64))
+                for tf_name in ['15M', '1H', '4H', 'D']:
+                    expected = window_bars(candles, TIMEFRAMES[tf_name], end)
+                    stored = aggregator.query_range(tf_name, start, end)
+                    assert np.array_equal(stored['timestamp'], expected.index.values.astype('datetime64[s]'))
+                    assert np.allclose(stored['close'], expected['close'])
+            return stats
+
+    for workers in (1, 4):
+        with tempfile.TemporaryDirectory() as tmp:
+            stub = RangeStubProvider(candles, latency, failure_rate, seed=seed)
+            stats = run(tmp, stub, workers)
+            assert stats['complete'], stats
+            result[f'workers_{workers}'] = {
+                'elapsed_s': stats['elapsed'], 'rows_per_second': stats['rows_per_second'],
+                'retries': stats['retries']}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        first = RangeStubProvider(candles, latency, failure_rate, stop_after=windows // 2, seed=seed)
+        interrupted = run(tmp, first, 4, cancel=threading.Event())
+        assert not interrupted['complete']
+
+        second = RangeStubProvider(candles, latency, failure_rate, seed=seed + 1)
+        resumed = run(tmp, second, 4)
+        assert resumed['complete'], resumed
+        # The resumed run fetches exactly the windows the first one did not finish
+        assert len(first.windows) == interrupted['fetched'] == resumed['resumed']
+        assert not set(first.windows) & set(second.windows)
+        assert resumed['resumed'] + resumed['fetched'] == windows
+        result['resume'] = {'first_run_windows': interrupted['fetched'],
+                            'resumed_windows': resumed['resumed'],
+                            'refetched_windows': resumed['fetched']}
+
+    return result
+
+
+def bench_quality(buffer_size: int, ticks: int, window: int = 100, seed: int = 0) -> Dict:
+    """
+    Per-tick cost of the streaming validator (trailing provider window of
+    ``window`` rows) vs the full-buffer OHLC check, plus a detection check:
+    injected anomalies fed through _merge_new_data are counted exactly once
+    and quarantined rows never reach the buffer.
+    """
+    candles = synthetic_candles(buffer_size + ticks, gap_ratio=0, seed=seed)
+    streaming, full = [], []
+
+    validator = CandleValidator()
+    buffer = CandleRingBuffer(buffer_size)
+    buffer.load(candles.iloc[:buffer_size])
+    validator.prime(buffer.frame())
+    for end in range(buffer_size + 1, buffer_size + ticks + 1):
+        batch = candles.iloc[max(0, end - window):end]
+        started = time.perf_counter()
+        batch = validator.validate(batch)
+        streaming.append(time.perf_counter() - started)
+        buffer.merge(batch)
+
+        started = time.perf_counter()
+        invalid_ohlc(buffer.frame()).any()
+        full.append(time.perf_counter() - started)
+
+    assert not any(validator.counts.values()), validator.counts
+
+    # Weekday, gap-free history so only the injected gap is expected
+    clean = synthetic_candles(6000, start='2024-01-08 00:00', gap_ratio=0, seed=seed)
+    dirty, expected = inject_anomalies(clean, seed)
+    with tempfile.TemporaryDirectory() as tmp, offline_aggregator(tmp) as aggregator:
+        aggregator._merge_new_data(dirty.iloc[:200], 'yfinance')
+        for end in list(range(203, len(dirty), 3)) + [len(dirty)]:
+            aggregator._merge_new_data(dirty.iloc[max(0, end - window):end], 'yfinance')
+        counts = aggregator.quality_report()[aggregator.primary_symbol]
+        quarantined = aggregator.validators[aggregator.primary_symbol].quarantined_frame()
+        stored = aggregator.candles_1m
+
+    for anomaly, count in expected.items():
+        assert counts[anomaly] == count, (anomaly, counts)
+    assert not stored.index.isin(quarantined.index).any()
+    assert len(stored) == len(dirty) - len(quarantined)
+
+    return {
+        'buffer_size': buffer_size,
+        'window': window,
+        'streaming': _percentiles(streaming),
+        'full_check': _percentiles(full),
+        'detected': counts
+    }
+
+
+def bench_ratelimit(hours: int, threads: int, seed: int = 0) -> Dict:
+    """
+    Token-bucket limiter checks and costs.
+
+    - Simulated: a greedy caller on a fake clock for ``hours`` never beats
+      burst + rate * t in any window, nor the daily quota, and gets exactly
+      the quota it is entitled to.
+    - Persisted: spent quota and bucket level survive a restart, with the
+      state file written at most once per save interval while acquiring.
+    - Threads: ``threads`` real threads share one bucket without overrun;
+      reports per-acquire overhead.
+    """
+    limits = {'alpha_vantage': {'rate': 5 / 60, 'burst': 5, 'daily': 25},
+              'twelve_data': {'rate': 8 / 60, 'burst': 8, 'daily': 800}}
+    result = {}
+
+    clock = FakeClock()
+    limiter = RateLimiter(limits, clock=clock.time, sleep=clock.sleep)
+    end = clock.now + hours * 3600
+    grants = {source: [] for source in limits}
+    while clock.now < end:
+        for source in limits:
+            if limiter.can_call(source):
+                assert limiter.acquire(source)
+                grants[source].append(clock.now)
+        clock.sleep(max(min(limiter.available_in(source) for source in limits), 1e-3))
+
+    for source, limit in limits.items():
+        stamps = np.array(grants[source])
+        for window in (60.0, 3600.0):
+            # Most calls in any window starting at a grant
+            counts = np.searchsorted(stamps, stamps + window, side='left') - np.arange(len(stamps))
+            assert counts.max() <= limit['burst'] + limit['rate'] * window + 1e-9, (source, window)
+        days = (stamps // 86400).astype(np.int64)
+        per_day = np.bincount(days - days[0])
+        assert per_day.max() <= limit['daily']
+        result[source] = {'calls': len(stamps), 'max_per_day': int(per_day.max()),
+                          'daily_quota': limit['daily']}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state_file = os.path.join(tmp, 'limits.json')
+        clock = FakeClock()
+        first = RateLimiter(limits, state_file, clock=clock.time, sleep=clock.sleep)
+        for _ in range(7):
+            first.acquire('alpha_vantage')
+        # 7 tokens took 24s, within one save interval: nothing written per token
+        assert not os.path.exists(state_file)
+        used = first.usage()['alpha_vantage']
+        first.save()  # shutdown
+        clock.sleep(30)
+        second = RateLimiter(limits, state_file, clock=clock.time, sleep=clock.sleep)
+        restored = second.usage()['alpha_vantage']
+        assert restored['used_today'] == used['used_today'] == 7
+        assert abs(restored['tokens'] - min(5, used['tokens'] + 30 * 5 / 60)) < 1e-9
+
+        # A cancelled wait hands its token back
+        while second.can_call('alpha_vantage'):
+            second.acquire('alpha_vantage')
+        cancel = threading.Event()
+        cancel.set()
+        before = second.usage()['alpha_vantage']
+        second.acquire('alpha_vantage', cancel=cancel)
+        after = second.usage()['alpha_vantage']
+        assert after['used_today'] == before['used_today']
+        result['persisted'] = {'used_today': restored['used_today'], 'tokens': restored['tokens']}
+
+    # Real threads on one bucket: never more than burst + rate * elapsed
+    rate, burst, duration = 500.0, 20, 1.0
+    limiter = RateLimiter({'shared': {'rate': rate, 'burst': burst}})
+    granted, stop = [], threading.Event()
+    lock = threading.Lock()
+
+    def worker() -> None:
+        while not stop.is_set():
+            if limiter.acquire('shared', timeout=0.05):
+                with lock:
+                    granted.append(time.monotonic())
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.monotonic()
+    for thread in workers:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in workers:
+        thread.join()
+    elapsed = time.monotonic() - started
+    assert len(granted) <= burst + rate * elapsed * 1.02, len(granted)
+
+    fast = RateLimiter({'free': {'rate': 1e9, 'burst': 1e9}})
+    samples = []
+    for _ in range(20_000):
+        t0 = time.perf_counter()
+        fast.acquire('free')
+        samples.append(time.perf_counter() - t0)
+    result['threads'] = {'threads': threads, 'granted': len(granted),
+                         'allowed': burst + rate * elapsed,
+                         'acquire_us': float(np.median(samples) * 1e6)}
+    return result
+
+
+class TwelveDataStub(ThreadingHTTPServer):
+    """
+    Local keep-alive HTTP server answering like Twelve Data's time_series
+    endpoint from synthetic candles (newest first, prices as strings),
+    over HTTPS when given a (certificate, key) pair.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, candles: pd.DataFrame, pairs: List[str],
+                 certificate: Optional[Tuple[str, str]] = None):
+        super().__init__(('127.0.0.1', 0), _TwelveDataHandler)
+        if certificate is not None:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(*certificate)
+            self.socket = context.wrap_socket(self.socket, server_side=True)
+        self.scheme = 'https' if certificate is not None else 'http'
+        self.candles = candles
+        self.pairs = pairs
+        self.visible = 0  # candles closed so far
+        self.connections = 0
+        self.requests = 0
+
+    @property
+    def url(self) -> str:
+        return f"{self.scheme}://127.0.0.1:{self.server_address[1]}/time_series"
+
+    def series(self, outputsize: int, start: Optional[str], end: Optional[str] = None) -> Dict:
+        candles = self.candles.iloc[:self.visible]
+        if start is not None:
+            candles = candles[candles.index >= pd.Timestamp(start)]
+        if end is not None:
+            candles = candles[candles.index <= pd.Timestamp(end)]
+        candles = candles.iloc[-outputsize:]
+        values = [{'datetime': ts.strftime('%Y-%m-%d %H:%M:%S'),
+                   'open': f"{row[0]:.5f}", 'high': f"{row[1]:.5f}",
+                   'low': f"{row[2]:.5f}", 'close': f"{row[3]:.5f}"}
+                  for ts, row in zip(candles.index[::-1],
+                                     candles[['open', 'high', 'low', 'close']].to_numpy()[::-1])]
+        return {'meta': {'interval': '1min'}, 'values': values, 'status': 'ok'}
+
+
+class _TwelveDataHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self) -> None:
+        self.server.requests += 1
+        params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        pairs = params['symbol'].split(',')
+        series = {pair: self.server.series(int(params['outputsize']), params.get('start_date'),
+                                           params.get('end_date'))
+                  for pair in pairs}
+        body = json.dumps(series[pairs[0]] if len(pairs) == 1 else series).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class _UnpooledHttp:
+    """The pre-session request path: a fresh connection per call."""
+
+    def __init__(self, verify=True):
+        self.verify = verify
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return requests.get(url, verify=self.verify, **kwargs)
+
+    def close(self) -> None:
+        pass
+
+
+def self_signed_certificate(directory: str) -> Tuple[str, str]:
+    """Throwaway (certificate, key) PEM files for 127.0.0.1, made with the openssl CLI."""
+    certificate, key = os.path.join(directory, 'stub.crt'), os.path.join(directory, 'stub.key')
+    try:
+        subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                        '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1',
+                        '-keyout', key, '-out', certificate], check=True, capture_output=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise RuntimeError(f"Could not create a certificate with the openssl CLI: {e}")
+    return certificate, key
+
+
+def bench_delta(minutes: int, window: int, symbols: int = 1, tls: bool = False) -> Dict:
+    """
+    Poll a local Twelve Data stub through the real fetch_twelve_batch path,
+    one new candle per poll, for three setups: fixed ``window`` per request
+    on a fresh connection each call (old), fixed window on the pooled
+    session, and delta requests on the pooled session.
+
+    Reports payload bytes, parse time and rows per poll and the number of
+    TCP connections the server saw. Over plain HTTP on loopback a new
+    connection costs well under a millisecond, so pooling shows up in the
+    connection count more than in poll time; ``tls`` serves the stub over
+    HTTPS, where every new connection pays a real TLS handshake (network
+    round trips to a remote provider would add to that).
+    """
+    pairs = fx_pairs(symbols)
+    candles = synthetic_candles(window + minutes, gap_ratio=0)
+    result = {'minutes': minutes, 'window': window, 'tls': tls}
+    certificates = tempfile.TemporaryDirectory()
+    certificate = self_signed_certificate(certificates.name) if tls else None
+
+    for mode in ('fixed_unpooled', 'fixed_pooled', 'delta_pooled'):
+        server = TwelveDataStub(candles, pairs, certificate)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            with tempfile.TemporaryDirectory() as tmp, offline_aggregator(tmp, pairs) as aggregator:
+                aggregator.rate_limiter = RateLimiter({})
+                aggregator.twelve_data_key = 'offline'
+                aggregator.TWELVE_DATA_URL = server.url
+                aggregator.DELTA_FETCH = mode == 'delta_pooled'
+                verify = certificate[0] if tls else True
+                if mode == 'fixed_unpooled':
+                    aggregator.http.close()
+                    aggregator.http = _UnpooledHttp(verify)
+                elif tls:
+                    # REQUESTS_CA_BUNDLE would override a session's verify
+                    aggregator.http.trust_env = False
+                    aggregator.http.verify = verify
+                aggregator.providers = {'twelve_data': lambda cancel: aggregator.fetch_twelve_batch(
+                    aggregator.symbols, outputsize=window, cancel=cancel,
+                    start=aggregator._delta_start(aggregator.symbols))}
+                for symbol in aggregator.symbols:
+                    aggregator.buffers[symbol].load(candles.iloc[:window])
+
+                polls = []
+                for minute in range(window, window + minutes):
+                    server.visible = minute + 1
+                    started = time.perf_counter()
+                    assert aggregator.fetch_latest_data()
+                    polls.append(time.perf_counter() - started)
+                    assert aggregator.buffers[aggregator.primary_symbol].last_timestamp == candles.index[minute]
+
+                stats = aggregator.transfer_report()['twelve_data']
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        result[mode] = {
+            'bytes_per_poll': stats['bytes'] / stats['calls'],
+            'parse_ms_per_poll': stats['parse_seconds'] / stats['calls'] * 1e3,
+            'rows_per_poll': stats['rows'] / stats['calls'],
+            'poll': _percentiles(polls),
+            'connections': server.connections
+        }
+    certificates.cleanup()
+    return result
+
+
+PIPELINE_STAGES = ('_merge_new_data', '_update_all_timeframes', '_save_state', '_save_to_database')
+
+
+def load_fixture(path: str) -> pd.DataFrame:
+    """
+    Recorded 1-minute candles from a CSV file (see the ``record`` command):
+    a timestamp column followed by open, high, low, close and volume.
+    """
+    candles = pd.read_csv(path, index_col=0, parse_dates=True)
+    candles.index.name = 'Datetime'
+    return candles[['open', 'high', 'low', 'close', 'volume']].sort_index()
+
+
+def fixture_candles(count: int, fixture: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    ``count`` candles from a recorded fixture, repeated forward in time
+    when it is too short, or synthetic candles without one.
+    """
+    if fixture is None:
+        return synthetic_candles(count, gap_ratio=0)
+    parts, offset = [], pd.Timedelta(0)
+    span = fixture.index[-1] - fixture.index[0] + pd.Timedelta(minutes=1)
+    while sum(len(part) for part in parts) < count:
+        part = fixture.copy()
+        part.index = part.index + offset
+        parts.append(part)
+        offset += span
+    return pd.concat(parts).iloc[:count]
+
+
+@contextlib.contextmanager
+def stage_timers(aggregator, stages=PIPELINE_STAGES) -> Iterator[Dict[str, List[float]]]:
+    """Time every call of the given aggregator methods while the context is open."""
+    samples = {stage: [] for stage in stages}
+    for stage in stages:
+        def timed(*args, _method=getattr(aggregator, stage), _samples=samples[stage], **kwargs):
+            started = time.perf_counter()
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                _samples.append(time.perf_counter() - started)
+        setattr(aggregator, stage, timed)
+    try:
+        yield samples
+    finally:
+        for stage in stages:
+            delattr(aggregator, stage)
+
+
+def bench_pipeline(buffer_size: int, ticks: int, window: int = 100,
+                   fixture: Optional[pd.DataFrame] = None) -> Dict:
+    """
+    Drive simulated minutes through fetch_latest_data at full speed with a
+    zero-latency fixture provider and time each ingest stage, then time
+    load_state on a fresh aggregator over the files left behind.
+
+    Args:
+        buffer_size: 1M candles held (buffer capacity and preloaded history)
+        ticks: Simulated minutes, one new candle each
+        window: Trailing candles per provider response
+        fixture: Recorded candles to replay instead of synthetic ones
+    """
+    candles = fixture_candles(buffer_size + ticks, fixture)
+    result = {'buffer_size': buffer_size, 'ticks': ticks, 'window': window}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with offline_aggregator(tmp) as aggregator:
+            symbol = aggregator.primary_symbol
+            aggregator.buffers[symbol] = CandleRingBuffer(buffer_size)
+            provider = StubProvider(candles, [(1.0, 0.0)], window=window, symbols=[symbol])
+            aggregator.providers = {'yfinance': provider}
+
+            started = time.perf_counter()
+            aggregator.buffers[symbol].load(candles.iloc[:buffer_size])
+            aggregator._update_all_timeframes(symbol)
+            aggregator._save_state(checkpoint=True)
+            aggregator._save_to_database()
+            result['preload_s'] = time.perf_counter() - started
+
+            ticks_done = []
+            with stage_timers(aggregator) as samples:
+                for minute in range(buffer_size, buffer_size + ticks):
+                    provider.visible = minute + 1
+                    started = time.perf_counter()
+                    assert aggregator.fetch_latest_data()
+                    ticks_done.append(time.perf_counter() - started)
+            assert aggregator.buffers[symbol].last_timestamp == candles.index[-1]
+
+        with offline_aggregator(tmp) as aggregator:
+            aggregator.buffers[aggregator.primary_symbol] = CandleRingBuffer(buffer_size)
+            with stage_timers(aggregator, ('load_state',)) as recovery:
+                assert aggregator.load_state()
+            assert len(aggregator.candles_1m) == buffer_size
+
+    stages = {stage: _percentiles(values) for stage, values in samples.items() if values}
+    stages['load_state'] = _percentiles(recovery['load_state'])
+    stages['tick'] = _percentiles(ticks_done)
+    for stage, stats in stages.items():
+        stats['per_second'] = 1e3 / stats['mean_ms'] if stats['mean_ms'] else float('inf')
+    result['stages'] = stages
+    result['candles_per_second'] = ticks / sum(ticks_done)
+    return result
+
+
+def bench_metrics(buffer_size: int, ticks: int, window: int = 100, calls: int = 200_000) -> Dict:
+    """
+    Cost of the ingest instrumentation: per-call cost of histogram
+    observations, and pipeline ticks with the registry enabled vs disabled
+    (alternating, so drift hits both equally). Also scrapes the HTTP
+    endpoint once and checks the exported tick counts.
+    """
+    registry = MetricsRegistry()
+    family = registry.histogram('bench_seconds', 'benchmark')
+    result = {'buffer_size': buffer_size, 'ticks': ticks}
+    for name, enabled in (('observe_ns', True), ('observe_disabled_ns', False)):
+        registry.enabled = enabled
+        started = time.perf_counter()
+        for i in range(calls):
+            family.observe(i * 1e-6, stage='merge')
+        result[name] = (time.perf_counter() - started) / calls * 1e9
+    for name, enabled in (('timer_ns', True), ('timer_disabled_ns', False)):
+        registry.enabled = enabled
+        started = time.perf_counter()
+        for _ in range(calls):
+            with family.time(stage='merge'):
+                pass
+        result[name] = (time.perf_counter() - started) / calls * 1e9
+
+    candles = synthetic_candles(buffer_size + ticks, gap_ratio=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        with offline_aggregator(tmp) as aggregator:
+            symbol = aggregator.primary_symbol
+            aggregator.buffers[symbol] = CandleRingBuffer(buffer_size)
+            provider = StubProvider(candles, [(1.0, 0.0)], window=window, symbols=[symbol])
+            aggregator.providers = {'yfinance': provider}
+            aggregator.buffers[symbol].load(candles.iloc[:buffer_size])
+            aggregator._update_all_timeframes(symbol)
+            aggregator._save_state(checkpoint=True)
+            aggregator._save_to_database()
+
+            samples = {True: [], False: []}
+            for minute in range(buffer_size, buffer_size + ticks):
+                enabled = minute % 2 == 0
+                aggregator.metrics.enabled = enabled
+                provider.visible = minute + 1
+                started = time.perf_counter()
+                assert aggregator.fetch_latest_data()
+                samples[enabled].append(time.perf_counter() - started)
+            aggregator.metrics.enabled = True
+
+            started = time.perf_counter()
+            aggregator.write_metrics()
+            result['write_file_ms'] = (time.perf_counter() - started) * 1e3
+            port = aggregator.metrics.serve(0)
+            text = requests.get(f'http://127.0.0.1:{port}/metrics', timeout=10).text
+            merge_count = f'forex_stage_seconds_count{{stage="merge"}} {len(samples[True])}'
+            assert merge_count in text, merge_count
+            result['exported_series'] = sum(1 for line in text.splitlines()
+                                            if line and not line.startswith('#'))
+            result['stage_report'] = aggregator.stage_report()
+
+    result['enabled'] = _percentiles(samples[True])
+    result['disabled'] = _percentiles(samples[False])
+    result['overhead_pct'] = (result['enabled']['p50_ms'] / result['disabled']['p50_ms'] - 1) * 100
+    return result
+
+
+# Run in a fresh interpreter inside the state directory: times the module
+# import, construction, state restore and the first candle read
+STARTUP_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import data_fetch
+imported = time.perf_counter()
+aggregator = data_fetch.MultiSourceForexAggregator(['EUR/JPY'])
+constructed = time.perf_counter()
+aggregator.load_state()
+restored = time.perf_counter()
+last = aggregator.get_timeframe_data('1M', last_n=1)
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1e3,
+    'init_ms': (constructed - imported) * 1e3,
+    'restore_ms': (restored - constructed) * 1e3,
+    'first_candle_ms': (served - started) * 1e3,
+    'last_candle': str(last.index[-1]),
+    'loaded': [name for name in ('yfinance', 'requests') if name in sys.modules]
+}))
+"""
+
+
+def bench_startup(buffer_size: int, runs: int = 5) -> Dict:
+    """
+    Time-to-first-served-candle of a fresh process, restoring a
+    ``buffer_size`` 1M buffer from checkpoint + journal (cold) and from the
+    warm-restart snapshot (warm), plus a check that both restore the same
+    buffer and timeframes and keep aggregating identically afterwards.
+    """
+    candles = synthetic_candles(buffer_size + 100, gap_ratio=0)
+    module_dir = os.path.dirname(os.path.abspath(__file__))
+    result = {'buffer_size': buffer_size, 'runs': runs}
+
+    def probe(tmp: str) -> Dict:
+        output = subprocess.run([sys.executable, '-c', STARTUP_PROBE, module_dir], cwd=tmp,
+                                capture_output=True, text=True, check=True).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with offline_aggregator(tmp) as aggregator:
+            symbol = aggregator.primary_symbol
+            aggregator.buffers[symbol] = CandleRingBuffer(aggregator.BUFFER_SIZES['1M'])
+            aggregator.buffers[symbol].load(candles.iloc[:buffer_size])
+            aggregator._update_all_timeframes(symbol)
+            aggregator._save_state(checkpoint=True)
+            for minute in range(buffer_size, buffer_size + 50):  # journal tail
+                aggregator.buffers[symbol].merge(candles.iloc[minute:minute + 1])
+                aggregator._update_all_timeframes(symbol)
+                aggregator._save_state()
+            aggregator._save_to_database()
+            aggregator.close()
+            assert aggregator.save_snapshot()
+            snapshot_file = os.path.join(tmp, aggregator.SNAPSHOT_FILE)
+            result['snapshot_kib'] = os.path.getsize(snapshot_file) / 1024
+
+        restored = {}
+        for mode in ('warm', 'cold'):
+            if mode == 'cold':
+                os.rename(snapshot_file, snapshot_file + '.bak')
+            samples = [probe(tmp) for _ in range(runs)]
+            for key in ('import_ms', 'init_ms', 'restore_ms', 'first_candle_ms'):
+                result[f'{mode}_{key}'] = float(np.median([sample[key] for sample in samples]))
+            result[f'{mode}_loaded'] = samples[0]['loaded']
+            assert samples[0]['last_candle'] == str(candles.index[buffer_size + 49])
+
+            with offline_aggregator(tmp) as aggregator:
+                started = time.perf_counter()
+                assert aggregator.load_state()
+                result[f'{mode}_restore_in_process_ms'] = (time.perf_counter() - started) * 1e3
+                for minute in range(buffer_size + 50, buffer_size + 100):
+                    aggregator._merge_new_data(candles.iloc[minute - 5:minute + 1], 'yfinance')
+                    aggregator._update_all_timeframes()
+                restored[mode] = (aggregator.candles_1m.copy(),
+                                  {tf: df.copy() for tf, df in aggregator.timeframes.items()},
+                                  dict(aggregator.database.watermarks))
+            if mode == 'cold':
+                os.rename(snapshot_file + '.bak', snapshot_file)
+
+    pd.testing.assert_frame_equal(restored['warm'][0], restored['cold'][0])
+    for tf_name, bars in restored['cold'][1].items():
+        pd.testing.assert_frame_equal(restored['warm'][1][tf_name], bars)
+    assert restored['warm'][2] == restored['cold'][2]
+    return result
+
+
+def bench_events(ticks: int, buffer_size: int = 5000, window: int = 30,
+                 slow_delay: float = 0.05) -> Dict:
+    """
+    Publish-to-delivery latency of candle events for a callback, an async
+    iterator and a Unix-socket client, while a deliberately slow subscriber
+    with a small queue is attached: ingest ticks must not slow down, the
+    slow subscriber drops its oldest events, and every subscriber sees
+    strictly increasing sequence numbers. Every 25th tick the provider
+    revises a candle it already served.
+    """
+    candles = synthetic_candles(buffer_size + ticks, gap_ratio=0)
+    received = {name: [] for name in ('callback', 'async', 'ipc', 'slow')}
+    published: Dict[int, float] = {}
+
+    def recorder(name: str):
+        def record(event) -> None:
+            received[name].append((event.sequence, time.perf_counter(), event.kind))
+        return record
+
+    result = {'ticks': ticks}
+    with tempfile.TemporaryDirectory() as tmp:
+        with offline_aggregator(tmp) as aggregator:
+            symbol = aggregator.primary_symbol
+            aggregator.buffers[symbol].load(candles.iloc[:buffer_size])
+            aggregator._update_all_timeframes(symbol)
+            provider = StubProvider(candles, [(1.0, 0.0)], window=window, symbols=[symbol])
+            aggregator.providers = {'yfinance': provider}
+
+            bus = aggregator.events
+            publish = bus.publish
+
+            def timed_publish(events) -> None:
+                now = time.perf_counter()  # single publisher: numbering is predictable
+                for sequence in range(bus.sequence + 1, bus.sequence + len(events) + 1):
+                    published[sequence] = now
+                publish(events)
+            bus.publish = timed_publish
+
+            close_col = candles.columns.get_loc('close')
+            high_col = candles.columns.get_loc('high')
+
+            def run_ticks(start: int, stop: int) -> List[float]:
+                samples = []
+                for minute in range(start, stop):
+                    if minute % 25 == 0:
+                        # Provider revises a candle it already served
+                        candles.iat[minute - 3, close_col] = candles.iat[minute - 3, high_col]
+                    provider.visible = minute + 1
+                    started = time.perf_counter()
+                    assert aggregator.fetch_latest_data()
+                    samples.append(time.perf_counter() - started)
+                return samples
+
+            half = buffer_size + ticks // 2
+            result['tick_without_subscribers'] = _percentiles(run_ticks(buffer_size, half))
+
+            callback = bus.subscribe(recorder('callback'))
+            slow_record = recorder('slow')
+            slow = bus.subscribe(lambda event: (time.sleep(slow_delay), slow_record(event)),
+                                 maxsize=10, overflow='drop_oldest')
+
+            loop = asyncio.new_event_loop()
+            subscription = bus.subscribe_async(loop)
+
+            async def consume() -> None:
+                async for event in subscription:
+                    received['async'].append((event.sequence, time.perf_counter(), event.kind))
+            consumer = threading.Thread(target=loop.run_until_complete, args=(consume(),))
+            consumer.start()
+
+            server = aggregator.serve_events(os.path.join(tmp, 'events.sock'))
+            client = EventClient(server.address, timeout=10)
+            while not server.clients:
+                time.sleep(0.001)
+
+            def read_ipc() -> None:
+                try:
+                    for event in client:
+                        received['ipc'].append((event.sequence, time.perf_counter(), event.kind))
+                except OSError:
+                    pass
+            reader = threading.Thread(target=read_ipc)
+            reader.start()
+
+            result['tick_with_subscribers'] = _percentiles(
+                run_ticks(half, buffer_size + ticks))
+            total = bus.sequence
+
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline and not all(
+                    received[name] and received[name][-1][0] == total
+                    for name in ('callback', 'async', 'ipc')):
+                time.sleep(0.01)
+            result['slow_queue'] = slow.stats()
+            callback.close()
+            slow.close()
+            subscription.close()
+            consumer.join(10)
+            server.close()
+            client.close()
+            reader.join(10)
+            loop.close()
+
+    for name, events in received.items():
+        sequences = [sequence for sequence, _, _ in events]
+        assert sequences == sorted(set(sequences)), f"{name} out of order"
+        latencies = [arrived - published[sequence] for sequence, arrived, _ in events]
+        result[name] = {'events': len(events), **_percentiles(latencies)}
+    result['published'] = len(published)
+    result['kinds'] = {kind: sum(1 for _, _, k in received['callback'] if k == kind)
+                       for kind in ('candle', 'bar_closed', 'bar_revised')}
+    assert result['callback']['events'] == result['async']['events'] == result['ipc']['events']
+    return result
+
+
+def bench_history(days: int, reads: int = 20, seed: int = 0) -> Dict:
+    """
+    Full-history scans and on-the-fly aggregation from the day-partitioned
+    Arrow store vs the SQLite 1M table, for ``days`` of 1M candles.
+
+    Raises:
+        AssertionError: If the store and SQLite disagree on any row or bar
+    """
+    rng = np.random.default_rng(seed)
+    candles = synthetic_candles(int(days * 1440 * 0.9), seed=seed, float_volume=True)
+    first, last = candles.index[0], candles.index[-1]
+    result: Dict[str, Dict] = {'rows': len(candles), 'arrow': {}, 'sqlite': {}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(os.path.join(tmp, 'history'))
+        database = CandleDatabase(os.path.join(tmp, 'history.db'), ['EURJPY_1M'])
+        database.init_schema()
+
+        days_index = candles.index.floor('D')
+        bounds = np.flatnonzero(np.append(True, days_index[1:] != days_index[:-1]))
+        chunks = [candles.iloc[lo:hi] for lo, hi in zip(bounds, np.append(bounds[1:], len(candles)))]
+        started = time.perf_counter()
+        for chunk in chunks:
+            store.write('EURJPY', chunk)
+        result['arrow']['write_rows_per_s'] = len(candles) / (time.perf_counter() - started)
+        started = time.perf_counter()
+        for chunk in chunks:
+            database.write_history({'EURJPY_1M': (chunk, 'yfinance')})
+        result['sqlite']['write_rows_per_s'] = len(candles) / (time.perf_counter() - started)
+
+        sqlite3.connect(database.db_file).execute("PRAGMA wal_checkpoint(TRUNCATE)").close()
+        result['sqlite']['file_mb'] = os.path.getsize(database.db_file) / 2 ** 20
+        result['arrow']['file_mb'] = sum(os.path.getsize(path)
+                                         for path in store.partitions('EURJPY')) / 2 ** 20
+        result['arrow']['partitions'] = len(store.partitions('EURJPY'))
+
+        def arrow_frame(start, end) -> pd.DataFrame:
+            return columns_frame(store.scan('EURJPY', start, end))
+
+        def sqlite_frame(start, end) -> pd.DataFrame:
+            rows = database.query_range('EURJPY_1M', start, end - pd.Timedelta(minutes=1))
+            index = pd.DatetimeIndex(rows['timestamp'], name='Datetime')
+            return pd.DataFrame({col: rows[col].astype(np.float64) for col in OHLCV}, index=index)
+
+        end = last + pd.Timedelta(minutes=1)
+        for label, scan in (('arrow', lambda: store.scan('EURJPY', first, end)),
+                            ('sqlite', lambda: database.query_range('EURJPY_1M', first, last))):
+            timings = []
+            for _ in range(3):
+                began = time.perf_counter()
+                scan()
+                timings.append(time.perf_counter() - began)
+            result[label]['full_scan_ms'] = min(timings) * 1e3
+
+        full = arrow_frame(first, end)
+        assert np.array_equal(full.index.asi8, candles.index.as_unit('ns').asi8)
+        expected = sqlite_frame(first, end)
+        for col in OHLCV:
+            assert np.array_equal(full[col].to_numpy(), expected[col].to_numpy())
+
+        week = pd.Timedelta(days=7)
+        starts = [(first + (last - first - week) * rng.random()).floor('min') for _ in range(reads)]
+        store.partitions_read = 0
+        for label, reader in (('arrow', arrow_frame), ('sqlite', sqlite_frame)):
+            timings = []
+            for start in starts:
+                began = time.perf_counter()
+                reader(start, start + week)
+                timings.append(time.perf_counter() - began)
+            result[label]['range 7 days'] = _percentiles(timings)
+        result['arrow']['partitions_per_week'] = store.partitions_read / reads
+        assert store.partitions_read <= reads * 8  # pruned to the week's day files
+
+        for freq in ('1h', '1D'):
+            began = time.perf_counter()
+            bars = store.aggregate('EURJPY', freq)
+            result['arrow'][f'aggregate {freq} ms'] = (time.perf_counter() - began) * 1e3
+            began = time.perf_counter()
+            reference = resample_ohlcv(sqlite_frame(first, end), freq)
+            result['sqlite'][f'aggregate {freq} ms'] = (time.perf_counter() - began) * 1e3
+            assert np.array_equal(bars['ts'], reference.index.as_unit('ns').asi8)
+            for col in ('open', 'high', 'low', 'close'):
+                assert np.array_equal(bars[col], reference[col].to_numpy())
+            assert np.allclose(bars['volume'], reference['volume'].to_numpy())
+
+        database.close()
+
+    return result
+
+
+def bench_tiers(days: int, cache_mb: int = 8, repeats: int = 20, seed: int = 0) -> Dict:
+    """
+    ``get_range`` lookbacks far beyond the 500-minute buffer: cold (first)
+    and cached read times per query, cache size vs its bound, and equality
+    with a pandas resample of the full history.
+
+    Raises:
+        AssertionError: If a stitched range differs from the reference
+    """
+    candles = synthetic_candles(int(days * 1440 * 0.9), seed=seed, float_volume=True)
+    last = candles.index[-1]
+    queries = {'D x200': ('D', pd.Timedelta(days=200)),
+               '1H x30d': ('1H', pd.Timedelta(days=30)),
+               '15M x60d': ('15M', pd.Timedelta(days=60)),
+               '1M x3d': ('1M', pd.Timedelta(days=3))}
+    result: Dict[str, Dict] = {'rows': len(candles)}
+
+    with tempfile.TemporaryDirectory() as tmp, offline_aggregator(tmp) as aggregator:
+        aggregator.tiers.max_bytes = cache_mb * 2 ** 20
+        aggregator.history.write('EURJPY', candles.iloc[:-500])
+        aggregator.candles_1m = candles.iloc[-500:]
+        aggregator._update_all_timeframes()
+        aggregator._save_history()
+
+        for name, (timeframe, width) in queries.items():
+            start = (last - width).floor('D')
+            began = time.perf_counter()
+            bars = aggregator.get_range(timeframe, start)
+            first_ms = (time.perf_counter() - began) * 1e3
+            timings = []
+            for _ in range(repeats):
+                began = time.perf_counter()
+                aggregator.get_range(timeframe, start)
+                timings.append(time.perf_counter() - began)
+
+            if timeframe == '1M':
+                reference = candles.iloc[candles.index.searchsorted(start):]
+            else:
+                reference = resample_ohlcv(candles, TIMEFRAMES[timeframe])
+                reference = reference.iloc[reference.index.searchsorted(start):]
+            assert np.array_equal(bars.index.asi8, reference.index.as_unit('ns').asi8), name
+            for col in ('open', 'high', 'low', 'close'):
+                assert np.array_equal(bars[col].to_numpy(), reference[col].to_numpy()), name
+            assert np.allclose(bars['volume'].to_numpy(), reference['volume'].to_numpy()), name
+            result[name] = {'bars': len(bars), 'first_ms': first_ms, **_percentiles(timings)}
+
+        # A full-history 1M scan overflows the cache: evictions keep it bounded
+        aggregator.get_range('1M', candles.index[0])
+        stats = aggregator.tiers.stats()
+        assert stats['bytes'] <= aggregator.tiers.max_bytes
+        result['cache'] = {**stats, 'limit': aggregator.tiers.max_bytes}
+
+    return result
+
+
+def _event_log(aggregator) -> Tuple[Dict[Tuple[str, str], List[Tuple]], Callable[[], None]]:
+    """Collect events by (kind, timeframe), without sequence numbers, until stop()."""
+    events: Dict[Tuple[str, str], List[Tuple]] = {}
+    subscription = aggregator.events.subscribe(
+        lambda event: events.setdefault((event.kind, event.timeframe), []).append(event[1:-1]),
+        maxsize=10 ** 7)
+
+    def stop() -> None:
+        subscription.close()
+        subscription.join()
+    return events, stop
+
+
+def _closed_count(events: Dict[Tuple[str, str], List[Tuple]]) -> int:
+    return sum(len(bars) for (kind, _), bars in events.items() if kind == 'bar_closed')
+
+
+def bench_replay(days: int, minutes: int, speed_minutes: int = 120, speed: float = 7200.0,
+                 seed: int = 0) -> Dict:
+    """
+    Replay throughput over ``days`` of 1M candles at full speed, plus an
+    equivalence check: ``minutes`` of candles ingested live (stub provider
+    polled every minute through fetch_latest_data) and replayed with
+    step=1 and at the full-speed default (a day per poll) must leave
+    identical timeframe bars and emit identical candle and bar_closed
+    events. A short paced replay checks
+    that ``speed`` holds simulated time to that multiple of real time.
+
+    Raises:
+        AssertionError: If replayed and live output differ
+    """
+    result: Dict[str, Dict] = {}
+    sample = synthetic_candles(minutes, seed=seed)
+    runs = {}
+    for mode in ('live', 'step 1', 'step 1440'):
+        with tempfile.TemporaryDirectory() as tmp, offline_aggregator(tmp) as aggregator:
+            events, stop = _event_log(aggregator)
+            started = time.perf_counter()
+            if mode == 'live':
+                provider = StubProvider(sample, [(1.0, 0.0)])
+                aggregator.providers = {'yfinance': provider}
+                for minute in range(minutes):
+                    provider.visible = minute + 1
+                    aggregator.fetch_latest_data()
+            else:
+                ReplayEngine(aggregator, {'EURJPY': sample}, step=int(mode.split()[1])).run()
+            elapsed = time.perf_counter() - started
+            stop()
+            runs[mode] = (aggregator.timeframes, events)
+            result[mode] = {'seconds': elapsed, 'candles_per_s': minutes / elapsed,
+                            'bars_closed': _closed_count(events)}
+
+    live_frames, live_events = runs['live']
+    for mode in ('step 1', 'step 1440'):
+        frames, events = runs[mode]
+        for tf_name, bars in live_frames.items():
+            pd.testing.assert_frame_equal(frames[tf_name], bars, check_freq=False)
+        # Same events in the same order per timeframe (a batch closing several
+        # timeframes publishes them timeframe by timeframe)
+        assert events == live_events, mode
+
+    candles = synthetic_candles(int(days * 1440 * 0.9), seed=seed)
+    with tempfile.TemporaryDirectory() as tmp, offline_aggregator(tmp) as aggregator:
+        stats = ReplayEngine(aggregator, {'EURJPY': candles}).run()
+        reference = resample_ohlcv(candles, '1D').tail(aggregator.BUFFER_SIZES['D'])
+        pd.testing.assert_frame_equal(aggregator.timeframes['D'], reference,
+                                      check_freq=False, check_dtype=False)
+        result['year'] = stats
+
+        span = candles.iloc[:int(speed_minutes * 0.9)]
+        paced = ReplayEngine(aggregator, {'EURJPY': span}, speed=speed, step=1).run()
+        result['paced'] = {'speed': speed, 'sim_seconds': paced['sim_seconds'],
+                           'wall_seconds': paced['wall_seconds'],
+                           'achieved': paced['sim_seconds'] / paced['wall_seconds']}
+
+    return result
+
+
+def _reference_smooth(values: List[float], period: int, alpha: float) -> List[float]:
+    out, value = [np.nan] * len(values), np.nan
+    for i, x in enumerate(values):
+        if i == period - 1:
+            value = sum(values[:period]) / period
+        elif i >= period:
+            value = value + alpha * (x - value)
+        out[i] = value
+    return out
+
+
+def reference_indicator(name: str, bars: pd.DataFrame) -> np.ndarray:
+    """Textbook full recompute of an indicator over every bar (plain Python)."""
+    kind, period = name.split('_')
+    n = int(period)
+    high, low, close = (bars[col].astype(float).tolist() for col in ('high', 'low', 'close'))
+    if kind == 'ema':
+        return np.array(_reference_smooth(close, n, 2 / (n + 1)))
+    if kind == 'atr':
+        ranges = [high[0] - low[0]] + [
+            max(high[i] - low[i], abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1]))
+            for i in range(1, len(close))]
+        return np.array(_reference_smooth(ranges, n, 1 / n))
+    if kind == 'rsi':
+        changes = [close[i] - close[i - 1] for i in range(1, len(close))]
+        gains = _reference_smooth([max(d, 0.0) for d in changes], n, 1 / n)
+        losses = _reference_smooth([max(-d, 0.0) for d in changes], n, 1 / n)
+        out = [np.nan]
+        for gain, loss in zip(gains, losses):
+            if np.isnan(gain):
+                out.append(np.nan)
+            elif loss == 0:
+                out.append(100.0 if gain > 0 else 50.0)
+            else:
+                out.append(100 - 100 / (1 + gain / loss))
+        return np.array(out)
+    values = high if kind == 'high' else low
+    pick = max if kind == 'high' else min
+    return np.array([pick(values[i - n + 1:i + 1]) if i >= n - 1 else np.nan
+                     for i in range(len(values))])
+
+
+def _check_indicators(frame: pd.DataFrame, bars: pd.DataFrame, label: str) -> float:
+    """Largest relative difference from the reference over the rows of ``frame``."""
+    worst = 0.0
+    positions = bars.index.searchsorted(frame.index)
+    assert np.array_equal(bars.index[positions], frame.index), label
+    for name in frame.columns:
+        expected = reference_indicator(name, bars)[positions]
+        actual = frame[name].to_numpy()
+        assert np.array_equal(np.isnan(expected), np.isnan(actual)), (label, name)
+        mask = ~np.isnan(expected)
+        assert np.allclose(actual[mask], expected[mask], rtol=1e-9, atol=1e-9), (label, name)
+        if mask.any():
+            worst = max(worst, float(np.max(np.abs(actual[mask] - expected[mask]) /
+                                            np.maximum(np.abs(expected[mask]), 1e-12))))
+    return worst
+
+
+def bench_indicators(days: int, ticks: int, buffer_size: int = 2000, seed: int = 0) -> Dict:
+    """
+    Indicator cache against a plain-Python full recompute: vectorized
+    backfill vs bar-by-bar folding over long 15M/1H histories; then a live
+    run (small 1M buffer, older history on disk) ticking one candle at a
+    time with a provider revision, a restart from the checkpoint, and the
+    per-tick cost vs recomputing every indicator with pandas over the
+    timeframe frame.
+
+    Raises:
+        AssertionError: If any indicator differs from the reference
+    """
+    names = ['ema_20', 'ema_50', 'atr_14', 'rsi_14', 'high_20', 'low_20']
+    candles = synthetic_candles(int(days * 1440 * 0.9), seed=seed, float_volume=True)
+    result: Dict[str, Dict] = {}
+
+    for freq in ('15min', '1h'):
+        bars = resample_ohlcv(candles, freq)
+        vectorized, folded = IndicatorSet(names, 100), IndicatorSet(names, 100)
+        began = time.perf_counter()
+        vectorized.backfill(bars)
+        backfill_s = time.perf_counter() - began
+        began = time.perf_counter()
+        folded.update(bars)
+        fold_s = time.perf_counter() - began
+        began = time.perf_counter()
+        for name in names:
+            reference_indicator(name, bars)
+        reference_s = time.perf_counter() - began
+        result[freq] = {
+            'bars': len(bars),
+            'backfill_bars_per_s': len(bars) / backfill_s,
+            'fold_bars_per_s': len(bars) / fold_s,
+            'reference_bars_per_s': len(bars) / reference_s,
+            'max_rel_diff': max(_check_indicators(vectorized.frame(), bars, f'{freq} backfill'),
+                                _check_indicators(folded.frame(), bars, f'{freq} fold'))
+        }
+
+    live = candles.iloc[-(buffer_size + ticks):]
+    with tempfile.TemporaryDirectory() as tmp:
+        with offline_aggregator(tmp) as aggregator:
+            aggregator.history.write('EURJPY', candles.iloc[:-(buffer_size + ticks)])
+            aggregator.candles_1m = live.iloc[:buffer_size]
+            aggregator._save_history()
+            aggregator._update_all_timeframes()
+
+            pandas_times = []
+            with stage_timers(aggregator, ('_ingest', '_update_indicators')) as samples:
+                for minute in range(buffer_size, buffer_size + ticks):
+                    batch = live.iloc[minute:minute + 1]
+                    if minute == buffer_size + ticks // 2:
+                        # The provider revises a candle of an already closed 15M bar
+                        revised = live.iloc[minute - 20:minute + 1].copy()
+                        revised.iloc[0, revised.columns.get_loc('high')] += 0.5
+                        live = pd.concat([live.iloc[:minute - 20], revised, live.iloc[minute + 1:]])
+                        candles = pd.concat([candles.iloc[:-(buffer_size + ticks)], live])
+                        batch = revised
+                    aggregator._ingest({'EURJPY': batch}, 'stub')
+
+                    frame = aggregator.get_timeframe_data('15M')
+                    began = time.perf_counter()
+                    _pandas_indicators(frame)
+                    pandas_times.append(time.perf_counter() - began)
+
+            worst = 0.0
+            for tf_name, freq in aggregator.TIMEFRAMES.items():
+                bars = resample_ohlcv(candles, freq)
+                worst = max(worst, _check_indicators(aggregator.get_indicators(tf_name), bars, tf_name))
+            before = {tf_name: aggregator.get_indicators(tf_name) for tf_name in aggregator.TIMEFRAMES}
+            aggregator._save_state(checkpoint=True)
+
+        with offline_aggregator(tmp) as restarted:
+            assert restarted.load_state()
+            for tf_name, frame in before.items():
+                pd.testing.assert_frame_equal(restarted.get_indicators(tf_name), frame)
+
+        stages = {}
+        with offline_aggregator(tmp) as aggregator:
+            aggregator.load_state()
+            aggregator.candles_1m = live.iloc[:buffer_size]
+            aggregator._update_all_timeframes()
+            for tf_name in aggregator.TIMEFRAMES:
+                aggregator.indicators['EURJPY'][tf_name].reset()
+            began = time.perf_counter()
+            aggregator._update_indicators('EURJPY')
+            stages['cold_backfill_ms'] = (time.perf_counter() - began) * 1e3
+
+    result['live'] = {
+        'ticks': ticks,
+        'max_rel_diff': worst,
+        'tick': _percentiles(samples['_ingest']),
+        'indicator_update': _percentiles(samples['_update_indicators']),
+        'pandas_recompute_15m': _percentiles(pandas_times),
+        **stages
+    }
+    return result
+
+
+def _pandas_indicators(bars: pd.DataFrame) -> Dict[str, pd.Series]:
+    """What a strategy would do each tick without the cache: recompute from the frame."""
+    close, high, low = bars['close'], bars['high'], bars['low']
+    prev = close.shift()
+    true_range = pd.concat([high - low, (high - prev).abs(), (low - prev).abs()], axis=1).max(axis=1)
+    change = close.diff()
+    gain = change.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    loss = (-change).clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    return {
+        'ema_20': close.ewm(span=20, adjust=False).mean(),
+        'ema_50': close.ewm(span=50, adjust=False).mean(),
+        'atr_14': true_range.ewm(alpha=1 / 14, adjust=False).mean(),
+        'rsi_14': 100 - 100 / (1 + gain / loss),
+        'high_20': high.rolling(20).max(),
+        'low_20': low.rolling(20).min()
+    }
+
+
+def run_metadata() -> Dict:
+    """Commit, interpreter and library versions a result file was produced with."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'commit': commit,
+        'created': pd.Timestamp.now(tz='UTC').isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float) -> List[Dict]:
+    """
+    Stage-by-stage p50 ratios (current / baseline) between two pipeline
+    result files, matched by buffer size.
+    """
+    rows = []
+    before = {run['buffer_size']: run for run in baseline['results']}
+    for run in current['results']:
+        old = before.get(run['buffer_size'])
+        if old is None:
+            continue
+        for stage, stats in run['stages'].items():
+            if stage not in old['stages']:
+                continue
+            ratio = stats['p50_ms'] / max(old['stages'][stage]['p50_ms'], 1e-9)
+            rows.append({'buffer_size': run['buffer_size'], 'stage': stage,
+                         'baseline_ms': old['stages'][stage]['p50_ms'],
+                         'current_ms': stats['p50_ms'], 'ratio': ratio,
+                         'regression': ratio > threshold})
+    return rows
+
+
+SHARED_TIMEFRAMES = ['1M', '15M', '1H', '4H', 'D']
+
+
+def _revise_for_tick(candles: pd.DataFrame, minute: int) -> None:
+    """Every 25th minute the provider revises a candle it already served."""
+    if minute % 25 == 0:
+        close_col = candles.columns.get_loc('close')
+        candles.iat[minute - 3, close_col] = candles.iat[minute - 3, candles.columns.get_loc('high')]
+
+
+def _strategy_read(frames: Dict[str, object]) -> float:
+    """Stand-in strategy work over the last 100 bars of each timeframe."""
+    return float(sum(np.mean(frame['close'][-100:]) for frame in frames.values()))
+
+
+def _bus_reader(name: str, symbol: str, base: int, ticks: int, started, ready, results) -> None:
+    """Reader process: waits for each bus generation and reads every timeframe zero-copy."""
+    from sharedbus import SharedCandleReader
+    reader = SharedCandleReader(name)
+    latencies, reads, seen, invalid = [], [], {}, 0
+    ready.put(os.getpid())
+    cpu = time.process_time()
+    generation = base
+    while generation < base + ticks:
+        generation = reader.wait(generation, timeout=30)
+        read_start = time.perf_counter()
+        while True:
+            current = reader.generation
+            views = {tf: reader.read(symbol, tf, last_n=100) for tf in SHARED_TIMEFRAMES}
+            _strategy_read({tf: view.columns for tf, view in views.items()})
+            last = views['1M'].columns
+            tail = (int(last['ts'][-1]), float(last['close'][-1]))
+            if all(view.valid() for view in views.values()) and reader.generation == current:
+                break
+            invalid += 1
+        reads.append(time.perf_counter() - read_start)
+        generation = current
+        latencies.append(time.time() - started[generation - base - 1])
+        seen[generation - base - 1] = tail
+    cpu = time.process_time() - cpu
+    del views, last
+    results.put({'latency': latencies, 'read': reads, 'cpu': cpu, 'seen': seen,
+                 'invalid': invalid, 'retries': reader.retries, 'calls': 0})
+    reader.close()
+
+
+def _own_aggregator_reader(symbol: str, ticks: int, buffer_size: int, seed: int, current,
+                           started, ready, results) -> None:
+    """Baseline reader process: runs its own aggregator against the provider."""
+    candles = synthetic_candles(buffer_size + ticks, seed=seed, gap_ratio=0)
+    latencies, reads, seen = [], [], {}
+    with tempfile.TemporaryDirectory() as tmp:
+        with offline_aggregator(tmp) as aggregator:
+            aggregator.buffers[symbol].load(candles.iloc[:buffer_size])
+            aggregator._update_all_timeframes(symbol)
+            provider = StubProvider(candles, [(1.0, 0.0)], symbols=[symbol])
+            aggregator.providers = {'yfinance': provider}
+            ready.put(os.getpid())
+            cpu = time.process_time()
+            done = 0
+            while done < ticks:
+                tick = current.value
+                if tick == done:
+                    time.sleep(0.0005)
+                    continue
+                for i in range(done, tick):
+                    _revise_for_tick(candles, buffer_size + i)
+                provider.visible = buffer_size + tick
+                read_start = time.perf_counter()
+                aggregator.fetch_latest_data()
+                frames = {tf: aggregator.get_timeframe_data(tf, symbol, last_n=100)
+                          for tf in SHARED_TIMEFRAMES}
+                _strategy_read(frames)
+                reads.append(time.perf_counter() - read_start)
+                latencies.append(time.time() - started[tick - 1])
+                seen[tick - 1] = (int(frames['1M'].index[-1].value), float(frames['1M']['close'].iloc[-1]))
+                done = tick
+            cpu = time.process_time() - cpu
+            calls = provider.calls
+    results.put({'latency': latencies, 'read': reads, 'cpu': cpu, 'seen': seen,
+                 'invalid': 0, 'retries': 0, 'calls': calls})
+
+
+def bench_shared(readers: int, ticks: int, interval: float, buffer_size: int = 20000,
+                 seed: int = 0) -> Dict:
+    """
+    Tick-to-reader latency and CPU of ``readers`` strategy processes, once
+    reading one aggregator through the shared-memory bus and once each
+    polling an aggregator of its own. Every 25th tick revises a candle, so
+    readers also see in-place rewrites; every value a bus reader saw is
+    checked against the writer's bars for that tick.
+    """
+    import multiprocessing
+    from sharedbus import SharedCandleReader
+
+    context = multiprocessing.get_context('spawn')
+    candles = synthetic_candles(buffer_size + ticks, seed=seed, gap_ratio=0)
+    result = {'readers': readers, 'ticks': ticks, 'interval_ms': interval * 1e3}
+
+    def collect(processes, results) -> Dict:
+        reports = [results.get(timeout=600) for _ in processes]
+        for process in processes:
+            process.join(60)
+        latency = [sample for report in reports for sample in report['latency']]
+        return {'latency': _percentiles(latency),
+                'read': _percentiles([sample for report in reports for sample in report['read']]),
+                'reader_cpu_ms_per_tick': float(np.mean([r['cpu'] for r in reports])) / ticks * 1e3,
+                'updates': len(latency),
+                'provider_calls': sum(r['calls'] for r in reports),
+                'invalid_views': sum(r['invalid'] for r in reports),
+                'seqlock_retries': sum(r['retries'] for r in reports),
+                'seen': [r['seen'] for r in reports]}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with offline_aggregator(tmp) as aggregator:
+            symbol = aggregator.primary_symbol
+            aggregator.buffers[symbol].load(candles.iloc[:buffer_size])
+            aggregator._update_all_timeframes(symbol)
+            provider = StubProvider(candles, [(1.0, 0.0)], symbols=[symbol])
+            aggregator.providers = {'yfinance': provider}
+            bus = aggregator.publish_shared()
+            base = bus.stats()['generation']
+
+            started = context.Array('d', ticks, lock=False)
+            ready, results = context.Queue(), context.Queue()
+            processes = [context.Process(target=_bus_reader, args=(
+                bus.name, symbol, base, ticks, started, ready, results)) for _ in range(readers)]
+            for process in processes:
+                process.start()
+            for _ in processes:
+                ready.get(timeout=120)
+
+            truth, publish = {}, []
+            cpu = time.process_time()
+            for tick in range(ticks):
+                due = time.perf_counter() + interval
+                _revise_for_tick(candles, buffer_size + tick)
+                provider.visible = buffer_size + tick + 1
+                started[tick] = time.time()
+                publish_start = time.perf_counter()
+                aggregator.fetch_latest_data()
+                publish.append(time.perf_counter() - publish_start)
+                assert bus.stats()['generation'] == base + tick + 1
+                frame = aggregator.buffers[symbol].frame()
+                truth[tick] = (int(frame.index[-1].value), float(frame['close'].iloc[-1]))
+                time.sleep(max(0.0, due - time.perf_counter()))
+            writer_cpu = time.process_time() - cpu
+
+            shared = collect(processes, results)
+            # A reader can skip generations, but what it saw must match
+            mismatches = sum(tick_seen != truth[tick] for seen in shared.pop('seen')
+                             for tick, tick_seen in seen.items())
+            assert mismatches == 0, f"{mismatches} bus reads differ from the writer's bars"
+            shared['writer_cpu_ms_per_tick'] = writer_cpu / ticks * 1e3
+            shared['writer_tick'] = _percentiles(publish)
+            shared['publish'] = aggregator.stage_report().get('shared_publish', {})
+            shared['bus'] = bus.stats()
+
+            # A reader's view of the whole window really is shared memory
+            reader = SharedCandleReader(bus.name)
+            window = reader.read(symbol, '1M')
+            assert np.shares_memory(window.columns['close'], reader.slots[(symbol, '1M')].columns['close'])
+            assert len(window) == min(len(frame), aggregator.BUFFER_SIZES['1M'])
+            del window
+            reader.close()
+        result['shared'] = shared
+
+    current = context.Value('l', 0, lock=False)
+    started = context.Array('d', ticks, lock=False)
+    ready, results = context.Queue(), context.Queue()
+    processes = [context.Process(target=_own_aggregator_reader, args=(
+        symbol, ticks, buffer_size, seed, current, started, ready, results))
+        for _ in range(readers)]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.get(timeout=600)
+    for tick in range(ticks):
+        due = time.perf_counter() + interval
+        started[tick] = time.time()
+        current.value = tick + 1
+        time.sleep(max(0.0, due - time.perf_counter()))
+    own = collect(processes, results)
+    own.pop('seen')
+    result['own_aggregator'] = own
+    return result
+
+
+class PublishingProvider:
+    """
+    Simulated provider serving each candle once its publication delay after
+    the close has passed on a simulated clock; each call costs a rate-limit
+    token and ``latency`` simulated seconds.
+    """
+
+    def __init__(self, candles: pd.DataFrame, delays: np.ndarray, clock: SimulatedClock,
+                 limiter: RateLimiter, symbol: str, latency: float = 0.3, window: int = 100):
+        closes = candles.index.as_unit('s').asi8 + 60
+        # Candles are published in order, a late one holds back the next
+        self.available = np.maximum.accumulate(closes + delays)
+        self.candles = candles
+        self.clock = clock
+        self.limiter = limiter
+        self.symbol = symbol
+        self.latency = latency
+        self.window = window
+        self.calls = 0
+
+    def __call__(self, cancel: threading.Event) -> Dict[str, pd.DataFrame]:
+        if not self.limiter.acquire('yfinance', cancel=cancel):
+            return {}
+        self.calls += 1
+        now = self.clock()
+        served = int(self.available.searchsorted(now, side='right'))
+        self.clock.advance_to(pd.Timestamp(now + self.latency, unit='s'))
+        return {self.symbol: self.candles.iloc[max(0, served - self.window):served]}
+
+
+SCHEDULE_POLICIES = ('fixed_60s', 'scheduler', 'scheduler_retry')
+
+
+def bench_schedule(hours: int, start: str = '2024-01-05 12:00', seed: int = 0) -> Dict:
+    """
+    Candle-close-to-merged latency and poll counts of the old fixed
+    60-second loop, the PollScheduler with its quota-neutral defaults (one
+    call per close) and with one retry per missing candle, over ``hours``
+    of simulated time (by default Friday noon across the FX weekend close),
+    against a provider publishing each candle after a random delay. All
+    loops run the real fetch/ingest path on a simulated clock with the same
+    rate limiter. Provider calls and empty polls are also counted within
+    the FX session, where the weekend polls the fixed loop wastes do not
+    hide the cost.
+    """
+    rng = np.random.default_rng(seed)
+    begin = pd.Timestamp(start)
+    minutes = np.arange(begin.value // 60_000_000_000 - 500,
+                        (begin + pd.Timedelta(hours=hours)).value // 60_000_000_000)
+    session = np.array([next_session_minute(int(m)) == m for m in minutes])
+    candles = synthetic_candles(int(session.sum()), seed=seed, gap_ratio=0)
+    candles.index = pd.DatetimeIndex(minutes[session] * 60_000_000_000, name='Datetime')
+    # Publication delay: lognormal around 6s, 2% of candles 30-60s late
+    delays = rng.lognormal(np.log(6.0), 0.5, len(candles))
+    late = rng.random(len(candles)) < 0.02
+    delays[late] = rng.uniform(30, 60, late.sum())
+    history = int(candles.index.searchsorted(begin))
+    limits = {'yfinance': {'rate': 1 / 6, 'burst': 3, 'daily': None}}
+
+    result = {'hours': hours, 'candles': len(candles) - history,
+              'delay_p50_s': float(np.median(delays)), 'rate_per_minute': 10}
+    for policy in SCHEDULE_POLICIES:
+        clock = SimulatedClock(begin)
+        with tempfile.TemporaryDirectory() as tmp:
+            with offline_aggregator(tmp) as aggregator:
+                symbol = aggregator.primary_symbol
+                aggregator.buffers[symbol].load(candles.iloc[:history])
+                aggregator._update_all_timeframes(symbol)
+                aggregator.clock = clock
+                aggregator.rate_limiter = RateLimiter(
+                    limits, clock=clock,
+                    sleep=lambda seconds: clock.advance_to(clock.now + pd.Timedelta(seconds=seconds)))
+                config = dict(aggregator.POLL_SCHEDULE)
+                if policy == 'scheduler_retry':
+                    config['max_retries'] = 1  # latency for quota
+                aggregator.scheduler = PollScheduler(clock=clock, seed=seed, **config)
+                provider = PublishingProvider(candles, delays, clock, aggregator.rate_limiter, symbol)
+                aggregator.providers = {'yfinance': provider}
+
+                closes = candles.index.as_unit('s').asi8 + 60
+                latencies, polls, empty_polls, weekend_polls, session_empty = [], 0, 0, 0, 0
+                merged = history
+                end = begin + pd.Timedelta(hours=hours)
+                while clock.now < end:
+                    minute = clock.now.value // 60_000_000_000
+                    weekend = next_session_minute(minute) != minute
+                    weekend_polls += weekend
+                    polls += 1
+                    aggregator.fetch_latest_data()
+                    held = len(aggregator.buffers[symbol])  # capacity exceeds the run
+                    now = clock()
+                    latencies.extend(now - closes[merged:held])
+                    empty_polls += held == merged
+                    session_empty += held == merged and not weekend
+                    merged = held
+                    wait = 60.0 if policy == 'fixed_60s' else aggregator.next_poll_in()
+                    clock.advance_to(clock.now + pd.Timedelta(seconds=wait))
+                stats = aggregator.scheduler.stats()
+        result[policy] = {
+            'latency_p50_s': float(np.percentile(latencies, 50)),
+            'latency_p99_s': float(np.percentile(latencies, 99)),
+            'latency_max_s': float(np.max(latencies)),
+            'merged': len(latencies), 'polls': polls, 'provider_calls': provider.calls,
+            'empty_polls': empty_polls, 'weekend_polls': weekend_polls,
+            'session_calls': polls - weekend_polls, 'session_empty_polls': session_empty,
+            'deferred': stats['deferred'] if policy != 'fixed_60s' else None,
+            'measured_delay_s': stats['delay']
+        }
+    return result
+
+
+class FlakyProvider:
+    """
+    Offline provider with a fixed response time, an optional lag behind the
+    latest candle, and outage windows (ticks) during which it raises.
+    """
+
+    def __init__(self, candles: pd.DataFrame, symbol: str, latency: float, lag: int = 0,
+                 outages: Optional[List[Tuple[int, int]]] = None, window: int = 30):
+        self.candles = candles
+        self.symbol = symbol
+        self.latency = latency
+        self.lag = lag
+        self.outages = outages or []
+        self.window = window
+        self.tick = 0
+        self.calls = 0
+
+    def __call__(self, cancel: threading.Event) -> Dict[str, pd.DataFrame]:
+        self.calls += 1
+        if cancel.wait(self.latency):
+            return {}
+        if any(start <= self.tick < end for start, end in self.outages):
+            raise ConnectionError("provider unavailable")
+        visible = self.tick + 1 - self.lag
+        return {self.symbol: self.candles.iloc[max(0, visible - self.window):visible]}
+
+
+def bench_health(ticks: int, outage: Tuple[int, int] = (60, 120), history: int = 500) -> Dict:
+    """
+    Provider selection with health scoring and circuit breakers against the
+    previous static order with its skip-after-3-failures counter, one
+    simulated minute per poll (hedged fetching, real call latencies):
+
+    - twelve_data: listed first, fastest, but serves candles 2 minutes late
+    - yfinance: fresh, 40ms per call
+    - alpha_vantage: fresh, 10ms per call, down during ``outage``
+    """
+    candles = synthetic_candles(history + ticks, start='2024-01-08 00:00', gap_ratio=0)
+    result = {'ticks': ticks, 'outage': list(outage)}
+    for policy in ('static', 'health'):
+        with tempfile.TemporaryDirectory() as tmp:
+            with offline_aggregator(tmp) as aggregator:
+                symbol = aggregator.primary_symbol
+                aggregator.buffers[symbol].load(candles.iloc[:history])
+                aggregator._update_all_timeframes(symbol)
+                clock = SimulatedClock(candles.index[history])
+                aggregator.clock = clock
+                providers = {
+                    'twelve_data': FlakyProvider(candles, symbol, 0.005, lag=2),
+                    'yfinance': FlakyProvider(candles, symbol, 0.04),
+                    'alpha_vantage': FlakyProvider(candles, symbol, 0.01, outages=[
+                        (history + outage[0], history + outage[1])])
+                }
+                aggregator.providers = dict(providers)
+                aggregator.HEDGE_DELAY = 0.025
+                if policy == 'static':
+                    # Old behaviour: fixed order, skipped for good after 3 failures
+                    aggregator.health = HealthMonitor(providers, clock=clock, cooldown=float('inf'))
+                    aggregator.health.order = list
+                else:
+                    aggregator.health = HealthMonitor(
+                        providers, os.path.join(tmp, 'health.json'), clock=clock,
+                        **aggregator.CIRCUIT_BREAKER)
+
+                winners, latencies, outage_calls, merged = [], [], 0, 0
+                for tick in range(ticks):
+                    minute = history + tick
+                    for provider in providers.values():
+                        provider.tick = minute
+                    clock.advance_to(candles.index[minute] + pd.Timedelta(minutes=1))
+                    calls_before = providers['alpha_vantage'].calls
+                    merged += aggregator.fetch_latest_data()
+                    if outage[0] <= minute - history < outage[1]:
+                        outage_calls += providers['alpha_vantage'].calls - calls_before
+                    winners.append(aggregator.last_fetch_stats['source'])
+                    if aggregator.last_fetch_stats['latency'] is not None:
+                        latencies.append(aggregator.last_fetch_stats['latency'])
+
+                after = winners[outage[1]:]
+                recovered = next((i for i, source in enumerate(after) if source == 'alpha_vantage'), None)
+                stats = {
+                    'polls_with_new_candle': merged,
+                    'fetch': _percentiles(latencies),
+                    'calls': {source: provider.calls for source, provider in providers.items()},
+                    'wins': {source: winners.count(source) for source in providers},
+                    'outage_calls': outage_calls,
+                    'recovered_after_ticks': recovered,
+                    'health': aggregator.health.report()
+                }
+                if policy == 'health':
+                    # A restart picks the learned state back up
+                    saved = HealthMonitor(providers, os.path.join(tmp, 'health.json'), clock=clock)
+                    stats['restored'] = saved.report() == aggregator.health.report()
+            result[policy] = stats
+    return result
+
+
+def bench_bulk(rows: int, repeats: int = 5, float_volume: bool = False, seed: int = 0,
+               whole_float_volume: bool = False) -> Dict:
+    """
+    Rebuild every timeframe from ``rows`` 1M candles with the bulk NumPy
+    kernel vs one pandas resample per timeframe. ``whole_float_volume``
+    stores the integer tick volumes as float64 with some missing (NaN), as
+    they arrive from providers that pad absent volumes.
+
+    Raises:
+        AssertionError: If any timeframe differs from the resample path
+    """
+    candles = synthetic_candles(rows, seed=seed, float_volume=float_volume)
+    if whole_float_volume:
+        candles['volume'] = candles['volume'].astype(np.float64)
+        candles.iloc[::97, candles.columns.get_loc('volume')] = np.nan
+    result: Dict = {'rows': rows, 'float_volume': float_volume,
+                    'whole_float_volume': whole_float_volume}
+
+    bulk_times, resample_times = [], []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        bulk = aggregate_timeframes(candles, TIMEFRAMES)
+        bulk_times.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        reference = {tf_name: resample_ohlcv(candles, freq) for tf_name, freq in TIMEFRAMES.items()}
+        resample_times.append(time.perf_counter() - started)
+    result['bulk'] = _percentiles(bulk_times)
+    result['resample'] = _percentiles(resample_times)
+    result['speedup'] = result['resample']['p50_ms'] / result['bulk']['p50_ms']
+
+    for tf_name in TIMEFRAMES:
+        pd.testing.assert_frame_equal(bulk[tf_name], reference[tf_name],
+                                      check_freq=False, check_exact=True)
+    result['bars'] = {tf_name: len(bars) for tf_name, bars in bulk.items()}
+
+    # Full IncrementalAggregator rebuild (startup/recovery), now on the bulk kernel
+    sizes = {tf_name: 100 for tf_name in TIMEFRAMES}
+    started = time.perf_counter()
+    frames = IncrementalAggregator(TIMEFRAMES, sizes).update(candles)
+    result['aggregator_rebuild_ms'] = (time.perf_counter() - started) * 1e3
+    for tf_name, bars in frames.items():
+        pd.testing.assert_frame_equal(bars, reference[tf_name].tail(100), check_freq=False)
+    return result
+
+
+def bench_cache(days: int = 10, symbols: int = 4, clients: int = 8,
+                latency: float = 0.2) -> Dict:
+    """
+    Provider response cache: bootstrap ``days`` of 1M candles for
+    ``symbols`` pairs through the real Twelve Data range path from a local
+    stub, twice, each time into a fresh working directory sharing one cache
+    directory (a restart that lost its state). Then poll the live edge
+    twice within a minute and once after the next close, and send
+    ``clients`` identical requests at once to a provider call taking
+    ``latency`` seconds.
+
+    Checks that the warm bootstrap stores the same candles without calling
+    the provider, that the live edge is refetched once a candle closed, and
+    that concurrent identical requests reach the provider once.
+    """
+    pairs = fx_pairs(symbols)
+    start = pd.Timestamp('2024-01-01')
+    end = start + pd.Timedelta(days=days)
+    candles = synthetic_candles(days * 1440, start=str(start), gap_ratio=0)
+    candles = candles[candles.index < end]
+    result = {'days': days, 'symbols': symbols}
+
+    server = TwelveDataStub(candles, pairs)
+    server.visible = len(candles)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    now = [end.value / 1e9 + 3600]  # simulated clock, an hour after the range
+
+    @contextlib.contextmanager
+    def aggregator_in(workdir: str, cache_dir: str) -> Iterator:
+        with offline_aggregator(workdir, pairs) as aggregator:
+            aggregator.rate_limiter = RateLimiter({})
+            aggregator.twelve_data_key = 'offline'
+            aggregator.TWELVE_DATA_URL = server.url
+            aggregator.BACKFILL_WINDOWS['twelve_data'] = pd.Timedelta(days=1)
+            aggregator.clock = lambda: now[0]
+            aggregator.response_cache = ResponseCache(cache_dir, clock=lambda: now[0])
+            yield aggregator
+
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            stored = {}
+            for run in ('cold', 'warm'):
+                requests_before = server.requests
+                with tempfile.TemporaryDirectory() as tmp, aggregator_in(tmp, cache_dir) as aggregator:
+                    started = time.perf_counter()
+                    stats = aggregator.backfill(start, end, source='twelve_data')
+                    elapsed = time.perf_counter() - started
+                    assert all(report['complete'] for report in stats.values()), stats
+                    stored[run] = {symbol: aggregator.query_range('1M', start, end)
+                                   for symbol in aggregator.symbols}
+                    assert all(len(rows['timestamp']) == len(candles) for rows in stored[run].values())
+                    counters = aggregator.response_cache.stats()['providers']['twelve_data']
+                    result[run] = {'provider_requests': server.requests - requests_before,
+                                   'elapsed_s': elapsed,
+                                   'hit_rate': counters['hits'] / counters['requests'],
+                                   'credits_saved': counters['saved'],
+                                   'cache_bytes': aggregator.response_cache.stats()['bytes']}
+            for symbol, rows in stored['cold'].items():
+                assert np.array_equal(rows, stored['warm'][symbol]), symbol
+            assert result['cold']['provider_requests'] == days * symbols
+            assert result['warm']['provider_requests'] == 0
+
+        # Live edge: reused within the minute, refetched after the next close
+        with tempfile.TemporaryDirectory() as cache_dir, tempfile.TemporaryDirectory() as tmp, \
+                aggregator_in(tmp, cache_dir) as aggregator:
+            now[0] = candles.index[-1].value / 1e9 + 65  # last candle closed 5s ago
+            polls = []
+            for offset in (0, 20, 60):
+                now[0] += offset
+                before = server.requests
+                frames = aggregator.fetch_twelve_batch(aggregator.symbols, outputsize=100)
+                assert all(frames[symbol].index[-1] == candles.index[-1] for symbol in aggregator.symbols)
+                polls.append(server.requests - before)
+            assert polls == [1, 0, 1], polls
+            result['live_requests'] = polls
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # Coalescing: identical requests while the first one is in flight
+    cache = ResponseCache(None)
+    calls = []
+
+    def slow_call(missing: List[str]) -> Dict[str, pd.DataFrame]:
+        calls.append(missing)
+        time.sleep(latency)
+        return {symbol: candles.tail(100) for symbol in missing}
+
+    barrier = threading.Barrier(clients)
+    answers = []
+
+    def client() -> None:
+        barrier.wait()
+        answers.append(cache.fetch('twelve_data', pairs, '1min', 'outputsize=100', slow_call,
+                                   per_symbol=True))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    assert len(calls) == 1 and len(answers) == clients
+    assert all(answer.keys() == set(pairs) for answer in answers)
+    counters = cache.stats()['providers']['twelve_data']
+    result['coalescing'] = {'clients': clients, 'provider_calls': len(calls),
+                            'coalesced': counters['coalesced'], 'credits_saved': counters['saved'],
+                            'elapsed_s': elapsed}
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    agg = commands.add_parser(
+        'aggregation', help='incremental vs resample timeframe aggregation')
+    agg.add_argument('--buffer', type=int, action='append',
+                     help='1M buffer size (repeatable, default 500 and 5000)')
+    agg.add_argument('--ticks', type=int, default=500)
+    agg.add_argument('--seed', type=int, default=0)
+
+    rec = commands.add_parser(
+        'recovery', help='journal/checkpoint vs pickle persistence and recovery')
+    rec.add_argument('--buffer', type=int, action='append',
+                     help='1M buffer size (repeatable, default 500, 50000, 500000)')
+    rec.add_argument('--tail', type=int, default=500,
+                     help='journal records since the last checkpoint')
+    rec.add_argument('--fsync', default='always')
+
+    fetch = commands.add_parser(
+        'fetch', help='sequential vs concurrent vs hedged provider fetching')
+    fetch.add_argument('--minutes', type=int, default=500)
+    fetch.add_argument('--hedge-delay', type=float, default=0.05)
+    fetch.add_argument('--seed', type=int, default=0)
+
+    sym = commands.add_parser(
+        'symbols', help='multi-symbol poll throughput with batched downloads')
+    sym.add_argument('--symbols', type=int, action='append',
+                     help='symbol count (repeatable, default 1, 10 and 50)')
+    sym.add_argument('--minutes', type=int, default=100)
+
+    buf = commands.add_parser(
+        'buffer', help='1M ring buffer vs concat merge per tick')
+    buf.add_argument('--buffer', type=int, action='append',
+                     help='1M buffer size (repeatable, default 500, 50000, 250000, 500000)')
+    buf.add_argument('--ticks', type=int, default=500)
+    buf.add_argument('--seed', type=int, default=0)
+
+    reads = commands.add_parser(
+        'reads', help='allocation per get_timeframe_data call (tracemalloc)')
+    reads.add_argument('--buffer', type=int, action='append',
+                       help='1M buffer size (repeatable, default 1000, 50000, 250000)')
+    reads.add_argument('--ticks', type=int, default=200)
+
+    sto = commands.add_parser(
+        'storage', help='integer-epoch vs TEXT timestamp SQLite schema')
+    sto.add_argument('--rows', type=int, default=1_000_000)
+    sto.add_argument('--batch', type=int, default=10_000,
+                     help='rows per flush transaction')
+
+    bf = commands.add_parser(
+        'backfill', help='parallel, resumable backfill against a range stub provider')
+    bf.add_argument('--days', type=int, default=60)
+    bf.add_argument('--latency', type=float, default=0.05,
+                    help='seconds per stub request')
+    bf.add_argument('--failure-rate', type=float, default=0.1)
+
+    qual = commands.add_parser(
+        'quality', help='streaming data-quality checks vs full-buffer validation')
+    qual.add_argument('--buffer', type=int, action='append',
+                      help='1M buffer size (repeatable, default 1000, 50000, 250000)')
+    qual.add_argument('--ticks', type=int, default=500)
+    qual.add_argument('--window', type=int, default=100,
+                      help='rows per provider response')
+
+    rl = commands.add_parser(
+        'ratelimit', help='token-bucket quota compliance, persistence and overhead')
+    rl.add_argument('--hours', type=int, default=48, help='simulated hours')
+    rl.add_argument('--threads', type=int, default=16)
+
+    dl = commands.add_parser(
+        'delta', help='delta vs fixed-window provider requests over pooled HTTP')
+    dl.add_argument('--minutes', type=int, default=200)
+    dl.add_argument('--window', type=int, action='append',
+                    help='fixed request window (repeatable, default 100 and 2880)')
+    dl.add_argument('--tls', action='store_true',
+                    help='serve the stub over HTTPS (self-signed, needs the openssl CLI)')
+
+    pipe = commands.add_parser(
+        'pipeline', help='per-stage ingest latency/throughput with a fixture provider')
+    pipe.add_argument('--buffer', type=int, action='append',
+                      help='1M buffer size (repeatable, default 500, 10000, 100000, 1000000)')
+    pipe.add_argument('--ticks', type=int, default=200)
+    pipe.add_argument('--window', type=int, default=100,
+                      help='candles per provider response')
+    pipe.add_argument('--fixture', help='recorded candles CSV instead of synthetic data')
+    pipe.add_argument('--output', help='write results as JSON')
+
+    met = commands.add_parser(
+        'metrics', help='instrumentation overhead and Prometheus export')
+    met.add_argument('--buffer', type=int, default=10_000)
+    met.add_argument('--ticks', type=int, default=1000)
+
+    start = commands.add_parser(
+        'startup', help='cold vs warm-snapshot process startup to the first served candle')
+    start.add_argument('--buffer', type=int, action='append',
+                       help='1M candles restored (repeatable, default 10000 and 250000)')
+    start.add_argument('--runs', type=int, default=5)
+
+    ev = commands.add_parser(
+        'events', help='candle event delivery latency, ordering and backpressure')
+    ev.add_argument('--ticks', type=int, default=300)
+
+    hist = commands.add_parser(
+        'history', help='Arrow history store scans and aggregation vs SQLite')
+    hist.add_argument('--days', type=int, default=365)
+
+    tiers = commands.add_parser(
+        'tiers', help='get_range lookbacks stitched from disk and memory')
+    tiers.add_argument('--days', type=int, default=300)
+    tiers.add_argument('--cache-mb', type=int, default=8)
+
+    rp = commands.add_parser(
+        'replay', help='historical replay throughput and equivalence with live ingestion')
+    rp.add_argument('--days', type=int, default=365)
+    rp.add_argument('--minutes', type=int, default=3000, help='candles in the live comparison')
+
+    ind = commands.add_parser(
+        'indicators', help='incremental indicator cache vs a full recompute')
+    ind.add_argument('--days', type=int, default=120)
+    ind.add_argument('--ticks', type=int, default=600)
+
+    shm = commands.add_parser(
+        'shared', help='shared-memory candle bus readers vs one aggregator per reader')
+    shm.add_argument('--readers', type=int, default=16)
+    shm.add_argument('--ticks', type=int, default=200)
+    shm.add_argument('--interval', type=float, default=0.1, help='seconds between ticks')
+
+    sch = commands.add_parser(
+        'schedule', help='bar-close-aligned poll scheduler vs the fixed 60s loop (simulated clock)')
+    sch.add_argument('--hours', type=int, default=72)
+
+    hl = commands.add_parser(
+        'health', help='provider health ordering and circuit breakers vs the static failover')
+    hl.add_argument('--ticks', type=int, default=240)
+
+    blk = commands.add_parser(
+        'bulk', help='bulk NumPy timeframe rebuild vs one pandas resample per timeframe')
+    blk.add_argument('--rows', type=int, action='append',
+                     help='1M candles aggregated (repeatable, default 1000000 and 2000000)')
+    blk.add_argument('--repeats', type=int, default=5)
+    blk.add_argument('--float-volume', action='store_true',
+                     help='fractional float volumes (summed by pandas for exact rounding)')
+    blk.add_argument('--whole-float-volume', action='store_true',
+                     help='integer tick volumes stored as float64')
+
+    cch = commands.add_parser(
+        'cache', help='provider response cache: warm restarts, live edge and request coalescing')
+    cch.add_argument('--days', type=int, default=10)
+    cch.add_argument('--symbols', type=int, default=4)
+    cch.add_argument('--clients', type=int, default=8,
+                     help='concurrent identical requests for the coalescing check')
+
+    cmp = commands.add_parser(
+        'compare', help='compare two pipeline JSON result files')
+    cmp.add_argument('baseline')
+    cmp.add_argument('current')
+    cmp.add_argument('--threshold', type=float, default=1.2,
+                     help='p50 ratio counted as a regression')
+
+    rec_fix = commands.add_parser(
+        'record', help='export stored candles as a fixture CSV')
+    rec_fix.add_argument('--db', default='eurjpy_data.db')
+    rec_fix.add_argument('--table', default='EURJPY_1M')
+    rec_fix.add_argument('--output', required=True)
+
+    args = parser.parse_args()
+
+    if args.command == 'aggregation':
+        for buffer_size in args.buffer or [500, 5000]:
+            for float_volume in (False, True):
+                result = bench_aggregation(
+                    buffer_size, args.ticks, args.seed, float_volume)
+                print(f"buffer={buffer_size:>7} float_volume={float_volume!s:<5} "
+                      f"incremental p50={result['incremental']['p50_ms']:.3f}ms "
+                      f"resample p50={result['resample']['p50_ms']:.3f}ms (outputs identical)")
+
+    elif args.command == 'recovery':
+        for buffer_size in args.buffer or [500, 50_000, 500_000]:
+            result = bench_recovery(buffer_size, args.tail, fsync=args.fsync)
+            print(f"buffer={buffer_size:>7} "
+                  f"save p50: pickle={result['pickle_save']['p50_ms']:.3f}ms "
+                  f"journal={result['journal_append']['p50_ms']:.3f}ms | "
+                  f"recover: pickle={result['pickle_recover_ms']:.1f}ms "
+                  f"journal={result['journal_recover_ms']:.1f}ms "
+                  f"(+{result['timeframe_rebuild_ms']:.1f}ms timeframe rebuild)")
+
+    elif args.command == 'fetch':
+        print(f"{args.minutes} minutes, hedge delay {args.hedge_delay * 1e3:.0f}ms, seed {args.seed}, "
+              f"profiles {STUB_PROFILES}")
+        for mode in ('sequential', 'hedged', 'concurrent'):
+            result = bench_fetch(mode, args.minutes, args.hedge_delay, args.seed)
+            latency = result['close_to_merge']
+            print(f"{mode:>10}: close-to-merge p50={latency['p50_ms']:.1f}ms "
+                  f"p99={latency['p99_ms']:.1f}ms missed={result['missed']} "
+                  f"calls={result['provider_calls']}")
+
+    elif args.command == 'symbols':
+        for count in args.symbols or [1, 10, 50]:
+            result = bench_symbols(count, args.minutes)
+            print(f"symbols={count:>3}: poll p50={result['poll']['p50_ms']:.1f}ms "
+                  f"p99={result['poll']['p99_ms']:.1f}ms "
+                  f"throughput={result['candles_per_second']:.0f} candles/s "
+                  f"requests/poll={result['provider_requests_per_poll']:.0f}")
+
+    elif args.command == 'buffer':
+        for buffer_size in args.buffer or [500, 50_000, 250_000, 500_000]:
+            result = bench_buffer(buffer_size, args.ticks, seed=args.seed)
+            print(f"buffer={buffer_size:>7} merge p50: "
+                  f"ring={result['ring_buffer']['p50_ms']:.3f}ms "
+                  f"concat={result['concat']['p50_ms']:.3f}ms | p99: "
+                  f"ring={result['ring_buffer']['p99_ms']:.3f}ms "
+                  f"concat={result['concat']['p99_ms']:.3f}ms "
+                  f"({result['revised_ticks']} revised ticks, outputs identical)")
+
+    elif args.command == 'reads':
+        for buffer_size in args.buffer or [1000, 50_000, 250_000]:
+            result = bench_reads(buffer_size, args.ticks)
+            print(f"buffer={buffer_size:>7} median bytes/call: " + " ".join(
+                f"{key}={value / 1024:.1f}KiB" for key, value in result['bytes_per_call'].items()))
+
+    elif args.command == 'storage':
+        result = bench_storage(args.rows, args.batch)
+        for schema in ('text', 'integer'):
+            stats = result[schema]
+            print(f"{schema:>7}: write={stats['write_rows_per_s']:,.0f} rows/s "
+                  f"file={stats['file_mb']:.1f}MiB | " + " | ".join(
+                      f"{key} p50={value['p50_ms']:.2f}ms ({value['rows_per_s']:,.0f} rows/s)"
+                      for key, value in stats.items() if key.startswith('range')))
+
+    elif args.command == 'backfill':
+        result = bench_backfill(args.days, args.latency, failure_rate=args.failure_rate)
+        for workers in (1, 4):
+            stats = result[f'workers_{workers}']
+            print(f"workers={workers}: {result['windows']} windows, {result['rows']} rows in "
+                  f"{stats['elapsed_s']:.2f}s ({stats['rows_per_second']:,.0f} rows/s, "
+                  f"{stats['retries']} retries)")
+        resume = result['resume']
+        print(f"resume: first run stored {resume['first_run_windows']} windows, "
+              f"second run skipped {resume['resumed_windows']} and fetched "
+              f"{resume['refetched_windows']} (database matches source)")
+
+    elif args.command == 'quality':
+        for buffer_size in args.buffer or [1000, 50_000, 250_000]:
+            result = bench_quality(buffer_size, args.ticks, args.window)
+            print(f"buffer={buffer_size:>7} per tick p50: "
+                  f"streaming={result['streaming']['p50_ms']:.3f}ms "
+                  f"full-buffer={result['full_check']['p50_ms']:.3f}ms | detected "
+                  f"{ {k: v for k, v in result['detected'].items() if v} }")
+
+    elif args.command == 'ratelimit':
+        result = bench_ratelimit(args.hours, args.threads)
+        for source in ('alpha_vantage', 'twelve_data'):
+            stats = result[source]
+            print(f"{source:>13}: {stats['calls']} calls in {args.hours}h simulated, "
+                  f"max {stats['max_per_day']}/day (quota {stats['daily_quota']}), no window overrun")
+        print(f"    persisted: used_today={result['persisted']['used_today']} "
+              f"tokens={result['persisted']['tokens']:.2f} after restart (saved on shutdown)")
+        threads = result['threads']
+        print(f"      threads: {threads['threads']} threads granted {threads['granted']} "
+              f"(allowed {threads['allowed']:.0f}), acquire p50={threads['acquire_us']:.1f}us")
+
+    elif args.command == 'delta':
+        for window in args.window or [100, 2880]:
+            result = bench_delta(args.minutes, window, tls=args.tls)
+            for mode in ('fixed_unpooled', 'fixed_pooled', 'delta_pooled'):
+                stats = result[mode]
+                print(f"window={window:>5} {mode:>14}: {stats['bytes_per_poll'] / 1024:7.1f}KiB "
+                      f"parse={stats['parse_ms_per_poll']:.2f}ms rows={stats['rows_per_poll']:.0f} "
+                      f"poll p50={stats['poll']['p50_ms']:.1f}ms "
+                      f"connections={stats['connections']}")
+
+    elif args.command == 'pipeline':
+        fixture = load_fixture(args.fixture) if args.fixture else None
+        results = []
+        for buffer_size in args.buffer or [500, 10_000, 100_000, 1_000_000]:
+            result = bench_pipeline(buffer_size, args.ticks, args.window, fixture)
+            results.append(result)
+            print(f"buffer={buffer_size:>8} ({result['candles_per_second']:,.0f} candles/s, "
+                  f"preload {result['preload_s']:.1f}s)")
+            for stage, stats in result['stages'].items():
+                print(f"    {stage:>24}: p50={stats['p50_ms']:8.3f}ms "
+                      f"p99={stats['p99_ms']:8.3f}ms ({stats['per_second']:,.0f}/s)")
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump({'meta': run_metadata(), 'fixture': args.fixture,
+                           'results': results}, f, indent=2)
+            print(f"Results written to {args.output}")
+
+    elif args.command == 'metrics':
+        result = bench_metrics(args.buffer, args.ticks)
+        print(f"observe={result['observe_ns']:.0f}ns (disabled {result['observe_disabled_ns']:.0f}ns) "
+              f"timer={result['timer_ns']:.0f}ns (disabled {result['timer_disabled_ns']:.0f}ns) per call")
+        print(f"tick p50: instrumented={result['enabled']['p50_ms']:.3f}ms "
+              f"plain={result['disabled']['p50_ms']:.3f}ms "
+              f"(overhead {result['overhead_pct']:+.1f}%)")
+        print(f"export: {result['exported_series']} series, "
+              f"file written in {result['write_file_ms']:.2f}ms")
+        for stage, stats in result['stage_report'].items():
+            print(f"    {stage:>12}: mean={stats['mean'] * 1e3:.3f}ms p99<={stats['p99'] * 1e3:g}ms")
+
+    elif args.command == 'startup':
+        for buffer_size in args.buffer or [10_000, 250_000]:
+            result = bench_startup(buffer_size, args.runs)
+            print(f"buffer={buffer_size:>7} snapshot={result['snapshot_kib']:.0f}KiB "
+                  f"(warm and cold restores identical)")
+            for mode in ('cold', 'warm'):
+                print(f"    {mode}: import={result[f'{mode}_import_ms']:.0f}ms "
+                      f"init={result[f'{mode}_init_ms']:.1f}ms "
+                      f"restore={result[f'{mode}_restore_ms']:.1f}ms "
+                      f"first candle={result[f'{mode}_first_candle_ms']:.0f}ms "
+                      f"(providers loaded: {result[f'{mode}_loaded'] or 'none'})")
+
+    elif args.command == 'events':
+        result = bench_events(args.ticks)
+        print(f"tick p50: no subscribers={result['tick_without_subscribers']['p50_ms']:.3f}ms "
+              f"with subscribers={result['tick_with_subscribers']['p50_ms']:.3f}ms")
+        print(f"events: {result['kinds']} (in order for every subscriber)")
+        for name in ('callback', 'async', 'ipc'):
+            stats = result[name]
+            print(f"{name:>9}: {stats['events']} events, publish-to-delivery "
+                  f"p50={stats['p50_ms']:.3f}ms p99={stats['p99_ms']:.3f}ms")
+        slow = result['slow_queue']
+        print(f"     slow: {slow['delivered']} delivered, {slow['dropped']} dropped "
+              f"(queue of 10, ingest not blocked)")
+
+    elif args.command == 'history':
+        result = bench_history(args.days)
+        print(f"{result['rows']} 1M candles in {result['arrow']['partitions']} day files "
+              f"({result['arrow']['file_mb']:.1f}MB, SQLite {result['sqlite']['file_mb']:.1f}MB)")
+        for name in ('arrow', 'sqlite'):
+            stats = result[name]
+            print(f"{name:>6}: write {stats['write_rows_per_s']:,.0f} rows/s, "
+                  f"full scan {stats['full_scan_ms']:.1f}ms, "
+                  f"7-day range p50={stats['range 7 days']['p50_ms']:.2f}ms, "
+                  f"1H {stats['aggregate 1h ms']:.1f}ms, D {stats['aggregate 1D ms']:.1f}ms")
+        print(f"7-day range reads {result['arrow']['partitions_per_week']:.1f} partitions "
+              f"(results identical to SQLite)")
+
+    elif args.command == 'tiers':
+        result = bench_tiers(args.days, args.cache_mb)
+        print(f"{result['rows']} 1M candles, 500 in memory")
+        for name in ('D x200', '1H x30d', '15M x60d', '1M x3d'):
+            stats = result[name]
+            print(f"{name:>9}: {stats['bars']:>5} bars, first {stats['first_ms']:.1f}ms, "
+                  f"cached p50={stats['p50_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms")
+        cache = result['cache']
+        print(f"cold cache: {cache['segments']} segments, {cache['bytes'] / 2 ** 20:.1f}MB "
+              f"(limit {cache['limit'] / 2 ** 20:.0f}MB), {cache['hits']} hits, "
+              f"{cache['misses']} misses, {cache['evictions']} evictions")
+
+    elif args.command == 'replay':
+        result = bench_replay(args.days, args.minutes)
+        for mode in ('live', 'step 1', 'step 1440'):
+            stats = result[mode]
+            print(f"{mode:>9}: {args.minutes} candles in {stats['seconds']:.2f}s "
+                  f"({stats['candles_per_s']:,.0f}/s), {stats['bars_closed']} bar_closed events")
+        print("replayed timeframes and events identical to live ingestion")
+        year = result['year']
+        print(f"     year: {year['candles']} candles in {year['wall_seconds']:.2f}s "
+              f"({year['candles_per_second']:,.0f}/s, {year['polls']} polls, no subscribers)")
+        paced = result['paced']
+        print(f"    paced: {paced['sim_seconds'] / 60:.0f} simulated minutes in "
+              f"{paced['wall_seconds']:.2f}s ({paced['achieved']:.0f}x real time, "
+              f"asked {paced['speed']:.0f}x)")
+
+    elif args.command == 'indicators':
+        result = bench_indicators(args.days, args.ticks)
+        for freq in ('15min', '1h'):
+            stats = result[freq]
+            print(f"{freq:>5}: {stats['bars']} bars, backfill {stats['backfill_bars_per_s']:,.0f} bars/s, "
+                  f"bar by bar {stats['fold_bars_per_s']:,.0f} bars/s, "
+                  f"reference {stats['reference_bars_per_s']:,.0f} bars/s, "
+                  f"max rel diff {stats['max_rel_diff']:.1e}")
+        live = result['live']
+        print(f" live: {live['ticks']} ticks with a revision and a restart, "
+              f"max rel diff {live['max_rel_diff']:.1e} on every timeframe")
+        print(f"       indicator update p50={live['indicator_update']['p50_ms']:.3f}ms "
+              f"p99={live['indicator_update']['p99_ms']:.3f}ms per tick (7 timeframes x 6, "
+              f"ingest tick p50={live['tick']['p50_ms']:.2f}ms)")
+        print(f"       vs pandas recompute of one timeframe's frame "
+              f"p50={live['pandas_recompute_15m']['p50_ms']:.3f}ms; "
+              f"cold backfill of all timeframes {live['cold_backfill_ms']:.1f}ms")
+
+    elif args.command == 'shared':
+        result = bench_shared(args.readers, args.ticks, args.interval)
+        print(f"{result['readers']} readers, {result['ticks']} ticks every {result['interval_ms']:.0f}ms")
+        for mode, label in (('shared', 'shared bus'), ('own_aggregator', 'own aggregator')):
+            stats = result[mode]
+            print(f"{label:>15}: tick-to-read p50={stats['latency']['p50_ms']:.2f}ms "
+                  f"p99={stats['latency']['p99_ms']:.2f}ms, "
+                  f"update+read p50={stats['read']['p50_ms']:.3f}ms, "
+                  f"reader CPU {stats['reader_cpu_ms_per_tick']:.2f}ms/tick, "
+                  f"{stats['updates']} updates seen, {stats['provider_calls']} reader provider calls")
+        shared = result['shared']
+        print(f"     bus writer: CPU {shared['writer_cpu_ms_per_tick']:.2f}ms/tick "
+              f"(bus publish mean {shared['publish'].get('mean', 0) * 1e3:.2f}ms), "
+              f"{shared['bus']['bytes'] / 2 ** 20:.1f}MiB block, {shared['bus']['rewrites']} rewrites, "
+              f"{shared['invalid_views']} views re-read after a rewrite, "
+              f"{shared['seqlock_retries']} seqlock retries; every read matched the writer")
+
+    elif args.command == 'schedule':
+        result = bench_schedule(args.hours)
+        print(f"{result['hours']}h simulated from Friday noon, {result['candles']} candles, "
+              f"publication delay p50 {result['delay_p50_s']:.1f}s, "
+              f"rate limit {result['rate_per_minute']} calls/min")
+        for policy in SCHEDULE_POLICIES:
+            stats = result[policy]
+            print(f"{policy:>15}: close-to-merged p50={stats['latency_p50_s']:.1f}s "
+                  f"p99={stats['latency_p99_s']:.1f}s max={stats['latency_max_s']:.1f}s, "
+                  f"in session {stats['session_calls']} calls ({stats['session_empty_polls']} empty); "
+                  f"{stats['polls']} polls in total ({stats['weekend_polls']} over the weekend), "
+                  f"{stats['provider_calls']} provider calls")
+            if stats['deferred'] is not None:
+                print(f"{'':>15}  learned publication delay {stats['measured_delay_s']:.1f}s, "
+                      f"{stats['deferred']} late candles left for the next close")
+
+    elif args.command == 'health':
+        result = bench_health(args.ticks)
+        start, end = result['outage']
+        print(f"{result['ticks']} polls, alpha_vantage down for polls {start}-{end}")
+        for policy in ('static', 'health'):
+            stats = result[policy]
+            recovered = stats['recovered_after_ticks']
+            print(f"{policy:>7}: {stats['polls_with_new_candle']} polls with a new candle, "
+                  f"fetch p50={stats['fetch']['p50_ms']:.1f}ms p99={stats['fetch']['p99_ms']:.1f}ms, "
+                  f"calls {stats['calls']}, wins {stats['wins']}")
+            print(f"         {stats['outage_calls']} calls into the outage, alpha_vantage back "
+                  + (f"{recovered} polls after it recovered" if recovered is not None else "never"))
+        health = result['health']
+        for source, report in health['health'].items():
+            print(f"  {source:>13}: {report['state']}, latency {report['latency'] or 0:.3f}s, "
+                  f"errors {report['error_rate']:.0%}, age {report['age'] or 0:.0f}s, "
+                  f"expected {report['expected_seconds']:.2f}s")
+        print(f"health state restored after restart: {health['restored']}")
+
+    elif args.command == 'bulk':
+        for rows in args.rows or [1_000_000, 2_000_000]:
+            result = bench_bulk(rows, args.repeats, args.float_volume,
+                                whole_float_volume=args.whole_float_volume)
+            print(f"{rows:>9} 1M candles: bulk p50={result['bulk']['p50_ms']:.1f}ms, "
+                  f"resample p50={result['resample']['p50_ms']:.1f}ms "
+                  f"({result['speedup']:.1f}x), aggregator rebuild "
+                  f"{result['aggregator_rebuild_ms']:.1f}ms (all timeframes identical)")
+
+    elif args.command == 'cache':
+        result = bench_cache(args.days, args.symbols, args.clients)
+        for run in ('cold', 'warm'):
+            stats = result[run]
+            print(f"{run} bootstrap ({result['days']} days x {result['symbols']} symbols): "
+                  f"{stats['provider_requests']} provider requests, {stats['elapsed_s']:.2f}s, "
+                  f"hit rate {stats['hit_rate']:.0%}, {stats['credits_saved']} credits saved, "
+                  f"cache {stats['cache_bytes'] / 2 ** 20:.1f}MiB")
+        print(f"live edge polls at +0s, +20s, +80s: provider requests {result['live_requests']}")
+        coalescing = result['coalescing']
+        print(f"{coalescing['clients']} identical concurrent requests: "
+              f"{coalescing['provider_calls']} provider call, {coalescing['coalesced']} coalesced, "
+              f"{coalescing['credits_saved']} credits saved in {coalescing['elapsed_s']:.2f}s")
+
+    elif args.command == 'compare':
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        print(f"baseline {baseline['meta'].get('commit')} vs current {current['meta'].get('commit')}")
+        rows = compare_results(baseline, current, args.threshold)
+        for row in rows:
+            flag = '  REGRESSION' if row['regression'] else ''
+            print(f"buffer={row['buffer_size']:>8} {row['stage']:>24}: "
+                  f"{row['baseline_ms']:8.3f}ms -> {row['current_ms']:8.3f}ms "
+                  f"(x{row['ratio']:.2f}){flag}")
+        if any(row['regression'] for row in rows):
+            return 1
+
+    elif args.command == 'record':
+        database = CandleDatabase(args.db, [args.table])
+        rows = database.query_range(args.table)
+        database.close()
+        candles = pd.DataFrame({col: rows[col] for col in ['open', 'high', 'low', 'close', 'volume']},
+                               index=pd.DatetimeIndex(rows['timestamp'], name='timestamp'))
+        candles.to_csv(args.output)
+        print(f"{len(candles)} candles written to {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
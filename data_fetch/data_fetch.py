@@ -13,16 +13,30 @@ Data Sources (in priority order):
 3. Twelve Data (tertiary) - Comprehensive financial data API
 
 Features:
-- Multi-source failover for reliability
+- Multi-source failover for reliability, ordered by measured provider health
+- Circuit breakers with half-open probes, so a failing provider is retried later
+- Delta fetching from the last stored candle over pooled HTTP sessions
+- Multiple FX pairs per process (FOREX_SYMBOLS) with batched downloads
 - Real-time and historical EUR/JPY data
-- Multi-timeframe aggregation (15M, 30M, 1H, 2H, 4H, Daily, Weekly)
-- Data validation and quality checks
+- Multi-timeframe aggregation (15M, 30M, 1H, 2H, 4H, Daily, Weekly), rebuilt in one vectorized pass
+- EMA/ATR/RSI/rolling high-low per timeframe, updated in O(1) per closed bar
+- Array-backed 1M ring buffer holding months of minute bars
+- Resumable, parallel historical backfill into SQLite
+- Streaming data-quality checks with quarantine of bad candles
 - SQLite persistence and crash recovery
-- Rate limit handling for free APIs
-- Paper trading simulation preparation
+- Token-bucket rate limits and daily quotas per provider, kept across restarts
+- On-disk provider response cache (closed windows kept, live edge until the next close) with request coalescing
+- Polls aligned to candle closes plus measured provider delays, idle over the weekend
+- Per-stage latency histograms exported in Prometheus text format
+- Fast startup: providers imported on first use, warm restart from a snapshot
+- Candle/bar-close/revision event subscriptions, in-process or over a local socket
+- Shared-memory candle bus: strategy processes read one aggregator's bars zero-copy
+- Multi-year 1M history in day-partitioned Arrow files (optional, needs pyarrow)
+- get_range() stitching on-disk history to the in-memory buffers, with an LRU segment cache
+- Historical replay through the live ingest path on a simulated clock (paper trading, backtests)
 
 Requirements:
-pip install yfinance alpha-vantage pandas numpy python-dotenv requests
+pip install yfinance pandas numpy python-dotenv requests
 
 Setup:
 1. Get free API key from Alpha Vantage: https://www.alphavantage.co/support/#api-key
@@ -35,19 +49,36 @@ import os
 import sys
 import time
 import pickle
-import sqlite3
 import logging
+import threading
 from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional, Tuple, Any
 import traceback
 
 import pandas as pd
 import numpy as np
-import yfinance as yf
-import requests
-from alpha_vantage.foreignexchange import ForeignExchange
 from dotenv import load_dotenv
 
+from aggregation import TIMEFRAMES, IncrementalAggregator, aggregate_timeframes, resample_ohlcv
+from backfill import BackfillEngine
+from events import EventBus, EventServer, bar_events
+from fetching import ProviderFetcher
+from health import CIRCUIT_STATES, HealthMonitor
+from history import HistoryStore, columns_frame, history_available
+from indicators import IndicatorSet
+from journal import CandleJournal
+from metrics import LAG_BUCKETS, SIZE_BUCKETS, MetricsRegistry
+from quality import CandleValidator, invalid_ohlc
+from ratelimit import RateLimiter
+from replay import ReplayEngine
+from respcache import ProviderCall, ResponseCache
+from scheduler import PollScheduler
+from ringbuffer import CandleRingBuffer, select_rows
+from sharedbus import SharedCandleBus
+from snapshot import load_snapshot, remove_snapshot, write_snapshot
+from storage import CandleDatabase
+from tiered import TieredStore
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -64,45 +95,60 @@ class MultiSourceForexAggregator:
     """
     Multi-source forex data aggregator with failover capabilities.
 
-    Uses multiple free data providers to ensure reliable EUR/JPY data access
-    for strategy development and testing.
+    Uses multiple free data providers to ensure reliable forex data access
+    for strategy development and testing. Several FX pairs can be tracked
+    by one instance; they share provider requests (batched where the API
+    allows it), rate limits and the database connection, while buffers,
+    timeframes and journals are kept per symbol.
     """
 
-    def __init__(self):
-        """Initialize aggregator with multiple data sources."""
+    def __init__(self, symbols: Optional[List[str]] = None):
+        """
+        Initialize aggregator with multiple data sources.
+
+        Args:
+            symbols: FX pairs as 'BASE/QUOTE'; defaults to the comma-separated
+                FOREX_SYMBOLS environment variable, else EUR/JPY. The first
+                pair is the primary symbol behind candles_1m/timeframes.
+        """
         load_dotenv()
 
         # API credentials (optional for some sources)
         self.alpha_vantage_key = os.getenv('ALPHA_VANTAGE_API_KEY')
         self.twelve_data_key = os.getenv('TWELVE_DATA_API_KEY')
 
-        # Initialize Alpha Vantage client if key available
-        self.av_client = None
-        if self.alpha_vantage_key:
-            self.av_client = ForeignExchange(
-                key=self.alpha_vantage_key, output_format="pandas")
-
-        # Data storage
-        self.candles_1m = pd.DataFrame()
-        self.timeframes = {}
+        # One pooled keep-alive HTTP session for the REST providers, created
+        # on first use (yfinance keeps its own shared session). Polls reuse
+        # the connection and skip the TLS handshake a fresh one costs.
+        self._http = None
+        self.HTTP_TIMEOUT = 30
+        self.ALPHA_VANTAGE_URL = "https://www.alphavantage.co/query"
+        self.TWELVE_DATA_URL = "https://api.twelvedata.com/time_series"
 
         # Configuration
-        self.SYMBOL_YAHOO = 'EURJPY=X'  # Yahoo Finance symbol
-        self.SYMBOL_ALPHA = ('EUR', 'JPY')  # Alpha Vantage format
-        self.SYMBOL_TWELVE = 'EUR/JPY'  # Twelve Data format
-
-        self.TIMEFRAMES = {
-            '15M': '15min',
-            '30M': '30min',
-            '1H': '1h',
-            '2H': '2h',
-            '4H': '4h',
-            'D': '1D',
-            'W': '1W'
-        }
+        if symbols is None:
+            symbols = [pair.strip() for pair in
+                       os.getenv('FOREX_SYMBOLS', 'EUR/JPY').split(',') if pair.strip()]
+        self.SYMBOLS = {}
+        for pair in symbols:
+            base, quote = pair.upper().split('/')
+            self.SYMBOLS[base + quote] = {
+                'yahoo': f"{base}{quote}=X",  # Yahoo Finance symbol
+                'alpha': (base, quote),  # Alpha Vantage format
+                'twelve': f"{base}/{quote}"  # Twelve Data format
+            }
+        self.symbols = list(self.SYMBOLS)
+        self.primary_symbol = self.symbols[0]
+
+        primary = self.SYMBOLS[self.primary_symbol]
+        self.SYMBOL_YAHOO = primary['yahoo']
+        self.SYMBOL_ALPHA = primary['alpha']
+        self.SYMBOL_TWELVE = primary['twelve']
+
+        self.TIMEFRAMES = dict(TIMEFRAMES)
 
         self.BUFFER_SIZES = {
-            '1M': 500,
+            '1M': 250_000,  # ~6 months of FX minutes; appends are O(new candles)
             '15M': 100,
             '30M': 100,
             '1H': 100,
@@ -112,470 +158,1569 @@ class MultiSourceForexAggregator:
             'W': 100
         }
 
-        # Rate limiting
-        self.last_api_call = {}
-        self.API_DELAYS = {
-            'yfinance': 1,      # 1 second between calls
-            'alpha_vantage': 12,  # 5 calls per minute = 12 second delay
-            'twelve_data': 8     # 8 calls per minute = 7.5 second delay
+        # Data storage, per symbol: 1M candles in preallocated ring buffers
+        self.buffers = {
+            symbol: CandleRingBuffer(self.BUFFER_SIZES['1M'])
+            for symbol in self.symbols
+        }
+        self.symbol_timeframes = {symbol: {} for symbol in self.symbols}
+
+        # Incremental timeframe aggregation (folds only new 1M candles)
+        self.aggregators = {
+            symbol: IncrementalAggregator(self.TIMEFRAMES, self.BUFFER_SIZES)
+            for symbol in self.symbols
+        }
+
+        # Streaming data-quality checks on newly arrived candles
+        self.QUALITY_CHECKS = {
+            'gap_tolerance': 5,     # missing session minutes before a gap is counted
+            'stale_run': 15,        # flat, unchanged minutes before prices count as stale
+            'spike_window': 120,    # returns in the rolling z-score
+            'spike_zscore': 10.0
+        }
+        self.validators = {
+            symbol: CandleValidator(**self.QUALITY_CHECKS)
+            for symbol in self.symbols
         }
 
+        # Indicators per timeframe ('<ema|atr|rsi|high|low>_<period>'),
+        # folded as bars close; a cold start or gap backfills them from
+        # INDICATOR_WARMUP stored bars
+        self.INDICATORS = {
+            tf_name: ['ema_20', 'ema_50', 'atr_14', 'rsi_14', 'high_20', 'low_20']
+            for tf_name in self.TIMEFRAMES
+        }
+        self.INDICATOR_WARMUP = 1000
+        self.indicators = {
+            symbol: {tf_name: IndicatorSet(names, self.BUFFER_SIZES.get(tf_name, 100))
+                     for tf_name, names in self.INDICATORS.items()}
+            for symbol in self.symbols
+        }
+
+        # Rate limiting: token buckets per provider (rate in calls/second,
+        # burst calls back to back, daily quota per UTC day)
+        self.RATE_LIMITS = {
+            'yfinance': {'rate': 1.0, 'burst': 5, 'daily': None},
+            'alpha_vantage': {'rate': 5 / 60, 'burst': 5, 'daily': 25},   # free tier
+            'twelve_data': {'rate': 8 / 60, 'burst': 8, 'daily': 800}     # credits
+        }
+        self.RATE_LIMIT_FILE = 'forex_rate_limits.json'
+        self.rate_limiter = RateLimiter(self.RATE_LIMITS, self.RATE_LIMIT_FILE)
+
+        # Provider fetching: 'sequential' (failover only), 'concurrent'
+        # (all eligible providers at once) or 'hedged' (fire the next
+        # provider after HEDGE_DELAY seconds without an answer)
+        self.FETCH_MODE = 'hedged'
+        self.HEDGE_DELAY = 3.0
+        self.FETCH_TIMEOUT = 120.0
+        self.fetcher = ProviderFetcher()
+
+        # Delta fetching: request only candles from shortly before the
+        # last stored minute (the overlap picks up revised candles)
+        self.DELTA_FETCH = True
+        self.DELTA_OVERLAP = pd.Timedelta(minutes=5)
+
+        # Latest 1M request per provider, in priority order. Each call
+        # returns a dict of symbol -> candles for all tracked symbols.
+        # Alpha Vantage has no start parameter; compact is its smallest window.
+        # Provider client libraries are imported on the first call, so
+        # providers left out of FOREX_PROVIDERS are never loaded.
+        self.providers = {
+            'yfinance': lambda cancel: self.fetch_yfinance_batch(
+                self.symbols, period="2d", interval="1m", cancel=cancel,
+                start=self._delta_start(self.symbols)),
+            'alpha_vantage': lambda cancel: self.fetch_alpha_vantage_batch(
+                self.symbols, interval="1min", outputsize="compact", cancel=cancel),
+            'twelve_data': lambda cancel: self.fetch_twelve_batch(
+                self.symbols, interval="1min", outputsize=100, cancel=cancel,
+                start=self._delta_start(self.symbols))
+        }
+        enabled = os.getenv('FOREX_PROVIDERS')
+        if enabled:
+            enabled = [name.strip() for name in enabled.split(',')]
+            self.providers = {name: call for name, call in self.providers.items() if name in enabled}
+        self.last_fetch_stats = {}
+
+        # Wall clock in epoch seconds; replay substitutes a simulated one
+        self.clock = time.time
+
+        # Poll scheduling: each minute's close plus the provider's learned
+        # publication delay, one call per close (see PollScheduler)
+        self.POLL_SCHEDULE = {
+            'publication_delay': 5.0,  # seconds, until delays are learned
+            'retry_base': 4.0,
+            'retry_max': 15.0,
+            'max_retries': 0,          # per candle; > 0 spends quota on retries for latency
+            'jitter': 0.25,
+            'quantile': 0.97,          # of first polls that should find their candle
+            'step': 1.0,
+            'stale_after': 300.0       # empty polls count as failures after this
+        }
+        self.scheduler = PollScheduler(clock=lambda: self.clock(), **self.POLL_SCHEDULE)
+
+        # Payload bytes, parse time and rows per provider call
+        self.transfer_stats = {}
+        self.transfer_lock = threading.Lock()
+
+        # Per-stage metrics in Prometheus text format, served on
+        # METRICS_PORT (None = off) and rewritten to METRICS_FILE every tick
+        self.METRICS_PORT = int(os.getenv('FOREX_METRICS_PORT', '0')) or None
+        self.METRICS_FILE = 'forex_metrics.prom'
+        self.metrics = MetricsRegistry()
+        self._init_metrics()
+
+        # Candle events ('candle', 'bar_closed', 'bar_revised') for
+        # subscribers; EVENT_SOCKET also streams them to local processes
+        self.events = EventBus()
+        self.EVENT_SOCKET = os.getenv('FOREX_EVENT_SOCKET')
+        self.event_server: Optional[EventServer] = None
+
+        # Shared-memory candle bus (see sharedbus.SharedCandleReader) under
+        # the SHARED_BUS block name; revisions since the last publish are
+        # tracked per timeframe so only changed rows are rewritten
+        self.SHARED_BUS = os.getenv('FOREX_SHARED_BUS')
+        self.shared_bus: Optional[SharedCandleBus] = None
+        self._shared_since: Dict[str, Dict[str, pd.Timestamp]] = {
+            symbol: {} for symbol in self.symbols}
+
+        # Historical backfill: date-range 1M requests per provider, split
+        # into windows the provider accepts (Alpha Vantage has no range API)
+        self.backfill_providers = {
+            'yfinance': self.fetch_yfinance_range,
+            'twelve_data': self.fetch_twelve_range
+        }
+        self.BACKFILL_WINDOWS = {
+            'yfinance': pd.Timedelta(days=7),     # 1m requests span at most 7 days
+            'twelve_data': pd.Timedelta(days=3)   # 5000 points per request
+        }
+        self.BACKFILL_LOOKBACK = {
+            'yfinance': pd.Timedelta(days=30)     # 1m history is only kept 30 days
+        }
+        self.BACKFILL_WORKERS = 4
+        self.BACKFILL_CHECKPOINT_FILE = 'forex_backfill_{symbol}.json'
+
         # State files
-        self.STATE_FILE = 'forex_aggregator_state.pkl'
+        self.STATE_FILE = 'forex_aggregator_state.pkl'  # legacy pickle snapshot
+        self.JOURNAL_FILE = 'forex_aggregator_{symbol}.journal'
+        self.CHECKPOINT_FILE = 'forex_aggregator_{symbol}.checkpoint'
         self.DB_FILE = 'eurjpy_data.db'
+        self.SNAPSHOT_FILE = 'forex_aggregator.snapshot'  # warm-restart cache
+        self.HISTORY_DIR = 'history'  # columnar 1M history, one directory per symbol
+
+        # Crash recovery: 'always', 'interval' or 'never' fsync per append
+        self.JOURNAL_FSYNC = 'always'
+        self.CHECKPOINT_EVERY = 1000  # journaled candles between checkpoints
+        self.journals = {
+            symbol: CandleJournal(
+                self.JOURNAL_FILE.format(symbol=symbol),
+                self.CHECKPOINT_FILE.format(symbol=symbol),
+                fsync=self.JOURNAL_FSYNC, checkpoint_every=self.CHECKPOINT_EVERY)
+            for symbol in self.symbols
+        }
 
         # Current data source tracking
         self.current_source = None
-        self.source_failures = {'yfinance': 0,
-                                'alpha_vantage': 0, 'twelve_data': 0}
 
+        # Provider health: latency, error-rate and freshness averages order
+        # the providers; circuit breakers skip failing ones until a timed
+        # half-open probe succeeds. Kept across restarts in HEALTH_FILE.
+        self.HEALTH_FILE = 'forex_provider_health.json'
+        self.CIRCUIT_BREAKER = {
+            'failure_threshold': 3,  # consecutive failures (errors, empty answers)
+            'cooldown': 60.0,        # seconds before the first probe
+            'max_cooldown': 900.0    # doubled after each failed probe up to this
+        }
+        self.health = HealthMonitor(self.providers, self.HEALTH_FILE,
+                                    clock=lambda: self.clock(), **self.CIRCUIT_BREAKER)
+
+        # Provider response cache: closed request windows are kept on disk
+        # for good, live-edge answers until the next candle closes (at most
+        # live_ttl seconds); identical requests in flight are coalesced
+        self.RESPONSE_CACHE_DIR = 'response_cache'
+        self.RESPONSE_CACHE = {
+            'max_bytes': 256 * 2 ** 20,  # LRU bound of the directory
+            'live_ttl': 30.0,            # seconds a live-edge answer is reused
+            'settle': 900.0              # seconds after which a window counts as closed
+        }
+        self.response_cache = ResponseCache(self.RESPONSE_CACHE_DIR, clock=lambda: self.clock(),
+                                            **self.RESPONSE_CACHE)
+
+        self.history = HistoryStore(self.HISTORY_DIR) if history_available() else None
+        if self.history is None:
+            logger.info("pyarrow not installed, columnar 1M history disabled")
+
+        # get_range(): buffers are the hot tier, history (or SQLite) the cold one
+        self.COLD_CACHE_BYTES = 64 * 2 ** 20  # LRU bound of cached cold segments
+        self.tiers = TieredStore(self._hot_bars, self._cold_bars, self.COLD_CACHE_BYTES)
+
+        # A current snapshot also lets the database skip its schema pass
+        self._snapshot = load_snapshot(self.SNAPSHOT_FILE)
         self._init_database()
-        logger.info("Multi-source forex aggregator initialized")
+        logger.info(f"Multi-source forex aggregator initialized for {', '.join(self.symbols)}")
+
+    # Single-symbol views onto the primary symbol's state
+    @property
+    def candles_1m(self) -> pd.DataFrame:
+        return self.buffers[self.primary_symbol].frame()
+
+    @candles_1m.setter
+    def candles_1m(self, value: pd.DataFrame) -> None:
+        self.buffers[self.primary_symbol].load(value)
+
+    @property
+    def timeframes(self) -> Dict[str, pd.DataFrame]:
+        return self.symbol_timeframes[self.primary_symbol]
+
+    @timeframes.setter
+    def timeframes(self, value: Dict[str, pd.DataFrame]) -> None:
+        self.symbol_timeframes[self.primary_symbol] = value
+
+    @property
+    def aggregator(self) -> IncrementalAggregator:
+        return self.aggregators[self.primary_symbol]
+
+    @property
+    def journal(self) -> CandleJournal:
+        return self.journals[self.primary_symbol]
+
+    def table_name(self, symbol: str, timeframe: str) -> str:
+        """SQLite table holding one symbol's candles for one timeframe."""
+        return f"{symbol}_{timeframe}"
 
     def _init_database(self) -> None:
         """Initialize SQLite database for data storage."""
         try:
-            conn = sqlite3.connect(self.DB_FILE)
-            cursor = conn.cursor()
-
-            # Create tables for each timeframe
-            for tf in ['1M'] + list(self.TIMEFRAMES.keys()):
-                table_name = f"EURJPY_{tf}"
-                cursor.execute(f"""
-                    CREATE TABLE IF NOT EXISTS {table_name} (
-                        timestamp TEXT PRIMARY KEY,
-                        open REAL NOT NULL,
-                        high REAL NOT NULL,
-                        low REAL NOT NULL,
-                        close REAL NOT NULL,
-                        volume INTEGER DEFAULT 0,
-                        source TEXT NOT NULL,
-                        created_at TEXT DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-
-            # Create metadata table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS metadata (
-                    key TEXT PRIMARY KEY,
-                    value TEXT,
-                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            conn.commit()
-            conn.close()
+            self.database = CandleDatabase(self.DB_FILE, [
+                self.table_name(symbol, tf)
+                for symbol in self.symbols
+                for tf in ['1M'] + list(self.TIMEFRAMES.keys())
+            ])
+            if self._snapshot is not None and self.database.restore_watermarks(
+                    self._snapshot[0]['watermarks']):
+                logger.info("Database watermarks restored from snapshot")
+                return
+            self.database.init_schema()
             logger.info("Database initialized")
 
         except Exception as e:
             logger.error(f"Database initialization failed: {e}")
             raise
 
-    def _wait_for_rate_limit(self, source: str) -> None:
-        """Enforce rate limits for API calls."""
-        if source not in self.last_api_call:
-            self.last_api_call[source] = 0
+    def _init_metrics(self) -> None:
+        """Declare the metric families recorded by the ingest loop."""
+        self.provider_latency = self.metrics.histogram(
+            'forex_provider_request_seconds', 'Provider request latency, including rate-limit waits')
+        self.provider_bytes = self.metrics.histogram(
+            'forex_provider_response_bytes', 'Provider response payload size', SIZE_BUCKETS)
+        self.provider_parse = self.metrics.histogram(
+            'forex_provider_parse_seconds', 'Time spent parsing provider responses')
+        self.provider_rows = self.metrics.counter(
+            'forex_provider_rows_total', 'Candle rows parsed from provider responses')
+        self.provider_errors = self.metrics.counter(
+            'forex_provider_errors_total', 'Failed provider requests')
+        self.stage_seconds = self.metrics.histogram(
+            'forex_stage_seconds', 'Duration of ingest stages (merge, aggregate, state, database)')
+        self.candle_lag = self.metrics.histogram(
+            'forex_candle_lag_seconds', 'Seconds from a 1M candle closing until it is merged',
+            LAG_BUCKETS)
+        self.candles_merged = self.metrics.counter(
+            'forex_candles_merged_total', '1M candles appended or revised')
+        self.provider_expected = self.metrics.gauge(
+            'forex_provider_expected_seconds', 'Expected seconds until a provider delivers a fresh candle')
+        self.provider_error_rate = self.metrics.gauge(
+            'forex_provider_error_rate', 'Moving average of failed provider calls')
+        self.provider_circuit = self.metrics.gauge(
+            'forex_provider_circuit_state', 'Provider circuit breaker (0 closed, 1 half open, 2 open)')
+        self.cache_hit_ratio = self.metrics.gauge(
+            'forex_response_cache_hit_ratio', 'Share of provider symbol requests served by the response cache')
+        self.cache_saved = self.metrics.gauge(
+            'forex_response_cache_saved_tokens', 'Rate-limit tokens (calls or credits) saved by the response cache')
+        self.cache_bytes = self.metrics.gauge(
+            'forex_response_cache_bytes', 'Size of the on-disk provider response cache')
+        self.bar_timestamp = self.metrics.gauge(
+            'forex_bar_timestamp_seconds', 'Open time of the latest available bar per timeframe')
+
+    @property
+    def http(self):
+        """Pooled requests session, imported and created on first use."""
+        if self._http is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            self._http = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            self._http.mount('https://', adapter)
+            self._http.mount('http://', adapter)
+        return self._http
+
+    @http.setter
+    def http(self, session) -> None:
+        self._http = session
+
+    def _wait_for_rate_limit(self, source: str, cancel: Optional[threading.Event] = None,
+                             tokens: int = 1) -> bool:
+        """
+        Enforce rate limits for API calls.
 
-        time_since_last = time.time() - self.last_api_call[source]
-        required_delay = self.API_DELAYS.get(source, 1)
+        Args:
+            source: Provider name
+            cancel: Set to abandon the wait
+            tokens: Calls or credits the request costs
 
-        if time_since_last < required_delay:
-            sleep_time = required_delay - time_since_last
-            logger.debug(
-                f"Rate limiting {source}: sleeping {sleep_time:.1f} seconds")
-            time.sleep(sleep_time)
+        Returns:
+            bool: False if the wait was cancelled or the daily quota is spent
+            and the call should be skipped
+        """
+        return self.rate_limiter.acquire(source, tokens, cancel)
 
-        self.last_api_call[source] = time.time()
+    def _delta_start(self, symbols: List[str]) -> Optional[pd.Timestamp]:
+        """
+        Start of the next delta request for a batch of symbols.
 
-    def fetch_yfinance_data(self, period: str = "7d", interval: str = "1m") -> pd.DataFrame:
+        Returns:
+            DELTA_OVERLAP before the oldest last stored candle, or None (fetch
+            the provider's default window) while any buffer is empty
+        """
+        if not self.DELTA_FETCH:
+            return None
+        last = [self.buffers[symbol].last_timestamp for symbol in symbols]
+        if any(ts is None for ts in last):
+            return None
+        return min(last) - self.DELTA_OVERLAP
+
+    def _record_transfer(self, source: str, nbytes: Optional[int], parse_seconds: float,
+                         rows: int) -> None:
+        """Accumulate payload size (None if unknown), parse time and rows for a call."""
+        if nbytes is not None:
+            self.provider_bytes.observe(nbytes, source=source)
+        self.provider_parse.observe(parse_seconds, source=source)
+        self.provider_rows.inc(rows, source=source)
+
+        with self.transfer_lock:
+            stats = self.transfer_stats.setdefault(
+                source, {'calls': 0, 'bytes': 0, 'parse_seconds': 0.0, 'rows': 0})
+            stats['calls'] += 1
+            stats['bytes'] += nbytes or 0
+            stats['parse_seconds'] += parse_seconds
+            stats['rows'] += rows
+            stats['last'] = {'bytes': nbytes, 'parse_ms': parse_seconds * 1e3, 'rows': rows}
+
+    def transfer_report(self) -> Dict[str, Dict[str, Any]]:
+        """Per-provider transfer totals and the last call's bytes, parse time and rows."""
+        with self.transfer_lock:
+            return {source: dict(stats) for source, stats in self.transfer_stats.items()}
+
+    def _cached_fetch(self, source: str, symbols: List[str], interval: str, window: str,
+                      call: ProviderCall, end: Optional[pd.Timestamp] = None, per_symbol: bool = False,
+                      cancel: Optional[threading.Event] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Serve a provider request through the response cache (see
+        ResponseCache.fetch) and export the cache counters.
         """
-        Fetch data from Yahoo Finance using yfinance.
+        result = self.response_cache.fetch(source, symbols, interval, window, call, end=end,
+                                           per_symbol=per_symbol, cancel=cancel)
+        stats = self.response_cache.stats()
+        counters = stats['providers'][source]
+        self.cache_hit_ratio.set(counters['hits'] / max(counters['requests'], 1), source=source)
+        self.cache_saved.set(counters['saved'], source=source)
+        self.cache_bytes.set(stats['bytes'])
+        return result
+
+    def fetch_yfinance_data(self, period: str = "7d", interval: str = "1m",
+                            cancel: Optional[threading.Event] = None) -> pd.DataFrame:
+        """
+        Fetch primary-symbol data from Yahoo Finance using yfinance.
 
         Args:
             period: Time period (1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max)
             interval: Data interval (1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 1d, 5d, 1wk, 1mo, 3mo)
+            cancel: Set by the fetcher when another provider already answered
         """
-        try:
-            self._wait_for_rate_limit('yfinance')
-            logger.info(f"Fetching Yahoo Finance data: {period}, {interval}")
+        return self.fetch_yfinance_batch(
+            [self.primary_symbol], period, interval, cancel).get(
+                self.primary_symbol, pd.DataFrame())
 
-            # Download data
-            data = yf.download(
-                tickers=self.SYMBOL_YAHOO,
-                period=period,
-                interval=interval,
-                progress=False,
-                rounding=False,  # Keep full precision
-                auto_adjust=False  # Use raw prices
-            )
+    def fetch_yfinance_batch(self, symbols: List[str], period: str = "7d", interval: str = "1m",
+                             cancel: Optional[threading.Event] = None,
+                             start: Optional[pd.Timestamp] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Fetch several symbols from Yahoo Finance in one multi-ticker download.
 
-            if data.empty:
-                logger.warning("No data returned from Yahoo Finance")
-                return pd.DataFrame()
+        Args:
+            symbols: Symbol keys (e.g. 'EURJPY')
+            period: Time period, as for fetch_yfinance_data
+            interval: Data interval, as for fetch_yfinance_data
+            cancel: Set by the fetcher when another provider already answered
+            start: Only fetch candles from this UTC time on (replaces period)
 
-            # Clean column names (remove ticker prefix if present)
-            if isinstance(data.columns, pd.MultiIndex):
-                data.columns = [col[0] for col in data.columns]
+        Returns:
+            Dict of symbol -> candles for symbols that returned data
+        """
+        try:
+            window = f"period={period}" if start is None else f"start={start}"
+            return self._cached_fetch(
+                'yfinance', symbols, interval, window,
+                lambda missing: self._download_yfinance(missing, period, interval, cancel, start),
+                cancel=cancel)
 
-            # Standardize column names
-            data.columns = [col.lower().replace(' ', '_')
-                            for col in data.columns]
-            if 'adj_close' in data.columns:
-                data = data.drop('adj_close', axis=1)
+        except Exception as e:
+            logger.error(f"Yahoo Finance fetch failed: {e}")
+            return {}
+
+    def _download_yfinance(self, symbols: List[str], period: str, interval: str,
+                           cancel: Optional[threading.Event],
+                           start: Optional[pd.Timestamp]) -> Optional[Dict[str, pd.DataFrame]]:
+        """One multi-ticker yfinance download (None if the rate limit skipped it)."""
+        if not self._wait_for_rate_limit('yfinance', cancel):
+            return None
+
+        tickers = {self.SYMBOLS[symbol]['yahoo']: symbol for symbol in symbols}
+        window = {'period': period}
+        if start is not None:
+            # Yahoo serves 1m data for at most the last 7 days per request
+            earliest = pd.Timestamp.now(tz='UTC').tz_localize(None) - pd.Timedelta(days=7)
+            window = {'start': max(start, earliest).tz_localize('UTC')}
+        logger.info(
+            f"Fetching Yahoo Finance data: {len(symbols)} symbols, "
+            f"{window.get('period') or 'from ' + str(window['start'])}, {interval}")
+
+        # Download data
+        import yfinance as yf
+        data = yf.download(
+            tickers=list(tickers),
+            interval=interval,
+            group_by='ticker',
+            progress=False,
+            rounding=False,  # Keep full precision
+            auto_adjust=False,  # Use raw prices
+            **window
+        )
+
+        if data.empty:
+            logger.warning("No data returned from Yahoo Finance")
+            return {}
+
+        # yfinance does not expose the payload size, only parse cost is recorded
+        parse_started = time.perf_counter()
+        result = self._split_yfinance(data, tickers)
+        self._record_transfer('yfinance', None, time.perf_counter() - parse_started,
+                              sum(len(df) for df in result.values()))
+        logger.info(f"Yahoo Finance: {sum(len(df) for df in result.values())} "
+                    f"candles retrieved for {len(result)} symbols")
+        return result
+
+    def fetch_yfinance_range(self, symbol: str, start: pd.Timestamp, end: pd.Timestamp,
+                             cancel: Optional[threading.Event] = None) -> pd.DataFrame:
+        """
+        Fetch 1m Yahoo Finance candles in [start, end) for the backfill engine.
 
-            # Add volume column if missing (forex doesn't have volume)
-            if 'volume' not in data.columns:
-                data['volume'] = 0
+        Yahoo serves at most 7 days of 1m data per request and nothing older
+        than 30 days (see BACKFILL_WINDOWS / BACKFILL_LOOKBACK).
 
-            # Remove timezone info for consistency
-            if data.index.tz is not None:
-                data.index = data.index.tz_convert(None)
+        Raises:
+            Exception: Provider errors propagate so the window is retried
+        """
+        ticker = self.SYMBOLS[symbol]['yahoo']
 
-            logger.info(f"Yahoo Finance: {len(data)} candles retrieved")
-            return data
+        def download(missing: List[str]) -> Optional[Dict[str, pd.DataFrame]]:
+            if not self._wait_for_rate_limit('yfinance', cancel):
+                return None
+            logger.info(f"Backfilling Yahoo Finance {ticker}: {start} -> {end}")
 
-        except Exception as e:
-            logger.error(f"Yahoo Finance fetch failed: {e}")
-            self.source_failures['yfinance'] += 1
-            return pd.DataFrame()
+            import yfinance as yf
+            data = yf.download(
+                tickers=[ticker],
+                start=start.tz_localize('UTC'),
+                end=end.tz_localize('UTC'),
+                interval='1m',
+                group_by='ticker',
+                progress=False,
+                rounding=False,
+                auto_adjust=False
+            )
+            if data.empty:
+                return {}
+            return self._split_yfinance(data, {ticker: symbol})
+
+        return self._cached_fetch('yfinance', [symbol], '1m', f"{start}/{end}", download,
+                                  end=end, cancel=cancel).get(symbol, pd.DataFrame())
 
-    def fetch_alpha_vantage_data(self, interval: str = "1min", outputsize: str = "compact") -> pd.DataFrame:
+    @classmethod
+    def _split_yfinance(cls, data: pd.DataFrame, tickers: Dict[str, str]) -> Dict[str, pd.DataFrame]:
+        """Split a (multi-ticker) yfinance download into normalized frames per symbol."""
+        result = {}
+        for ticker, symbol in tickers.items():
+            if isinstance(data.columns, pd.MultiIndex):
+                if ticker in data.columns.get_level_values(0):
+                    frame = data[ticker]
+                elif ticker in data.columns.get_level_values(1):
+                    frame = data.xs(ticker, axis=1, level=1)
+                else:
+                    continue
+            else:
+                frame = data
+
+            # Multi-ticker frames share one index; drop minutes this
+            # ticker has no quote for
+            frame = cls._normalize_yfinance(frame.dropna(how='all'))
+            if not frame.empty:
+                result[symbol] = frame
+        return result
+
+    @staticmethod
+    def _normalize_yfinance(data: pd.DataFrame) -> pd.DataFrame:
+        """Standardize a single-ticker yfinance frame to open/high/low/close/volume."""
+        data = data.copy()
+
+        # Standardize column names
+        data.columns = [col.lower().replace(' ', '_')
+                        for col in data.columns]
+        if 'adj_close' in data.columns:
+            data = data.drop('adj_close', axis=1)
+
+        # Add volume column if missing (forex doesn't have volume)
+        if 'volume' not in data.columns:
+            data['volume'] = 0
+
+        # Remove timezone info for consistency
+        if data.index.tz is not None:
+            data.index = data.index.tz_convert(None)
+
+        return data
+
+    def fetch_alpha_vantage_data(self, interval: str = "1min", outputsize: str = "compact",
+                                 cancel: Optional[threading.Event] = None,
+                                 symbol: Optional[str] = None) -> pd.DataFrame:
         """
         Fetch data from Alpha Vantage API.
 
         Args:
             interval: 1min, 5min, 15min, 30min, 60min
             outputsize: compact (last 100 data points) or full
+            cancel: Set by the fetcher when another provider already answered
+            symbol: Symbol key, defaults to the primary symbol
         """
-        if not self.av_client:
+        symbol = symbol or self.primary_symbol
+        from_symbol, to_symbol = self.SYMBOLS[symbol]['alpha']
+
+        if not self.alpha_vantage_key:
             logger.warning("Alpha Vantage API key not configured")
             return pd.DataFrame()
 
-        try:
-            self._wait_for_rate_limit('alpha_vantage')
+        def download(missing: List[str]) -> Optional[Dict[str, pd.DataFrame]]:
+            if not self._wait_for_rate_limit('alpha_vantage', cancel):
+                return None
             logger.info(
-                f"Fetching Alpha Vantage data: {interval}, {outputsize}")
+                f"Fetching Alpha Vantage data: {from_symbol}/{to_symbol}, {interval}, {outputsize}")
 
-            data, meta_data = self.av_client.get_currency_exchange_intraday(
-                from_symbol=self.SYMBOL_ALPHA[0],
-                to_symbol=self.SYMBOL_ALPHA[1],
-                interval=interval,
-                outputsize=outputsize
-            )
+            response = self.http.get(self.ALPHA_VANTAGE_URL, params={
+                'function': 'FX_INTRADAY',
+                'from_symbol': from_symbol,
+                'to_symbol': to_symbol,
+                'interval': interval,
+                'outputsize': outputsize,
+                'apikey': self.alpha_vantage_key
+            }, timeout=self.HTTP_TIMEOUT)
+            response.raise_for_status()
 
-            if data.empty:
-                logger.warning("No data returned from Alpha Vantage")
-                return pd.DataFrame()
-
-            # Rename columns to match our standard
-            column_mapping = {
-                '1. open': 'open',
-                '2. high': 'high',
-                '3. low': 'low',
-                '4. close': 'close'
-            }
+            parse_started = time.perf_counter()
+            payload = response.json()
+            series = payload.get(f"Time Series FX ({interval})")
+            if series is None:
+                # Quota notes and errors come back as 200 with a message
+                raise RuntimeError(
+                    payload.get('Error Message') or payload.get('Note') or
+                    payload.get('Information') or "unexpected response")
 
-            data = data.rename(columns=column_mapping)
-            data['volume'] = 0  # Forex doesn't have volume
+            data = self._parse_alpha_vantage_series(series)
+            self._record_transfer('alpha_vantage', len(response.content),
+                                  time.perf_counter() - parse_started, len(data))
 
-            # Sort by index (datetime)
-            data = data.sort_index()
+            if data.empty:
+                logger.warning("No data returned from Alpha Vantage")
+                return {}
 
             logger.info(f"Alpha Vantage: {len(data)} candles retrieved")
-            return data
+            return {symbol: data}
+
+        try:
+            return self._cached_fetch('alpha_vantage', [symbol], interval,
+                                      f"outputsize={outputsize}", download,
+                                      cancel=cancel).get(symbol, pd.DataFrame())
 
         except Exception as e:
             logger.error(f"Alpha Vantage fetch failed: {e}")
-            self.source_failures['alpha_vantage'] += 1
             return pd.DataFrame()
 
-    def fetch_twelve_data(self, interval: str = "1min", outputsize: int = 100) -> pd.DataFrame:
+    @staticmethod
+    def _parse_alpha_vantage_series(series: Dict[str, Dict[str, str]]) -> pd.DataFrame:
+        """Convert an Alpha Vantage 'Time Series FX' mapping to a candle frame."""
+        if not series:
+            return pd.DataFrame()
+
+        # Keys are '1. open' ... '4. close'; strip the numbering
+        data = pd.DataFrame.from_dict(series, orient='index', dtype=float)
+        data.columns = [col.split('. ', 1)[-1] for col in data.columns]
+        data.index = pd.to_datetime(data.index)
+        data.index.name = 'date'
+        data['volume'] = 0  # Forex doesn't have volume
+
+        # Sort by index (datetime)
+        return data.sort_index()
+
+    def fetch_alpha_vantage_batch(self, symbols: List[str], interval: str = "1min",
+                                  outputsize: str = "compact",
+                                  cancel: Optional[threading.Event] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Fetch several symbols from Alpha Vantage.
+
+        The FX intraday endpoint has no batch form, so this issues one
+        rate-limited request per symbol and stops early when cancelled.
+        """
+        result = {}
+        for symbol in symbols:
+            if cancel is not None and cancel.is_set():
+                break
+            data = self.fetch_alpha_vantage_data(interval, outputsize, cancel, symbol)
+            if not data.empty:
+                result[symbol] = data
+        return result
+
+    def fetch_twelve_data(self, interval: str = "1min", outputsize: int = 100,
+                          cancel: Optional[threading.Event] = None) -> pd.DataFrame:
         """
-        Fetch data from Twelve Data API.
+        Fetch primary-symbol data from Twelve Data API.
 
         Args:
             interval: 1min, 5min, 15min, 30min, 1h, 4h, 1day
             outputsize: Number of data points to retrieve
+            cancel: Set by the fetcher when another provider already answered
+        """
+        return self.fetch_twelve_batch(
+            [self.primary_symbol], interval, outputsize, cancel).get(
+                self.primary_symbol, pd.DataFrame())
+
+    def fetch_twelve_batch(self, symbols: List[str], interval: str = "1min", outputsize: int = 100,
+                           cancel: Optional[threading.Event] = None,
+                           start: Optional[pd.Timestamp] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Fetch several symbols from Twelve Data with one batch request.
+
+        Args:
+            symbols: Symbol keys (e.g. 'EURJPY')
+            interval: 1min, 5min, 15min, 30min, 1h, 4h, 1day
+            outputsize: Number of data points to retrieve per symbol
+            cancel: Set by the fetcher when another provider already answered
+            start: Only fetch candles from this UTC time on (outputsize
+                then caps the count at the 5000 maximum)
+
+        Returns:
+            Dict of symbol -> candles for symbols that returned data
         """
         if not self.twelve_data_key:
             logger.warning("Twelve Data API key not configured")
-            return pd.DataFrame()
+            return {}
 
         try:
-            self._wait_for_rate_limit('twelve_data')
-            logger.info(
-                f"Fetching Twelve Data: {interval}, {outputsize} points")
+            # Twelve Data charges one credit per symbol in a batch
+            window = f"outputsize={outputsize}" if start is None else f"start={start}"
+            return self._cached_fetch(
+                'twelve_data', symbols, interval, window,
+                lambda missing: self._download_twelve(missing, interval, outputsize, cancel, start),
+                per_symbol=True, cancel=cancel)
 
-            url = "https://api.twelvedata.com/time_series"
-            params = {
-                'symbol': self.SYMBOL_TWELVE,
-                'interval': interval,
-                'outputsize': outputsize,
-                'apikey': self.twelve_data_key
-            }
+        except Exception as e:
+            logger.error(f"Twelve Data fetch failed: {e}")
+            return {}
+
+    def _download_twelve(self, symbols: List[str], interval: str, outputsize: int,
+                         cancel: Optional[threading.Event],
+                         start: Optional[pd.Timestamp]) -> Optional[Dict[str, pd.DataFrame]]:
+        """One Twelve Data batch request (None if the rate limit skipped it)."""
+        if not self._wait_for_rate_limit('twelve_data', cancel, tokens=len(symbols)):
+            return None
+        logger.info(
+            f"Fetching Twelve Data: {len(symbols)} symbols, {interval}, {outputsize} points")
+
+        pairs = {self.SYMBOLS[symbol]['twelve']: symbol for symbol in symbols}
+
+        params = {
+            'symbol': ','.join(pairs),
+            'interval': interval,
+            'outputsize': outputsize,
+            'timezone': 'UTC',
+            'apikey': self.twelve_data_key
+        }
+        if start is not None:
+            params['start_date'] = start.strftime('%Y-%m-%d %H:%M:%S')
+            params['outputsize'] = 5000
 
-            response = requests.get(url, params=params)
-            response.raise_for_status()
+        response = self.http.get(self.TWELVE_DATA_URL, params=params,
+                                 timeout=self.HTTP_TIMEOUT)
+        response.raise_for_status()
+
+        parse_started = time.perf_counter()
+        json_data = response.json()
 
-            json_data = response.json()
+        # A single symbol returns one series, a batch is keyed by symbol
+        if len(pairs) == 1:
+            json_data = {next(iter(pairs)): json_data}
 
-            if 'values' not in json_data:
+        result = {}
+        for pair, series in json_data.items():
+            if pair not in pairs:
+                continue
+            if 'values' not in series:
                 logger.warning(
-                    f"No values in Twelve Data response: {json_data}")
-                return pd.DataFrame()
+                    f"No values in Twelve Data response for {pair}: {series}")
+                continue
+            result[pairs[pair]] = self._parse_twelve_values(series['values'])
+        self._record_transfer('twelve_data', len(response.content),
+                              time.perf_counter() - parse_started,
+                              sum(len(df) for df in result.values()))
 
-            # Convert to DataFrame
-            df = pd.DataFrame(json_data['values'])
+        logger.info(f"Twelve Data: {sum(len(df) for df in result.values())} "
+                    f"candles retrieved for {len(result)} symbols")
+        return result
 
-            # Convert datetime and set as index
-            df['datetime'] = pd.to_datetime(df['datetime'])
-            df.set_index('datetime', inplace=True)
+    def fetch_twelve_range(self, symbol: str, start: pd.Timestamp, end: pd.Timestamp,
+                           cancel: Optional[threading.Event] = None) -> pd.DataFrame:
+        """
+        Fetch 1min Twelve Data candles in [start, end) for the backfill engine.
 
-            # Convert price columns to float
-            for col in ['open', 'high', 'low', 'close']:
-                df[col] = df[col].astype(float)
+        A request returns at most 5000 points, so windows must stay below
+        5000 minutes (see BACKFILL_WINDOWS).
 
-            df['volume'] = 0  # Forex doesn't have volume
-            df = df.sort_index()
+        Raises:
+            Exception: Provider errors propagate so the window is retried
+        """
+        if not self.twelve_data_key:
+            raise RuntimeError("Twelve Data API key not configured")
+        pair = self.SYMBOLS[symbol]['twelve']
+
+        def download(missing: List[str]) -> Optional[Dict[str, pd.DataFrame]]:
+            if not self._wait_for_rate_limit('twelve_data', cancel):
+                return None
+            logger.info(f"Backfilling Twelve Data {pair}: {start} -> {end}")
+
+            response = self.http.get(self.TWELVE_DATA_URL, timeout=self.HTTP_TIMEOUT, params={
+                'symbol': pair,
+                'interval': '1min',
+                'start_date': start.strftime('%Y-%m-%d %H:%M:%S'),
+                'end_date': end.strftime('%Y-%m-%d %H:%M:%S'),
+                'outputsize': 5000,
+                'timezone': 'UTC',
+                'apikey': self.twelve_data_key
+            })
+            response.raise_for_status()
+            series = response.json()
+
+            if 'values' not in series:
+                # Twelve Data reports "no data for this range" as an error payload
+                if series.get('code') == 400 and 'No data' in series.get('message', ''):
+                    return {}
+                raise RuntimeError(f"Twelve Data error for {pair}: {series}")
+            candles = self._parse_twelve_values(series['values'])
+            return {symbol: candles[candles.index < end]}
+
+        return self._cached_fetch('twelve_data', [symbol], '1min', f"{start}/{end}", download,
+                                  end=end, cancel=cancel).get(symbol, pd.DataFrame())
+
+    @staticmethod
+    def _parse_twelve_values(values: List[Dict[str, Any]]) -> pd.DataFrame:
+        """Convert a Twelve Data 'values' list to a candle frame."""
+        if not values:
+            return pd.DataFrame()
 
-            logger.info(f"Twelve Data: {len(df)} candles retrieved")
-            return df
+        # Build columns straight from the string fields: the per-call cost
+        # then scales with the rows returned, not with DataFrame setup
+        index = pd.DatetimeIndex(
+            np.array([v['datetime'] for v in values], dtype='datetime64[us]'), name='datetime')
+        df = pd.DataFrame({
+            col: np.array([v[col] for v in values], dtype=np.float64)
+            for col in ['open', 'high', 'low', 'close']
+        }, index=index)
 
-        except Exception as e:
-            logger.error(f"Twelve Data fetch failed: {e}")
-            self.source_failures['twelve_data'] += 1
-            return pd.DataFrame()
+        df['volume'] = 0  # Forex doesn't have volume
+        if index.is_monotonic_decreasing:
+            return df.iloc[::-1]  # newest first
+        return df.sort_index()
 
     def fetch_latest_data(self) -> bool:
         """
         Fetch latest data using available sources with failover.
 
+        Depending on FETCH_MODE, providers are tried one after another,
+        all at once, or hedged; the first response that advances any
+        symbol's 1M buffer is merged and the remaining requests are
+        cancelled.
+
         Returns:
             bool: True if new data was obtained
         """
-        sources = ['yfinance', 'alpha_vantage', 'twelve_data']
-
-        for source in sources:
-            # Skip sources that have failed too many times
-            if self.source_failures[source] >= 3:
-                continue
-
+        started = self.clock()
+        held = self._newest_candle()
+        # Fastest expected fresh candle first; skip sources whose circuit
+        # is open or whose rate limit would not allow a call within the
+        # fetch timeout
+        calls = [(source, self.providers[source]) for source in self.health.order(self.providers)
+                 if self.rate_limiter.available_in(source) < self.FETCH_TIMEOUT
+                 and self.health.allow(source)]
+
+        hedge_delay = {'sequential': None, 'concurrent': 0.0}.get(
+            self.FETCH_MODE, self.HEDGE_DELAY)
+        result = self.fetcher.fetch(
+            calls, self._advances_candles, hedge_delay=hedge_delay,
+            timeout=self.FETCH_TIMEOUT)
+        self.last_fetch_stats = result
+
+        for source, stats in result['calls'].items():
+            if stats.get('latency') is not None:
+                self.provider_latency.observe(stats['latency'], source=source)
+            if stats.get('error'):
+                logger.error(f"Error fetching from {source}: {stats['error']}")
+                self.provider_errors.inc(source=source)
+            elif stats.get('rows') == 0:
+                logger.warning(f"No data from {source}")
+
+        source = result['source']
+        new_count, merge_failed = 0, False
+        if source is not None:
             try:
-                if source == 'yfinance':
-                    # Get last 2 days of 1-minute data
-                    new_data = self.fetch_yfinance_data(
-                        period="2d", interval="1m")
+                new_count = self._ingest(result['data'], source)
+            except Exception as e:
+                logger.error(f"Error merging data from {source}: {e}")
+                merge_failed = True
+        self._record_health(calls, result, held, merge_failed)
 
-                elif source == 'alpha_vantage':
-                    # Get intraday 1-minute data
-                    new_data = self.fetch_alpha_vantage_data(
-                        interval="1min", outputsize="compact")
+        if new_count > 0:
+            logger.info(
+                f"Successfully fetched {new_count} new candles from {source} "
+                f"in {result['latency']:.2f}s")
+            self.current_source = source
+            self.scheduler.observe(self._newest_candle(), started, source)
+            return True
 
-                elif source == 'twelve_data':
-                    # Get 1-minute data
-                    new_data = self.fetch_twelve_data(
-                        interval="1min", outputsize=100)
+        logger.warning("All data sources failed or returned no new data")
+        self.scheduler.observe(self._newest_candle(), started)
+        return False
 
+    def _record_health(self, calls: List[Tuple[str, Any]], result: Dict[str, Any],
+                       held: Optional[pd.Timestamp], merge_failed: bool) -> None:
+        """
+        Feed one poll's calls to the health monitor: finished calls with
+        candles succeed (a merge error counts against the winner), errors
+        and empty answers fail, calls outrun by the winner end the failure
+        streak, and calls that never started release their probe.
+        """
+        now = self.clock()
+        for source, _ in calls:
+            stats = result['calls'].get(source)
+            if stats is None or stats.get('cancelled'):
+                self.health.release(source)
+                continue
+            if stats.get('latency') is None:
+                if result['source'] is not None:
+                    self.health.interrupted(source)
                 else:
-                    continue
-
-                if new_data.empty:
-                    logger.warning(f"No data from {source}")
-                    continue
-
-                # Check if we got new data
-                new_count = self._merge_new_data(new_data, source)
-
-                if new_count > 0:
-                    logger.info(
-                        f"Successfully fetched {new_count} new candles from {source}")
-                    self.current_source = source
-                    self.source_failures[source] = 0  # Reset failure counter
-
-                    # Update all timeframes
-                    self._update_all_timeframes()
-                    self._save_state()
-                    self._save_to_database()
+                    self.health.release(source)  # timed out
+                continue
+            ok = not stats.get('error') and bool(stats.get('rows'))
+            newest = held
+            if source == result['source']:
+                ok = ok and not merge_failed
+                data = result['data']
+                frames = data.values() if isinstance(data, dict) else [data]
+                newest = max((df.index.max() for df in frames if len(df)), default=held)
+            # Age of the freshest candle served; a response that did not
+            # advance the buffer is at least as old as what is held
+            age = now - (newest.value / 1e9 + 60) if ok and newest is not None else None
+            self.health.record(source, stats['latency'], ok, age)
+
+        for source, report in self.health.report().items():
+            self.provider_expected.set(report['expected_seconds'], source=source)
+            self.provider_error_rate.set(report['error_rate'], source=source)
+            self.provider_circuit.set(CIRCUIT_STATES.index(report['state']), source=source)
+        self.health.save()
+
+    @property
+    def source_failures(self) -> Dict[str, int]:
+        """Consecutive failed calls per provider."""
+        return {source: report['consecutive_failures']
+                for source, report in self.health.report().items()}
+
+    def _newest_candle(self) -> Optional[pd.Timestamp]:
+        """Latest 1M candle of the symbol furthest behind (None while a buffer is empty)."""
+        stamps = [self.buffers[symbol].last_timestamp for symbol in self.symbols]
+        return None if any(ts is None for ts in stamps) else min(stamps)
+
+    def next_poll_in(self) -> float:
+        """
+        Seconds until the next poll is due: after the next candle closes and
+        the provider's publication delay passes, sooner while retrying a
+        missing candle, never before a provider has rate-limit budget and
+        a closed (or probe-ready) circuit.
+        """
+        budget = min((max(self.rate_limiter.available_in(source), self.health.available_in(source))
+                      for source in self.providers), default=0.0)
+        return self.scheduler.wait_time(self._newest_candle(), budget)
 
-                    return True
+    def _ingest(self, data: Dict[str, pd.DataFrame], source: str, persist: bool = True) -> int:
+        """
+        Validate, merge and aggregate one batch of candles per symbol, then
+        persist them. Shared by the live loop and historical replay.
 
-            except Exception as e:
-                logger.error(f"Error fetching from {source}: {e}")
-                self.source_failures[source] += 1
+        Args:
+            data: Symbol -> 1M candles
+            source: Provider name recorded with the candles
+            persist: Write journal, database and history (off for replay)
 
-        logger.warning("All data sources failed or returned no new data")
+        Returns:
+            int: Number of candles added or revised
+        """
+        new_count = 0
+        for symbol, new_data in data.items():
+            with self.stage_seconds.time(stage='merge'):
+                merged = self._merge_new_data(new_data, source, symbol)
+            if merged > 0:
+                # Update all timeframes
+                with self.stage_seconds.time(stage='aggregate'):
+                    self._update_all_timeframes(symbol)
+                new_count += merged
+
+        if new_count > 0 and persist:
+            with self.stage_seconds.time(stage='state_write'):
+                self._save_state()
+            with self.stage_seconds.time(stage='db_write'):
+                self._save_to_database()
+            if self.history is not None:
+                with self.stage_seconds.time(stage='history_write'):
+                    self._save_history()
+        return new_count
+
+    def _advances_candles(self, source: str, new_data: Dict[str, pd.DataFrame]) -> bool:
+        """Whether a provider response has candles after the latest stored one for any symbol."""
+        for symbol, df in new_data.items():
+            buffer = self.buffers.get(symbol)
+            if buffer is None or df.empty:
+                continue
+            if buffer.empty or df.index.max() > buffer.last_timestamp:
+                return True
         return False
 
-    def _merge_new_data(self, new_data: pd.DataFrame, source: str) -> int:
+    def _merge_new_data(self, new_data: pd.DataFrame, source: str,
+                        symbol: Optional[str] = None) -> int:
         """
-        Merge new data with existing data, avoiding duplicates.
+        Merge new data into the symbol's 1M ring buffer.
+
+        Incoming rows pass the symbol's CandleValidator first; rows that
+        fail are quarantined and the rest of the batch is merged.
+        Candles after the last stored minute are appended; stored minutes
+        the provider now reports with different values are overwritten in
+        place, minutes missing from the window are filled in, and both are
+        re-derived downstream (timeframes, journal, database).
+
+        Args:
+            new_data: Provider candles
+            source: Provider name
+            symbol: Symbol key, defaults to the primary symbol
 
         Returns:
-            int: Number of new candles added
+            int: Number of candles added or revised
         """
+        symbol = symbol or self.primary_symbol
+        if new_data.empty:
+            return 0
+
+        validator = self.validators[symbol]
+        if validator.last_timestamp != self.buffers[symbol].last_timestamp:
+            # Buffer restored or bootstrapped outside this path
+            validator.prime(self.buffers[symbol].frame())
+        new_data = validator.validate(new_data)
         if new_data.empty:
             return 0
 
-        if self.candles_1m.empty:
-            self.candles_1m = new_data.copy()
-            self.candles_1m = self.candles_1m.tail(self.BUFFER_SIZES['1M'])
-            return len(self.candles_1m)
+        # Frames are immutable snapshots, so this keeps the pre-merge values
+        # for diffing revisions (only built while someone is subscribed)
+        before = self.buffers[symbol].frame() if self.events.active else None
+        appended, revised, since = self.buffers[symbol].merge(new_data)
+        self.candles_merged.inc(appended + revised, symbol=symbol)
+        if appended:
+            # A 1M candle closes a minute after its timestamp (naive UTC)
+            closed = self.buffers[symbol].last_timestamp.value / 1e9 + 60
+            self.candle_lag.observe(self.clock() - closed, symbol=symbol)
+
+        if revised:
+            logger.info(f"{symbol}: provider revised {revised} candles from {since}")
+            if before is not None:
+                self._publish_revised_candles(symbol, before, since)
+            self._apply_revision(symbol, since)
+
+        if appended and self.events.active:
+            self.events.publish(bar_events(
+                'candle', symbol, '1M', self.buffers[symbol].frame().iloc[-appended:]))
+
+        return appended + revised
+
+    def _publish_revised_candles(self, symbol: str, before: pd.DataFrame,
+                                 since: pd.Timestamp) -> None:
+        """Publish 'bar_revised' for stored 1M candles whose values changed or that were filled in."""
+        after = self.buffers[symbol].frame()
+        new = after.iloc[after.index.searchsorted(since):
+                         after.index.searchsorted(before.index[-1], side='right')]
+        old = before.reindex(new.index)  # late fills have no earlier values
+        changed = ((old.to_numpy() != new.to_numpy()) &
+                   ~(pd.isna(old.to_numpy()) & pd.isna(new.to_numpy()))).any(axis=1)
+        self.events.publish(bar_events('bar_revised', symbol, '1M', new[changed]))
+
+    def _apply_revision(self, symbol: str, since: pd.Timestamp) -> None:
+        """Propagate in-place 1M revisions to timeframes, journal and database watermarks."""
+        try:
+            revised_bars = self.aggregators[symbol].revise(self.buffers[symbol].frame(), since)
+        except Exception as e:
+            logger.error(f"Revising {symbol} timeframes failed, rebuilding: {e}")
+            self.aggregators[symbol].reset()
+            for indicators in self.indicators[symbol].values():
+                indicators.reset()
+            revised_bars = {}
+            self._mark_shared(symbol, list(self.TIMEFRAMES), pd.Timestamp.min)
+        self._mark_shared(symbol, ['1M'], since)
+
+        self.journals[symbol].rewind(since)
+        self.database.rewind(self.table_name(symbol, '1M'), since)
+        if self.history is not None:
+            self.history.rewind(symbol, since)
+        for tf_name, label in revised_bars.items():
+            self.database.rewind(self.table_name(symbol, tf_name), label)
+            self._mark_shared(symbol, [tf_name], label)
+            if tf_name in self.indicators[symbol]:
+                self.indicators[symbol][tf_name].revise(label)
+
+        if revised_bars and self.events.active:
+            frames = self.aggregators[symbol].frames()
+            for tf_name, label in revised_bars.items():
+                bars = frames[tf_name]
+                self.events.publish(bar_events(
+                    'bar_revised', symbol, tf_name, bars.iloc[bars.index.searchsorted(label):]))
 
-        # Find new candles (after last timestamp)
-        last_timestamp = self.candles_1m.index[-1]
-        new_candles = new_data[new_data.index > last_timestamp]
+    def _aggregate_timeframe(self, df: pd.DataFrame, freq: str) -> pd.DataFrame:
+        """Aggregate 1-minute data to specified timeframe."""
+        return resample_ohlcv(df, freq)
 
-        if new_candles.empty:
-            return 0
+    def _update_all_timeframes(self, symbol: Optional[str] = None) -> None:
+        """Update all timeframe aggregations from newly merged 1-minute data."""
+        symbol = symbol or self.primary_symbol
+        candles = self.buffers[symbol].frame()
+        if candles.empty:
+            return
 
-        # Append new candles
-        self.candles_1m = pd.concat([self.candles_1m, new_candles])
+        try:
+            previous = self.symbol_timeframes[symbol].copy()
+            self.symbol_timeframes[symbol].update(
+                self.aggregators[symbol].update(candles))
+            for tf_name, df in self.symbol_timeframes[symbol].items():
+                if df.empty:
+                    continue
+                self.bar_timestamp.set(df.index[-1].value / 1e9, symbol=symbol, timeframe=tf_name)
+                if self.events.active and df is not previous.get(tf_name):
+                    self._publish_closed_bars(symbol, tf_name, previous.get(tf_name), df)
+        except Exception as e:
+            logger.error(f"Incremental aggregation failed for {symbol}, rebuilding: {e}")
+            self.aggregators[symbol].reset()
+            self._rebuild_all_timeframes(symbol)
+            self._mark_shared(symbol, list(self.TIMEFRAMES), pd.Timestamp.min)
+        self._update_indicators(symbol)
+        if self.shared_bus is not None:
+            with self.stage_seconds.time(stage='shared_publish'):
+                self._publish_shared(symbol)
+
+    def _update_indicators(self, symbol: str) -> None:
+        """Fold newly closed bars into each timeframe's indicators (backfilling after gaps)."""
+        for tf_name, indicators in self.indicators[symbol].items():
+            bars = self.symbol_timeframes[symbol].get(tf_name)
+            if bars is None or bars.empty:
+                continue
+            try:
+                if indicators.needs_backfill(bars):
+                    indicators.backfill(self._indicator_history(symbol, tf_name, bars))
+                else:
+                    indicators.update(bars)
+            except Exception as e:
+                logger.error(f"Indicator update failed for {symbol} {tf_name}: {e}")
+                indicators.reset()
 
-        # Remove duplicates (keep last occurrence)
-        self.candles_1m = self.candles_1m[~self.candles_1m.index.duplicated(
-            keep='last')]
+    def _indicator_history(self, symbol: str, tf_name: str, bars: pd.DataFrame) -> pd.DataFrame:
+        """
+        Bars up to the last of ``bars``, reaching INDICATOR_WARMUP bars back
+        into storage. get_range also replaces a first in-memory bar that
+        only partly lies in the 1M buffer with the complete stored one.
+        """
+        start = bars.index[0] - pd.Timedelta(self.TIMEFRAMES[tf_name]) * self.INDICATOR_WARMUP
+        try:
+            history = self.get_range(tf_name, start, bars.index[-1] + pd.Timedelta(1, 'ns'), symbol)
+        except Exception as e:
+            logger.warning(f"No stored {symbol} {tf_name} bars for indicator warm-up: {e}")
+            return bars
+        return history if not history.empty else bars
+
+    def _publish_closed_bars(self, symbol: str, tf_name: str, previous: Optional[pd.DataFrame],
+                             bars: pd.DataFrame) -> None:
+        """Publish 'bar_closed' for bars after the last one seen before this update."""
+        if previous is not None and not previous.empty:
+            bars = bars.iloc[bars.index.searchsorted(previous.index[-1], side='right'):]
+        self.events.publish(bar_events('bar_closed', symbol, tf_name, bars))
+
+    def _rebuild_all_timeframes(self, symbol: Optional[str] = None) -> None:
+        """Re-aggregate every timeframe from the full 1-minute buffer."""
+        symbol = symbol or self.primary_symbol
+        for indicators in self.indicators[symbol].values():
+            indicators.reset()
+        candles = self.buffers[symbol].frame()
+        try:
+            bulk = aggregate_timeframes(candles, self.TIMEFRAMES)
+        except Exception as e:
+            logger.error(f"Bulk aggregation failed for {symbol}, resampling each timeframe: {e}")
+            bulk = {}
+        for tf_name, freq in self.TIMEFRAMES.items():
+            try:
+                aggregated = bulk.get(tf_name)
+                if aggregated is None:
+                    aggregated = self._aggregate_timeframe(candles, freq)
 
-        # Maintain buffer size
-        self.candles_1m = self.candles_1m.tail(self.BUFFER_SIZES['1M'])
+                if not aggregated.empty:
+                    aggregated = aggregated.tail(
+                        self.BUFFER_SIZES.get(tf_name, 100))
 
-        # Sort by index
-        self.candles_1m = self.candles_1m.sort_index()
+                self.symbol_timeframes[symbol][tf_name] = aggregated
 
-        return len(new_candles)
+            except Exception as e:
+                logger.error(f"Failed to aggregate {symbol} {tf_name}: {e}")
 
-    def _aggregate_timeframe(self, df: pd.DataFrame, freq: str) -> pd.DataFrame:
-        """Aggregate 1-minute data to specified timeframe."""
-        if df.empty:
+    def get_timeframe_data(self, timeframe: str, symbol: Optional[str] = None,
+                           since: Optional[pd.Timestamp] = None, last_n: Optional[int] = None,
+                           copy: bool = False) -> pd.DataFrame:
+        """
+        Get data for specified timeframe (and symbol, default primary).
+
+        Returns a read-only snapshot that shares memory with the aggregator:
+        later merges never modify it, so no copy is needed to keep it.
+
+        Args:
+            timeframe: '1M' or a key of TIMEFRAMES
+            symbol: Symbol key, defaults to the primary symbol
+            since: Only bars strictly after this timestamp (e.g. the last
+                bar the caller has already processed)
+            last_n: At most this many of the most recent bars
+            copy: Return a private, writable copy instead
+        """
+        symbol = symbol or self.primary_symbol
+        if timeframe == '1M':
+            data = self.buffers[symbol].snapshot(since, last_n)
+        else:
+            frames = self.symbol_timeframes[symbol]
+            data = select_rows(
+                frames[timeframe] if timeframe in frames else pd.DataFrame(), since, last_n)
+        return data.copy() if copy else data
+
+    def get_indicators(self, timeframe: str, symbol: Optional[str] = None,
+                       since: Optional[pd.Timestamp] = None,
+                       last_n: Optional[int] = None) -> pd.DataFrame:
+        """
+        Indicator values for the closed bars of a timeframe (read-only).
+
+        Indexed like ``get_timeframe_data(timeframe)``, one column per
+        entry of INDICATORS[timeframe].
+
+        Args:
+            timeframe: A key of TIMEFRAMES
+            symbol: Symbol key, defaults to the primary symbol
+            since: Only bars strictly after this timestamp
+            last_n: At most this many of the most recent bars
+        """
+        indicators = self.indicators[symbol or self.primary_symbol].get(timeframe)
+        if indicators is None:
             return pd.DataFrame()
+        return select_rows(indicators.frame(), since, last_n)
+
+    def query_range(self, timeframe: str, start=None, end=None,
+                    symbol: Optional[str] = None) -> np.ndarray:
+        """
+        Read stored candles in [start, end] from the database.
+
+        Covers the full persisted history, not just the in-memory buffers.
+
+        Args:
+            timeframe: '1M' or a key of TIMEFRAMES
+            start: First timestamp to include (None = from the beginning)
+            end: Last timestamp to include (None = up to the latest)
+            symbol: Symbol key, defaults to the primary symbol
 
-        ohlc_dict = {
-            'open': 'first',
-            'high': 'max',
-            'low': 'min',
-            'close': 'last',
-            'volume': 'sum'
+        Returns:
+            Structured NumPy array with timestamp (datetime64[s]) and OHLCV fields
+        """
+        return self.database.query_range(
+            self.table_name(symbol or self.primary_symbol, timeframe), start, end)
+
+    @staticmethod
+    def _records_frame(rows: np.ndarray) -> pd.DataFrame:
+        """Candle frame from a query_range result."""
+        index = pd.DatetimeIndex(rows['timestamp']).as_unit('ns')
+        return pd.DataFrame({col: rows[col] for col in ['open', 'high', 'low', 'close', 'volume']},
+                            index=index)
+
+    def _state_metadata(self) -> Dict[str, Any]:
+        """Non-candle state stored alongside checkpoints."""
+        return {
+            'current_source': self.current_source,
+            'timestamp': datetime.now()
         }
 
-        if freq == '1W':
-            df_resampled = df.resample('W-MON', label='left').agg(ohlc_dict)
-        else:
-            df_resampled = df.resample(freq, label='left').agg(ohlc_dict)
+    def _save_state(self, checkpoint: bool = False) -> None:
+        """
+        Persist new 1M candles for crash recovery.
 
-        # Remove incomplete candles and NaN values
-        if not df_resampled.empty:
-            df_resampled = df_resampled[:-1].dropna()
+        Appends only candles newer than the last persisted one to each
+        symbol's journal, compacting into a checkpoint periodically or on
+        request.
+        """
+        for symbol in self.symbols:
+            candles = self.buffers[symbol].frame()
+            if candles.empty:
+                continue
 
-        return df_resampled
+            try:
+                journal = self.journals[symbol]
+                if checkpoint or journal.needs_checkpoint(candles):
+                    journal.checkpoint(candles, {**self._state_metadata(),
+                                                 'indicators': self._export_indicators(symbol)})
+                else:
+                    journal.append(candles, self.current_source)
 
-    def _update_all_timeframes(self) -> None:
-        """Update all timeframe aggregations from 1-minute data."""
-        if self.candles_1m.empty:
-            return
+            except Exception as e:
+                logger.error(f"State save failed for {symbol}: {e}")
 
-        for tf_name, freq in self.TIMEFRAMES.items():
+    def load_state(self) -> bool:
+        """
+        Load state from a warm-restart snapshot if it is still current, else
+        from checkpoints and journals (or a legacy pickle).
+        """
+        if self._snapshot is not None:
             try:
-                aggregated = self._aggregate_timeframe(self.candles_1m, freq)
+                if self._load_snapshot():
+                    return True
+            except Exception as e:
+                logger.error(f"Snapshot restore failed, using full recovery: {e}")
+            finally:
+                self._snapshot = None
 
-                if not aggregated.empty:
-                    aggregated = aggregated.tail(
-                        self.BUFFER_SIZES.get(tf_name, 100))
+        restored = False
 
-                self.timeframes[tf_name] = aggregated
+        for symbol in self.symbols:
+            try:
+                candles, meta = self.journals[symbol].recover()
 
-            except Exception as e:
-                logger.error(f"Failed to aggregate {tf_name}: {e}")
+                if candles.empty:
+                    if symbol == self.primary_symbol:
+                        restored = self._load_legacy_state() or restored
+                    continue
 
-    def get_timeframe_data(self, timeframe: str) -> pd.DataFrame:
-        """Get data for specified timeframe."""
-        if timeframe == '1M':
-            return self.candles_1m.copy()
-        return self.timeframes.get(timeframe, pd.DataFrame()).copy()
+                self.buffers[symbol].load(candles)
+                self.current_source = meta.get('current_source', self.current_source)
+                self._restore_indicators(symbol, meta.get('indicators'))
+                self._update_all_timeframes(symbol)
 
-    def _save_state(self) -> None:
-        """Save current state for crash recovery."""
-        try:
-            state = {
-                'candles_1m': self.candles_1m,
-                'timeframes': self.timeframes,
-                'current_source': self.current_source,
-                'source_failures': self.source_failures,
-                'timestamp': datetime.now()
-            }
+                logger.info(f"{symbol}: state restored from checkpoint "
+                            f"{meta.get('timestamp')} and journal")
+                logger.info(f"{symbol}: restored {len(self.buffers[symbol])} 1-minute candles")
+                restored = True
 
-            with open(self.STATE_FILE, 'wb') as f:
-                pickle.dump(state, f)
+            except Exception as e:
+                logger.error(f"State load failed for {symbol}: {e}")
 
-        except Exception as e:
-            logger.error(f"State save failed: {e}")
+        return restored
 
-    def load_state(self) -> bool:
-        """Load state from file."""
-        try:
-            if not os.path.exists(self.STATE_FILE):
-                return False
+    def _export_indicators(self, symbol: str) -> Dict[str, Dict[str, Any]]:
+        return {tf_name: indicators.export_state()
+                for tf_name, indicators in self.indicators[symbol].items()}
 
-            with open(self.STATE_FILE, 'rb') as f:
-                state = pickle.load(f)
+    def _restore_indicators(self, symbol: str, saved: Optional[Dict[str, Dict[str, Any]]]) -> None:
+        """Restore saved indicator state; timeframes without any are backfilled on update."""
+        for tf_name, indicators in self.indicators[symbol].items():
+            indicators.restore_state((saved or {}).get(tf_name, {}))
 
-            self.candles_1m = state.get('candles_1m', pd.DataFrame())
-            self.timeframes = state.get('timeframes', {})
-            self.current_source = state.get('current_source')
-            self.source_failures = state.get(
-                'source_failures', {'yfinance': 0, 'alpha_vantage': 0, 'twelve_data': 0})
+    def _load_snapshot(self) -> bool:
+        """Restore buffers, timeframes and journal positions straight from snapshot arrays."""
+        meta, arrays = self._snapshot
+        if list(meta['symbols']) != self.symbols:
+            logger.info("Snapshot was taken for other symbols, using full recovery")
+            return False
 
-            logger.info(f"State restored from {state.get('timestamp')}")
+        for symbol in self.symbols:
+            saved = meta['symbols'][symbol]
+            columns = {col: arrays[f"{symbol}.{col}"]
+                       for col in ['ts', 'open', 'high', 'low', 'close', 'volume']}
+            self.buffers[symbol].load_columns(columns, saved['unit'], saved['index_name'])
+            candles = self.buffers[symbol].frame()
+            self._restore_indicators(symbol, saved.get('indicators'))
+            if self.aggregators[symbol].restore_state(saved['aggregator'], candles):
+                self.symbol_timeframes[symbol].update(self.aggregators[symbol].frames())
+                self._update_indicators(symbol)
+            else:
+                self._update_all_timeframes(symbol)
+            self.journals[symbol].resume(saved['journal_last_ts'], saved['journal_pending'])
+
+        self.current_source = meta.get('current_source')
+        logger.info(f"Warm restart from snapshot taken {meta.get('timestamp')}: " + ", ".join(
+            f"{symbol} {len(self.buffers[symbol])} candles" for symbol in self.symbols))
+        return True
+
+    def save_snapshot(self) -> bool:
+        """
+        Write the warm-restart snapshot.
 
-            if not self.candles_1m.empty:
-                logger.info(
-                    f"Restored {len(self.candles_1m)} 1-minute candles")
+        Call on shutdown after the final checkpoint, database flush and
+        ``close()``, so the files it is validated against no longer change.
+        Skipped (and an older snapshot removed) while a buffer holds
+        candles its journal has not persisted.
 
-            return True
+        Returns:
+            bool: True if a snapshot was written
+        """
+        meta = {**self._state_metadata(), 'symbols': {},
+                'watermarks': self.database.export_watermarks()}
+        arrays = {}
+        sources = [self.DB_FILE, f"{self.DB_FILE}-wal"]
+
+        for symbol in self.symbols:
+            buffer, journal = self.buffers[symbol], self.journals[symbol]
+            columns = buffer.columns()
+            last_ns = None if buffer.empty else pd.Timestamp(buffer.last_timestamp).as_unit('ns').value
+            if journal.last_ts != last_ns:
+                logger.warning(f"{symbol}: buffer not fully journaled, skipping snapshot")
+                remove_snapshot(self.SNAPSHOT_FILE)
+                return False
+
+            for col, values in columns.items():
+                arrays[f"{symbol}.{col}"] = values
+            meta['symbols'][symbol] = {
+                'unit': buffer.unit,
+                'index_name': buffer.index_name,
+                'aggregator': self.aggregators[symbol].export_state(),
+                'indicators': self._export_indicators(symbol),
+                'journal_last_ts': journal.last_ts,
+                'journal_pending': journal.pending
+            }
+            sources += [journal.journal_file, journal.checkpoint_file]
 
+        try:
+            size = write_snapshot(self.SNAPSHOT_FILE, meta, arrays, sources)
+            logger.info(f"Snapshot written ({size / 1024:.0f}KiB)")
+            return True
         except Exception as e:
-            logger.error(f"State load failed: {e}")
+            logger.error(f"Snapshot save failed: {e}")
+            remove_snapshot(self.SNAPSHOT_FILE)
             return False
 
+    def _load_legacy_state(self) -> bool:
+        """Load a pickle snapshot from older versions and checkpoint it."""
+        if not os.path.exists(self.STATE_FILE):
+            return False
+
+        with open(self.STATE_FILE, 'rb') as f:
+            state = pickle.load(f)
+
+        self.candles_1m = state.get('candles_1m', pd.DataFrame())
+        self.timeframes = state.get('timeframes', {})
+        self.current_source = state.get('current_source')
+
+        logger.info(f"Legacy state restored from {state.get('timestamp')}")
+
+        if not self.candles_1m.empty:
+            logger.info(
+                f"Restored {len(self.candles_1m)} 1-minute candles")
+            self.journal.checkpoint(self.candles_1m, self._state_metadata())
+
+        return True
+
     def _save_to_database(self) -> None:
-        """Save data to SQLite database."""
+        """Upsert candles added since the last flush into the SQLite database."""
         try:
-            conn = sqlite3.connect(self.DB_FILE)
-
-            # Save 1-minute data
-            if not self.candles_1m.empty:
-                df_save = self.candles_1m.reset_index()
-                # Get the first column (datetime) regardless of its name
-                datetime_col = df_save.columns[0]
-                df_save = df_save.rename(columns={datetime_col: 'timestamp'})
-                df_save['timestamp'] = pd.to_datetime(
-                    df_save['timestamp']).dt.strftime('%Y-%m-%d %H:%M:%S')
-                df_save['source'] = self.current_source or 'unknown'
-                df_save.to_sql('EURJPY_1M', conn,
-                               if_exists='replace', index=False)
-
-            # Save aggregated timeframes
-            for tf_name, df in self.timeframes.items():
-                if not df.empty:
-                    df_save = df.reset_index()
-                    # Get the first column (datetime) regardless of its name
-                    datetime_col = df_save.columns[0]
-                    df_save = df_save.rename(
-                        columns={datetime_col: 'timestamp'})
-                    df_save['timestamp'] = pd.to_datetime(
-                        df_save['timestamp']).dt.strftime('%Y-%m-%d %H:%M:%S')
-                    df_save['source'] = 'aggregated'
-                    df_save.to_sql(
-                        f'EURJPY_{tf_name}', conn, if_exists='replace', index=False)
-
-            conn.close()
+            batches = {}
+            for symbol in self.symbols:
+                batches[self.table_name(symbol, '1M')] = (
+                    self.buffers[symbol].frame(), self.current_source or 'unknown')
+                for tf_name, df in self.symbol_timeframes[symbol].items():
+                    batches[self.table_name(symbol, tf_name)] = (df, 'aggregated')
+
+            written = self.database.flush(batches)
+            if written:
+                logger.debug(f"Database flush: {written} rows upserted")
 
         except Exception as e:
             logger.error(f"Database save failed: {e}")
             logger.error(traceback.format_exc())  # Add this for full traceback
 
+    def _save_history(self) -> None:
+        """Append 1M candles added since the last flush to the columnar history."""
+        if self.history is None:
+            return
+        for symbol in self.symbols:
+            try:
+                self.history.flush(symbol, self.buffers[symbol].frame())
+            except Exception as e:
+                logger.error(f"History save failed for {symbol}: {e}")
+
+    def history_range(self, timeframe: str, start=None, end=None,
+                      symbol: Optional[str] = None) -> pd.DataFrame:
+        """
+        Candles from the columnar history: stored 1M rows, or complete bars
+        of a TIMEFRAMES entry aggregated from them on the fly.
+
+        Args:
+            timeframe: '1M' or a TIMEFRAMES key
+            start, end: Naive UTC bounds [start, end) (None = unbounded)
+            symbol: Symbol key, defaults to the primary symbol
+        """
+        if self.history is None:
+            return pd.DataFrame()
+        symbol = symbol or self.primary_symbol
+        if timeframe == '1M':
+            columns = self.history.scan(symbol, start, end)
+        else:
+            columns = self.history.aggregate(symbol, self.TIMEFRAMES[timeframe], start, end)
+        return columns_frame(columns)
+
+    def get_range(self, timeframe: str, start, end=None,
+                  symbol: Optional[str] = None) -> pd.DataFrame:
+        """
+        Bars in [start, end) from memory and disk alike.
+
+        Recent bars come from the in-memory buffers, older ones from the
+        columnar history (aggregated on the fly) or, without pyarrow, from
+        the database. Cold segments that can no longer change are cached
+        (LRU, COLD_CACHE_BYTES), so repeated lookbacks stay in memory
+        without growing it.
+
+        Args:
+            timeframe: '1M' or a TIMEFRAMES key
+            start: First bar timestamp to include (naive UTC)
+            end: End of the range, exclusive (None = up to the latest bar)
+            symbol: Symbol key, defaults to the primary symbol
+        """
+        return self.tiers.get_range(symbol or self.primary_symbol, timeframe, start, end)
+
+    def _hot_bars(self, symbol: str, timeframe: str) -> pd.DataFrame:
+        return self.get_timeframe_data(timeframe, symbol)
+
+    def _cold_bars(self, symbol: str, timeframe: str, start: int, end: int) -> Dict[str, np.ndarray]:
+        """Complete stored bars in [start, end) (epoch ns) as history columns."""
+        if self.history is not None:
+            if timeframe == '1M':
+                return self.history.scan(symbol, start, end)
+            return self.history.aggregate(symbol, self.TIMEFRAMES[timeframe], start, end)
+
+        rows = self.database.query_range(self.table_name(symbol, timeframe),
+                                         pd.Timestamp(start), pd.Timestamp(end - 1))
+        columns = {'ts': rows['timestamp'].astype('datetime64[ns]').view(np.int64)}
+        for col in ['open', 'high', 'low', 'close', 'volume']:
+            columns[col] = rows[col].astype(np.float64)
+        return columns
+
+    def replay(self, start, end=None, speed: Optional[float] = None, step: Optional[int] = None,
+               symbols: Optional[List[str]] = None,
+               cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        Replay stored 1M candles in [start, end) through the live ingest path.
+
+        Candles come from the columnar history, or from the database
+        without pyarrow. The replayed symbols' buffers and timeframes are
+        replaced and nothing is persisted, so run replays on an aggregator
+        of their own (e.g. in a separate working directory).
+
+        Args:
+            start: First candle to replay (naive UTC)
+            end: End of the range, exclusive (None = up to the latest)
+            speed: Multiple of real time, None = as fast as possible
+            step: Minutes of candles per simulated poll (default 1 when
+                paced, a day at full speed)
+            symbols: Symbol keys, defaults to all tracked symbols
+            cancel: Stops the replay once set
+
+        Returns:
+            Dict with candles, polls, wall_seconds and candles_per_second
+
+        Raises:
+            Exception: If ingesting a replayed batch fails (see ReplayEngine.run)
+        """
+        candles = {}
+        for symbol in symbols or self.symbols:
+            if self.history is not None:
+                candles[symbol] = self.history_range('1M', start, end, symbol)
+            else:
+                last = pd.Timestamp(end) - pd.Timedelta(seconds=1) if end is not None else None
+                candles[symbol] = self._records_frame(self.query_range('1M', start, last, symbol))
+        return ReplayEngine(self, candles, speed=speed, step=step).run(cancel)
+
+    def backfill(self, start, end=None, source: str = 'yfinance',
+                 symbols: Optional[List[str]] = None,
+                 cancel: Optional[threading.Event] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Fill the database with 1M candles (and derived bars) for a date range.
+
+        The range is fetched in provider-sized windows on BACKFILL_WORKERS
+        threads and written to SQLite (and the columnar history) window by
+        window; finished windows are checkpointed, so rerunning the same call
+        after an interruption only fetches what is missing. The in-memory
+        buffers are not touched.
+
+        Args:
+            start: First timestamp to fetch (UTC)
+            end: End of the range, exclusive (None = now)
+            source: Key of backfill_providers
+            symbols: Symbols to backfill, defaults to all tracked symbols
+            cancel: Set to stop after the windows already in flight
+
+        Returns:
+            Dict of backfill statistics per symbol
+        """
+        fetch_range = self.backfill_providers[source]
+        end = pd.Timestamp(end if end is not None else datetime.now(timezone.utc).replace(tzinfo=None)).floor('min')
+        start = pd.Timestamp(start)
+        if source in self.BACKFILL_LOOKBACK:
+            earliest = (end - self.BACKFILL_LOOKBACK[source]).ceil('D')
+            if start < earliest:
+                logger.warning(f"{source} only serves 1M data from {earliest}, clipping backfill")
+                start = earliest
+
+        engine = BackfillEngine(self.database, max_workers=self.BACKFILL_WORKERS,
+                                history=self.history)
+        results = {}
+        for symbol in symbols or self.symbols:
+            job = {'symbol': symbol, 'source': source, 'start': start, 'end': end,
+                   'window': self.BACKFILL_WINDOWS[source]}
+            tables = {tf_name: self.table_name(symbol, tf_name)
+                      for tf_name in ['1M'] + list(self.TIMEFRAMES)}
+            results[symbol] = engine.run(
+                job,
+                lambda a, b, c, symbol=symbol: fetch_range(symbol, a, b, c),
+                tables, self.TIMEFRAMES,
+                self.BACKFILL_CHECKPOINT_FILE.format(symbol=symbol), cancel)
+            self.tiers.invalidate(symbol)
+
+            stats = results[symbol]
+            logger.info(
+                f"Backfill {symbol}: {stats['rows']} rows in {stats['fetched']} windows "
+                f"({stats['resumed']} resumed, {stats['failed']} failed) "
+                f"at {stats['rows_per_second']:.0f} rows/s")
+        return results
+
     def fetch_historical_bootstrap(self, days: int = 7) -> bool:
         """
         Bootstrap with historical data for initial setup.
 
+        Backfills the database for the last ``days`` days, then loads the
+        newest BUFFER_SIZES['1M'] candles into the buffers.
+
         Args:
             days: Number of days of historical data to fetch
         """
@@ -583,23 +1728,27 @@ class MultiSourceForexAggregator:
 
         # Try yfinance first (best for historical data)
         try:
-            period_map = {1: "1d", 2: "2d", 5: "5d",
-                          7: "7d", 30: "1mo", 90: "3mo", 365: "1y"}
-            period = period_map.get(days, f"{days}d")
-
-            data = self.fetch_yfinance_data(period=period, interval="1m")
-
-            if not data.empty:
-                self.candles_1m = data.copy()
-                self.candles_1m = self.candles_1m.tail(self.BUFFER_SIZES['1M'])
+            end = pd.Timestamp(datetime.now(timezone.utc).replace(tzinfo=None)).floor('min')
+            results = self.backfill(end - pd.Timedelta(days=days), end, source='yfinance')
+
+            data = {}
+            for symbol in results:
+                rows = self.query_range('1M', end - pd.Timedelta(days=days), end, symbol)
+                if len(rows):
+                    data[symbol] = self._records_frame(rows)
+
+            if data:
+                for symbol, candles in data.items():
+                    self.buffers[symbol].load(candles)
+                    self._update_all_timeframes(symbol)
                 self.current_source = 'yfinance'
 
-                self._update_all_timeframes()
-                self._save_state()
+                self._save_state(checkpoint=True)
                 self._save_to_database()
 
                 logger.info(
-                    f"Bootstrap successful: {len(self.candles_1m)} candles loaded")
+                    f"Bootstrap successful: {sum(len(self.buffers[s]) for s in data)} "
+                    f"candles loaded for {len(data)} symbols")
                 return True
 
         except Exception as e:
@@ -607,56 +1756,185 @@ class MultiSourceForexAggregator:
 
         return False
 
+    def write_metrics(self) -> None:
+        """Rewrite METRICS_FILE (for node_exporter's textfile collector), if set."""
+        if self.METRICS_FILE:
+            self.metrics.write_file(self.METRICS_FILE)
+
+    def stage_report(self) -> Dict[str, Dict[str, float]]:
+        """Sample count, mean and bucketed p50/p99 seconds per ingest stage."""
+        report = {}
+        for (labels, hist) in list(self.stage_seconds.children.items()):
+            stage = dict(labels)['stage']
+            report[stage] = {
+                'count': hist.count,
+                'mean': hist.total / hist.count if hist.count else 0.0,
+                'p50': self.stage_seconds.quantile(0.5, stage=stage),
+                'p99': self.stage_seconds.quantile(0.99, stage=stage)
+            }
+        return report
+
+    def serve_events(self, address) -> EventServer:
+        """
+        Stream events to local processes (see ``events.EventClient``).
+
+        Args:
+            address: Unix socket path, or (host, port) for TCP on localhost
+        """
+        self.event_server = EventServer(self.events, address)
+        return self.event_server
+
+    def publish_shared(self, name: Optional[str] = None) -> SharedCandleBus:
+        """
+        Publish every symbol's 1M buffer and timeframes to a shared-memory
+        bus, kept current after each merge (see ``sharedbus.SharedCandleReader``).
+
+        Args:
+            name: Shared-memory block name (None = generated)
+        """
+        capacities = {symbol: {tf_name: self.BUFFER_SIZES.get(tf_name, 100)
+                               for tf_name in ['1M', *self.TIMEFRAMES]}
+                      for symbol in self.symbols}
+        self.shared_bus = SharedCandleBus(capacities, name)
+        for symbol in self.symbols:
+            self._publish_shared(symbol)
+        return self.shared_bus
+
+    def _mark_shared(self, symbol: str, timeframes: List[str], since: pd.Timestamp) -> None:
+        """Remember that bars from ``since`` changed, for the next shared publish."""
+        if self.shared_bus is None:
+            return
+        marks = self._shared_since[symbol]
+        for tf_name in timeframes:
+            marks[tf_name] = min(marks.get(tf_name, since), since)
+
+    def _publish_shared(self, symbol: str) -> None:
+        """Write the symbol's new and revised bars to the shared bus."""
+        marks = self._shared_since[symbol]
+        try:
+            self.shared_bus.publish(symbol, '1M', self.buffers[symbol].frame(), marks.pop('1M', None))
+            for tf_name in self.TIMEFRAMES:
+                bars = self.symbol_timeframes[symbol].get(tf_name)
+                self.shared_bus.publish(symbol, tf_name, bars if bars is not None else pd.DataFrame(),
+                                        marks.pop(tf_name, None))
+            self.shared_bus.commit()
+        except Exception as e:
+            logger.error(f"Shared bus publish failed for {symbol}: {e}")
+        marks.clear()
+
+    def close(self) -> None:
+        """Release journals, the database connection, fetch workers, servers and subscriptions; save rate-limit state."""
+        if self.event_server is not None:
+            self.event_server.close()
+        if self.shared_bus is not None:
+            self.shared_bus.close()
+            self.shared_bus = None
+        self.events.close()
+        for journal in self.journals.values():
+            journal.close()
+        self.database.close()
+        self.fetcher.shutdown()
+        self.rate_limiter.save()
+        if self._http is not None:
+            self._http.close()
+        self.metrics.close()
+
     def print_status(self) -> None:
         """Print current data status."""
-        print(f"\n=== EUR/JPY Multi-Source Data Status ===")
+        print(f"\n=== Multi-Source Forex Data Status ===")
         print(f"Timestamp: {datetime.now()}")
         print(f"Current Source: {self.current_source or 'None'}")
-        print(f"Source Failures: {self.source_failures}")
-
-        if not self.candles_1m.empty:
-            latest_1m = self.candles_1m.iloc[-1]
-            print(f"\n1M: {len(self.candles_1m)} candles")
-            print(f"    Latest: {self.candles_1m.index[-1]} | O:{latest_1m['open']:.5f} "
-                  f"H:{latest_1m['high']:.5f} L:{latest_1m['low']:.5f} C:{latest_1m['close']:.5f}")
-
-        for tf_name in self.TIMEFRAMES.keys():
-            df = self.timeframes.get(tf_name, pd.DataFrame())
-            if not df.empty:
-                latest = df.iloc[-1]
-                print(f"{tf_name:>3}: {len(df)} candles")
-                print(f"    Latest: {df.index[-1]} | O:{latest['open']:.5f} "
-                      f"H:{latest['high']:.5f} L:{latest['low']:.5f} C:{latest['close']:.5f}")
+        for source, health in self.health.report().items():
+            latency = f"{health['latency']:.2f}s" if health['latency'] is not None else "n/a"
+            retry = f", probe in {health['retry_in']:.0f}s" if health['state'] == 'open' else ""
+            print(f"Provider {source}: circuit {health['state']}{retry}, latency {latency}, "
+                  f"errors {health['error_rate']:.0%}, expect fresh candle in "
+                  f"{health['expected_seconds']:.1f}s")
+        for source, usage in self.rate_limiter.usage().items():
+            quota = f"{usage['used_today']}/{usage['daily']} today" if usage['daily'] else \
+                f"{usage['used_today']} today"
+            print(f"Rate limit {source}: {usage['tokens']:.1f}/{usage['burst']} tokens, {quota}")
+        schedule = self.scheduler.stats()
+        print(f"Polls: {schedule['polls']} ({schedule['empty_polls']} empty), "
+              f"publication delay {schedule['delay']:.1f}s")
+        for source, stats in self.transfer_report().items():
+            last = stats['last']
+            size = f"{last['bytes'] / 1024:.1f}KiB" if last['bytes'] is not None else "n/a"
+            print(f"Last {source} call: {last['rows']} rows, {size}, parsed in {last['parse_ms']:.1f}ms")
+        cache = self.response_cache.stats()
+        print(f"Response cache: {cache['entries']} entries, {cache['bytes'] / 2 ** 20:.1f}MiB, "
+              f"{cache['evictions']} evicted")
+        for source, counters in cache['providers'].items():
+            print(f"Cache {source}: {counters['hits']}/{counters['requests']} hits "
+                  f"({counters['hits'] / max(counters['requests'], 1):.0%}), "
+                  f"{counters['coalesced']} coalesced, {counters['saved']} rate-limit tokens saved")
+        for stage, stats in self.stage_report().items():
+            print(f"Stage {stage}: {stats['count']} runs, mean {stats['mean'] * 1e3:.2f}ms, "
+                  f"p99 <= {stats['p99'] * 1e3:g}ms")
+
+        for symbol in self.symbols:
+            print(f"\n--- {self.SYMBOLS[symbol]['twelve']} ---")
+            anomalies = {k: v for k, v in self.validators[symbol].counts.items() if v}
+            if anomalies:
+                print(f"Quality: {anomalies}")
+            candles = self.buffers[symbol].frame()
+            if not candles.empty:
+                latest_1m = candles.iloc[-1]
+                print(f"1M: {len(candles)} candles")
+                print(f"    Latest: {candles.index[-1]} | O:{latest_1m['open']:.5f} "
+                      f"H:{latest_1m['high']:.5f} L:{latest_1m['low']:.5f} C:{latest_1m['close']:.5f}")
+
+            for tf_name in self.TIMEFRAMES.keys():
+                df = self.symbol_timeframes[symbol].get(tf_name, pd.DataFrame())
+                if not df.empty:
+                    latest = df.iloc[-1]
+                    print(f"{tf_name:>3}: {len(df)} candles")
+                    print(f"    Latest: {df.index[-1]} | O:{latest['open']:.5f} "
+                          f"H:{latest['high']:.5f} L:{latest['low']:.5f} C:{latest['close']:.5f}")
 
         print("=" * 50)
 
+    def quality_report(self) -> Dict[str, Dict[str, int]]:
+        """Anomaly counters of the streaming data-quality checks per symbol."""
+        return {symbol: dict(validator.counts) for symbol, validator in self.validators.items()}
+
     def validate_data(self) -> bool:
-        """Validate data integrity."""
-        if self.candles_1m.empty:
-            logger.warning("No data to validate")
-            return False
+        """
+        Validate data integrity for every symbol.
 
-        try:
-            # Check OHLC relationships
-            invalid = (
-                (self.candles_1m['high'] < self.candles_1m['low']) |
-                (self.candles_1m['high'] < self.candles_1m['open']) |
-                (self.candles_1m['high'] < self.candles_1m['close']) |
-                (self.candles_1m['low'] > self.candles_1m['open']) |
-                (self.candles_1m['low'] > self.candles_1m['close'])
-            )
+        Checks the whole buffer once (e.g. after recovery) and reports the
+        counters of the streaming checks applied on every merge.
+        """
+        valid = True
 
-            if invalid.any():
-                logger.error(
-                    f"Found {invalid.sum()} invalid OHLC relationships")
-                return False
+        for symbol in self.symbols:
+            candles = self.buffers[symbol].frame()
+            if candles.empty:
+                logger.warning(f"{symbol}: no data to validate")
+                valid = False
+                continue
 
-            logger.info("Data validation passed")
-            return True
+            try:
+                # Check OHLC relationships
+                invalid = invalid_ohlc(candles)
 
-        except Exception as e:
-            logger.error(f"Data validation failed: {e}")
-            return False
+                if invalid.any():
+                    logger.error(
+                        f"{symbol}: found {invalid.sum()} invalid OHLC relationships")
+                    valid = False
+
+                # Anomalies seen by the streaming checks since startup
+                anomalies = {k: v for k, v in self.validators[symbol].counts.items() if v}
+                if anomalies:
+                    logger.warning(f"{symbol}: data-quality anomalies {anomalies}")
+
+            except Exception as e:
+                logger.error(f"{symbol}: data validation failed: {e}")
+                valid = False
+
+        if valid:
+            logger.info("Data validation passed")
+        return valid
 
 
 def main():
@@ -675,6 +1953,12 @@ def main():
 
     # Initialize aggregator
     aggregator = MultiSourceForexAggregator()
+    if aggregator.METRICS_PORT:
+        aggregator.metrics.serve(aggregator.METRICS_PORT)
+    if aggregator.EVENT_SOCKET:
+        aggregator.serve_events(aggregator.EVENT_SOCKET)
+    if aggregator.SHARED_BUS:
+        aggregator.publish_shared(aggregator.SHARED_BUS)
 
     # Load previous state or bootstrap
     if not aggregator.load_state():
@@ -688,9 +1972,9 @@ def main():
     # Print initial status
     aggregator.print_status()
 
-    # Main update loop
+    # Main update loop: polls follow candle closes (see PollScheduler)
     logger.info("Starting real-time update loop...")
-    update_interval = 60  # seconds
+    error_backoff = 120  # seconds
     consecutive_failures = 0
     max_failures = 5
 
@@ -700,7 +1984,8 @@ def main():
                 if aggregator.fetch_latest_data():
                     aggregator.print_status()
                     consecutive_failures = 0
-                else:
+                elif aggregator.scheduler.stale(aggregator._newest_candle()):
+                    # Empty polls while the candle is merely not published yet are expected
                     consecutive_failures += 1
                     logger.warning(
                         f"No new data ({consecutive_failures}/{max_failures})")
@@ -714,7 +1999,10 @@ def main():
                         logger.error(
                             "Bootstrap also failed. Continuing anyway...")
 
-                time.sleep(update_interval)
+                aggregator.write_metrics()
+                wait = aggregator.next_poll_in()
+                logger.debug(f"Next poll in {wait:.1f}s")
+                time.sleep(wait)
 
             except KeyboardInterrupt:
                 logger.info("Shutdown requested")
@@ -723,12 +2011,15 @@ def main():
             except Exception as e:
                 logger.error(f"Update loop error: {e}")
                 logger.error(traceback.format_exc())
-                time.sleep(update_interval * 2)
+                time.sleep(error_backoff)
 
     finally:
         logger.info("Saving final state...")
-        aggregator._save_state()
+        aggregator._save_state(checkpoint=True)
         aggregator._save_to_database()
+        aggregator._save_history()
+        aggregator.close()
+        aggregator.save_snapshot()
         logger.info("Shutdown complete")
 
 
@@ -0,0 +1,358 @@
+"""
+Candle Event Subscriptions
+==========================
+
+Publish/subscribe delivery of ingest events, so strategies react right
+after a merge instead of polling ``get_timeframe_data`` and diffing:
+
+- ``candle``: a new 1-minute candle was appended
+- ``bar_closed``: a bar closed on a timeframe (15M, 1H, ...)
+- ``bar_revised``: a stored 1M candle or closed bar was rewritten because
+  the provider revised it
+
+Publishing never blocks the ingest loop. Every subscription has its own
+bounded queue drained by its own thread (callbacks), event loop (async
+iterators) or socket writer (local IPC), so events reach each subscriber
+in publish order and a slow subscriber only delays itself. When its queue
+is full the oldest event is dropped (``overflow='drop_oldest'``, keep the
+latest prices) or the new one is (``'drop_newest'``); drops are counted
+and visible as gaps in the bus-wide ``sequence`` numbers.
+
+``EventServer`` forwards events to local processes as newline-delimited
+JSON over a Unix socket (TCP on localhost where those are unavailable);
+``EventClient`` reads them back.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+EVENT_KINDS = ('candle', 'bar_closed', 'bar_revised')
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest')
+
+
+class CandleEvent(NamedTuple):
+    """One candle or bar event; ``timestamp`` is the bar's (naive UTC) open time."""
+
+    kind: str
+    symbol: str
+    timeframe: str
+    timestamp: pd.Timestamp
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    sequence: int = 0
+
+    def to_json(self) -> str:
+        event = self._asdict()
+        event['timestamp'] = self.timestamp.isoformat()
+        return json.dumps(event)
+
+    @classmethod
+    def from_json(cls, line: Union[str, bytes]) -> 'CandleEvent':
+        event = json.loads(line)
+        event['timestamp'] = pd.Timestamp(event['timestamp'])
+        return cls(**event)
+
+
+def bar_events(kind: str, symbol: str, timeframe: str, bars: pd.DataFrame) -> List[CandleEvent]:
+    """Events for the rows of a candle/bar frame, oldest first."""
+    if bars.empty:
+        return []
+    columns = [bars[col].tolist() for col in ('open', 'high', 'low', 'close', 'volume')]
+    return [CandleEvent(kind, symbol, timeframe, timestamp, *values)
+            for timestamp, *values in zip(bars.index, *columns)]
+
+
+class Subscription:
+    """Bounded, ordered queue of events for one subscriber."""
+
+    def __init__(self, bus: 'EventBus', kinds: Optional[Iterable[str]] = None,
+                 symbols: Optional[Iterable[str]] = None,
+                 timeframes: Optional[Iterable[str]] = None,
+                 maxsize: int = 10_000, overflow: str = 'drop_oldest'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.bus = bus
+        self.kinds = None if kinds is None else frozenset(kinds)
+        self.symbols = None if symbols is None else frozenset(symbols)
+        self.timeframes = None if timeframes is None else frozenset(timeframes)
+        self.maxsize = maxsize
+        self.overflow = overflow
+
+        self.queue: Deque[CandleEvent] = deque()
+        self.delivered = 0
+        self.dropped = 0
+        self.closed = False
+        self._ready = threading.Condition(threading.Lock())
+
+    def matches(self, event: CandleEvent) -> bool:
+        return ((self.kinds is None or event.kind in self.kinds) and
+                (self.symbols is None or event.symbol in self.symbols) and
+                (self.timeframes is None or event.timeframe in self.timeframes))
+
+    def offer(self, events: List[CandleEvent]) -> None:
+        """Queue events without blocking, dropping per the overflow policy."""
+        with self._ready:
+            for event in events:
+                if len(self.queue) >= self.maxsize:
+                    self.dropped += 1
+                    if self.overflow == 'drop_newest':
+                        continue
+                    self.queue.popleft()
+                self.queue.append(event)
+            self._ready.notify()
+        self._wake()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[CandleEvent]:
+        """Next event, or None on timeout or once closed and drained."""
+        with self._ready:
+            if not self.queue and not self.closed:
+                self._ready.wait(timeout)
+            if not self.queue:
+                return None
+            self.delivered += 1
+            return self.queue.popleft()
+
+    def __iter__(self) -> Iterator[CandleEvent]:
+        while True:
+            event = self.get()
+            if event is None:
+                if self.closed:
+                    return
+                continue
+            yield event
+
+    def close(self) -> None:
+        """Unsubscribe; events already queued are still delivered."""
+        self.bus.unsubscribe(self)
+        with self._ready:
+            self.closed = True
+            self._ready.notify_all()
+        self._wake()
+
+    def stats(self) -> Dict[str, int]:
+        return {'queued': len(self.queue), 'delivered': self.delivered, 'dropped': self.dropped}
+
+    def _wake(self) -> None:
+        pass
+
+
+class CallbackSubscription(Subscription):
+    """Subscription delivering to a callback on its own thread."""
+
+    def __init__(self, bus: 'EventBus', callback: Callable[[CandleEvent], Any], **kwargs):
+        super().__init__(bus, **kwargs)
+        self.callback = callback
+        self.errors = 0
+        self.thread = threading.Thread(target=self._run, name='event-subscriber', daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        for event in self:
+            try:
+                self.callback(event)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Event subscriber failed on {event.kind} {event.timestamp}: {e}")
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """Wait until every queued event has been handled (after ``close``)."""
+        self.thread.join(timeout)
+
+
+class AsyncSubscription(Subscription):
+    """Subscription consumed with ``async for`` on an event loop."""
+
+    def __init__(self, bus: 'EventBus', loop: asyncio.AbstractEventLoop, **kwargs):
+        super().__init__(bus, **kwargs)
+        self.loop = loop
+        self._event = asyncio.Event()
+
+    def __aiter__(self) -> 'AsyncSubscription':
+        return self
+
+    async def __anext__(self) -> CandleEvent:
+        while True:
+            event = self.get(timeout=0)
+            if event is not None:
+                return event
+            if self.closed:
+                raise StopAsyncIteration
+            self._event.clear()
+            if self.queue or self.closed:
+                continue
+            await self._event.wait()
+
+    def _wake(self) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            pass  # loop already closed
+
+
+class EventBus:
+    """Fans published events out to every matching subscription."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions: List[Subscription] = []
+        self.sequence = 0
+        self.published = 0
+
+    @property
+    def active(self) -> bool:
+        """Whether anyone is subscribed (publishers skip building events otherwise)."""
+        return bool(self.subscriptions)
+
+    def subscribe(self, callback: Callable[[CandleEvent], Any], **kwargs) -> CallbackSubscription:
+        """
+        Call ``callback(event)`` on a dedicated thread for matching events.
+
+        Args:
+            callback: Event handler; exceptions are logged and counted
+            **kwargs: ``kinds``, ``symbols``, ``timeframes`` filters (None =
+                all), ``maxsize`` of the queue and ``overflow`` policy
+        """
+        return self._add(CallbackSubscription(self, callback, **kwargs))
+
+    def subscribe_async(self, loop: Optional[asyncio.AbstractEventLoop] = None,
+                        **kwargs) -> AsyncSubscription:
+        """Async iterator over matching events (call from the consuming loop)."""
+        return self._add(AsyncSubscription(self, loop or asyncio.get_running_loop(), **kwargs))
+
+    def subscribe_queue(self, **kwargs) -> Subscription:
+        """Blocking iterator / ``get()`` queue over matching events."""
+        return self._add(Subscription(self, **kwargs))
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self.lock:
+            if subscription in self.subscriptions:
+                self.subscriptions = [s for s in self.subscriptions if s is not subscription]
+
+    def publish(self, events: List[CandleEvent]) -> None:
+        """Number and enqueue events for every matching subscriber; never blocks on them."""
+        if not events:
+            return
+        with self.lock:
+            numbered = []
+            for event in events:
+                self.sequence += 1
+                numbered.append(event._replace(sequence=self.sequence))
+            self.published += len(numbered)
+            subscriptions = self.subscriptions
+            # Offer under the lock so concurrent publishers keep sequence order
+            for subscription in subscriptions:
+                matching = [event for event in numbered if subscription.matches(event)]
+                if matching:
+                    subscription.offer(matching)
+
+    def close(self) -> None:
+        for subscription in list(self.subscriptions):
+            subscription.close()
+
+    def _add(self, subscription: Subscription) -> Subscription:
+        with self.lock:
+            self.subscriptions = self.subscriptions + [subscription]
+        return subscription
+
+
+class EventServer:
+    """Streams bus events to local processes as newline-delimited JSON."""
+
+    def __init__(self, bus: EventBus, address: Union[str, tuple], maxsize: int = 10_000):
+        """
+        Args:
+            bus: Event source
+            address: Unix socket path, or (host, port) for TCP on localhost
+            maxsize: Per-client queue size; slow clients drop their oldest events
+        """
+        self.bus = bus
+        self.maxsize = maxsize
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.remove(address)
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(address)
+        self.sock.listen()
+        self.address = self.sock.getsockname()
+        # Appended on the accept thread, removed on subscriber threads
+        self.lock = threading.Lock()
+        self.clients: List[CallbackSubscription] = []
+        self._closed = False
+        threading.Thread(target=self._accept, name='event-server', daemon=True).start()
+        logger.info(f"Event server listening on {self.address}")
+
+    def _accept(self) -> None:
+        while not self._closed:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            if conn.family == socket.AF_INET:
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.lock:
+                if self._closed:
+                    conn.close()
+                    return
+                # Registered under the lock, so a send failing right away finds it
+                self.clients.append(self.bus.subscribe(
+                    self._sender(conn), maxsize=self.maxsize, overflow='drop_oldest'))
+
+    def _sender(self, conn: socket.socket) -> Callable[[CandleEvent], None]:
+        def send(event: CandleEvent) -> None:
+            try:
+                conn.sendall(event.to_json().encode() + b'\n')
+            except OSError:
+                conn.close()
+                with self.lock:
+                    gone = [client for client in self.clients if client.callback is send]
+                    self.clients = [client for client in self.clients if client.callback is not send]
+                for client in gone:
+                    client.close()
+        return send
+
+    def close(self) -> None:
+        with self.lock:
+            self._closed = True
+            clients, self.clients = self.clients, []
+        self.sock.close()
+        for client in clients:
+            client.close()
+        if self.sock.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.remove(self.address)
+
+
+class EventClient:
+    """Reads events from an ``EventServer``."""
+
+    def __init__(self, address: Union[str, tuple], timeout: Optional[float] = None):
+        if isinstance(address, str):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(address)
+        else:
+            self.sock = socket.create_connection(address, timeout)
+        self.reader = self.sock.makefile('rb')
+
+    def __iter__(self) -> Iterator[CandleEvent]:
+        for line in self.reader:
+            yield CandleEvent.from_json(line)
+
+    def close(self) -> None:
+        self.reader.close()
+        self.sock.close()
@@ -0,0 +1,140 @@
+"""
+Concurrent and Hedged Provider Fetching
+=======================================
+
+Runs provider requests on a small thread pool. Providers are launched in
+priority order; the next one fires when the previous returns nothing useful
+or, in hedged mode, once ``hedge_delay`` seconds pass without an answer.
+The first response accepted by the caller wins and every other request is
+cancelled: queued ones never start, and running ones see the shared cancel
+event (e.g. while sleeping on a rate limit) and give up.
+
+hedge_delay=None reproduces the old strictly sequential failover and
+hedge_delay=0 fires every provider at once.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# A provider call receives the cancel event and returns 1M candles, either
+# one frame or a dict of symbol -> frame for batched requests
+ProviderResponse = Union[pd.DataFrame, Dict[str, pd.DataFrame]]
+ProviderCall = Callable[[threading.Event], ProviderResponse]
+
+
+def row_count(data: ProviderResponse) -> int:
+    """Number of candles in a provider response."""
+    if isinstance(data, dict):
+        return sum(len(df) for df in data.values())
+    return len(data)
+
+
+class ProviderFetcher:
+    """Thread-pool runner for provider requests with hedging and cancellation."""
+
+    def __init__(self, max_workers: int = 4):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='provider')
+        self.in_flight: Dict[str, Future] = {}
+
+    def fetch(self, calls: List[Tuple[str, ProviderCall]],
+              accept: Callable[[str, ProviderResponse], bool],
+              hedge_delay: Optional[float] = None,
+              timeout: float = 120.0) -> Dict[str, Any]:
+        """
+        Fetch from providers until one response is accepted.
+
+        Args:
+            calls: (source, call) pairs in priority order
+            accept: Called on the calling thread with each non-failed
+                response; return True to take it and cancel the rest
+            hedge_delay: Seconds to wait for a provider before also firing
+                the next one (None = only on failure, 0 = all at once)
+            timeout: Overall deadline in seconds
+
+        Returns:
+            Dict with 'source' and 'data' of the accepted response (both
+            None if nothing was accepted), 'latency' in seconds
+            until acceptance, and per-provider 'calls' stats
+        """
+        cancel = threading.Event()
+        started = time.monotonic()
+        deadline = started + timeout
+        queue = [(source, call) for source, call in calls
+                 if not self._still_running(source)]
+        pending: Dict[Future, str] = {}
+        stats: Dict[str, Dict[str, Any]] = {}
+        next_launch = started
+
+        result = {'source': None, 'data': None, 'latency': None, 'calls': stats}
+
+        try:
+            while queue or pending:
+                now = time.monotonic()
+                if now >= deadline:
+                    logger.warning("Provider fetch timed out")
+                    break
+
+                if queue and (not pending or (hedge_delay is not None and now >= next_launch)):
+                    source, call = queue.pop(0)
+                    future = self.executor.submit(self._timed_call, call, cancel)
+                    pending[future] = source
+                    self.in_flight[source] = future
+                    stats[source] = {'started': now - started}
+                    if hedge_delay is not None:
+                        next_launch = now + hedge_delay
+                    continue
+
+                wait_for = deadline - now
+                if queue and hedge_delay is not None:
+                    wait_for = min(wait_for, next_launch - now)
+                done, _ = wait(pending, timeout=max(wait_for, 0),
+                               return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    source = pending.pop(future)
+                    data, elapsed, error = future.result()
+                    rows = row_count(data)
+                    stats[source].update(
+                        {'latency': elapsed, 'rows': rows, 'error': error})
+
+                    if error is None and rows and accept(source, data):
+                        result.update(source=source, data=data,
+                                      latency=time.monotonic() - started)
+                        return result
+
+                    # Useless answer: fail over immediately instead of waiting
+                    next_launch = time.monotonic()
+
+            return result
+
+        finally:
+            cancel.set()
+            for future, source in pending.items():
+                if future.cancel():
+                    stats[source]['cancelled'] = True
+
+    def _still_running(self, source: str) -> bool:
+        """Skip providers whose abandoned call from a previous poll is still running."""
+        future = self.in_flight.get(source)
+        return future is not None and not future.done()
+
+    @staticmethod
+    def _timed_call(call: ProviderCall, cancel: threading.Event) -> Tuple[ProviderResponse, float, Optional[str]]:
+        started = time.monotonic()
+        try:
+            data = call(cancel)
+            return data, time.monotonic() - started, None
+        except Exception as e:
+            # Reported in the call stats; the caller logs it with the source
+            return pd.DataFrame(), time.monotonic() - started, str(e)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,252 @@
+"""
+Provider Health and Circuit Breakers
+====================================
+
+Tracks how well each provider is doing and decides which providers a poll
+tries, and in what order:
+
+- Every finished call updates exponentially weighted averages of its
+  latency, its error rate (errors and empty answers), and the age of the
+  freshest candle it served (how far behind the market its data is).
+- Providers are ordered by expected time to a fresh candle:
+  ``latency / success_rate + age``. Providers without samples yet get
+  neutral priors and keep their configured order among themselves.
+- ``failure_threshold`` consecutive failures open a provider's circuit;
+  it is skipped for ``cooldown`` seconds. After that the circuit is half
+  open and the next poll sends one probe call (tried first, so hedging
+  still covers it). A successful probe closes the circuit. A failed probe
+  reopens it for twice the previous cooldown, capped at ``max_cooldown``.
+  So a provider is never skipped forever.
+- A call still running when another provider's answer is taken has not
+  failed, so it ends the failure streak. Without this, a provider that is
+  usually outrun (concurrent and hedged modes) would only ever report its
+  fast failures, and those alone would open its circuit.
+
+State is stamped with wall-clock time and saved to a JSON file, like the
+rate limits, so a restart keeps open circuits and learned latencies.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+CIRCUIT_STATES = (CLOSED, HALF_OPEN, OPEN)
+
+# Priors for providers without samples
+_PRIOR_LATENCY = 1.0
+_PRIOR_AGE = 60.0
+
+_SAVED_FIELDS = ('state', 'latency', 'error_rate', 'age', 'consecutive_failures',
+                 'opened_at', 'cooldown', 'calls', 'failures')
+
+
+class ProviderHealth:
+    """Running health statistics and circuit state of one provider."""
+
+    def __init__(self, cooldown: float):
+        self.state = CLOSED
+        self.latency: Optional[float] = None  # EWMA seconds per call
+        self.error_rate = 0.0  # EWMA of failed calls
+        self.age: Optional[float] = None  # EWMA seconds since the freshest served candle closed
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.cooldown = cooldown
+        self.calls = 0
+        self.failures = 0
+        self.probing = False  # half-open probe in flight
+
+    def expected_seconds(self) -> float:
+        """Expected seconds until this provider delivers a fresh candle."""
+        latency = _PRIOR_LATENCY if self.latency is None else self.latency
+        age = _PRIOR_AGE if self.age is None else self.age
+        return latency / max(1.0 - self.error_rate, 0.05) + age
+
+
+class HealthMonitor:
+    """Health scores, dynamic ordering and circuit breakers for all providers."""
+
+    def __init__(self, sources: Iterable[str], state_file: Optional[str] = None,
+                 clock: Callable[[], float] = time.time, alpha: float = 0.2,
+                 failure_threshold: int = 3, cooldown: float = 60.0,
+                 max_cooldown: float = 900.0):
+        """
+        Args:
+            sources: Provider names in configured priority order
+            state_file: JSON file for health state (None = not persisted)
+            clock: Wall-clock time in seconds
+            alpha: Weight of the newest sample in the moving averages
+            failure_threshold: Consecutive failures that open a circuit
+            cooldown: Seconds an opened circuit waits before a probe
+            max_cooldown: Cap of the cooldown after repeated failed probes
+        """
+        self.clock = clock
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state_file = state_file
+        self.lock = threading.Lock()
+        self.providers: Dict[str, ProviderHealth] = {
+            source: ProviderHealth(cooldown) for source in sources}
+        self._load_state()
+
+    def allow(self, source: str) -> bool:
+        """
+        Whether ``source`` may be called by this poll. An open circuit whose
+        cooldown has passed turns half open and admits one probe.
+        """
+        health = self._health(source)
+        with self.lock:
+            if health.state == OPEN and self.clock() >= health.opened_at + health.cooldown:
+                health.state = HALF_OPEN
+                logger.info(f"{source}: circuit half open, probing")
+            if health.state == HALF_OPEN:
+                if health.probing:
+                    return False
+                health.probing = True
+                return True
+            return health.state == CLOSED
+
+    def order(self, sources: Iterable[str]) -> List[str]:
+        """
+        Providers sorted by expected time to a fresh candle, half-open
+        probes first (ties keep the given order).
+        """
+        sources = list(sources)
+        return sorted(sources, key=lambda source: (
+            self._health(source).state != HALF_OPEN,
+            self._health(source).expected_seconds()))
+
+    def record(self, source: str, latency: float, ok: bool, age: Optional[float] = None) -> None:
+        """
+        Record a finished call.
+
+        Args:
+            source: Provider name
+            latency: Call duration in seconds
+            ok: False for errors and empty answers
+            age: Seconds since the freshest candle the call served closed
+        """
+        health = self._health(source)
+        with self.lock:
+            health.calls += 1
+            health.probing = False
+            health.latency = self._ewma(health.latency, latency)
+            health.error_rate = self._ewma(health.error_rate, 0.0 if ok else 1.0)
+            if ok:
+                if age is not None:
+                    health.age = self._ewma(health.age, max(age, 0.0))
+                if health.state != CLOSED:
+                    logger.info(f"{source}: probe succeeded, circuit closed")
+                health.state = CLOSED
+                health.consecutive_failures = 0
+                health.cooldown = self.base_cooldown
+                return
+
+            health.failures += 1
+            health.consecutive_failures += 1
+            if health.state == HALF_OPEN:
+                health.cooldown = min(health.cooldown * 2, self.max_cooldown)
+                self._open(source, health)
+            elif health.state == CLOSED and health.consecutive_failures >= self.failure_threshold:
+                self._open(source, health)
+
+    def release(self, source: str) -> None:
+        """Forget a probe that was admitted but never finished (cancelled or not launched)."""
+        with self.lock:
+            self._health(source).probing = False
+
+    def interrupted(self, source: str) -> None:
+        """
+        A call still running when another provider's answer was taken. It
+        had not failed by then, so it ends the failure streak; otherwise a
+        provider that is usually outrun would only ever report its fast
+        failures and have its circuit opened by them.
+        """
+        health = self._health(source)
+        with self.lock:
+            health.probing = False
+            if health.state == CLOSED:
+                health.consecutive_failures = 0
+
+    def available_in(self, source: str) -> float:
+        """Seconds until ``source`` may be called again (0 unless its circuit is open)."""
+        health = self._health(source)
+        if health.state != OPEN:
+            return 0.0
+        return max(0.0, health.opened_at + health.cooldown - self.clock())
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """Circuit state and health statistics per provider."""
+        with self.lock:
+            return {source: {
+                'state': health.state,
+                'latency': health.latency,
+                'error_rate': health.error_rate,
+                'age': health.age,
+                'expected_seconds': health.expected_seconds(),
+                'consecutive_failures': health.consecutive_failures,
+                'retry_in': self.available_in(source),
+                'calls': health.calls,
+                'failures': health.failures
+            } for source, health in self.providers.items()}
+
+    def save(self) -> None:
+        """Write health state to the state file (atomic replace)."""
+        if self.state_file is None:
+            return
+        try:
+            with self.lock:
+                state = {source: {field: getattr(health, field) for field in _SAVED_FIELDS}
+                         for source, health in self.providers.items()}
+                tmp_file = f"{self.state_file}.tmp"
+                with open(tmp_file, 'w') as f:
+                    json.dump(state, f)
+                os.replace(tmp_file, self.state_file)
+        except OSError as e:
+            logger.warning(f"Could not save provider health: {e}")
+
+    def _open(self, source: str, health: ProviderHealth) -> None:
+        health.state = OPEN
+        health.opened_at = self.clock()
+        logger.warning(f"{source}: circuit open after {health.consecutive_failures} "
+                       f"consecutive failures, probing again in {health.cooldown:.0f}s")
+
+    def _health(self, source: str) -> ProviderHealth:
+        health = self.providers.get(source)
+        if health is None:
+            health = self.providers[source] = ProviderHealth(self.base_cooldown)
+        return health
+
+    def _ewma(self, average: Optional[float], sample: float) -> float:
+        return sample if average is None else average + self.alpha * (sample - average)
+
+    def _load_state(self) -> None:
+        if self.state_file is None or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable provider health state: {e}")
+            return
+
+        for source, saved in state.items():
+            health = self.providers.get(source)
+            if health is None:
+                continue
+            for field in _SAVED_FIELDS:
+                if field in saved:
+                    setattr(health, field, saved[field])
+            if health.state not in CIRCUIT_STATES or (health.state == OPEN and health.opened_at is None):
+                health.state = CLOSED
+            elif health.state == HALF_OPEN:
+                # The probe in flight at shutdown never finished
+                health.state = OPEN
+                health.opened_at = min(health.opened_at or 0.0, self.clock())
@@ -0,0 +1,216 @@
+"""
+Partitioned Columnar 1M History
+===============================
+
+Multi-year store for 1-minute candles, alongside the SQLite tables that
+serve the live timeframes. Candles are kept in uncompressed Arrow IPC
+files, one per symbol and UTC day::
+
+    {root}/{SYMBOL}/{YYYY-MM}/{YYYY-MM-DD}.arrow
+
+- Writes rewrite only the day partitions they touch (atomic replace), so
+  appending the latest minutes costs one small file, not the history.
+- Reads list only the month directories and day files overlapping the
+  requested range (partition pruning), memory-map them and copy the
+  column buffers straight into one NumPy array per column.
+- ``aggregate`` derives any ``TIMEFRAMES`` bar from the stored 1M data
+  with vectorized ``reduceat`` instead of storing every timeframe.
+
+Columns are ``ts`` (int64 epoch ns, naive UTC) and float64 OHLCV. Arrow
+is optional: without ``pyarrow`` the aggregator runs without this store.
+"""
+
+import logging
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from aggregation import aggregate_columns
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # optional dependency
+    pa = None
+
+COLUMNS = ['ts', 'open', 'high', 'low', 'close', 'volume']
+
+_NS_PER_DAY = 86_400_000_000_000
+
+
+def history_available() -> bool:
+    """Whether pyarrow is installed (``pip install pyarrow``)."""
+    return pa is not None
+
+
+def empty_columns() -> Dict[str, np.ndarray]:
+    """Store columns with no rows."""
+    return {col: np.empty(0, dtype=np.int64 if col == 'ts' else np.float64) for col in COLUMNS}
+
+
+def frame_columns(candles: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Store columns of a candle frame (sorted, last duplicate kept)."""
+    index = candles.index
+    if index.tz is not None:
+        index = index.tz_convert(None)
+    columns = {'ts': index.as_unit('ns').asi8}
+    for col in COLUMNS[1:]:
+        columns[col] = candles[col].to_numpy(dtype=np.float64)
+    return _dedupe(columns)
+
+
+def columns_frame(columns: Dict[str, np.ndarray], index_name: str = 'Datetime') -> pd.DataFrame:
+    """Candle frame over store columns."""
+    index = pd.DatetimeIndex(columns['ts'].view('datetime64[ns]'), name=index_name)
+    return pd.DataFrame({col: columns[col] for col in COLUMNS[1:]}, index=index, copy=False)
+
+
+def _dedupe(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    stamps = columns['ts']
+    if len(stamps) < 2 or (np.diff(stamps) > 0).all():
+        return columns
+    order = np.argsort(stamps, kind='stable')
+    stamps = stamps[order]
+    last = np.append(stamps[1:] != stamps[:-1], True)
+    return {col: values[order][last] for col, values in columns.items()}
+
+
+class HistoryStore:
+    """Day-partitioned Arrow IPC files of 1M candles, one directory per symbol."""
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: Directory holding the symbol directories
+        """
+        if pa is None:
+            raise ImportError("The columnar history store needs pyarrow (pip install pyarrow)")
+        self.root = root
+        self.schema = pa.schema([('ts', pa.int64())] +
+                                [(col, pa.float64()) for col in COLUMNS[1:]])
+        self.watermarks: Dict[str, Optional[int]] = {}  # epoch ns of the last flushed candle
+        self.partitions_read = 0  # files opened by scans, for pruning checks
+
+    def partition_path(self, symbol: str, day: int) -> str:
+        """File of the UTC day ``day`` (days since epoch)."""
+        date = pd.Timestamp(day * _NS_PER_DAY)
+        return os.path.join(self.root, symbol, date.strftime('%Y-%m'),
+                            f"{date.strftime('%Y-%m-%d')}.arrow")
+
+    def partitions(self, symbol: str, start=None, end=None) -> List[str]:
+        """Day files overlapping [start, end), oldest first, pruned by name."""
+        base = os.path.join(self.root, symbol)
+        if not os.path.isdir(base):
+            return []
+        first = pd.Timestamp(start).strftime('%Y-%m-%d') if start is not None else ''
+        last = (pd.Timestamp(end) - pd.Timedelta(1, 'ns')).strftime('%Y-%m-%d') \
+            if end is not None else '9999'
+
+        paths = []
+        for month in sorted(os.listdir(base)):
+            if month < first[:7] or month > last[:7]:
+                continue
+            for name in sorted(os.listdir(os.path.join(base, month))):
+                if name.endswith('.arrow') and first <= name[:10] <= last:
+                    paths.append(os.path.join(base, month, name))
+        return paths
+
+    def write(self, symbol: str, candles: pd.DataFrame) -> int:
+        """
+        Upsert candles (later values win for the same minute).
+
+        Returns:
+            int: Rows written
+        """
+        if candles.empty:
+            return 0
+        columns = frame_columns(candles)
+        days = columns['ts'] // _NS_PER_DAY
+        bounds = np.flatnonzero(np.concatenate([[True], days[1:] != days[:-1], [True]]))
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            self._write_day(symbol, int(days[lo]), {col: values[lo:hi] for col, values in columns.items()})
+
+        last = int(columns['ts'][-1])
+        watermark = self.watermark(symbol)
+        if watermark is None or last > watermark:
+            self.watermarks[symbol] = last
+        return len(columns['ts'])
+
+    def flush(self, symbol: str, candles_1m: pd.DataFrame) -> int:
+        """Write the buffer's candles after the symbol's watermark."""
+        if candles_1m.empty:
+            return 0
+        watermark = self.watermark(symbol)
+        if watermark is not None:
+            since = pd.Timestamp(watermark).floor(np.datetime_data(candles_1m.index.dtype)[0])
+            candles_1m = candles_1m.iloc[candles_1m.index.searchsorted(since, side='right'):]
+        return self.write(symbol, candles_1m)
+
+    def rewind(self, symbol: str, since: pd.Timestamp) -> None:
+        """Re-write candles from ``since`` on the next flush (after revisions)."""
+        since_ns = pd.Timestamp(since).as_unit('ns').value
+        watermark = self.watermark(symbol)
+        if watermark is not None and since_ns <= watermark:
+            self.watermarks[symbol] = since_ns - 1
+
+    def watermark(self, symbol: str) -> Optional[int]:
+        """Epoch ns of the newest stored candle (read once from the last partition)."""
+        if symbol not in self.watermarks:
+            paths = self.partitions(symbol)
+            stamps = self._read(paths[-1])['ts'] if paths else []
+            self.watermarks[symbol] = int(stamps[-1]) if len(stamps) else None
+        return self.watermarks[symbol]
+
+    def scan(self, symbol: str, start=None, end=None) -> Dict[str, np.ndarray]:
+        """
+        1M candles in [start, end) as one contiguous NumPy array per column.
+
+        Args:
+            symbol: Symbol directory, e.g. 'EURJPY'
+            start, end: Naive UTC bounds (None = unbounded)
+        """
+        parts = [self._read(path) for path in self.partitions(symbol, start, end)]
+        if not parts:
+            return empty_columns()
+        lo = 0 if start is None else int(parts[0]['ts'].searchsorted(
+            pd.Timestamp(start).as_unit('ns').value))
+        hi = None if end is None else int(parts[-1]['ts'].searchsorted(
+            pd.Timestamp(end).as_unit('ns').value))
+        if len(parts) == 1:
+            return {col: values[lo:hi].copy() for col, values in parts[0].items()}
+        parts[0] = {col: values[lo:] for col, values in parts[0].items()}
+        parts[-1] = {col: values[:hi] for col, values in parts[-1].items()}
+        return {col: np.concatenate([part[col] for part in parts]) for col in COLUMNS}
+
+    def aggregate(self, symbol: str, freq: str, start=None, end=None) -> Dict[str, np.ndarray]:
+        """Complete bars of ``freq`` (a TIMEFRAMES value) built from the 1M candles in [start, end)."""
+        end_ns = None if end is None else pd.Timestamp(end).as_unit('ns').value
+        return aggregate_columns(self.scan(symbol, start, end), freq, end_ns)
+
+    def _read(self, path: str) -> Dict[str, np.ndarray]:
+        """Columns of one partition as zero-copy views over the memory-mapped file."""
+        self.partitions_read += 1
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        return {col: table.column(col).to_numpy() for col in COLUMNS}
+
+    def _write_day(self, symbol: str, day: int, columns: Dict[str, np.ndarray]) -> None:
+        path = self.partition_path(symbol, day)
+        if os.path.exists(path):
+            existing = self._read(path)
+            if len(existing['ts']) and existing['ts'][-1] < columns['ts'][0]:
+                columns = {col: np.concatenate([existing[col], columns[col]]) for col in COLUMNS}
+            else:
+                columns = _dedupe({col: np.concatenate([existing[col], columns[col]])
+                                   for col in COLUMNS})
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        table = pa.Table.from_arrays([pa.array(columns[col]) for col in COLUMNS], schema=self.schema)
+        tmp_file = f"{path}.tmp"
+        with pa.OSFile(tmp_file, 'wb') as sink, pa.ipc.new_file(sink, self.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_file, path)
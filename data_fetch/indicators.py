@@ -0,0 +1,455 @@
+"""
+Incremental Technical Indicators
+================================
+
+Indicators kept per symbol and timeframe next to the closed bars, so
+strategies read them instead of recomputing over the whole frame on every
+tick:
+
+- ``ema_N``: exponential moving average of the close, seeded with the
+  simple average of the first N closes
+- ``atr_N``: Wilder's average true range
+- ``rsi_N``: Wilder's relative strength index
+- ``high_N`` / ``low_N``: highest high / lowest low of the last N bars
+
+Each indicator keeps running state (a smoothed value, the previous close,
+a monotonic deque for rolling extremes), so a closing bar costs O(1).
+``backfill`` computes a whole history vectorized (pandas ``ewm`` for the
+recursive averages, sliding windows for the extremes) and leaves the same
+state the bar-by-bar path would have reached. Values are NaN until an
+indicator has seen enough bars.
+
+``IndicatorSet`` holds the indicators of one timeframe, their values for
+the most recent bars, and a state checkpoint per bar so a provider
+revision of a closed bar rolls back to the bar before it and refolds.
+"""
+
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Bar row as folded by the indicators: open, high, low, close, volume
+Bar = Tuple[float, float, float, float, float]
+
+
+class _Smoother:
+    """Exponential smoothing seeded with the simple average of the first ``period`` inputs."""
+
+    __slots__ = ('period', 'alpha', 'count', 'total', 'value')
+
+    def __init__(self, period: int, alpha: float):
+        self.period = period
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.value = np.nan
+
+    def push(self, x: float) -> float:
+        self.count += 1
+        if self.count < self.period:
+            self.total += x
+        elif self.count == self.period:
+            self.value = (self.total + x) / self.period
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+    def compute(self, x: np.ndarray) -> np.ndarray:
+        """Values for ``x`` from a reset state, leaving the state after its last input."""
+        out = np.full(len(x), np.nan)
+        self.reset()
+        self.count = len(x)
+        if len(x) < self.period:
+            self.total = float(x.sum())
+            return out
+        seeded = x[self.period - 1:].astype(np.float64)
+        seeded[0] = x[:self.period].mean()
+        smoothed = pd.Series(seeded).ewm(alpha=self.alpha, adjust=False).mean()
+        out[self.period - 1:] = smoothed.to_numpy()
+        self.value = float(out[-1])
+        return out
+
+    def export_state(self) -> List[float]:
+        return [self.count, self.total, self.value]
+
+    def restore_state(self, state: List[float]) -> None:
+        self.count, self.total, self.value = int(state[0]), float(state[1]), float(state[2])
+
+
+class Indicator(ABC):
+    """Running indicator over closed bars."""
+
+    def __init__(self, period: int):
+        if period < 1:
+            raise ValueError(f"Indicator period must be positive: {period}")
+        self.period = period
+
+    @abstractmethod
+    def reset(self) -> None:
+        """Forget every folded bar."""
+
+    @abstractmethod
+    def update(self, bar: Bar) -> float:
+        """Fold one closed bar and return the indicator value at it."""
+
+    @abstractmethod
+    def compute(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """Values for a bar history from a reset state, leaving the state after its last bar."""
+
+    @abstractmethod
+    def export_state(self) -> List[Any]:
+        """Running state as JSON-serializable values."""
+
+    @abstractmethod
+    def restore_state(self, state: List[Any]) -> None:
+        """Resume from a state returned by ``export_state``."""
+
+
+class EMA(Indicator):
+    """Exponential moving average of the close (alpha = 2 / (period + 1))."""
+
+    def __init__(self, period: int):
+        super().__init__(period)
+        self.smoother = _Smoother(period, 2 / (period + 1))
+
+    def reset(self) -> None:
+        self.smoother.reset()
+
+    def update(self, bar: Bar) -> float:
+        return self.smoother.push(bar[3])
+
+    def compute(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        return self.smoother.compute(columns['close'])
+
+    def export_state(self) -> List[Any]:
+        return self.smoother.export_state()
+
+    def restore_state(self, state: List[Any]) -> None:
+        self.smoother.restore_state(state)
+
+
+class ATR(Indicator):
+    """Wilder's average true range (alpha = 1 / period)."""
+
+    def __init__(self, period: int):
+        super().__init__(period)
+        self.smoother = _Smoother(period, 1 / period)
+        self.prev_close: Optional[float] = None
+
+    def reset(self) -> None:
+        self.smoother.reset()
+        self.prev_close = None
+
+    def update(self, bar: Bar) -> float:
+        _, high, low, close, _ = bar
+        if self.prev_close is None:
+            true_range = high - low
+        else:
+            true_range = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        return self.smoother.push(true_range)
+
+    def compute(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        high, low, close = columns['high'], columns['low'], columns['close']
+        true_range = high - low
+        if len(close) > 1:
+            prev = close[:-1]
+            true_range[1:] = np.maximum.reduce([true_range[1:], np.abs(high[1:] - prev),
+                                                np.abs(low[1:] - prev)])
+        self.prev_close = float(close[-1]) if len(close) else None
+        return self.smoother.compute(true_range)
+
+    def export_state(self) -> List[Any]:
+        return [self.prev_close, self.smoother.export_state()]
+
+    def restore_state(self, state: List[Any]) -> None:
+        self.prev_close = state[0]
+        self.smoother.restore_state(state[1])
+
+
+class RSI(Indicator):
+    """Wilder's relative strength index over close-to-close changes."""
+
+    def __init__(self, period: int):
+        super().__init__(period)
+        self.gains = _Smoother(period, 1 / period)
+        self.losses = _Smoother(period, 1 / period)
+        self.prev_close: Optional[float] = None
+
+    def reset(self) -> None:
+        self.gains.reset()
+        self.losses.reset()
+        self.prev_close = None
+
+    def update(self, bar: Bar) -> float:
+        close = bar[3]
+        prev, self.prev_close = self.prev_close, close
+        if prev is None:
+            return np.nan
+        change = close - prev
+        return self._rsi(self.gains.push(max(change, 0.0)), self.losses.push(max(-change, 0.0)))
+
+    def compute(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        close = columns['close']
+        out = np.full(len(close), np.nan)
+        change = np.diff(close)
+        gains = self.gains.compute(np.maximum(change, 0.0))
+        losses = self.losses.compute(np.maximum(-change, 0.0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = 100.0 - 100.0 / (1.0 + gains / losses)
+        rsi[losses == 0] = np.where(gains[losses == 0] > 0, 100.0, 50.0)
+        out[1:] = rsi
+        self.prev_close = float(close[-1]) if len(close) else None
+        return out
+
+    @staticmethod
+    def _rsi(gain: float, loss: float) -> float:
+        if np.isnan(gain):
+            return np.nan
+        if loss == 0:
+            return 100.0 if gain > 0 else 50.0
+        return 100.0 - 100.0 / (1.0 + gain / loss)
+
+    def export_state(self) -> List[Any]:
+        return [self.prev_close, self.gains.export_state(), self.losses.export_state()]
+
+    def restore_state(self, state: List[Any]) -> None:
+        self.prev_close = state[0]
+        self.gains.restore_state(state[1])
+        self.losses.restore_state(state[2])
+
+
+class _RollingExtreme(Indicator):
+    """Extreme of one column over the last ``period`` bars (monotonic deque)."""
+
+    column = 'high'
+    sign = 1.0  # +1 for maxima, -1 for minima (compared as sign * value)
+
+    def __init__(self, period: int):
+        super().__init__(period)
+        self.window: Deque[Tuple[int, float]] = deque()  # (bar number, value)
+        self.count = 0
+
+    def reset(self) -> None:
+        self.window.clear()
+        self.count = 0
+
+    def update(self, bar: Bar) -> float:
+        return self._push(bar[1] if self.column == 'high' else bar[2])
+
+    def _push(self, value: float) -> float:
+        window, number = self.window, self.count
+        self.count += 1
+        while window and self.sign * window[-1][1] <= self.sign * value:
+            window.pop()
+        window.append((number, value))
+        if window[0][0] <= number - self.period:
+            window.popleft()
+        return window[0][1] if self.count >= self.period else np.nan
+
+    def compute(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        values = columns[self.column]
+        out = np.full(len(values), np.nan)
+        if len(values) >= self.period:
+            windows = np.lib.stride_tricks.sliding_window_view(values, self.period)
+            out[self.period - 1:] = windows.max(axis=1) if self.sign > 0 else windows.min(axis=1)
+        # Only the last ``period`` bars can still matter
+        self.reset()
+        self.count = max(0, len(values) - self.period)
+        for value in values[self.count:].tolist():
+            self._push(value)
+        return out
+
+    def export_state(self) -> List[Any]:
+        return [self.count, [list(item) for item in self.window]]
+
+    def restore_state(self, state: List[Any]) -> None:
+        self.count = int(state[0])
+        self.window = deque((int(number), float(value)) for number, value in state[1])
+
+
+class RollingHigh(_RollingExtreme):
+    """Highest high of the last ``period`` bars."""
+
+    column = 'high'
+    sign = 1.0
+
+
+class RollingLow(_RollingExtreme):
+    """Lowest low of the last ``period`` bars."""
+
+    column = 'low'
+    sign = -1.0
+
+
+INDICATOR_KINDS = {'ema': EMA, 'atr': ATR, 'rsi': RSI, 'high': RollingHigh, 'low': RollingLow}
+
+
+def make_indicator(name: str) -> Indicator:
+    """Indicator from a name like 'ema_20' (kind, underscore, period)."""
+    kind, _, period = name.partition('_')
+    if kind not in INDICATOR_KINDS or not period.isdigit():
+        raise ValueError(f"Unknown indicator: {name} (expected one of "
+                         f"{', '.join(INDICATOR_KINDS)} followed by _<period>)")
+    return INDICATOR_KINDS[kind](int(period))
+
+
+def bar_columns(bars: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """OHLCV columns of a bar frame as float64 arrays."""
+    return {col: bars[col].to_numpy(dtype=np.float64)
+            for col in ('open', 'high', 'low', 'close', 'volume')}
+
+
+class IndicatorSet:
+    """The indicators of one timeframe, with values for its most recent bars."""
+
+    def __init__(self, names: List[str], max_bars: int = 100):
+        """
+        Args:
+            names: Indicator names, e.g. ['ema_20', 'rsi_14']
+            max_bars: Bars whose values (and rollback checkpoints) are kept
+        """
+        self.names = list(names)
+        self.indicators = [make_indicator(name) for name in self.names]
+        self.max_bars = max_bars
+        self.reset()
+
+    def reset(self) -> None:
+        for indicator in self.indicators:
+            indicator.reset()
+        self.labels: Deque[int] = deque(maxlen=self.max_bars)  # bar labels, epoch ns
+        self.values: Deque[Tuple[float, ...]] = deque(maxlen=self.max_bars)
+        # Indicator state after each kept bar, for rolling back revisions
+        self.checkpoints: Deque[Optional[List[Any]]] = deque(maxlen=self.max_bars)
+        self.last_label: Optional[int] = None
+        self.index_meta: Tuple = ('ns', None)
+        self._frame: Optional[pd.DataFrame] = None
+        self._seen: Optional[pd.DataFrame] = None  # bar frame last folded (frames are immutable)
+
+    def needs_backfill(self, bars: pd.DataFrame) -> bool:
+        """Whether ``bars`` cannot be continued from the current state (none, or a gap)."""
+        if bars.empty or bars is self._seen:
+            return False
+        return (self.last_label is None or self.last_label < bars.index[0].value or
+                self.last_label > bars.index[-1].value)
+
+    def backfill(self, bars: pd.DataFrame) -> None:
+        """
+        Recompute from a bar history: vectorized over all but the last
+        ``max_bars`` bars, then bar by bar so their values and checkpoints
+        are kept.
+        """
+        self.reset()
+        if bars.empty:
+            return
+        head = len(bars) - min(len(bars), self.max_bars)
+        if head:
+            columns = bar_columns(bars.iloc[:head])
+            for indicator in self.indicators:
+                indicator.compute(columns)
+            self.last_label = int(bars.index[head - 1:head].as_unit('ns').asi8[0])
+        self._fold(bars.iloc[head:])
+
+    def update(self, bars: pd.DataFrame) -> int:
+        """
+        Fold closed bars newer than the last folded one.
+
+        Returns:
+            int: Number of bars folded
+        """
+        if bars.empty or bars is self._seen:
+            return 0
+        self._seen = bars
+        if self.last_label is None:
+            return self._fold(bars)
+        if bars.index[-1].value <= self.last_label:
+            return 0
+        start = bars.index.searchsorted(pd.Timestamp(self.last_label), side='right')
+        return self._fold(bars.iloc[start:])
+
+    def revise(self, label: pd.Timestamp) -> None:
+        """Roll back to before the bar ``label`` (its bars were recomputed upstream)."""
+        label_ns = pd.Timestamp(label).as_unit('ns').value
+        if self.last_label is None or label_ns > self.last_label:
+            return
+        while self.labels and self.labels[-1] >= label_ns:
+            self.labels.pop()
+            self.values.pop()
+            self.checkpoints.pop()
+        if not self.labels or self.checkpoints[-1] is None:
+            self.reset()  # rolled back past the kept checkpoints: backfill again
+            return
+        for indicator, state in zip(self.indicators, self.checkpoints[-1]):
+            indicator.restore_state(state)
+        self.last_label = self.labels[-1]
+        self._frame = None
+        self._seen = None
+
+    def frame(self) -> pd.DataFrame:
+        """Values for the most recent bars, indexed like the bars (read-only)."""
+        if self._frame is None:
+            unit, name = self.index_meta
+            index = pd.DatetimeIndex(np.array(self.labels, dtype='datetime64[ns]'), name=name)
+            values = np.array(self.values, dtype=np.float64).reshape(
+                len(self.labels), len(self.names))
+            values.flags.writeable = False
+            self._frame = pd.DataFrame(values, index=index.as_unit(unit), columns=self.names,
+                                       copy=False)
+        return self._frame
+
+    def export_state(self) -> Dict[str, Any]:
+        """Running state plus the kept values, as plain values for JSON."""
+        if self.last_label is None:
+            return {}
+        return {
+            'names': self.names,
+            'last_label': self.last_label,
+            'index_meta': list(self.index_meta),
+            'state': [indicator.export_state() for indicator in self.indicators],
+            'labels': list(self.labels),
+            'values': [list(row) for row in self.values]
+        }
+
+    def restore_state(self, state: Dict[str, Any]) -> bool:
+        """
+        Restore exported state; False (and reset) if it is missing or was
+        saved for other indicators.
+        """
+        self.reset()
+        if not state or state.get('names') != self.names:
+            return False
+        for indicator, saved in zip(self.indicators, state['state']):
+            indicator.restore_state(saved)
+        self.last_label = int(state['last_label'])
+        self.index_meta = tuple(state['index_meta'])
+        self.labels.extend(state['labels'])
+        self.values.extend(tuple(row) for row in state['values'])
+        # Only the latest checkpoint is persisted; revising older bars re-backfills
+        self.checkpoints.extend([None] * (len(self.labels) - 1) + [state['state']])
+        return True
+
+    def _fold(self, bars: pd.DataFrame) -> int:
+        if bars.empty:
+            return 0
+        self.index_meta = (np.datetime_data(bars.index.dtype)[0], bars.index.name)
+        columns = bar_columns(bars)
+        rows = zip(bars.index.as_unit('ns').asi8.tolist(),
+                   *(columns[col].tolist() for col in ('open', 'high', 'low', 'close', 'volume')))
+        # Bars that will not stay in the kept window are only folded
+        for _ in range(len(bars) - self.max_bars):
+            _, *bar = next(rows)
+            for indicator in self.indicators:
+                indicator.update(bar)
+        for label, *bar in rows:
+            self.labels.append(label)
+            self.values.append(tuple(indicator.update(bar) for indicator in self.indicators))
+            self.checkpoints.append([indicator.export_state() for indicator in self.indicators])
+        self.last_label = self.labels[-1]
+        self._frame = None
+        return len(bars)
@@ -0,0 +1,329 @@
+"""
+Crash-Recovery Journal for 1-Minute Candles
+===========================================
+
+Write-ahead journal of appended 1M candles plus periodic compacted
+checkpoints, replacing whole-state pickle snapshots.
+
+- Journal: fixed-size binary records (epoch ns, OHLCV, source id) each
+  protected by a CRC32, so a torn tail write is detected and discarded.
+- Checkpoint: the whole 1M buffer and aggregator metadata, written to a
+  temporary file, fsynced and atomically renamed over the previous one.
+- Recovery: load the checkpoint, replay the journal tail on top of it.
+
+Per-tick cost is O(new candles); the O(buffer) checkpoint only runs every
+``checkpoint_every`` journaled candles.
+"""
+
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+RECORD_DTYPE = np.dtype([
+    ('ts', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+    ('source', 'u1'),
+    ('crc', '<u4')
+])
+_CRC_OFFSET = RECORD_DTYPE.fields['crc'][1]
+
+SOURCES = ['unknown', 'yfinance', 'alpha_vantage', 'twelve_data']
+
+JOURNAL_MAGIC = b'FXJ1'
+CHECKPOINT_MAGIC = b'FXC1'
+_HEADER = struct.Struct('<4sI')
+
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+
+def _source_id(source: Optional[str]) -> int:
+    return SOURCES.index(source) if source in SOURCES else 0
+
+
+def frame_meta(candles_1m: pd.DataFrame) -> Dict[str, Any]:
+    """Index name, resolution and volume dtype needed to rebuild the frame."""
+    return {
+        'index_name': candles_1m.index.name,
+        'unit': np.datetime_data(candles_1m.index.dtype)[0],
+        'volume_dtype': str(candles_1m['volume'].dtype)
+    }
+
+
+def to_records(candles: pd.DataFrame, source: Optional[str] = None) -> np.ndarray:
+    """Pack candles into journal records (CRC left unset)."""
+    records = np.zeros(len(candles), dtype=RECORD_DTYPE)
+    records['ts'] = candles.index.as_unit('ns').asi8
+    for col in ('open', 'high', 'low', 'close', 'volume'):
+        records[col] = candles[col].to_numpy(dtype=np.float64)
+    records['source'] = _source_id(source)
+    return records
+
+
+def from_records(records: np.ndarray, meta: Dict[str, Any]) -> pd.DataFrame:
+    """Unpack journal records into a candle frame."""
+    index = pd.DatetimeIndex(records['ts'].view('datetime64[ns]'),
+                             name=meta.get('index_name'))
+    df = pd.DataFrame({
+        col: records[col].astype(np.float64)
+        for col in ('open', 'high', 'low', 'close')
+    }, index=index.as_unit(meta.get('unit', 'ns')))
+    df['volume'] = records['volume'].astype(meta.get('volume_dtype', 'int64'))
+    return df
+
+
+def _write_header(f, magic: bytes, meta: Dict[str, Any]) -> None:
+    payload = json.dumps(meta, default=str).encode()
+    f.write(_HEADER.pack(magic, len(payload)))
+    f.write(payload)
+
+
+def _read_header(data: bytes, magic: bytes) -> Tuple[Dict[str, Any], int]:
+    found, length = _HEADER.unpack_from(data)
+    if found != magic:
+        raise ValueError(f"Bad file magic {found!r}, expected {magic!r}")
+    start = _HEADER.size
+    return json.loads(data[start:start + length]), start + length
+
+
+def _fsync_dir(path: str) -> None:
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class CandleJournal:
+    """Append-only candle journal with atomically replaced checkpoints."""
+
+    def __init__(self, journal_file: str, checkpoint_file: str, fsync: str = 'always',
+                 fsync_interval: float = 5.0, checkpoint_every: int = 1000):
+        """
+        Args:
+            journal_file: Path of the append-only journal
+            checkpoint_file: Path of the compacted checkpoint
+            fsync: 'always' (every append), 'interval' (at most every
+                ``fsync_interval`` seconds) or 'never' (leave it to the OS)
+            fsync_interval: Seconds between fsyncs for the 'interval' policy
+            checkpoint_every: Journaled candles between checkpoints
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+
+        self.journal_file = journal_file
+        self.checkpoint_file = checkpoint_file
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.checkpoint_every = checkpoint_every
+
+        self.last_ts: Optional[int] = None  # epoch ns of last persisted candle
+        self.pending = 0  # candles journaled since the last checkpoint
+        self._file = None
+        self._last_fsync = 0.0
+
+    def recover(self) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """
+        Rebuild the 1M buffer from the checkpoint plus the journal tail.
+
+        Returns:
+            Tuple of (candles, checkpoint metadata); empty frame if nothing
+            has been persisted yet
+        """
+        meta: Dict[str, Any] = {}
+        parts = []
+
+        if os.path.exists(self.checkpoint_file):
+            with open(self.checkpoint_file, 'rb') as f:
+                data = f.read()
+            meta, offset = _read_header(data, CHECKPOINT_MAGIC)
+            payload = memoryview(data)[offset:-4]
+            (expected,) = struct.unpack('<I', data[-4:])
+            if zlib.crc32(payload) != expected:
+                raise ValueError("Checkpoint checksum mismatch")
+            parts.append(np.frombuffer(payload, dtype=RECORD_DTYPE))
+
+        journal_meta, records, valid_bytes = self._read_journal()
+        if records is not None and len(records):
+            parts.append(records)
+            meta = {**journal_meta, **meta}
+            if records['source'][-1]:
+                meta['current_source'] = SOURCES[records['source'][-1]]
+
+        if os.path.exists(self.journal_file):
+            # Drop a torn tail so new appends start on a record boundary
+            if os.path.getsize(self.journal_file) > valid_bytes:
+                logger.warning("Discarding torn journal tail")
+                with open(self.journal_file, 'r+b') as f:
+                    f.truncate(valid_bytes)
+            self.pending = 0 if records is None else len(records)
+
+        if not parts:
+            return pd.DataFrame(), meta
+
+        records = np.concatenate(parts)
+        if len(records) == 0:
+            return pd.DataFrame(), meta
+
+        candles = from_records(records, meta)
+        if not (np.diff(records['ts']) > 0).all():
+            # Journal entries win over checkpoint rows for the same minute
+            candles = candles[~candles.index.duplicated(keep='last')].sort_index()
+        self.last_ts = int(records['ts'].max())
+        return candles, meta
+
+    def resume(self, last_ts: Optional[int], pending: int) -> None:
+        """Adopt the position ``recover`` would have found (warm restart from a snapshot)."""
+        self.last_ts = last_ts
+        self.pending = pending
+
+    def _read_journal(self) -> Tuple[Dict[str, Any], Optional[np.ndarray], int]:
+        """Read valid journal records, stopping at the first torn/corrupt one."""
+        if not os.path.exists(self.journal_file):
+            return {}, None, 0
+
+        with open(self.journal_file, 'rb') as f:
+            data = f.read()
+        if len(data) < _HEADER.size:
+            return {}, None, 0
+
+        meta, offset = _read_header(data, JOURNAL_MAGIC)
+        count = (len(data) - offset) // RECORD_DTYPE.itemsize
+        records = np.frombuffer(data, dtype=RECORD_DTYPE, count=count, offset=offset)
+        raw = memoryview(data)[offset:]
+
+        valid = 0
+        size = RECORD_DTYPE.itemsize
+        for i in range(count):
+            start = i * size
+            if zlib.crc32(raw[start:start + _CRC_OFFSET]) != records['crc'][i]:
+                break
+            valid += 1
+
+        return meta, records[:valid], offset + valid * size
+
+    def needs_checkpoint(self, candles_1m: pd.DataFrame) -> bool:
+        """Whether the next save should compact instead of appending."""
+        if self.last_ts is None or not os.path.exists(self.checkpoint_file):
+            return True
+        if self.pending >= self.checkpoint_every:
+            return True
+        # Buffer was replaced by something older (e.g. re-bootstrap)
+        return not candles_1m.empty and candles_1m.index[-1].value < self.last_ts
+
+    def append(self, candles_1m: pd.DataFrame, source: Optional[str]) -> int:
+        """
+        Journal candles newer than the last persisted one.
+
+        Returns:
+            int: Number of records appended
+        """
+        if candles_1m.empty:
+            return 0
+
+        rows = candles_1m
+        if self.last_ts is not None:
+            last_ts = pd.Timestamp(self.last_ts).floor(np.datetime_data(candles_1m.index.dtype)[0])
+            start = candles_1m.index.searchsorted(last_ts, side='right')
+            rows = candles_1m.iloc[start:]
+        if rows.empty:
+            return 0
+
+        records = to_records(rows, source)
+        raw = bytearray(records.tobytes())
+        size = RECORD_DTYPE.itemsize
+        for i in range(len(records)):
+            start = i * size
+            crc = zlib.crc32(raw[start:start + _CRC_OFFSET])
+            struct.pack_into('<I', raw, start + _CRC_OFFSET, crc)
+
+        f = self._open(candles_1m)
+        f.write(raw)
+        f.flush()
+        self._sync(f)
+
+        self.last_ts = int(records['ts'][-1])
+        self.pending += len(records)
+        return len(records)
+
+    def rewind(self, since: pd.Timestamp) -> None:
+        """Re-journal candles from ``since`` on the next append (after in-place revisions)."""
+        since_ns = pd.Timestamp(since).as_unit('ns').value
+        if self.last_ts is not None and since_ns <= self.last_ts:
+            # Recovery keeps the last record per minute, so re-appended
+            # rows supersede the earlier ones
+            self.last_ts = since_ns - 1
+
+    def checkpoint(self, candles_1m: pd.DataFrame, metadata: Dict[str, Any]) -> None:
+        """Atomically write the full buffer as a checkpoint and reset the journal."""
+        meta = dict(metadata)
+        if not candles_1m.empty:
+            meta.update(frame_meta(candles_1m))
+        payload = to_records(candles_1m).tobytes() if not candles_1m.empty else b''
+
+        tmp_file = f"{self.checkpoint_file}.tmp"
+        with open(tmp_file, 'wb') as f:
+            _write_header(f, CHECKPOINT_MAGIC, meta)
+            f.write(payload)
+            f.write(struct.pack('<I', zlib.crc32(payload)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.checkpoint_file)
+        _fsync_dir(self.checkpoint_file)
+
+        # Journal contents are now covered by the checkpoint; a crash before
+        # this truncate only leaves duplicates that recovery deduplicates.
+        self._close_file()
+        with open(self.journal_file, 'wb') as f:
+            _write_header(f, JOURNAL_MAGIC, meta)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.last_ts = int(candles_1m.index[-1:].as_unit('ns').asi8[0]) if not candles_1m.empty else None
+        self.pending = 0
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+            if self.fsync != 'never':
+                os.fsync(self._file.fileno())
+        self._close_file()
+
+    def _open(self, candles_1m: pd.DataFrame):
+        if self._file is None:
+            new_file = not os.path.exists(self.journal_file) or os.path.getsize(self.journal_file) == 0
+            self._file = open(self.journal_file, 'ab')
+            if new_file:
+                _write_header(self._file, JOURNAL_MAGIC, frame_meta(candles_1m))
+        return self._file
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _sync(self, f) -> None:
+        if self.fsync == 'always':
+            os.fsync(f.fileno())
+        elif self.fsync == 'interval':
+            now = time.monotonic()
+            if now - self._last_fsync >= self.fsync_interval:
+                os.fsync(f.fileno())
+                self._last_fsync = now
@@ -0,0 +1,250 @@
+"""
+Ingest Pipeline Metrics
+=======================
+
+Low-overhead counters, gauges and fixed-bucket histograms for the stages
+of the ingest loop, exported in the Prometheus text format over a local
+HTTP endpoint (``/metrics``) and/or written to a file for node_exporter's
+textfile collector.
+
+Observing a value is a bisect over the bucket bounds plus two additions
+under a lock; a disabled registry turns every call into a no-op (timers
+skip the clock reads too), so the hot loop can keep its instrumentation
+unconditionally. Enabled, it is not free: about 2us per observation and
+3-4us per timed block, or +1.5-2% of a ~15ms pipeline tick as measured
+by ``benchmark.py metrics``.
+"""
+
+import bisect
+import logging
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds, from 100us (one merge) to 2 minutes (a slow provider)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Seconds from candle close until it is merged
+LAG_BUCKETS = (1.0, 2.5, 5.0, 10.0, 15.0, 30.0, 60.0, 120.0, 300.0, 900.0, 3600.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class _Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class _Timer:
+    __slots__ = ('family', 'key', 'started')
+
+    def __init__(self, family: 'MetricFamily', key: LabelKey):
+        self.family = family
+        self.key = key
+
+    def __enter__(self) -> None:
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self.family._observe(self.key, time.perf_counter() - self.started)
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NO_TIMER = _NoTimer()
+
+
+class MetricFamily:
+    """One metric name with a child per label set."""
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, kind: str, help_text: str,
+                 buckets: Sequence[float] = ()):
+        self.registry = registry
+        self.name = name
+        self.kind = kind  # 'counter', 'gauge' or 'histogram'
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.children: Dict[LabelKey, object] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record one histogram sample."""
+        if self.registry.enabled:
+            self._observe(_key(labels), value)
+
+    def _observe(self, key: LabelKey, value: float) -> None:
+        if not self.registry.enabled:
+            return
+        with self.registry.lock:
+            child = self.children.get(key)
+            if child is None:
+                child = self.children[key] = _Histogram(len(self.buckets) + 1)
+            child.counts[bisect.bisect_left(self.buckets, value)] += 1
+            child.total += value
+            child.count += 1
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Add to a counter."""
+        if not self.registry.enabled:
+            return
+        key = _key(labels)
+        with self.registry.lock:
+            self.children[key] = self.children.get(key, 0.0) + amount
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set a gauge."""
+        if not self.registry.enabled:
+            return
+        key = _key(labels)
+        with self.registry.lock:
+            self.children[key] = value
+
+    def time(self, **labels: str) -> '_Timer':
+        """Context manager observing the duration of the block in seconds."""
+        if not self.registry.enabled:
+            return _NO_TIMER
+        return _Timer(self, _key(labels))
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self.children.items()):
+            if self.kind != 'histogram':
+                lines.append(f"{self.name}{_labels(key)} {_number(child)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                le = '+Inf' if bound == math.inf else _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(key + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(key)} {_number(child.total)}")
+            lines.append(f"{self.name}_count{_labels(key)} {child.count}")
+        return lines
+
+    def quantile(self, q: float, **labels: str) -> Optional[float]:
+        """Upper bucket bound below which a fraction ``q`` of samples fall."""
+        child = self.children.get(_key(labels))
+        if child is None or not child.count:
+            return None
+        rank, cumulative = q * child.count, 0
+        for bound, count in zip(self.buckets + (math.inf,), child.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return math.inf
+
+
+class MetricsRegistry:
+    """Named metric families plus Prometheus text export."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.families: Dict[str, MetricFamily] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def histogram(self, name: str, help_text: str,
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> MetricFamily:
+        return self._family(name, 'histogram', help_text, buckets)
+
+    def counter(self, name: str, help_text: str) -> MetricFamily:
+        return self._family(name, 'counter', help_text)
+
+    def gauge(self, name: str, help_text: str) -> MetricFamily:
+        return self._family(name, 'gauge', help_text)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self.lock:
+            lines = [line for family in self.families.values() for line in family.render()]
+        return '\n'.join(lines) + '\n'
+
+    def write_file(self, path: str) -> None:
+        """Write the current metrics to ``path`` (atomic replace)."""
+        try:
+            tmp_file = f"{path}.tmp"
+            with open(tmp_file, 'w') as f:
+                f.write(self.render())
+            os.replace(tmp_file, path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics file: {e}")
+
+    def serve(self, port: int, host: str = '127.0.0.1') -> int:
+        """
+        Serve ``/metrics`` on a daemon thread.
+
+        Returns:
+            int: The bound port (useful with port 0)
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True).start()
+        logger.info(f"Metrics served on http://{host}:{self._server.server_address[1]}/metrics")
+        return self._server.server_address[1]
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _family(self, name: str, kind: str, help_text: str,
+                buckets: Sequence[float] = ()) -> MetricFamily:
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = MetricFamily(self, name, kind, help_text, buckets)
+        return family
+
+
+def _key(labels: Dict[str, str]) -> LabelKey:
+    items = tuple(labels.items())
+    return items if len(items) < 2 else tuple(sorted(items))
+
+
+def _labels(key: LabelKey) -> str:
+    if not key:
+        return ''
+    pairs = []
+    for name, value in key:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
@@ -0,0 +1,401 @@
+"""
+Streaming Candle Data-Quality Checks
+====================================
+
+Validates provider candles as they arrive, before they reach the 1M
+buffer, instead of re-checking the whole buffer once at startup.
+
+Checks (counted per anomaly type in ``CandleValidator.counts``):
+
+- invalid_ohlc: high/low not bracketing open/close, or negative volume
+- non_finite: NaN/inf or non-positive prices
+- duplicate / out_of_order: repeated or unsorted timestamps in a batch
+  (the last of several duplicates wins, as in the buffer)
+- gap: more than ``gap_tolerance`` expected FX session minutes missing
+- stale: a flat candle repeating the previous close for ``stale_run``
+  minutes in a row
+- spike: a close whose log return is more than ``spike_zscore`` standard
+  deviations from the rolling mean of the last ``spike_window`` returns
+
+Rows failing invalid_ohlc, non_finite or spike are quarantined: dropped
+from the batch and kept in a bounded quarantine for inspection, while the
+rest of the batch is merged. Earlier duplicates are dropped, ordering is
+left to the buffer, and gaps and stale prices are only counted (dropping
+stale rows would leave holes indistinguishable from missing data).
+
+Quarantine is not final. Providers resend quarantined minutes with every
+window: unchanged resends are dropped without being counted again, while
+corrected ones are validated afresh and released from quarantine when they
+pass. When a run of ``spike_reset`` spikes turns out to be a genuine level
+shift, the spikes that started the run are released and returned with the
+batch that completes it, so the new level has no holes.
+
+Only rows after the last validated minute go through the stateful checks,
+and the rolling spike statistics are running sums, so per-tick work grows
+with the new rows, not with the provider's trailing window or the buffer.
+Older rows in a batch (possible revisions) only get the vectorized
+consistency check.
+"""
+
+import logging
+import math
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+OHLCV = PRICE_COLUMNS + ['volume']
+
+ANOMALY_TYPES = ('invalid_ohlc', 'non_finite', 'duplicate', 'out_of_order',
+                 'gap', 'stale', 'spike')
+
+# FX trades from Sunday 22:00 to Friday 22:00 UTC: the first 5 days of
+# every week counted from a Sunday 22:00
+_SESSION_ANCHOR = pd.Timestamp('1970-01-04 22:00').value // 60_000_000_000
+_WEEK_MINUTES = 7 * 1440
+_SESSION_MINUTES = 5 * 1440
+
+
+def session_minutes_before(minutes: np.ndarray) -> np.ndarray:
+    """Number of FX session minutes before each epoch minute (since the anchor)."""
+    offset = minutes - _SESSION_ANCHOR
+    weeks, rest = np.divmod(offset, _WEEK_MINUTES)
+    return weeks * _SESSION_MINUTES + np.minimum(rest, _SESSION_MINUTES)
+
+
+def next_session_minute(minute: int) -> int:
+    """First FX session epoch minute at or after ``minute`` (itself while the market is open)."""
+    rest = (minute - _SESSION_ANCHOR) % _WEEK_MINUTES
+    return minute if rest < _SESSION_MINUTES else minute + _WEEK_MINUTES - rest
+
+
+def last_session_minute(minute: int) -> int:
+    """Last FX session epoch minute at or before ``minute``."""
+    rest = (minute - _SESSION_ANCHOR) % _WEEK_MINUTES
+    return minute if rest < _SESSION_MINUTES else minute - (rest - _SESSION_MINUTES + 1)
+
+
+def missing_session_minutes(minutes: np.ndarray) -> np.ndarray:
+    """
+    Expected session minutes missing between consecutive epoch minutes.
+
+    Returns:
+        Array of len(minutes) - 1 counts
+    """
+    before = session_minutes_before(minutes)
+    in_session = session_minutes_before(minutes[:-1] + 1) - before[:-1]
+    return before[1:] - before[:-1] - in_session
+
+
+def _invalid_rows(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    open_, high, low, close = (columns[col] for col in PRICE_COLUMNS)
+    return ((high < low) | (high < open_) | (high < close) |
+            (low > open_) | (low > close) | (columns['volume'] < 0))
+
+
+def _non_finite_rows(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    bad = np.zeros(len(columns['close']), dtype=bool)
+    for col in PRICE_COLUMNS:
+        bad |= ~(np.isfinite(columns[col]) & (columns[col] > 0))
+    return bad
+
+
+def _columns(candles: pd.DataFrame) -> Dict[str, np.ndarray]:
+    return {col: candles[col].to_numpy(dtype=np.float64) for col in OHLCV}
+
+
+def invalid_ohlc(candles: pd.DataFrame) -> np.ndarray:
+    """Boolean mask of rows with inconsistent OHLC values or negative volume."""
+    return _invalid_rows(_columns(candles))
+
+
+def non_finite(candles: pd.DataFrame) -> np.ndarray:
+    """Boolean mask of rows with missing, infinite or non-positive prices."""
+    return _non_finite_rows(_columns(candles))
+
+
+class CandleValidator:
+    """Incremental quality checks for one symbol's 1M candle stream."""
+
+    def __init__(self, gap_tolerance: int = 5, stale_run: int = 15,
+                 spike_window: int = 120, spike_zscore: float = 10.0,
+                 spike_min_history: int = 30, spike_reset: int = 3,
+                 quarantine_size: int = 1000):
+        """
+        Args:
+            gap_tolerance: Missing session minutes tolerated between candles
+            stale_run: Consecutive flat, unchanged candles counted as stale
+            spike_window: Returns kept for the rolling z-score
+            spike_zscore: Absolute z-score above which a close is a spike
+            spike_min_history: Returns needed before spikes are flagged
+            spike_reset: Consecutive spikes accepted as a new price level
+            quarantine_size: Quarantined rows kept for inspection
+        """
+        self.gap_tolerance = gap_tolerance
+        self.stale_run = stale_run
+        self.spike_window = spike_window
+        self.spike_zscore = spike_zscore
+        self.spike_min_history = spike_min_history
+        self.spike_reset = spike_reset
+
+        self.counts = {anomaly: 0 for anomaly in ANOMALY_TYPES}
+        self.quarantine: Deque[Tuple[pd.Timestamp, str, Dict[str, float]]] = deque(maxlen=quarantine_size)
+        self._quarantined: Dict[int, np.ndarray] = {}  # epoch ns -> OHLCV, mirrors the deque
+        self._released: Dict[int, np.ndarray] = {}  # level-shift rows to return with the batch
+
+        self.last_timestamp: Optional[pd.Timestamp] = None  # naive UTC
+        self._last_ns: Optional[int] = None
+        self._last_close: Optional[float] = None  # last accepted close
+        self._flat_run = 0
+        self._spike_run: List[Tuple[int, float]] = []  # (epoch ns, close) of consecutive spikes
+        self._returns: Deque[float] = deque()
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    def prime(self, candles: pd.DataFrame) -> None:
+        """Seed the running state from candles already in the buffer."""
+        self.last_timestamp = self._last_ns = None
+        self._last_close = None
+        self._flat_run = 0
+        self._spike_run = []
+        self._released = {}
+        self._returns.clear()
+        self._sum = self._sum_sq = 0.0
+        if candles.empty:
+            return
+
+        tail = candles.iloc[-(self.spike_window + 1):]
+        closes = tail['close'].to_numpy(dtype=np.float64)
+        for value in np.diff(np.log(closes)):
+            if np.isfinite(value):
+                self._push_return(float(value))
+        self._last_ns = int(self._epoch_ns(candles.index[-1:])[0])
+        self.last_timestamp = pd.Timestamp(self._last_ns)
+        self._last_close = float(closes[-1])
+
+    def validate(self, candles: pd.DataFrame) -> pd.DataFrame:
+        """
+        Check a provider batch and drop the rows that fail.
+
+        Args:
+            candles: Provider 1M candles (any order, may overlap stored minutes)
+
+        Returns:
+            The batch without quarantined rows, plus released rows of an
+            earlier batch when it completes a level shift
+        """
+        if candles.empty:
+            return candles
+
+        stamps = self._epoch_ns(candles.index)
+        columns = _columns(candles)
+        if self._last_ns is None:
+            new = np.ones(len(stamps), dtype=bool)
+        else:
+            new = stamps > self._last_ns
+
+        keep = np.ones(len(stamps), dtype=bool)
+        if not new.all():
+            keep[~new] = self._check_overlap(self._take(columns, ~new), stamps[~new])
+        if new.any():
+            keep[new] = self._check_new(self._take(columns, new), stamps[new])
+
+        result = candles if keep.all() else candles[keep]
+        if self._released:
+            result = self._with_released(result, stamps[keep])
+        return result
+
+    def quarantined_frame(self) -> pd.DataFrame:
+        """Quarantined rows with their reason, oldest first."""
+        if not self.quarantine:
+            return pd.DataFrame()
+        stamps, reasons, values = zip(*self.quarantine)
+        frame = pd.DataFrame(list(values), index=pd.DatetimeIndex(stamps))
+        frame['reason'] = reasons
+        return frame
+
+    def _check_overlap(self, columns: Dict[str, np.ndarray], stamps: np.ndarray) -> np.ndarray:
+        """Older rows: drop unchanged quarantined minutes and inconsistent revisions."""
+        keep = ~self._resent(columns, stamps)
+        for reason, mask in (('non_finite', _non_finite_rows(columns)),
+                             ('invalid_ohlc', _invalid_rows(columns))):
+            for i in np.flatnonzero(mask & keep):
+                self._reject(columns, i, reason, stamps[i])
+            keep &= ~mask
+        self._release_corrected(stamps[keep & self._known(stamps)])
+        return keep
+
+    def _check_new(self, columns: Dict[str, np.ndarray], stamps: np.ndarray) -> np.ndarray:
+        """Rows after the last validated minute: every check, in time order."""
+        order = None
+        if len(stamps) > 1 and (np.diff(stamps) <= 0).any():
+            if (np.diff(stamps) < 0).any():
+                self.counts['out_of_order'] += 1
+                order = np.argsort(stamps, kind='stable')
+                columns, stamps = self._take(columns, order), stamps[order]
+            later = np.append(stamps[1:] != stamps[:-1], True)  # buffer keeps the last
+            self.counts['duplicate'] += int((~later).sum())
+        else:
+            later = np.ones(len(stamps), dtype=bool)
+
+        accepted = later & ~self._resent(columns, stamps)
+        for reason, mask in (('non_finite', _non_finite_rows(columns)),
+                             ('invalid_ohlc', _invalid_rows(columns))):
+            for i in np.flatnonzero(mask & accepted):
+                self._reject(columns, i, reason, stamps[i])
+            accepted &= ~mask
+
+        closes = columns['close']
+        flat = columns['high'] == columns['low']
+        spiked = np.zeros(len(stamps), dtype=bool)
+        for i in np.flatnonzero(accepted):
+            accepted[i] = self._scan(float(closes[i]), bool(flat[i]), int(stamps[i]))
+            if not accepted[i]:
+                self._reject(columns, i, 'spike', stamps[i])
+                spiked[i] = True
+
+        # Spikes released by a level shift later in this batch are kept here;
+        # the ones from earlier batches are added by validate()
+        readmitted = spiked & np.isin(stamps, np.fromiter(self._released, dtype=np.int64))
+        if readmitted.any():
+            accepted |= readmitted
+            for stamp in stamps[readmitted]:
+                del self._released[int(stamp)]
+        self._release_corrected(stamps[accepted & self._known(stamps)])
+
+        minutes = stamps[accepted] // 60_000_000_000
+        if len(minutes):
+            if self._last_ns is not None:
+                minutes = np.concatenate([[self._last_ns // 60_000_000_000], minutes])
+            missing = missing_session_minutes(np.unique(minutes))
+            self.counts['gap'] += int((missing > self.gap_tolerance).sum())
+            self._last_ns = int(stamps[accepted][-1])
+            self.last_timestamp = pd.Timestamp(self._last_ns)
+
+        if order is None:
+            return accepted
+        keep = np.empty(len(stamps), dtype=bool)
+        keep[order] = accepted
+        return keep
+
+    def _scan(self, close: float, flat: bool, stamp: int) -> bool:
+        """Sequential stale and spike state for one row; False means quarantine."""
+        if self._last_close is None:
+            self._last_close = close
+            return True
+
+        if flat and close == self._last_close:
+            self._flat_run += 1
+            if self._flat_run == self.stale_run:
+                self.counts['stale'] += 1
+        else:
+            self._flat_run = 0
+
+        value = math.log(close / self._last_close)
+        count = len(self._returns)
+        if count >= self.spike_min_history:
+            mean = self._sum / count
+            std = max(math.sqrt(max(self._sum_sq / count - mean * mean, 0.0)), 1e-6)
+            if abs(value - mean) > self.spike_zscore * std:
+                self._spike_run.append((stamp, close))
+                if len(self._spike_run) < self.spike_reset:
+                    return False
+                # Several "spikes" in a row: a genuine level shift. The run
+                # belongs to the new level and seeds its return statistics.
+                logger.warning(f"Price level shift accepted at close {close}")
+                run = self._spike_run[:-1]
+                self._released.update(self._release([s for s, _ in run]))
+                self.counts['spike'] -= len(run)
+                self._returns.clear()
+                self._sum = self._sum_sq = 0.0
+                closes = [c for _, c in self._spike_run]
+                for previous, current in zip(closes, closes[1:]):
+                    self._push_return(math.log(current / previous))
+                self._spike_run = []
+                self._last_close = close
+                return True
+
+        self._spike_run = []
+        self._push_return(value)
+        self._last_close = close
+        return True
+
+    def _push_return(self, value: float) -> None:
+        self._returns.append(value)
+        self._sum += value
+        self._sum_sq += value * value
+        if len(self._returns) > self.spike_window:
+            old = self._returns.popleft()
+            self._sum -= old
+            self._sum_sq -= old * old
+
+    def _reject(self, columns: Dict[str, np.ndarray], i: int, reason: str, stamp: int) -> None:
+        self.counts[reason] += 1
+        if int(stamp) in self._quarantined:
+            self._release([int(stamp)])  # a corrected resend that still fails
+        if len(self.quarantine) == self.quarantine.maxlen:
+            self._quarantined.pop(self.quarantine[0][0].value, None)
+        timestamp = pd.Timestamp(int(stamp))
+        values = {col: float(columns[col][i]) for col in OHLCV}
+        self.quarantine.append((timestamp, reason, values))
+        self._quarantined[int(stamp)] = np.array(list(values.values()))
+        logger.warning(f"Quarantined {reason} candle at {timestamp}")
+
+    def _release(self, stamps) -> Dict[int, np.ndarray]:
+        """Take minutes out of quarantine; returns their quarantined OHLCV values."""
+        released = {int(stamp): self._quarantined.pop(int(stamp)) for stamp in stamps
+                    if int(stamp) in self._quarantined}
+        if released:
+            self.quarantine = deque((entry for entry in self.quarantine
+                                     if entry[0].value not in released),
+                                    maxlen=self.quarantine.maxlen)
+        return released
+
+    def _release_corrected(self, stamps: np.ndarray) -> None:
+        if len(stamps):
+            self._release(stamps)
+            logger.info(f"Released {len(stamps)} corrected candles from quarantine")
+
+    def _known(self, stamps: np.ndarray) -> np.ndarray:
+        """Rows of quarantined minutes."""
+        if not self._quarantined:
+            return np.zeros(len(stamps), dtype=bool)
+        return np.isin(stamps, np.fromiter(self._quarantined, dtype=np.int64))
+
+    def _resent(self, columns: Dict[str, np.ndarray], stamps: np.ndarray) -> np.ndarray:
+        """Rows identical to their quarantined copy (providers resend them with every window)."""
+        resent = self._known(stamps)
+        for i in np.flatnonzero(resent):
+            values = np.array([columns[col][i] for col in OHLCV])
+            resent[i] = np.array_equal(values, self._quarantined[int(stamps[i])], equal_nan=True)
+        return resent
+
+    def _with_released(self, candles: pd.DataFrame, kept: np.ndarray) -> pd.DataFrame:
+        """Add the rows released by a level shift that are not in the batch itself."""
+        in_batch = set(kept.tolist())
+        stamps = sorted(stamp for stamp in self._released if stamp not in in_batch)
+        values = [self._released[stamp] for stamp in stamps]
+        self._released = {}
+        if not stamps:
+            return candles
+        index = pd.DatetimeIndex(np.array(stamps, dtype='datetime64[ns]'))
+        if candles.index.tz is not None:
+            index = index.tz_localize('UTC').tz_convert(candles.index.tz)
+        index = index.as_unit(candles.index.unit).rename(candles.index.name)
+        rows = pd.DataFrame(np.array(values), index=index, columns=OHLCV)
+        rows = rows.astype({col: candles[col].dtype for col in OHLCV if col in candles})
+        return pd.concat([rows, candles]).sort_index(kind='stable')
+
+    @staticmethod
+    def _take(columns: Dict[str, np.ndarray], rows) -> Dict[str, np.ndarray]:
+        return {col: values[rows] for col, values in columns.items()}
+
+    @staticmethod
+    def _epoch_ns(index: pd.DatetimeIndex) -> np.ndarray:
+        if index.tz is not None:
+            index = index.tz_convert(None)
+        return index.as_unit('ns').asi8
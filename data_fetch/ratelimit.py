@@ -0,0 +1,261 @@
+"""
+Token-Bucket Provider Rate Limiting
+===================================
+
+Per-provider token buckets shared by every thread that calls a provider:
+
+- ``burst`` tokens let a few calls go out back to back, refilled at the
+  sustained ``rate`` (calls per second).
+- An optional ``daily`` quota caps calls per UTC day (e.g. Alpha Vantage's
+  free tier), independent of the bucket.
+
+Callers reserve tokens under a lock and then wait outside it, so
+concurrent callers queue up in order instead of all firing at once, and a
+cancelled wait hands its tokens back. ``available_in`` / ``can_call``
+answer "when can this provider be called" without reserving anything, for
+picking providers.
+
+Bucket levels and daily usage are stamped with wall-clock time and saved
+to a JSON file (atomic replace) at most every ``save_interval`` seconds
+and on shutdown, so a restart neither forgets spent quota nor loses the
+tokens refilled while the process was down. A crash loses at most one
+interval of spending. The clock and sleep functions are injectable for
+simulation.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_DAY_SECONDS = 86400
+
+
+class TokenBucket:
+    """Token bucket with an optional daily quota for one provider."""
+
+    def __init__(self, rate: float, burst: float, daily: Optional[int] = None, now: float = 0.0):
+        """
+        Args:
+            rate: Sustained calls per second
+            burst: Bucket capacity (calls allowed back to back)
+            daily: Calls allowed per UTC day (None = unlimited)
+            now: Current clock time; the bucket starts full
+        """
+        self.rate = rate
+        self.burst = burst
+        self.daily = daily
+        self.tokens = float(burst)  # negative while callers are queued
+        self.updated = now
+        self.day = int(now // _DAY_SECONDS)
+        self.used_today = 0
+        self.granted = 0
+        self.waited = 0.0  # total seconds callers were asked to wait
+
+    def refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        day = int(now // _DAY_SECONDS)
+        if day != self.day:
+            self.day = day
+            self.used_today = 0
+
+    def wait_time(self, now: float, tokens: int = 1) -> float:
+        """Seconds until ``tokens`` could be taken without queueing (refills first)."""
+        self.refill(now)
+        if self.daily is not None and self.used_today + tokens > self.daily:
+            return (self.day + 1) * _DAY_SECONDS - now
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+    def reserve(self, now: float, tokens: int = 1) -> Optional[float]:
+        """
+        Take ``tokens`` now, going into debt if needed.
+
+        Returns:
+            Seconds to wait before calling, or None if the daily quota is spent
+        """
+        self.refill(now)
+        if self.daily is not None and self.used_today + tokens > self.daily:
+            return None
+        self.tokens -= tokens
+        self.used_today += tokens
+        self.granted += tokens
+        wait = max(0.0, -self.tokens / self.rate)
+        self.waited += wait
+        return wait
+
+    def refund(self, tokens: int = 1) -> None:
+        self.tokens = min(self.burst, self.tokens + tokens)
+        self.used_today = max(0, self.used_today - tokens)
+        self.granted -= tokens
+
+
+class RateLimiter:
+    """Thread-safe token buckets for all providers, persisted across restarts."""
+
+    def __init__(self, limits: Dict[str, Dict[str, Any]], state_file: Optional[str] = None,
+                 clock: Callable[[], float] = time.time,
+                 sleep: Optional[Callable[[float], None]] = None,
+                 save_interval: float = 30.0):
+        """
+        Args:
+            limits: Provider -> {'rate': calls/s, 'burst': calls, 'daily': calls or None}
+            state_file: JSON file for bucket state (None = not persisted)
+            clock: Wall-clock time in seconds
+            sleep: Replaces real waiting (e.g. a simulated clock's advance);
+                cancellation is then only checked before waiting
+            save_interval: Seconds between state file writes while tokens
+                are being taken (call ``save`` on shutdown)
+        """
+        self.clock = clock
+        self.sleep = sleep
+        self.state_file = state_file
+        self.save_interval = save_interval
+        self.lock = threading.Lock()
+        now = clock()
+        self._saved_at = now
+        self.buckets = {source: TokenBucket(limit['rate'], limit['burst'], limit.get('daily'), now)
+                        for source, limit in limits.items()}
+        self._load_state()
+
+    def acquire(self, source: str, tokens: int = 1, cancel: Optional[threading.Event] = None,
+                timeout: Optional[float] = None) -> bool:
+        """
+        Block until ``source`` may be called.
+
+        Args:
+            source: Provider name; providers without a bucket are not limited
+            tokens: Calls (or credits) the request costs
+            cancel: Set to abandon the wait and hand the tokens back
+            timeout: Give up (without spending tokens) if the wait is longer
+
+        Returns:
+            bool: False if the call should be skipped (cancelled, timed out
+            or daily quota spent)
+        """
+        wait = self._reserve(source, tokens, timeout)
+        if wait is None:
+            return False
+
+        if wait > 0:
+            logger.debug(f"Rate limiting {source}: waiting {wait:.1f} seconds")
+            if self.sleep is not None:
+                cancelled = cancel is not None and cancel.is_set()
+                if not cancelled:
+                    self.sleep(wait)
+            elif cancel is None:
+                time.sleep(wait)
+                cancelled = False
+            else:
+                cancelled = cancel.wait(wait)
+
+            if cancelled:
+                logger.debug(f"Rate-limited call to {source} cancelled")
+                self._refund(source, tokens)
+                return False
+
+        self._save_due()
+        return True
+
+    def available_in(self, source: str, tokens: int = 1) -> float:
+        """Seconds until ``source`` can be called without waiting (0 = now)."""
+        bucket = self.buckets.get(source)
+        if bucket is None:
+            return 0.0
+        with self.lock:
+            return bucket.wait_time(self.clock(), tokens)
+
+    def can_call(self, source: str, tokens: int = 1) -> bool:
+        """Whether ``source`` can be called right now without waiting."""
+        return self.available_in(source, tokens) == 0.0
+
+    def usage(self) -> Dict[str, Dict[str, Any]]:
+        """Bucket level, daily usage and quota utilization per provider."""
+        now = self.clock()
+        report = {}
+        with self.lock:
+            for source, bucket in self.buckets.items():
+                bucket.refill(now)
+                report[source] = {
+                    'tokens': bucket.tokens,
+                    'burst': bucket.burst,
+                    'rate_per_minute': bucket.rate * 60,
+                    'used_today': bucket.used_today,
+                    'daily': bucket.daily,
+                    'daily_utilization': (bucket.used_today / bucket.daily
+                                          if bucket.daily else None),
+                    'granted': bucket.granted,
+                    'waited_seconds': bucket.waited
+                }
+        return report
+
+    def save(self) -> None:
+        """Write bucket state to the state file (atomic replace)."""
+        if self.state_file is None:
+            return
+        try:
+            with self.lock:
+                state = {source: {'tokens': bucket.tokens, 'updated': bucket.updated,
+                                  'day': bucket.day, 'used_today': bucket.used_today}
+                         for source, bucket in self.buckets.items()}
+                tmp_file = f"{self.state_file}.tmp"
+                with open(tmp_file, 'w') as f:
+                    json.dump(state, f)
+                os.replace(tmp_file, self.state_file)
+        except OSError as e:
+            logger.warning(f"Could not save rate limit state: {e}")
+
+    def _save_due(self) -> None:
+        if self.state_file is None:
+            return
+        with self.lock:
+            now = self.clock()
+            if now - self._saved_at < self.save_interval:
+                return
+            self._saved_at = now
+        self.save()
+
+    def _reserve(self, source: str, tokens: int, timeout: Optional[float]) -> Optional[float]:
+        bucket = self.buckets.get(source)
+        if bucket is None:
+            return 0.0
+        with self.lock:
+            now = self.clock()
+            if timeout is not None and bucket.wait_time(now, tokens) > timeout:
+                logger.debug(f"Rate limit wait for {source} exceeds {timeout}s, skipping")
+                return None
+            wait = bucket.reserve(now, tokens)
+        if wait is None:
+            logger.warning(f"Daily quota for {source} spent "
+                           f"({bucket.used_today}/{bucket.daily} calls)")
+        return wait
+
+    def _refund(self, source: str, tokens: int) -> None:
+        with self.lock:
+            self.buckets[source].refund(tokens)
+
+    def _load_state(self) -> None:
+        if self.state_file is None or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable rate limit state: {e}")
+            return
+
+        now = self.clock()
+        for source, saved in state.items():
+            bucket = self.buckets.get(source)
+            if bucket is None:
+                continue
+            bucket.tokens = min(bucket.burst, saved['tokens'])
+            bucket.updated = min(saved['updated'], now)
+            bucket.day = saved['day']
+            bucket.used_today = saved['used_today']
+            bucket.refill(now)
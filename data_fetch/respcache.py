@@ -0,0 +1,290 @@
+"""
+Provider Response Cache
+=======================
+
+Normalized candles from the providers, kept on disk per provider, symbol,
+interval and request window, so restarts, development runs and repeated
+bootstraps do not spend free-tier quota on data that was already fetched:
+
+- Windows that ended more than ``settle`` seconds ago are closed. The
+  providers no longer revise them, so their entries never expire. Empty
+  answers (weekends, holidays) are kept too.
+- Everything else is the live edge. Its entries are reused for at most
+  ``live_ttl`` seconds, only while no candle has closed since they were
+  fetched, and only if they already held the latest closed candle. A poll
+  waiting for a new candle therefore always reaches the provider.
+- Entries are files in the snapshot format. The directory is bounded by
+  ``max_bytes``, with least-recently-used eviction (file mtimes keep the
+  order across restarts).
+- Identical requests in flight are coalesced: later callers wait for the
+  first caller's answer instead of sending their own.
+- Batch requests only ask the provider for the symbols that missed.
+
+Hits, misses, coalesced requests and the rate-limit tokens (calls or
+credits) saved are counted per provider.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from snapshot import load_snapshot, remove_snapshot, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+CACHE_SUFFIX = '.fxc'
+
+# call(symbols) -> symbol -> candles, or None if the request was skipped
+ProviderCall = Callable[[List[str]], Optional[Dict[str, pd.DataFrame]]]
+
+
+def interval_seconds(interval: str) -> Optional[float]:
+    """Length of a provider interval ('1m', '1min', '4h', '1day') in seconds, None if unknown."""
+    try:
+        seconds = pd.Timedelta(interval).total_seconds()
+    except (ValueError, TypeError):
+        return None
+    return seconds if seconds > 0 else None
+
+
+class _Flight:
+    """A provider request in flight that identical requests wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Dict[str, pd.DataFrame]] = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    """On-disk cache of provider candle responses with request coalescing."""
+
+    def __init__(self, directory: Optional[str], max_bytes: int = 256 * 2 ** 20,
+                 live_ttl: float = 30.0, settle: float = 900.0,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            directory: Directory of the cache files (None = nothing is cached,
+                requests are only coalesced)
+            max_bytes: Size bound of the directory
+            live_ttl: Seconds a live-edge entry may be reused
+            settle: Seconds after a window's end from which it counts as closed
+            clock: Wall-clock time in epoch seconds
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.live_ttl = live_ttl
+        self.settle = settle
+        self.clock = clock
+        self.entries: 'OrderedDict[str, int]' = OrderedDict()  # file name -> bytes, oldest use first
+        self.cached_bytes = 0
+        self.evictions = 0
+        self.counters: Dict[str, Dict[str, int]] = {}
+        self.lock = threading.Lock()
+        self._flights: Dict[Tuple, _Flight] = {}
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._scan()
+
+    def fetch(self, provider: str, symbols: List[str], interval: str, window: str,
+              call: ProviderCall, end: Optional[pd.Timestamp] = None,
+              per_symbol: bool = False,
+              cancel: Optional[threading.Event] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Serve a provider request from the cache, asking the provider only
+        for the symbols that missed.
+
+        Args:
+            provider: Provider name
+            symbols: Symbol keys requested
+            interval: Candle interval as passed to the provider
+            window: Request window as passed to the provider (e.g.
+                'period=7d', 'start=...', 'start/end')
+            call: ``call(missing)`` asks the provider for the missing symbols;
+                returns symbol -> candles (symbols without data left out), or
+                None if the request was skipped. Errors propagate to every
+                caller waiting for it.
+            end: End of the requested range (None = up to now, the live edge)
+            per_symbol: The provider charges per symbol rather than per request
+            cancel: Set to stop waiting for a coalesced request
+
+        Returns:
+            Dict of symbol -> candles for symbols with data
+        """
+        now = self.clock()
+        closed = end is not None and pd.Timestamp(end).value / 1e9 + self.settle <= now
+        result, missing = {}, []
+        for symbol in symbols:
+            frame = self._get(self._key(provider, symbol, interval, window), now)
+            if frame is None:
+                missing.append(symbol)
+            elif not frame.empty:
+                result[symbol] = frame
+
+        def cost(count: int) -> int:
+            return count if per_symbol else min(count, 1)
+
+        with self.lock:
+            counters = self.counters.setdefault(
+                provider, {'requests': 0, 'hits': 0, 'misses': 0, 'coalesced': 0, 'saved': 0})
+            counters['requests'] += len(symbols)
+            counters['hits'] += len(symbols) - len(missing)
+            counters['misses'] += len(missing)
+            counters['saved'] += cost(len(symbols)) - cost(len(missing))
+            if not missing:
+                return result
+
+            flight_key = (provider, interval, window, tuple(sorted(missing)))
+            flight = self._flights.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[flight_key] = _Flight()
+            else:
+                counters['coalesced'] += 1
+                counters['saved'] += cost(len(missing))
+
+        if not leader:
+            while not flight.done.wait(0.05):
+                if cancel is not None and cancel.is_set():
+                    return result
+            if flight.error is not None:
+                raise flight.error
+            fetched = flight.result
+        else:
+            try:
+                fetched = flight.result = call(missing)
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with self.lock:
+                    del self._flights[flight_key]
+                flight.done.set()
+            if fetched is not None:
+                self._store(provider, missing, interval, window, fetched, closed, now)
+
+        if fetched is not None:
+            result.update({symbol: frame for symbol, frame in fetched.items() if symbol in missing})
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Entries, bytes and evictions, plus request counters per provider."""
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.cached_bytes,
+                    'evictions': self.evictions,
+                    'providers': {provider: dict(counters)
+                                  for provider, counters in self.counters.items()}}
+
+    def clear(self) -> None:
+        """Delete every cache entry."""
+        with self.lock:
+            for name in list(self.entries):
+                self._remove(name)
+
+    @staticmethod
+    def _key(provider: str, symbol: str, interval: str, window: str) -> str:
+        return f"{provider}|{symbol}|{interval}|{window}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + CACHE_SUFFIX)
+
+    def _get(self, key: str, now: float) -> Optional[pd.DataFrame]:
+        """Cached candles for a key (empty if the provider had none), None on a miss."""
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        name = os.path.basename(path)
+        with self.lock:
+            if name not in self.entries:
+                return None
+
+        loaded = load_snapshot(path)
+        with self.lock:
+            if loaded is None or loaded[0].get('key') != key:
+                self._remove(name)
+                return None
+            meta, arrays = loaded
+            valid_until = meta['valid_until']
+            if valid_until is not None and now >= valid_until:
+                self._remove(name)
+                return None
+            if name in self.entries:
+                self.entries.move_to_end(name)
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+
+        index = pd.DatetimeIndex(np.array(arrays['index']).view(meta['index_dtype']),
+                                 name=meta['index_name'])
+        return pd.DataFrame({col: np.array(arrays[f"col_{i}"])
+                             for i, col in enumerate(meta['columns'])}, index=index)
+
+    def _store(self, provider: str, symbols: List[str], interval: str, window: str,
+               fetched: Dict[str, pd.DataFrame], closed: bool, now: float) -> None:
+        """Write fetched candles as entries, if they may be reused."""
+        if self.directory is None:
+            return
+        step = interval_seconds(interval)
+        for symbol in symbols:
+            frame = fetched.get(symbol)
+            if frame is None or frame.empty:
+                frame = pd.DataFrame(index=pd.DatetimeIndex([], dtype='datetime64[ns]'))
+            if closed:
+                valid_until = None
+            else:
+                # Live edge: only until the next candle closes, and only if
+                # the answer already holds the latest closed candle
+                if frame.empty or step is None:
+                    continue
+                boundary = (now // step) * step
+                if frame.index[-1].value / 1e9 < boundary - step:
+                    continue
+                valid_until = min(now + self.live_ttl, boundary + step)
+            if not isinstance(frame.index, pd.DatetimeIndex) or frame.index.tz is not None:
+                continue
+
+            key = self._key(provider, symbol, interval, window)
+            meta = {'key': key, 'stored_at': now, 'valid_until': valid_until,
+                    'index_dtype': str(frame.index.dtype), 'index_name': frame.index.name,
+                    'columns': list(frame.columns)}
+            arrays = {'index': frame.index.asi8}
+            arrays.update({f"col_{i}": frame[col].to_numpy() for i, col in enumerate(frame.columns)})
+            path = self._path(key)
+            name = os.path.basename(path)
+            with self.lock:
+                try:
+                    size = write_snapshot(path, meta, arrays, [])
+                except (OSError, ValueError, TypeError) as e:
+                    logger.warning(f"Could not cache {provider} {symbol} response: {e}")
+                    continue
+                self.cached_bytes += size - self.entries.pop(name, 0)
+                self.entries[name] = size
+                while self.cached_bytes > self.max_bytes and len(self.entries) > 1:
+                    self._remove(next(iter(self.entries)))
+                    self.evictions += 1
+
+    def _remove(self, name: str) -> None:
+        self.cached_bytes -= self.entries.pop(name, 0)
+        remove_snapshot(os.path.join(self.directory, name))
+
+    def _scan(self) -> None:
+        """Index the entries left by earlier runs, least recently used first."""
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(CACHE_SUFFIX):
+                stat = entry.stat()
+                found.append((stat.st_mtime_ns, entry.name, stat.st_size))
+        for _, name, size in sorted(found):
+            self.entries[name] = size
+            self.cached_bytes += size
+        while self.cached_bytes > self.max_bytes and self.entries:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
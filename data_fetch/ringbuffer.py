@@ -0,0 +1,339 @@
+"""
+Array-Backed 1-Minute Candle Buffer
+===================================
+
+Fixed-capacity candle store over preallocated NumPy columns (int64 epoch
+timestamps plus OHLCV), replacing the ``pd.concat`` / ``duplicated`` /
+``tail`` / ``sort_index`` round trip that reallocated the whole 1M frame on
+every merge.
+
+- Appending k candles writes k rows: O(k), independent of capacity.
+- Revised candles (same minute, new values) are overwritten in place.
+- Late fills (minutes missing from the window, e.g. candles released from
+  quarantine) are inserted by rebuilding the window: O(capacity), but rare.
+- The live window is always contiguous, so ``frame()`` wraps read-only
+  column slices in a DataFrame without copying them.
+
+Columns are allocated at twice the capacity and the window slides forward
+through them; when it reaches the end, the live rows move to fresh arrays.
+That move is O(capacity) but only happens once per ``capacity`` appended
+candles, so the amortized per-candle cost stays constant.
+
+Frames are immutable snapshots (copy-on-write): appends only write rows no
+frame covers yet, and a revision first moves the columns to fresh arrays if
+a frame handed out earlier is still alive, so readers never copy and never
+see a frame change under them.
+"""
+
+import sys
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+
+def select_rows(df: pd.DataFrame, since: Optional[pd.Timestamp] = None,
+                last_n: Optional[int] = None) -> pd.DataFrame:
+    """
+    Rows of a time-indexed frame a reader has not seen yet, without copying.
+
+    Args:
+        df: Sorted frame (1M window or closed bars)
+        since: Only rows strictly after this timestamp
+        last_n: At most this many of the most recent rows
+
+    Returns:
+        A slice of ``df`` sharing its data
+    """
+    if df.empty:
+        return df
+    if since is not None:
+        # Compare at the index resolution so any timestamp can be passed
+        since = pd.Timestamp(since).floor(np.datetime_data(df.index.dtype)[0])
+        df = df.iloc[df.index.searchsorted(since, side='right'):]
+    if last_n is not None:
+        df = df.iloc[max(len(df) - last_n, 0):]
+    return df
+
+
+class CandleRingBuffer:
+    """Sliding window over the most recent ``capacity`` 1-minute candles."""
+
+    def __init__(self, capacity: int):
+        """
+        Args:
+            capacity: Maximum number of candles kept
+        """
+        if capacity <= 0:
+            raise ValueError(f"Capacity must be positive, got {capacity}")
+
+        self.capacity = capacity
+        self.version = 0  # bumped on every mutation
+        self.index_name: Optional[str] = None
+        self.unit = 'ns'
+        self._columns: Dict[str, np.ndarray] = {}
+        self._start = 0
+        self._end = 0
+        self._frame: Optional[pd.DataFrame] = None
+        self._owner_refs = 0
+        self._allocate(np.int64)
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    @property
+    def empty(self) -> bool:
+        return self._end == self._start
+
+    @property
+    def last_timestamp(self) -> Optional[pd.Timestamp]:
+        if self.empty:
+            return None
+        return pd.Timestamp(self._columns['ts'][self._end - 1], unit=self.unit)
+
+    def clear(self) -> None:
+        self._start = self._end = 0
+        self._mutated()
+
+    def load(self, candles: pd.DataFrame) -> int:
+        """
+        Replace the contents with the last ``capacity`` rows of a frame.
+
+        Returns:
+            int: Number of candles kept
+        """
+        self.clear()
+        if candles.empty:
+            return 0
+
+        self.index_name = candles.index.name
+        self.unit = np.datetime_data(candles.index.dtype)[0]
+        rows = self._rows(candles)
+        self._load_rows({col: values[-self.capacity:] for col, values in rows.items()})
+        return len(self)
+
+    def load_columns(self, columns: Dict[str, np.ndarray], unit: str = 'ns',
+                     index_name: Optional[str] = None) -> int:
+        """
+        Replace the contents with raw columns ('ts' in ``unit`` plus OHLCV),
+        e.g. from a snapshot, without going through a DataFrame.
+
+        Returns:
+            int: Number of candles kept
+        """
+        self.clear()
+        if len(columns['ts']) == 0:
+            return 0
+
+        self.index_name = index_name
+        self.unit = unit
+        self._load_rows({col: columns[col][-self.capacity:] for col in ['ts'] + PRICE_COLUMNS + ['volume']})
+        return len(self)
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """The live window's 'ts' and OHLCV columns as read-only views."""
+        views = {}
+        for col, values in self._columns.items():
+            view = values[self._start:self._end]
+            view.flags.writeable = False
+            views[col] = view
+        return views
+
+    def merge(self, candles: pd.DataFrame) -> Tuple[int, int, Optional[pd.Timestamp]]:
+        """
+        Append candles newer than the last one and overwrite revised ones.
+
+        Rows older than the last candle are compared with the stored minute
+        and written in place when any OHLCV value differs; minutes that are
+        missing from the window (late fills) are inserted, and rows older
+        than the window are ignored.
+
+        Returns:
+            Tuple of (candles appended, candles revised or filled, timestamp
+            of the earliest revised or filled candle or None)
+        """
+        if candles.empty:
+            return 0, 0, None
+        if self.empty:
+            return self.load(candles), 0, None
+
+        rows = self._rows(candles)
+        split = int(rows['ts'].searchsorted(self._columns['ts'][self._end - 1], side='right'))
+
+        revised, since = 0, None
+        if split:
+            revised, since = self._revise({col: values[:split] for col, values in rows.items()})
+        appended = self._append({col: values[split:] for col, values in rows.items()})
+        return appended, revised, since
+
+    def frame(self) -> pd.DataFrame:
+        """
+        The live window as a read-only DataFrame over the buffer's arrays.
+
+        Cached until the next mutation; later merges never change a frame
+        that has already been handed out.
+        """
+        if self._frame is None:
+            if self.empty:
+                self._frame = pd.DataFrame()
+            else:
+                window = slice(self._start, self._end)
+                views = {}
+                for col, values in self._columns.items():
+                    view = values[window]
+                    view.flags.writeable = False
+                    views[col] = view
+                index = pd.DatetimeIndex(
+                    views.pop('ts').view(f'datetime64[{self.unit}]'),
+                    name=self.index_name, copy=False)
+                self._frame = pd.DataFrame(views, index=index, copy=False)
+        return self._frame
+
+    def snapshot(self, since: Optional[pd.Timestamp] = None,
+                 last_n: Optional[int] = None) -> pd.DataFrame:
+        """Read-only slice of the window; see ``select_rows``."""
+        return select_rows(self.frame(), since, last_n)
+
+    def _allocate(self, volume_dtype) -> None:
+        size = 2 * self.capacity
+        self._columns = {'ts': np.empty(size, dtype=np.int64)}
+        for col in PRICE_COLUMNS:
+            self._columns[col] = np.empty(size, dtype=np.float64)
+        self._columns['volume'] = np.empty(size, dtype=volume_dtype)
+        self._owner_refs = self._max_refs()
+
+    def _max_refs(self) -> int:
+        # Every NumPy view keeps a reference to the array owning the memory
+        return max(sys.getrefcount(values) for values in self._columns.values())
+
+    def _detach_readers(self) -> None:
+        """Copy-on-write: move to fresh arrays while handed-out frames still view these."""
+        self._frame = None
+        if self._max_refs() > self._owner_refs:
+            self._move_window(len(self))
+
+    def _move_window(self, keep: int) -> None:
+        """Copy the newest ``keep`` rows to the front of freshly allocated columns."""
+        window = slice(self._end - keep, self._end)
+        old = self._columns
+        self._allocate(old['volume'].dtype)
+        for col, values in old.items():
+            self._columns[col][:keep] = values[window]
+        self._start, self._end = 0, keep
+
+    def _rows(self, candles: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Column arrays of a frame, sorted and de-duplicated, in the buffer's time unit."""
+        index = candles.index
+        if index.tz is not None:
+            index = index.tz_convert(None)
+        if np.datetime_data(index.dtype)[0] != self.unit:
+            index = index.as_unit(self.unit)
+
+        rows = {'ts': index.asi8}
+        for col in PRICE_COLUMNS:
+            rows[col] = candles[col].to_numpy(dtype=np.float64)
+        rows['volume'] = candles['volume'].to_numpy()
+
+        if not (index.is_monotonic_increasing and index.is_unique):
+            order = np.argsort(rows['ts'], kind='stable')
+            stamps = rows['ts'][order]
+            last = np.append(stamps[1:] != stamps[:-1], True)  # keep the last duplicate
+            rows = {col: values[order][last] for col, values in rows.items()}
+        return rows
+
+    def _locate(self, stamps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Absolute row positions of stored minutes, and which ``stamps`` are stored."""
+        # The window view dies on return, so it never counts as a reader
+        live_ts = self._columns['ts'][self._start:self._end]
+        positions = live_ts.searchsorted(stamps)
+        found = positions < len(live_ts)
+        found[found] = live_ts[positions[found]] == stamps[found]
+        return positions[found] + self._start, found
+
+    def _revise(self, rows: Dict[str, np.ndarray]) -> Tuple[int, Optional[pd.Timestamp]]:
+        positions, found = self._locate(rows['ts'])
+        fills = ~found & (rows['ts'] > self._columns['ts'][self._start])
+
+        revised, since = 0, None
+        if found.any():
+            revised, since = self._overwrite(positions, {col: values[found] for col, values in rows.items()})
+        if fills.any():
+            revised += self._fill({col: values[fills] for col, values in rows.items()})
+            first = pd.Timestamp(rows['ts'][fills][0], unit=self.unit)
+            since = first if since is None else min(since, first)
+        return revised, since
+
+    def _overwrite(self, positions: np.ndarray,
+                   rows: Dict[str, np.ndarray]) -> Tuple[int, Optional[pd.Timestamp]]:
+        """Write stored minutes whose values changed, in place."""
+        offset = self._start
+        changed = np.zeros(len(positions), dtype=bool)
+        values = {}
+        for col in PRICE_COLUMNS + ['volume']:
+            new = self._cast(col, rows[col])
+            old = self._columns[col][positions]
+            changed |= ~((old == new) | ((old != old) & (new != new)))
+            values[col] = new
+
+        if not changed.any():
+            return 0, None
+
+        self._detach_readers()
+        positions = positions[changed] - offset + self._start
+        for col, new in values.items():
+            self._columns[col][positions] = new[changed]
+        self._mutated()
+        return len(positions), pd.Timestamp(self._columns['ts'][positions[0]], unit=self.unit)
+
+    def _fill(self, rows: Dict[str, np.ndarray]) -> int:
+        """Insert minutes missing from the window into fresh arrays, oldest rows giving way."""
+        window = slice(self._start, self._end)
+        merged = {col: np.concatenate([values[window], self._cast(col, rows[col])])
+                  for col, values in self._columns.items()}
+        order = np.argsort(merged['ts'], kind='stable')[-self.capacity:]
+        self._load_rows({col: values[order] for col, values in merged.items()})
+        return len(rows['ts'])
+
+    def _append(self, rows: Dict[str, np.ndarray]) -> int:
+        count = len(rows['ts'])
+        if count == 0:
+            return 0
+        if count >= self.capacity:
+            self._load_rows({col: values[-self.capacity:] for col, values in rows.items()})
+            return count
+
+        if rows['volume'].dtype.kind == 'f' and self._columns['volume'].dtype.kind != 'f':
+            # Same promotion pd.concat applied to mixed int/float volume
+            self._columns['volume'] = self._columns['volume'].astype(np.float64)
+
+        if self._end + count > len(self._columns['ts']):
+            # Slide the window back to the front of fresh arrays
+            self._move_window(min(len(self), self.capacity - count))
+
+        self._write(rows, self._end)
+        self._end += count
+        self._start = max(self._start, self._end - self.capacity)
+        self._mutated()
+        return count
+
+    def _load_rows(self, rows: Dict[str, np.ndarray]) -> None:
+        self._allocate(np.float64 if rows['volume'].dtype.kind == 'f' else np.int64)
+        self._write(rows, 0)
+        self._start, self._end = 0, len(rows['ts'])
+        self._mutated()
+
+    def _write(self, rows: Dict[str, np.ndarray], offset: int) -> None:
+        target = slice(offset, offset + len(rows['ts']))
+        for col, values in rows.items():
+            self._columns[col][target] = self._cast(col, values)
+
+    def _cast(self, col: str, values: np.ndarray) -> np.ndarray:
+        if col == 'volume' and self._columns[col].dtype.kind != 'f':
+            return np.nan_to_num(values).astype(self._columns[col].dtype, copy=False)
+        return values
+
+    def _mutated(self) -> None:
+        self.version += 1
+        self._frame = None
@@ -0,0 +1,184 @@
+"""
+Bar-Close-Aligned Poll Scheduling
+=================================
+
+Decides when the live loop polls the providers next, instead of sleeping a
+flat minute after every poll:
+
+- Polls are aligned to candle closes: a 1M candle stamped ``m`` closes at
+  ``m + 1min`` and shows up at the provider some seconds later, so the next
+  poll is due at that close plus the provider's publication delay.
+- The publication delay is learned per provider from the first poll for
+  each candle: a miss moves the estimate up by ``quantile * step``, a hit
+  down by ``(1 - quantile) * step``, so it settles where that share of
+  first polls finds its candle (a streaming quantile, which needs no
+  retries to observe the delay).
+- By default each candle close gets one poll, so no more provider calls
+  are made than by a fixed one-minute loop; a candle that poll misses
+  comes with the next one. ``max_retries`` > 0 trades quota for latency:
+  a missing candle is then polled again with exponential, jittered backoff
+  (capped at ``retry_max``), at the cost of extra, often empty, calls.
+- Outside the FX session (Friday 22:00 to Sunday 22:00 UTC) nothing is
+  polled; the first poll is due after the session's first candle closes.
+- A poll is never scheduled before the rate limiter has a token for it.
+
+Time comes from an injectable clock (epoch seconds), so schedules can be
+simulated.
+"""
+
+import logging
+import random
+import time
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+from quality import last_session_minute, next_session_minute
+
+logger = logging.getLogger(__name__)
+
+_NS_PER_MINUTE = 60_000_000_000
+
+
+class PollScheduler:
+    """Next poll time from candle closes, measured publication delays and backoff."""
+
+    def __init__(self, clock: Callable[[], float] = time.time, publication_delay: float = 5.0,
+                 retry_base: float = 4.0, retry_max: float = 15.0, max_retries: int = 0,
+                 jitter: float = 0.25, quantile: float = 0.97, step: float = 1.0,
+                 stale_after: float = 300.0,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            clock: Wall-clock time in epoch seconds
+            publication_delay: Assumed seconds from close until a provider
+                serves a candle, before any delay is measured
+            retry_base: First retry delay in seconds while a candle is missing
+            retry_max: Retry delay cap in seconds
+            max_retries: Retries per missing candle before waiting for the
+                next candle's close (0 = one call per close, quota-neutral)
+            jitter: Retry delays are scaled by a random factor in [1 - jitter, 1 + jitter]
+            quantile: Share of first polls that should find their candle
+                (higher = fewer empty polls, later candles)
+            step: Seconds the delay estimate moves per first poll
+            stale_after: Seconds past the close of the oldest missing candle
+                after which empty polls count as failures (see ``stale``)
+            seed: RNG seed for the jitter
+        """
+        self.clock = clock
+        self.publication_delay = publication_delay
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.max_retries = max_retries
+        self.jitter = jitter
+        self.quantile = quantile
+        self.step = step
+        self.stale_after = stale_after
+        self.delays: Dict[Optional[str], float] = {}  # learned publication delay per provider
+        self.source: Optional[str] = None  # provider that delivered last
+        self.attempts = 0  # consecutive polls without the awaited candle
+        self.polls = 0
+        self.empty_polls = 0
+        self.deferred = 0  # candles left for the next close after max_retries
+        self._awaited: Optional[int] = None  # epoch minute being waited for
+        self._rng = random.Random(seed)
+
+    def expected_minute(self, now: Optional[float] = None) -> int:
+        """Epoch minute of the latest FX session candle that has closed by ``now``."""
+        now = self.clock() if now is None else now
+        return last_session_minute(int(now // 60) - 1)
+
+    def delay(self, source: Optional[str] = None) -> float:
+        """Current publication-delay estimate (seconds) of a provider."""
+        return self.delays.get(source or self.source, self.publication_delay)
+
+    def observe(self, newest: Optional[pd.Timestamp], started: float,
+                source: Optional[str] = None) -> None:
+        """
+        Record a finished poll.
+
+        Args:
+            newest: Newest candle held after the poll (the oldest across symbols)
+            started: Clock time the poll was sent
+            source: Provider whose response was merged (None = nothing merged)
+        """
+        self.polls += 1
+        expected = self.expected_minute(started)
+        have = -1 if newest is None else pd.Timestamp(newest).value // _NS_PER_MINUTE
+        # Only a candle's first poll, made within a minute of its close,
+        # times the publication delay
+        offset = started - (expected + 1) * 60
+        first = (self._awaited != expected or self.attempts == 0) and 0 <= offset < 60
+        if have >= expected:
+            if source is not None:
+                self.source = source
+            if first:
+                self._learn(offset, True)
+            self.attempts = 0
+            self._awaited = None
+        else:
+            self.empty_polls += 1
+            if first:
+                self._learn(offset, False)
+            # The retry budget is per candle: a newer close starts it afresh
+            self.attempts = self.attempts + 1 if self._awaited == expected else 1
+            if self.attempts == self.max_retries + 1:
+                self.deferred += 1
+            self._awaited = expected
+
+    def _learn(self, offset: float, found: bool) -> None:
+        """Move the delay estimate after a first poll ``offset`` seconds past the close."""
+        delay = self.delay()
+        if not found:
+            # Not served by ``offset``: the delay is at least that long
+            delay = max(delay, offset) + self.quantile * self.step
+        elif offset <= delay + self.step:
+            # Found on time; a poll held back (rate limit, outage) says little
+            delay -= (1 - self.quantile) * self.step
+        self.delays[self.source] = max(delay, 0.0)
+
+    def next_poll(self, newest: Optional[pd.Timestamp], budget: float = 0.0) -> float:
+        """
+        Clock time the next poll is due.
+
+        Args:
+            newest: Newest candle held (the oldest across symbols)
+            budget: Seconds until a provider can be called under its rate limit
+        """
+        now = self.clock()
+        expected = self.expected_minute(now)
+        have = -1 if newest is None else pd.Timestamp(newest).value // _NS_PER_MINUTE
+        if have >= expected:
+            # Caught up: wait for the next session candle to close
+            upcoming = next_session_minute(expected + 1)
+            due = (upcoming + 1) * 60 + self.delay()
+            if self._awaited is None or self._awaited < upcoming:
+                self._awaited = upcoming
+        elif self.attempts == 0 or self._awaited != expected:
+            # Candle closed since the last poll: poll once it should be served
+            due = max(now, (expected + 1) * 60 + self.delay())
+        elif self.attempts > self.max_retries:
+            # Retry budget spent: the candle is late, take it with the next one
+            upcoming = next_session_minute(expected + 1)
+            due = max((upcoming + 1) * 60 + self.delay(), now + self.retry_max)
+        else:
+            retry = min(self.retry_base * 2 ** (self.attempts - 1), self.retry_max)
+            due = now + retry * self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+        return max(due, now + budget)
+
+    def wait_time(self, newest: Optional[pd.Timestamp], budget: float = 0.0) -> float:
+        """Seconds to sleep until the next poll."""
+        return max(0.0, self.next_poll(newest, budget) - self.clock())
+
+    def stale(self, newest: Optional[pd.Timestamp]) -> bool:
+        """Whether candles are missing for longer than ``stale_after`` seconds."""
+        expected = self.expected_minute()
+        have = -1 if newest is None else pd.Timestamp(newest).value // _NS_PER_MINUTE
+        if have >= expected:
+            return False
+        missing = next_session_minute(have + 1) if have >= 0 else expected
+        return self.clock() - (missing + 1) * 60 > self.stale_after
+
+    def stats(self) -> Dict[str, float]:
+        return {'polls': self.polls, 'empty_polls': self.empty_polls, 'attempts': self.attempts,
+                'deferred': self.deferred, 'delay': self.delay()}
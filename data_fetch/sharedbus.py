@@ -0,0 +1,355 @@
+"""
+Shared-Memory Candle Bus
+========================
+
+One ingest process publishes its 1M buffer and closed timeframe bars into a
+``multiprocessing.shared_memory`` block; any number of strategy processes
+attach to it and read NumPy views straight out of that block. Readers make
+no API calls, keep no copy of the candles, and nothing is serialized.
+
+Layout: a JSON directory of slots (one per symbol and timeframe) followed by
+a bus header (``generation``, bumped after every publish, and the publish
+time) and the slots. Each slot has a small control block and six columns:
+int64 epoch-ns timestamps, then float64 open/high/low/close/volume. Volume
+is always float64 on the bus.
+
+Each slot is a sliding window over columns twice its capacity, like
+``CandleRingBuffer``: new bars are written after the window's end, so rows
+a reader is looking at are not touched by plain appends. Only a revision
+or the occasional move of the window back to the start of the columns
+rewrites rows in place. Those rewrites bump the slot's ``epoch``.
+
+Consistency uses a seqlock. The writer makes ``seq`` odd while it updates
+a slot and even again when it is done; a reader takes the window bounds
+only while ``seq`` is even and unchanged. The views it builds stay
+consistent while ``epoch`` is unchanged, so a strategy computes on them
+directly and then calls ``valid()`` to confirm the data did not change
+underneath (retrying if it did), instead of copying up front. This relies
+on stores becoming visible in program order (x86); ``BusSnapshot.copy``
+gives a validated private copy where that is not a given.
+"""
+
+import json
+import logging
+import sys
+import time
+from multiprocessing import shared_memory
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BUS_COLUMNS = ['ts', 'open', 'high', 'low', 'close', 'volume']
+
+_MAGIC = b'FXBUS001'
+_DIRECTORY_BYTES = 64 * 1024
+_BUS_HEADER = _DIRECTORY_BYTES
+_SLOT_HEADER_BYTES = 64
+
+# Bus header fields (int64)
+_GENERATION, _PUBLISHED_NS = 0, 1
+# Slot control fields (int64)
+_SEQ, _EPOCH, _START, _COUNT = 0, 1, 2, 3
+
+_NS_PER_UNIT = {'s': 1_000_000_000, 'ms': 1_000_000, 'us': 1_000, 'ns': 1}
+
+SlotKey = Tuple[str, str]
+
+
+class _Slot:
+    """Control block and column views of one (symbol, timeframe) window."""
+
+    def __init__(self, buf, offset: int, capacity: int, writable: bool):
+        self.capacity = capacity
+        self.size = 2 * capacity
+        self.control = np.ndarray((8,), dtype=np.int64, buffer=buf, offset=offset)
+        self.columns: Dict[str, np.ndarray] = {}
+        offset += _SLOT_HEADER_BYTES
+        for col in BUS_COLUMNS:
+            dtype = np.int64 if col == 'ts' else np.float64
+            values = np.ndarray((self.size,), dtype=dtype, buffer=buf, offset=offset)
+            if not writable:
+                values.flags.writeable = False
+            self.columns[col] = values
+            offset += self.size * 8
+
+    @staticmethod
+    def nbytes(capacity: int) -> int:
+        return _SLOT_HEADER_BYTES + len(BUS_COLUMNS) * 2 * capacity * 8
+
+
+def _open_block(name: str) -> shared_memory.SharedMemory:
+    """Attach without registering the block with this process's resource tracker."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Before 3.13 attaching registers the block, and the tracker unlinks it
+    # when this process exits, taking the bus away from every other reader
+    from multiprocessing import resource_tracker
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _directory(buf) -> Dict:
+    if bytes(buf[:8]) != _MAGIC:
+        raise ValueError("Not a candle bus shared-memory block")
+    length = int(np.frombuffer(buf, dtype=np.int64, count=1, offset=8)[0])
+    return json.loads(bytes(buf[16:16 + length]).decode())
+
+
+class SharedCandleBus:
+    """Writer side: publishes candle frames into a shared-memory block."""
+
+    def __init__(self, capacities: Dict[str, Dict[str, int]], name: Optional[str] = None):
+        """
+        Args:
+            capacities: Symbol -> timeframe ('1M', '15M', ...) -> rows kept
+            name: Shared-memory block name (None = generated; see ``name``)
+        """
+        slots, offset = [], _BUS_HEADER + _SLOT_HEADER_BYTES
+        for symbol, timeframes in capacities.items():
+            for timeframe, capacity in timeframes.items():
+                slots.append({'symbol': symbol, 'timeframe': timeframe,
+                              'offset': offset, 'capacity': int(capacity)})
+                offset += _Slot.nbytes(int(capacity))
+        directory = json.dumps({'slots': slots}).encode()
+        if len(directory) > _DIRECTORY_BYTES - 16:
+            raise ValueError(f"Too many bus slots for the directory: {len(slots)}")
+
+        self.block = shared_memory.SharedMemory(name=name, create=True, size=offset)
+        buf = self.block.buf
+        buf[16:16 + len(directory)] = directory
+        np.ndarray((1,), dtype=np.int64, buffer=buf, offset=8)[0] = len(directory)
+        self.header = np.ndarray((8,), dtype=np.int64, buffer=buf, offset=_BUS_HEADER)
+        self.header[:] = 0
+        self.slots: Dict[SlotKey, _Slot] = {}
+        for spec in slots:
+            slot = _Slot(buf, spec['offset'], spec['capacity'], writable=True)
+            slot.control[:] = 0
+            self.slots[(spec['symbol'], spec['timeframe'])] = slot
+        self.rows_written = 0
+        self.rewrites = 0
+        buf[:8] = _MAGIC  # last, so readers never see a half-built directory
+        logger.info(f"Candle bus '{self.name}' created: {len(slots)} slots, {offset / 2 ** 20:.1f}MiB")
+
+    @property
+    def name(self) -> str:
+        return self.block.name
+
+    def publish(self, symbol: str, timeframe: str, frame: pd.DataFrame,
+                since: Optional[pd.Timestamp] = None) -> int:
+        """
+        Make ``frame`` the slot's window, writing only rows the window lacks.
+
+        Args:
+            symbol: Symbol key, e.g. 'EURJPY'
+            timeframe: '1M' or a TIMEFRAMES key
+            frame: Sorted candles or closed bars (only the last
+                ``capacity`` rows are kept)
+            since: First timestamp whose values changed since the last
+                publish (a revision); None = only new rows were added
+
+        Returns:
+            int: Number of rows written
+        """
+        slot = self.slots[(symbol, timeframe)]
+        if len(frame) > slot.capacity:
+            frame = frame.iloc[-slot.capacity:]
+        count = len(frame)
+        if count:
+            # Compare in the index's own unit; only written rows are scaled to ns
+            scale = _NS_PER_UNIT[np.datetime_data(frame.index.dtype)[0]]
+            stamps = frame.index.asi8
+        else:
+            scale, stamps = 1, np.empty(0, dtype=np.int64)
+
+        control, columns = slot.control, slot.columns
+        start, old_count = int(control[_START]), int(control[_COUNT])
+        old = columns['ts'][start:start + old_count]
+        # Rows of the current window that the new frame keeps unchanged
+        head = int(old.searchsorted(stamps[0] * scale)) if count and old_count else old_count
+        keep = old_count - head
+        if (not count or head >= old_count or old[head] != stamps[0] * scale
+                or keep > count or stamps[keep - 1] * scale != old[-1]):
+            head, keep = 0, 0
+            start = 0
+        else:
+            start += head
+        first = keep
+        if since is not None and count:
+            first = min(first, int(stamps.searchsorted(pd.Timestamp(since).value // scale)))
+        if start + count > slot.size:
+            # Window reached the end of the columns: move it back to the start
+            start, first = 0, 0
+        rewrite = first < keep or (start == 0 and first == 0 and old_count > 0)
+
+        control[_SEQ] += 1  # odd: write in progress
+        try:
+            if rewrite:
+                control[_EPOCH] += 1
+                self.rewrites += 1
+            if first < count:
+                rows = slice(start + first, start + count)
+                columns['ts'][rows] = stamps[first:] * scale
+                for col in BUS_COLUMNS[1:]:
+                    columns[col][rows] = frame[col].to_numpy()[first:]
+            control[_START] = start
+            control[_COUNT] = count
+        finally:
+            control[_SEQ] += 1
+        self.rows_written += count - first
+        return count - first
+
+    def commit(self) -> int:
+        """Mark a batch of publishes as done; readers waiting on ``generation`` wake up."""
+        self.header[_PUBLISHED_NS] = time.time_ns()
+        self.header[_GENERATION] += 1
+        return int(self.header[_GENERATION])
+
+    def stats(self) -> Dict[str, int]:
+        return {'slots': len(self.slots), 'bytes': self.block.size,
+                'generation': int(self.header[_GENERATION]),
+                'rows_written': self.rows_written, 'rewrites': self.rewrites}
+
+    def close(self) -> None:
+        """Detach and remove the block (attached readers keep their mapping)."""
+        self.header = None
+        self.slots = {}
+        try:
+            self.block.close()
+        except BufferError:
+            logger.warning(f"Candle bus '{self.name}' still has views in this process")
+        try:
+            self.block.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class BusSnapshot:
+    """
+    Zero-copy view of one slot's window, consistent while ``valid()``.
+
+    ``columns`` holds read-only views into shared memory; compute on them,
+    then check ``valid()`` and retry if the writer rewrote the window.
+    """
+
+    __slots__ = ('columns', 'epoch', '_control')
+
+    def __init__(self, columns: Dict[str, np.ndarray], epoch: int, control: np.ndarray):
+        self.columns = columns
+        self.epoch = epoch
+        self._control = control
+
+    def __len__(self) -> int:
+        return len(self.columns['ts'])
+
+    def valid(self) -> bool:
+        """Whether no row of this view has been rewritten since it was taken."""
+        return int(self._control[_EPOCH]) == self.epoch
+
+    def frame(self) -> pd.DataFrame:
+        """The view as a DataFrame over the shared arrays (no copy)."""
+        views = dict(self.columns)
+        index = pd.DatetimeIndex(views.pop('ts').view('datetime64[ns]'), copy=False)
+        return pd.DataFrame(views, index=index, copy=False)
+
+    def copy(self) -> Optional[pd.DataFrame]:
+        """A private copy of the view, or None if it was rewritten meanwhile."""
+        frame = self.frame().copy()
+        return frame if self.valid() else None
+
+
+class SharedCandleReader:
+    """Reader side: attaches to a bus by name and hands out zero-copy views."""
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name: Block name the writer was created with (``SharedCandleBus.name``)
+        """
+        self.block = _open_block(name)
+        buf = self.block.buf
+        directory = _directory(buf)
+        self.header = np.ndarray((8,), dtype=np.int64, buffer=buf, offset=_BUS_HEADER)
+        self.slots: Dict[SlotKey, _Slot] = {
+            (spec['symbol'], spec['timeframe']): _Slot(
+                buf, spec['offset'], spec['capacity'], writable=False)
+            for spec in directory['slots']
+        }
+        self.retries = 0
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(dict.fromkeys(symbol for symbol, _ in self.slots))
+
+    def timeframes(self, symbol: str) -> List[str]:
+        return [timeframe for slot_symbol, timeframe in self.slots if slot_symbol == symbol]
+
+    @property
+    def generation(self) -> int:
+        return int(self.header[_GENERATION])
+
+    @property
+    def published_at(self) -> float:
+        """Epoch seconds of the last ``commit``."""
+        return int(self.header[_PUBLISHED_NS]) / 1e9
+
+    def read(self, symbol: str, timeframe: str, last_n: Optional[int] = None) -> BusSnapshot:
+        """
+        Consistent zero-copy view of a slot's window.
+
+        Args:
+            symbol: Symbol key, e.g. 'EURJPY'
+            timeframe: '1M' or a TIMEFRAMES key
+            last_n: At most this many of the most recent rows
+        """
+        slot = self.slots[(symbol, timeframe)]
+        control = slot.control
+        while True:
+            seq = int(control[_SEQ])
+            if not seq & 1:
+                epoch, start, count = int(control[_EPOCH]), int(control[_START]), int(control[_COUNT])
+                if int(control[_SEQ]) == seq:
+                    break
+            self.retries += 1
+            time.sleep(0)
+        if last_n is not None and count > last_n:
+            start, count = start + count - last_n, last_n
+        rows = slice(start, start + count)
+        return BusSnapshot({col: values[rows] for col, values in slot.columns.items()},
+                           epoch, control)
+
+    def wait(self, generation: int, timeout: Optional[float] = None,
+             interval: float = 0.0005) -> int:
+        """
+        Poll until the bus moves past ``generation``.
+
+        Returns:
+            int: The new generation (unchanged on timeout)
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = int(self.header[_GENERATION])
+            if current != generation or (deadline is not None and time.monotonic() >= deadline):
+                return current
+            time.sleep(interval)
+
+    def updates(self, interval: float = 0.0005) -> Iterator[int]:
+        """Yield each new generation as the writer commits it."""
+        generation = self.generation
+        while True:
+            generation = self.wait(generation, interval=interval)
+            yield generation
+
+    def close(self) -> None:
+        self.header = None
+        self.slots = {}
+        try:
+            self.block.close()
+        except BufferError:
+            logger.debug("Candle bus views still referenced; mapping closes with the process")
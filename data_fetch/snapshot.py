@@ -0,0 +1,116 @@
+"""
+Warm-Restart Snapshot
+=====================
+
+Compact image of the in-memory state written on clean shutdown, so the
+next start can skip journal replay, pandas reconstruction, timeframe
+re-aggregation and the database DDL pass.
+
+The file is a small JSON header (metadata, array layout and the size and
+mtime of every file the state was derived from) followed by the raw
+column arrays, which are read back as views over one buffer.
+
+The snapshot is only a cache: the checkpoint/journal pair stays the
+source of truth. ``load_snapshot`` returns None unless every recorded
+source file is unchanged, so anything written after the snapshot (or a
+missing or damaged snapshot) falls back to the normal recovery path.
+"""
+
+import json
+import logging
+import os
+import struct
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b'FXS1'
+_HEADER = struct.Struct('<4sI')
+
+
+def file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    """(size, mtime in ns) of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def write_snapshot(path: str, meta: Dict[str, Any], arrays: Dict[str, np.ndarray],
+                   sources: Iterable[str]) -> int:
+    """
+    Write metadata and arrays, stamped with the current state of ``sources``.
+
+    Returns:
+        int: Bytes written
+    """
+    layout, offset = [], 0
+    for name, values in arrays.items():
+        values = np.ascontiguousarray(values)
+        arrays[name] = values
+        layout.append([name, values.dtype.str, len(values), offset])
+        offset += values.nbytes
+
+    header = json.dumps({
+        'meta': meta,
+        'layout': layout,
+        'sources': {source: file_stamp(source) for source in sources}
+    }, default=str).encode()
+
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, len(header)))
+        f.write(header)
+        for values in arrays.values():
+            f.write(memoryview(values).cast('B'))
+    os.replace(tmp_file, path)
+    return _HEADER.size + len(header) + offset
+
+
+def load_snapshot(path: str) -> Optional[Tuple[Dict[str, Any], Dict[str, np.ndarray]]]:
+    """
+    Read a snapshot if it is still current.
+
+    Returns:
+        Tuple of (metadata, arrays) with read-only arrays, or None if the
+        snapshot is missing, unreadable or any source file changed since
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, length = _HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"Bad snapshot magic {magic!r}")
+        header = json.loads(data[_HEADER.size:_HEADER.size + length])
+        payload = memoryview(data)[_HEADER.size + length:]
+
+        for source, stamp in header['sources'].items():
+            current = file_stamp(source)
+            if (list(current) if current else None) != stamp:
+                logger.info(f"Snapshot is stale ({source} changed), using full recovery")
+                return None
+
+        arrays = {}
+        for name, dtype, count, offset in header['layout']:
+            dtype = np.dtype(dtype)
+            if offset + count * dtype.itemsize > len(payload):
+                raise ValueError(f"Snapshot truncated in {name}")
+            arrays[name] = np.frombuffer(payload, dtype=dtype, count=count, offset=offset)
+        return header['meta'], arrays
+
+    except (OSError, ValueError, KeyError, struct.error) as e:
+        logger.warning(f"Ignoring unreadable snapshot: {e}")
+        return None
+
+
+def remove_snapshot(path: str) -> None:
+    """Delete a snapshot that no longer matches the persisted state."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
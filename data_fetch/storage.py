@@ -0,0 +1,280 @@
+"""
+SQLite Candle Storage
+=====================
+
+Long-lived SQLite connection (WAL journaling) that persists candles with
+batched ``INSERT ... ON CONFLICT(timestamp) DO UPDATE`` upserts. Each table
+keeps a flush watermark, so a flush only writes rows newer than what is
+already stored and the database keeps history beyond the in-memory buffers.
+
+Tables are keyed by symbol and timeframe (``{SYMBOL}_{TF}``, e.g.
+``EURJPY_1M``); the caller decides the names. Timestamps are INTEGER epoch
+seconds (UTC) and the tables are ``WITHOUT ROWID``, so rows are clustered
+on time and range scans are integer B-tree seeks. Tables from older
+versions (TEXT timestamps, with or without a primary key) are migrated in
+place on startup.
+"""
+
+import logging
+import sqlite3
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Rows returned by query_range, filled straight from the cursor
+RANGE_DTYPE = np.dtype([
+    ('timestamp', 'datetime64[s]'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'f8')
+])
+
+
+def epoch_seconds(timestamp) -> int:
+    """Epoch seconds of a timestamp (naive timestamps are taken as UTC)."""
+    return pd.Timestamp(timestamp).as_unit('ns').value // 1_000_000_000
+
+
+class CandleDatabase:
+    """SQLite store for 1M and aggregated candles, one table per symbol and timeframe."""
+
+    def __init__(self, db_file: str, tables: Iterable[str]):
+        """
+        Args:
+            db_file: Path of the SQLite database
+            tables: Candle table names, e.g. ['EURJPY_1M', 'EURJPY_15M', ...]
+        """
+        self.db_file = db_file
+        self.tables = list(tables)
+        self.conn: Optional[sqlite3.Connection] = None
+        self.watermarks: Dict[str, Optional[pd.Timestamp]] = {}
+
+    def connect(self) -> sqlite3.Connection:
+        """Open (once) the shared connection with WAL journaling."""
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.db_file)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        return self.conn
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def init_schema(self) -> None:
+        """Create tables, migrate legacy ones and load flush watermarks."""
+        conn = self.connect()
+
+        with conn:
+            for table_name in self.tables:
+                if self._needs_migration(table_name):
+                    self._migrate_legacy_table(table_name)
+                else:
+                    self._create_table(table_name)
+
+            # Create metadata table
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS metadata (
+                    key TEXT PRIMARY KEY,
+                    value TEXT,
+                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+        for table_name in self.tables:
+            row = conn.execute(
+                f"SELECT MAX(timestamp) FROM {table_name}").fetchone()
+            self.watermarks[table_name] = (
+                pd.Timestamp(row[0], unit='s') if row[0] is not None else None)
+
+    def restore_watermarks(self, watermarks: Dict[str, Optional[int]]) -> bool:
+        """
+        Adopt flush watermarks (epoch ns) saved while the schema was current,
+        instead of running ``init_schema``; the connection opens on first use.
+
+        Returns:
+            bool: False if they do not cover every table
+        """
+        if set(watermarks) != set(self.tables):
+            return False
+        self.watermarks = {table_name: None if value is None else pd.Timestamp(value)
+                           for table_name, value in watermarks.items()}
+        return True
+
+    def export_watermarks(self) -> Dict[str, Optional[int]]:
+        """Flush watermarks as epoch ns, for ``restore_watermarks``."""
+        return {table_name: None if watermark is None else watermark.value
+                for table_name, watermark in self.watermarks.items()}
+
+    def _create_table(self, table_name: str) -> None:
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                timestamp INTEGER PRIMARY KEY,
+                open REAL NOT NULL,
+                high REAL NOT NULL,
+                low REAL NOT NULL,
+                close REAL NOT NULL,
+                volume INTEGER DEFAULT 0,
+                source TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+
+    def _needs_migration(self, table_name: str) -> bool:
+        """
+        Older tables store TEXT timestamps: keyed ones from the first upsert
+        schema, unkeyed ones from the ``to_sql(if_exists='replace')`` path.
+        """
+        columns = self.conn.execute(f"PRAGMA table_info({table_name})").fetchall()
+        return any(col[1] == 'timestamp' and col[2].upper() != 'INTEGER' for col in columns)
+
+    def _migrate_legacy_table(self, table_name: str) -> None:
+        logger.info(f"Migrating {table_name} to integer-epoch schema")
+        legacy = f"{table_name}_legacy"
+        self.conn.execute(f"ALTER TABLE {table_name} RENAME TO {legacy}")
+        self._create_table(table_name)
+        self.conn.execute(f"""
+            INSERT OR REPLACE INTO {table_name}
+                (timestamp, open, high, low, close, volume, source)
+            SELECT CAST(strftime('%s', timestamp) AS INTEGER), open, high, low, close,
+                   COALESCE(volume, 0), COALESCE(source, 'unknown')
+            FROM {legacy}
+            WHERE strftime('%s', timestamp) IS NOT NULL
+              AND open IS NOT NULL AND high IS NOT NULL
+              AND low IS NOT NULL AND close IS NOT NULL
+            ORDER BY timestamp
+        """)
+        self.conn.execute(f"DROP TABLE {legacy}")
+
+    def pending_rows(self, table_name: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Rows of a sorted frame that are newer than the table's watermark."""
+        if df.empty:
+            return df
+        watermark = self.watermarks.get(table_name)
+        if watermark is None:
+            return df
+        # A rewound watermark may sit between ticks of the index resolution
+        watermark = watermark.floor(np.datetime_data(df.index.dtype)[0])
+        return df.iloc[df.index.searchsorted(watermark, side='right'):]
+
+    def rewind(self, table_name: str, since: pd.Timestamp) -> None:
+        """Move a watermark back so the next flush re-upserts rows from ``since``."""
+        watermark = self.watermarks.get(table_name)
+        if watermark is not None and since <= watermark:
+            self.watermarks[table_name] = since - pd.Timedelta(1, 'ns')
+
+    def flush(self, batches: Dict[str, Tuple[pd.DataFrame, str]]) -> int:
+        """
+        Upsert new rows for several tables in a single transaction.
+
+        Args:
+            batches: Mapping of table name to (sorted candle frame, source label)
+
+        Returns:
+            int: Number of rows written
+        """
+        conn = self.connect()
+        pending = []
+
+        for table_name, (df, source) in batches.items():
+            rows = self.pending_rows(table_name, df)
+            if not rows.empty:
+                pending.append((table_name, rows, source))
+
+        if not pending:
+            return 0
+
+        written = 0
+        with conn:
+            for table_name, rows, source in pending:
+                written += self._upsert(table_name, rows, source)
+
+        # Only advance watermarks once the transaction has committed
+        for table_name, rows, _ in pending:
+            self.watermarks[table_name] = rows.index[-1]
+
+        return written
+
+    def write_history(self, batches: Dict[str, Tuple[pd.DataFrame, str]]) -> int:
+        """
+        Upsert every row of several tables in one transaction, ignoring watermarks.
+
+        Used for backfilled history, which is usually older than what the
+        live flush has already written. Watermarks only move forward.
+
+        Returns:
+            int: Number of rows written
+        """
+        conn = self.connect()
+        batches = {name: batch for name, batch in batches.items() if not batch[0].empty}
+        if not batches:
+            return 0
+
+        written = 0
+        with conn:
+            for table_name, (rows, source) in batches.items():
+                written += self._upsert(table_name, rows, source)
+
+        for table_name, (rows, _) in batches.items():
+            watermark = self.watermarks.get(table_name)
+            if watermark is None or rows.index[-1] > watermark:
+                self.watermarks[table_name] = rows.index[-1]
+
+        return written
+
+    def query_range(self, table_name: str, start=None, end=None) -> np.ndarray:
+        """
+        Read candles with start <= timestamp <= end into a NumPy array.
+
+        Rows stream from the cursor straight into a structured array
+        (``RANGE_DTYPE``); no row list, DataFrame or datetime parsing is
+        involved, only the cursor's transient tuples.
+
+        Args:
+            table_name: Candle table, e.g. 'EURJPY_1H'
+            start: First timestamp to include (None = from the beginning)
+            end: Last timestamp to include (None = up to the latest)
+
+        Returns:
+            Structured array with timestamp (datetime64[s]) and OHLCV fields
+        """
+        conn = self.connect()
+        low = epoch_seconds(start) if start is not None else -2 ** 63
+        high = epoch_seconds(end) if end is not None else 2 ** 63 - 1
+
+        cursor = conn.execute(f"""
+            SELECT timestamp, open, high, low, close, volume FROM {table_name}
+            WHERE timestamp BETWEEN ? AND ?
+            ORDER BY timestamp
+        """, (low, high))
+        return np.fromiter(cursor, dtype=RANGE_DTYPE)
+
+    def _upsert(self, table_name: str, rows: pd.DataFrame, source: str) -> int:
+        timestamps = rows.index.as_unit('ns').asi8 // 1_000_000_000
+        records = zip(
+            timestamps.tolist(),
+            rows['open'].tolist(),
+            rows['high'].tolist(),
+            rows['low'].tolist(),
+            rows['close'].tolist(),
+            rows['volume'].fillna(0).tolist(),
+            [source] * len(rows)
+        )
+
+        self.conn.executemany(f"""
+            INSERT INTO {table_name} (timestamp, open, high, low, close, volume, source)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(timestamp) DO UPDATE SET
+                open = excluded.open,
+                high = excluded.high,
+                low = excluded.low,
+                close = excluded.close,
+                volume = excluded.volume,
+                source = excluded.source
+        """, records)
+        return len(rows)
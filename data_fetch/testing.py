@@ -0,0 +1,91 @@
+"""
+Synthetic Test Data
+===================
+
+Candle generators and a fake clock shared by the pytest suite and the
+offline benchmarks, kept apart from ``benchmark.py`` so the tests do not
+import every subsystem and ``requests`` with it.
+"""
+
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def synthetic_candles(count: int, start: str = '2024-01-05 20:00', seed: int = 0,
+                      gap_ratio: float = 0.1, float_volume: bool = False) -> pd.DataFrame:
+    """
+    Generate a random-walk EUR/JPY-like 1-minute candle frame.
+
+    Args:
+        count: Number of candles
+        start: Timestamp of the first candidate minute
+        seed: RNG seed
+        gap_ratio: Fraction of minutes randomly missing
+        float_volume: Use float volumes instead of integer ticks
+    """
+    rng = np.random.default_rng(seed)
+    minutes = int(count / (1 - gap_ratio)) + 1
+    index = pd.date_range(start, periods=minutes, freq='1min')
+    index = index[np.sort(rng.choice(minutes, count, replace=False))]
+    index.name = 'Datetime'
+
+    close = 160 + np.cumsum(rng.normal(0, 0.01, count))
+    open_ = close + rng.normal(0, 0.005, count)
+    spread = np.abs(rng.normal(0, 0.01, count))
+    volume = rng.random(count) * 10 if float_volume else rng.integers(0, 50, count)
+
+    return pd.DataFrame({
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': volume
+    }, index=index)
+
+
+def inject_anomalies(candles: pd.DataFrame, seed: int = 0) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Copy of gap-free candles with known anomalies at fixed positions.
+
+    Returns:
+        Tuple of (candles, expected anomaly counts)
+    """
+    candles = candles.copy()
+    n = len(candles)
+    col = candles.columns.get_loc
+
+    spike = n // 3
+    candles.iloc[spike, col('close')] *= 1.03
+    candles.iloc[spike, col('high')] = candles.iloc[spike]['close']
+
+    broken = n // 2
+    candles.iloc[broken, col('high')] = candles.iloc[broken]['low'] - 0.1
+
+    missing = 2 * n // 3
+    candles.iloc[missing, col('close')] = np.nan
+
+    stale = 3 * n // 4
+    flat = candles.iloc[stale - 1]['close']
+    for row in range(stale, stale + 20):
+        candles.iloc[row, [col('open'), col('high'), col('low'), col('close')]] = flat
+
+    gap = 4 * n // 5
+    candles = candles.drop(candles.index[gap:gap + 30])
+
+    expected = {'spike': 1, 'invalid_ohlc': 1, 'non_finite': 1, 'stale': 1, 'gap': 1}
+    return candles, expected
+
+
+class FakeClock:
+    """Simulated wall clock; sleeping advances it instantly."""
+
+    def __init__(self, start: float = 1_704_067_200.0):  # 2024-01-01 00:00 UTC
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
@@ -0,0 +1,21 @@
+"""Make the data_fetch modules importable the way data_fetch.py imports them."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def aggregator(tmp_path, monkeypatch):
+    """Offline MultiSourceForexAggregator whose state files live in ``tmp_path``."""
+    monkeypatch.chdir(tmp_path)
+    import data_fetch
+
+    aggregator = data_fetch.MultiSourceForexAggregator(['EUR/JPY'])
+    for journal in aggregator.journals.values():
+        journal.fsync = 'never'
+    yield aggregator
+    aggregator.close()
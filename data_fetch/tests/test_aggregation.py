@@ -0,0 +1,97 @@
+"""Incremental and bulk aggregation against the pandas resample reference."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregation import TIMEFRAMES, IncrementalAggregator, aggregate_timeframes, resample_ohlcv
+from testing import synthetic_candles
+
+SIZES = {tf_name: 100 for tf_name in TIMEFRAMES}
+
+
+def assert_matches_resample(frames, buffer):
+    for tf_name, freq in TIMEFRAMES.items():
+        expected = resample_ohlcv(buffer, freq).tail(SIZES[tf_name])
+        pd.testing.assert_frame_equal(frames[tf_name], expected, check_exact=True,
+                                      check_freq=False, obj=tf_name)
+
+
+@pytest.mark.parametrize('float_volume', [False, True])
+def test_sliding_buffer_matches_resample(float_volume):
+    # Three weeks with 10% gaps: several W-MON bins and trimmed heads
+    rng = np.random.default_rng(1)
+    candles = synthetic_candles(30_000, float_volume=float_volume)
+    aggregator = IncrementalAggregator(TIMEFRAMES, SIZES)
+    window = 20_000
+    end = window
+    assert_matches_resample(aggregator.update(candles.iloc[:end]), candles.iloc[:end])
+
+    while end < len(candles):
+        end = min(end + int(rng.integers(1, 400)), len(candles))
+        buffer = candles.iloc[max(0, end - window):end]
+        assert_matches_resample(aggregator.update(buffer), buffer)
+    assert len(aggregator.frames()['W']) >= 2
+
+
+def test_revisions_match_resample():
+    rng = np.random.default_rng(2)
+    candles = synthetic_candles(15_000)
+    aggregator = IncrementalAggregator(TIMEFRAMES, SIZES)
+    buffer = candles.iloc[:10_000].copy()
+    aggregator.update(buffer)
+
+    for end in range(10_000, 15_000, 250):
+        # Overwrite a run of stored candles (provider resends), then append
+        first = end - int(rng.integers(1, 3000))
+        revised = buffer.index[first:first + 20]
+        buffer.loc[revised, 'close'] += 0.05
+        buffer.loc[revised, 'high'] = buffer.loc[revised, ['high', 'close']].max(axis=1)
+        buffer.loc[revised, 'volume'] += 7
+        aggregator.revise(buffer, revised[0])
+
+        buffer = pd.concat([buffer, candles.iloc[end:end + 250]])
+        assert_matches_resample(aggregator.update(buffer), buffer)
+
+
+def test_revision_of_forming_bar():
+    candles = synthetic_candles(5_000, gap_ratio=0)
+    aggregator = IncrementalAggregator(TIMEFRAMES, SIZES)
+    buffer = candles.iloc[:4_000].copy()
+    aggregator.update(buffer)
+
+    buffer.iloc[-1, buffer.columns.get_loc('low')] -= 1.0
+    aggregator.revise(buffer, buffer.index[-1])
+    buffer = pd.concat([buffer, candles.iloc[4_000:]])
+    assert_matches_resample(aggregator.update(buffer), buffer)
+
+
+@pytest.mark.parametrize('float_volume', [False, True])
+def test_bulk_kernel_matches_resample(float_volume):
+    candles = synthetic_candles(50_000, seed=3, float_volume=float_volume)
+    bars = aggregate_timeframes(candles, TIMEFRAMES)
+    for tf_name, freq in TIMEFRAMES.items():
+        pd.testing.assert_frame_equal(bars[tf_name], resample_ohlcv(candles, freq),
+                                      check_exact=True, check_freq=False, obj=tf_name)
+
+
+@pytest.mark.parametrize('missing', [False, True])
+def test_bulk_kernel_whole_float_volume(missing):
+    candles = synthetic_candles(50_000, seed=5)
+    candles['volume'] = candles['volume'].astype(np.float64)
+    if missing:
+        candles.iloc[::101, candles.columns.get_loc('volume')] = np.nan
+    bars = aggregate_timeframes(candles, TIMEFRAMES)
+    for tf_name, freq in TIMEFRAMES.items():
+        pd.testing.assert_frame_equal(bars[tf_name], resample_ohlcv(candles, freq),
+                                      check_exact=True, check_freq=False, obj=tf_name)
+
+
+def test_bulk_kernel_skips_missing_prices():
+    candles = synthetic_candles(10_000, seed=4)
+    candles.iloc[::97, candles.columns.get_loc('open')] = np.nan
+    candles.iloc[::89, candles.columns.get_loc('close')] = np.nan
+    bars = aggregate_timeframes(candles, TIMEFRAMES)
+    for tf_name, freq in TIMEFRAMES.items():
+        pd.testing.assert_frame_equal(bars[tf_name], resample_ohlcv(candles, freq),
+                                      check_exact=True, check_freq=False, obj=tf_name)
@@ -0,0 +1,122 @@
+"""Resumable backfill against a local stub provider: resume, retries, clipping."""
+
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregation import TIMEFRAMES
+from backfill import BackfillEngine, window_bars
+from storage import CandleDatabase
+from testing import synthetic_candles
+
+START = pd.Timestamp('2024-01-01')
+END = START + pd.Timedelta(days=8)
+TABLES = {tf_name: f'EURJPY_{tf_name}' for tf_name in ['1M'] + list(TIMEFRAMES)}
+CANDLES = synthetic_candles(8 * 1440, start=str(START), gap_ratio=0)
+CANDLES = CANDLES[CANDLES.index < END]
+
+
+class StubFetch:
+    """WindowFetch serving CANDLES, failing the windows in ``broken``."""
+
+    def __init__(self, broken=(), stop_after=None):
+        self.broken = set(broken)
+        self.stop_after = stop_after
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, start, end, cancel):
+        with self.lock:
+            self.calls.append(start)
+            if start in self.broken:
+                raise ConnectionError(f'provider error for {start}')
+            if self.stop_after is not None and len(self.calls) >= self.stop_after:
+                cancel.set()
+        return CANDLES.iloc[CANDLES.index.searchsorted(start):CANDLES.index.searchsorted(end)]
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = CandleDatabase(str(tmp_path / 'candles.db'), TABLES.values())
+    database.init_schema()
+    yield database
+    database.close()
+
+
+def job(start=START, symbol='EURJPY'):
+    return {'symbol': symbol, 'source': 'stub', 'start': start, 'end': END,
+            'window': pd.Timedelta(days=1)}
+
+
+def run(database, tmp_path, fetch, cancel=None, workers=1, **kwargs):
+    engine = BackfillEngine(database, max_workers=workers, retries=2)
+    return engine.run(kwargs.pop('job', job()), fetch, TABLES, TIMEFRAMES,
+                      str(tmp_path / 'checkpoint.json'), cancel)
+
+
+def stored_stamps(database, tf_name):
+    return database.query_range(TABLES[tf_name])['timestamp']
+
+
+def test_cancel_then_resume_fetches_only_unfinished_windows(database, tmp_path):
+    first = StubFetch(stop_after=3)
+    interrupted = run(database, tmp_path, first, cancel=threading.Event())
+    assert not interrupted['complete']
+    assert interrupted['fetched'] == 3
+
+    second = StubFetch()
+    resumed = run(database, tmp_path, second, workers=4)
+    assert resumed['complete']
+    assert resumed['resumed'] == 3 and resumed['fetched'] == 5
+    assert not set(first.calls) & set(second.calls)
+
+    np.testing.assert_array_equal(stored_stamps(database, '1M'),
+                                  CANDLES.index.to_numpy(dtype='datetime64[s]'))
+    expected = window_bars(CANDLES, TIMEFRAMES['1H'], END)
+    np.testing.assert_array_equal(stored_stamps(database, '1H'),
+                                  expected.index.to_numpy(dtype='datetime64[s]'))
+
+
+def test_checkpoint_of_another_job_is_ignored(database, tmp_path):
+    run(database, tmp_path, StubFetch())
+    with open(tmp_path / 'checkpoint.json') as f:
+        assert json.load(f)['job']['symbol'] == 'EURJPY'
+
+    other = StubFetch()
+    stats = run(database, tmp_path, other, job=job(symbol='USDJPY'))
+    assert stats['resumed'] == 0 and stats['fetched'] == 8
+    assert len(other.calls) == 8
+
+
+def test_failing_window_is_counted_and_not_marked_done(database, tmp_path):
+    broken = START + pd.Timedelta(days=2)
+    fetch = StubFetch(broken=[broken])
+    stats = run(database, tmp_path, fetch)
+
+    assert stats['failed'] == 1 and stats['retries'] == 2
+    assert fetch.calls.count(broken) == 3  # first attempt plus two retries
+    assert not stats['complete'] and stats['fetched'] == 7
+    with open(tmp_path / 'checkpoint.json') as f:
+        assert str(broken) not in json.load(f)['done']
+
+    # The next run fetches only that window
+    retry = StubFetch()
+    stats = run(database, tmp_path, retry)
+    assert retry.calls == [broken] and stats['complete']
+
+
+def test_rows_before_the_job_start_are_not_written(database, tmp_path):
+    start = START + pd.Timedelta(hours=12)
+    stats = run(database, tmp_path, StubFetch(), job=job(start))
+    assert stats['complete']
+
+    wanted = CANDLES[CANDLES.index >= start]
+    assert stats['rows'] == len(wanted)
+    np.testing.assert_array_equal(stored_stamps(database, '1M'),
+                                  wanted.index.to_numpy(dtype='datetime64[s]'))
+    assert stored_stamps(database, '15M')[0] == start
+    # The first day's daily bar would hold only half its candles
+    assert stored_stamps(database, 'D')[0] == START + pd.Timedelta(days=1)
@@ -0,0 +1,120 @@
+"""Candle event bus: ordering, overflow policies, async iteration and the socket server."""
+
+import asyncio
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from events import CandleEvent, EventBus, EventClient, EventServer
+
+START = pd.Timestamp('2024-01-08 00:00')
+
+
+def candle(i, kind='candle', timeframe='1M'):
+    return CandleEvent(kind, 'EURJPY', timeframe, START + pd.Timedelta(minutes=i),
+                       160.0 + i, 160.5 + i, 159.5 + i, 160.2 + i, float(i))
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.005)
+
+
+def test_events_arrive_in_publish_order():
+    bus = EventBus()
+    received = []
+    subscription = bus.subscribe(received.append)
+    bars = bus.subscribe_queue(kinds=['bar_closed'], timeframes=['1H'])
+
+    for i in range(0, 300, 3):
+        bus.publish([candle(i), candle(i + 1), candle(i, 'bar_closed', '1H')])
+    subscription.close()
+    subscription.join(5)
+    bars.close()
+
+    assert [event.timestamp for event in received if event.kind == 'candle'] == \
+        [candle(i).timestamp for start in range(0, 300, 3) for i in (start, start + 1)]
+    assert [event.sequence for event in received] == list(range(1, 301))
+    closed = list(bars)
+    assert len(closed) == 100 and all(event.timeframe == '1H' for event in closed)
+    assert [event.sequence for event in closed] == list(range(3, 301, 3))
+
+
+@pytest.mark.parametrize('overflow', ['drop_oldest', 'drop_newest'])
+def test_slow_subscriber_drops_without_stalling_publish(overflow):
+    bus = EventBus()
+    entered, release = threading.Event(), threading.Event()
+    received = []
+
+    def slow(event):
+        entered.set()
+        release.wait(5)
+        received.append(event.sequence)
+
+    subscription = bus.subscribe(slow, maxsize=10, overflow=overflow)
+    fast = bus.subscribe_queue(maxsize=1000)
+    bus.publish([candle(0)])
+    assert entered.wait(5)
+    started = time.perf_counter()
+    for i in range(1, 200):
+        bus.publish([candle(i)])
+    assert time.perf_counter() - started < 1.0  # the blocked callback held nothing up
+    assert len(fast.queue) == 200
+
+    release.set()
+    subscription.close()
+    subscription.join(5)
+    # The event in the callback when it blocked, then the 10 the queue kept
+    assert len(received) == 11
+    assert received[0] == 1 and subscription.dropped == 189
+    if overflow == 'drop_oldest':
+        assert received[1:] == list(range(191, 201))  # latest prices win
+    else:
+        assert received[1:] == list(range(2, 12))
+
+
+def test_async_iteration():
+    bus = EventBus()
+
+    async def consume():
+        subscription = bus.subscribe_async(kinds=['candle'])
+
+        def producer():
+            for i in range(50):
+                bus.publish([candle(i), candle(i, 'bar_closed', '15M')])
+                time.sleep(0.001)
+            subscription.close()
+
+        threading.Thread(target=producer).start()
+        return [event async for event in subscription]
+
+    events = asyncio.run(asyncio.wait_for(consume(), 10))
+    assert [event.close for event in events] == [candle(i).close for i in range(50)]
+
+
+def test_server_round_trip_over_unix_socket(tmp_path):
+    bus = EventBus()
+    path = str(tmp_path / 'events.sock')
+    server = EventServer(bus, path)
+    client = EventClient(path, timeout=5)
+    try:
+        wait_until(lambda: server.clients)
+        sent = [candle(i) for i in range(20)]
+        bus.publish(sent)
+
+        stream = iter(client)
+        received = [next(stream) for _ in sent]
+        assert [event._replace(sequence=0) for event in received] == sent
+        assert [event.sequence for event in received] == list(range(1, 21))
+
+        # A client that went away is dropped on the next failed send
+        client.close()
+        wait_until(lambda: (bus.publish([candle(0)]), not server.clients)[1])
+        assert not bus.subscriptions
+    finally:
+        client.close()
+        server.close()
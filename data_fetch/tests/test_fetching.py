@@ -0,0 +1,55 @@
+"""Provider fetching modes and their effect on provider health."""
+
+import logging
+import threading
+
+import pandas as pd
+
+from fetching import ProviderFetcher
+from health import CLOSED, HealthMonitor
+from testing import synthetic_candles
+
+CANDLES = synthetic_candles(10)
+
+
+def provider(delay=0.0, data=CANDLES, error=None):
+    def call(cancel: threading.Event):
+        if cancel.wait(delay):
+            return pd.DataFrame()
+        if error is not None:
+            raise error
+        return data
+    return call
+
+
+def test_concurrent_mode_takes_the_fastest_answer():
+    fetcher = ProviderFetcher()
+    calls = [('slow', provider(0.5)), ('fast', provider(0.01))]
+    result = fetcher.fetch(calls, lambda source, data: True, hedge_delay=0.0)
+    assert result['source'] == 'fast'
+    assert result['latency'] < 0.4
+    # The outrun call was still running and got cancelled
+    assert result['calls']['slow'].get('latency') is None
+    fetcher.shutdown()
+
+
+def test_errors_are_reported_once_by_the_caller(caplog):
+    fetcher = ProviderFetcher()
+    calls = [('broken', provider(error=ConnectionError('down'))), ('ok', provider())]
+    with caplog.at_level(logging.ERROR):
+        result = fetcher.fetch(calls, lambda source, data: True)
+    assert result['source'] == 'ok'
+    assert result['calls']['broken']['error'] == 'down'
+    assert not caplog.records
+    fetcher.shutdown()
+
+
+def test_outrun_calls_end_the_failure_streak():
+    health = HealthMonitor(['a'], failure_threshold=3)
+    for _ in range(2):
+        health.record('a', 0.01, ok=False)
+    health.interrupted('a')
+    health.record('a', 0.01, ok=False)
+    report = health.report()['a']
+    assert report['state'] == CLOSED
+    assert report['consecutive_failures'] == 1
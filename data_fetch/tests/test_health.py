@@ -0,0 +1,141 @@
+"""Provider health: circuit breaker transitions, ordering and persisted state."""
+
+import json
+
+import pytest
+
+from health import CLOSED, HALF_OPEN, OPEN, HealthMonitor
+from testing import FakeClock
+
+SOURCES = ['twelve_data', 'yfinance', 'alpha_vantage']
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def monitor_on(clock, state_file=None, **kwargs):
+    return HealthMonitor(SOURCES, state_file and str(state_file), clock=clock.time, **kwargs)
+
+
+def fail(monitor, source, times):
+    for _ in range(times):
+        assert monitor.allow(source)
+        monitor.record(source, 0.5, ok=False)
+
+
+def state(monitor, source):
+    return monitor.report()[source]['state']
+
+
+def test_circuit_opens_after_consecutive_failures(clock):
+    monitor = monitor_on(clock, failure_threshold=3, cooldown=60.0)
+    fail(monitor, 'yfinance', 2)
+    monitor.record('yfinance', 0.2, ok=True, age=5.0)  # a success ends the streak
+    fail(monitor, 'yfinance', 2)
+    assert state(monitor, 'yfinance') == CLOSED
+
+    fail(monitor, 'yfinance', 1)
+    assert state(monitor, 'yfinance') == OPEN
+    assert not monitor.allow('yfinance')
+    assert monitor.available_in('yfinance') == 60.0
+    assert monitor.allow('twelve_data')  # other providers are unaffected
+
+
+def test_half_open_probe_after_cooldown(clock):
+    monitor = monitor_on(clock, failure_threshold=2, cooldown=60.0)
+    fail(monitor, 'yfinance', 2)
+    clock.sleep(59.0)
+    assert not monitor.allow('yfinance')
+    assert monitor.available_in('yfinance') == pytest.approx(1.0)
+
+    clock.sleep(1.0)
+    assert monitor.allow('yfinance')  # the probe
+    assert state(monitor, 'yfinance') == HALF_OPEN
+    assert not monitor.allow('yfinance')  # only one probe at a time
+    assert monitor.order(SOURCES)[0] == 'yfinance'  # probes go first
+
+    monitor.record('yfinance', 0.3, ok=True, age=4.0)
+    assert state(monitor, 'yfinance') == CLOSED
+    assert monitor.allow('yfinance') and monitor.allow('yfinance')
+
+
+def test_failed_probe_reopens_with_a_longer_cooldown(clock):
+    monitor = monitor_on(clock, failure_threshold=2, cooldown=60.0, max_cooldown=200.0)
+    fail(monitor, 'yfinance', 2)
+    for cooldown in [120.0, 200.0, 200.0]:  # doubled, then capped
+        clock.sleep(monitor.available_in('yfinance'))
+        fail(monitor, 'yfinance', 1)  # the probe fails
+        assert state(monitor, 'yfinance') == OPEN
+        assert monitor.available_in('yfinance') == cooldown
+
+    # A probe that never finished frees the slot for the next one
+    clock.sleep(200.0)
+    assert monitor.allow('yfinance')
+    monitor.release('yfinance')
+    assert monitor.allow('yfinance')
+
+    # A successful probe restores the base cooldown
+    monitor.record('yfinance', 0.3, ok=True)
+    fail(monitor, 'yfinance', 2)
+    assert monitor.available_in('yfinance') == 60.0
+
+
+def test_interrupted_call_ends_the_failure_streak(clock):
+    monitor = monitor_on(clock, failure_threshold=3)
+    for _ in range(5):
+        fail(monitor, 'alpha_vantage', 2)
+        monitor.interrupted('alpha_vantage')  # outrun, not failed
+    assert state(monitor, 'alpha_vantage') == CLOSED
+
+
+def test_order_by_expected_time_to_a_fresh_candle(clock):
+    monitor = monitor_on(clock)
+    assert monitor.order(SOURCES) == SOURCES  # no samples: configured order
+    monitor.record('twelve_data', 0.05, ok=True, age=120.0)  # fast but stale
+    monitor.record('yfinance', 0.4, ok=True, age=5.0)
+    monitor.record('alpha_vantage', 0.1, ok=True, age=5.0)
+    assert monitor.order(SOURCES) == ['alpha_vantage', 'yfinance', 'twelve_data']
+
+
+def test_state_round_trips_through_the_json_file(clock, tmp_path):
+    path = tmp_path / 'health.json'
+    monitor = monitor_on(clock, path, failure_threshold=2, cooldown=60.0)
+    monitor.record('twelve_data', 0.25, ok=True, age=30.0)
+    fail(monitor, 'yfinance', 2)
+    clock.sleep(60.0)
+    fail(monitor, 'yfinance', 1)  # failed probe: open for 120s
+    fail(monitor, 'alpha_vantage', 2)
+    clock.sleep(60.0)
+    assert monitor.allow('alpha_vantage')  # probe in flight at shutdown
+    before = monitor.report()
+    monitor.save()
+    assert sorted(json.loads(path.read_text())) == sorted(SOURCES)
+
+    restored = monitor_on(clock, path, failure_threshold=2, cooldown=60.0)
+    after = restored.report()
+    for source in ['twelve_data', 'yfinance']:
+        assert after[source] == before[source]
+    # Circuits are stamped with wall-clock time, so downtime counts
+    clock.sleep(45.0)
+    assert restored.available_in('yfinance') == pytest.approx(15.0)
+
+    # The unfinished probe reopens the circuit, due for a new probe now
+    assert after['alpha_vantage']['state'] == OPEN
+    assert restored.allow('alpha_vantage')
+    assert state(restored, 'alpha_vantage') == HALF_OPEN
+
+
+def test_unreadable_state_file_is_ignored(clock, tmp_path):
+    path = tmp_path / 'health.json'
+    path.write_text('{not json')
+    monitor = monitor_on(clock, path)
+    assert all(report['state'] == CLOSED for report in monitor.report().values())
+
+    path.write_text(json.dumps({'yfinance': {'state': 'bogus', 'calls': 7},
+                                'removed_source': {'state': OPEN}}))
+    monitor = monitor_on(clock, path)
+    assert monitor.report()['yfinance']['state'] == CLOSED
+    assert monitor.report()['yfinance']['calls'] == 7
+    assert 'removed_source' not in monitor.report()
@@ -0,0 +1,112 @@
+"""Columnar 1M history: day-partition upserts, partition pruning and watermarks."""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from history import HistoryStore, columns_frame, history_available
+from testing import synthetic_candles
+
+pytestmark = pytest.mark.skipif(not history_available(), reason='pyarrow is not installed')
+
+# Jan 30 - Feb 2: four days across a month boundary
+CANDLES = synthetic_candles(4 * 1440, start='2024-01-30 00:00', gap_ratio=0)
+CANDLES = CANDLES[CANDLES.index < pd.Timestamp('2024-02-03')]
+
+
+def stored(store, start=None, end=None):
+    return columns_frame(store.scan('EURJPY', start, end), CANDLES.index.name)
+
+
+def assert_candles(frame, candles):
+    np.testing.assert_array_equal(frame.index.asi8, candles.index.as_unit('ns').asi8)
+    for col in frame.columns:
+        np.testing.assert_array_equal(frame[col], candles[col].to_numpy(dtype=np.float64))
+
+
+def partition_days(paths):
+    return [os.path.basename(path)[:10] for path in paths]
+
+
+def test_writes_one_file_per_day(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    assert store.write('EURJPY', CANDLES) == len(CANDLES)
+    assert partition_days(store.partitions('EURJPY')) == \
+        ['2024-01-30', '2024-01-31', '2024-02-01', '2024-02-02']
+    assert os.path.isdir(tmp_path / 'EURJPY' / '2024-02')
+    assert_candles(stored(store), CANDLES)
+
+
+def test_overlapping_write_upserts_the_day(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    store.write('EURJPY', CANDLES.iloc[:2000])
+
+    # Rewrites the tail of day one and extends into day two; later values win
+    revised = CANDLES.iloc[1000:2500].copy()
+    revised['close'] += 1.0
+    assert store.write('EURJPY', revised) == 1500
+
+    expected = CANDLES.iloc[:2500].copy()
+    expected.iloc[1000:, expected.columns.get_loc('close')] += 1.0
+    assert_candles(stored(store), expected)
+
+
+def test_duplicate_minutes_keep_the_last_value(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    store.write('EURJPY', CANDLES.iloc[:100])
+
+    # Unsorted batch that repeats minutes, some of them already stored
+    batch = CANDLES.iloc[[150, 50, 120, 50]].copy()
+    batch['close'] = [1.0, 2.0, 3.0, 4.0]
+    assert store.write('EURJPY', batch) == 3
+
+    expected = pd.concat([CANDLES.iloc[:100], CANDLES.iloc[[120, 150]]])
+    expected.loc[CANDLES.index[50], 'close'] = 4.0
+    expected.loc[CANDLES.index[120], 'close'] = 3.0
+    expected.loc[CANDLES.index[150], 'close'] = 1.0
+    frame = stored(store)
+    assert frame.index.is_unique
+    assert_candles(frame, expected)
+
+
+@pytest.mark.parametrize('start, end, days', [
+    ('2024-01-31', '2024-02-01', ['2024-01-31']),  # end at midnight excludes that day
+    ('2024-01-31 23:59', '2024-02-01 00:01', ['2024-01-31', '2024-02-01']),
+    ('2024-02-01', '2024-02-02', ['2024-02-01']),  # the January directory is skipped
+    ('2024-01-30 12:00', '2024-02-02', ['2024-01-30', '2024-01-31', '2024-02-01']),
+    (None, '2024-01-31', ['2024-01-30']),
+    ('2024-02-02', None, ['2024-02-02']),
+    ('2024-03-01', None, []),
+])
+def test_range_reads_prune_partitions(tmp_path, start, end, days):
+    store = HistoryStore(str(tmp_path))
+    store.write('EURJPY', CANDLES)
+    assert partition_days(store.partitions('EURJPY', start, end)) == days
+
+    store.partitions_read = 0
+    frame = stored(store, start, end)
+    assert store.partitions_read == len(days)
+    wanted = CANDLES
+    if start is not None:
+        wanted = wanted[wanted.index >= pd.Timestamp(start)]
+    if end is not None:
+        wanted = wanted[wanted.index < pd.Timestamp(end)]
+    assert_candles(frame, wanted)
+
+
+def test_watermark_is_read_back_after_reopening(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    assert store.watermark('EURJPY') is None
+    store.flush('EURJPY', CANDLES.iloc[:3000])
+    assert store.watermark('EURJPY') == CANDLES.index[2999].value
+
+    reopened = HistoryStore(str(tmp_path))
+    assert reopened.watermark('EURJPY') == CANDLES.index[2999].value
+    assert reopened.partitions_read == 1  # only the newest partition is opened
+
+    # A flush of the whole buffer appends only the minutes past the watermark
+    assert reopened.flush('EURJPY', CANDLES) == len(CANDLES) - 3000
+    assert reopened.watermark('EURJPY') == CANDLES.index[-1].value
+    assert_candles(stored(reopened), CANDLES)
@@ -0,0 +1,112 @@
+"""Checkpoint + journal crash recovery."""
+
+import os
+
+import pandas as pd
+import pytest
+
+from journal import RECORD_DTYPE, CandleJournal
+from testing import synthetic_candles
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / 'candles.journal'), str(tmp_path / 'candles.checkpoint')
+
+
+def test_recovers_checkpoint_plus_journal_tail(paths):
+    candles = synthetic_candles(1_500)
+    journal = CandleJournal(*paths, fsync='never')
+    journal.checkpoint(candles.iloc[:1_000], {'current_source': 'yfinance'})
+    for end in range(1_001, 1_501, 7):
+        journal.append(candles.iloc[:end], 'twelve_data')
+    journal.append(candles, 'twelve_data')
+    journal.close()
+
+    recovered, meta = CandleJournal(*paths).recover()
+    pd.testing.assert_frame_equal(recovered, candles, check_freq=False)
+    assert meta['current_source'] == 'twelve_data'
+
+
+def test_torn_tail_is_discarded(paths):
+    candles = synthetic_candles(200)
+    journal = CandleJournal(*paths, fsync='never')
+    journal.checkpoint(candles.iloc[:100], {})
+    journal.append(candles, 'yfinance')
+    journal.close()
+
+    # Crash in the middle of the last record
+    journal_file = paths[0]
+    with open(journal_file, 'r+b') as f:
+        f.truncate(os.path.getsize(journal_file) - RECORD_DTYPE.itemsize // 2)
+
+    recovered, _ = CandleJournal(*paths).recover()
+    pd.testing.assert_frame_equal(recovered, candles.iloc[:-1], check_freq=False)
+    # The torn bytes are gone, so later appends start on a record boundary
+    reopened = CandleJournal(*paths, fsync='never')
+    reopened.recover()
+    reopened.append(candles, 'yfinance')
+    reopened.close()
+    recovered, _ = CandleJournal(*paths).recover()
+    pd.testing.assert_frame_equal(recovered, candles, check_freq=False)
+
+
+def test_corrupt_record_stops_replay(paths):
+    candles = synthetic_candles(200)
+    journal = CandleJournal(*paths, fsync='never')
+    journal.checkpoint(candles.iloc[:100], {})
+    journal.append(candles, 'yfinance')
+    journal.close()
+
+    with open(paths[0], 'r+b') as f:
+        f.seek(-RECORD_DTYPE.itemsize * 10 + 12, os.SEEK_END)
+        f.write(b'\xff\xff')
+
+    recovered, _ = CandleJournal(*paths).recover()
+    pd.testing.assert_frame_equal(recovered, candles.iloc[:190], check_freq=False)
+
+
+def test_rewound_revisions_supersede_journaled_rows(paths):
+    candles = synthetic_candles(300)
+    journal = CandleJournal(*paths, fsync='never')
+    journal.checkpoint(candles.iloc[:200], {})
+    journal.append(candles.iloc[:250], 'yfinance')
+
+    revised = candles.copy()
+    revised.iloc[180:260, revised.columns.get_loc('close')] += 0.5
+    journal.rewind(revised.index[180])
+    journal.append(revised, 'yfinance')
+    journal.close()
+
+    recovered, _ = CandleJournal(*paths).recover()
+    pd.testing.assert_frame_equal(recovered, revised, check_freq=False)
+
+
+def test_checkpoint_checksum_mismatch_raises(paths):
+    journal = CandleJournal(*paths, fsync='never')
+    journal.checkpoint(synthetic_candles(100), {})
+    journal.close()
+    with open(paths[1], 'r+b') as f:
+        f.seek(-40, os.SEEK_END)
+        f.write(b'\x00' * 8)
+
+    with pytest.raises(ValueError):
+        CandleJournal(*paths).recover()
+
+
+def test_needs_checkpoint(paths):
+    candles = synthetic_candles(100)
+    journal = CandleJournal(*paths, fsync='never', checkpoint_every=10)
+    assert journal.needs_checkpoint(candles)
+    journal.checkpoint(candles.iloc[:50], {})
+    assert not journal.needs_checkpoint(candles)
+    journal.append(candles.iloc[:60], None)
+    assert journal.needs_checkpoint(candles)  # checkpoint_every reached
+    journal.checkpoint(candles, {})
+    assert journal.needs_checkpoint(candles.iloc[:20])  # replaced by older data
+    journal.close()
+
+
+def test_empty_state_recovers_empty(paths):
+    candles, meta = CandleJournal(*paths).recover()
+    assert candles.empty and meta == {}
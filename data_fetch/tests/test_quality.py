@@ -0,0 +1,100 @@
+"""Streaming candle validator: quarantine, resends and level shifts."""
+
+import pandas as pd
+
+from quality import CandleValidator
+from ringbuffer import CandleRingBuffer
+from testing import inject_anomalies, synthetic_candles
+
+PRICES = ['open', 'high', 'low', 'close']
+
+
+def weekday_candles(count):
+    return synthetic_candles(count, start='2024-01-08 00:00', gap_ratio=0)
+
+
+def stream(candles, primed=200, window=10):
+    """Feed trailing provider windows one minute at a time, as polling does."""
+    validator = CandleValidator()
+    buffer = CandleRingBuffer(len(candles) + 100)
+    buffer.load(candles.iloc[:primed])
+    validator.prime(buffer.frame())
+    for end in range(primed + 1, len(candles) + 1):
+        buffer.merge(validator.validate(candles.iloc[max(0, end - window):end]))
+    return validator, buffer
+
+
+def test_injected_anomalies_counted_once():
+    candles, expected = inject_anomalies(weekday_candles(3000))
+    validator, buffer = stream(candles)
+    quarantined = validator.quarantined_frame()
+
+    assert {k: v for k, v in validator.counts.items() if v} == expected
+    assert sorted(quarantined['reason']) == ['invalid_ohlc', 'non_finite', 'spike']
+    assert not buffer.frame().index.isin(quarantined.index).any()
+    assert len(buffer) == len(candles) - len(quarantined)
+
+
+def test_level_shift_across_batches_leaves_no_holes():
+    candles = weekday_candles(600)
+    candles.iloc[400:, [candles.columns.get_loc(col) for col in PRICES]] *= 1.05
+    validator, buffer = stream(candles)
+
+    pd.testing.assert_frame_equal(buffer.frame(), candles, check_freq=False)
+    assert validator.counts['spike'] == 0
+    assert validator.counts['gap'] == 0
+    assert validator.quarantined_frame().empty
+
+
+def test_level_shift_within_one_batch_keeps_every_row():
+    candles = weekday_candles(300)
+    candles.iloc[250:, [candles.columns.get_loc(col) for col in PRICES]] *= 0.95
+    validator = CandleValidator()
+    validator.prime(candles.iloc[:200])
+
+    kept = validator.validate(candles.iloc[200:])
+
+    pd.testing.assert_frame_equal(kept, candles.iloc[200:])
+    assert validator.counts['spike'] == 0
+    assert validator.quarantined_frame().empty
+
+
+def test_isolated_spike_stays_quarantined():
+    candles = weekday_candles(600)
+    candles.iloc[400, candles.columns.get_loc('close')] *= 1.03
+    candles.iloc[400, candles.columns.get_loc('high')] = candles.iloc[400]['close']
+    validator, buffer = stream(candles)
+
+    assert validator.counts['spike'] == 1
+    assert list(validator.quarantined_frame().index) == [candles.index[400]]
+    assert candles.index[400] not in buffer.frame().index
+
+
+def test_corrected_resend_is_revalidated():
+    candles = weekday_candles(600)
+    broken = candles.copy()
+    broken.iloc[400, broken.columns.get_loc('high')] = broken.iloc[400]['low'] - 0.1
+    validator, buffer = stream(broken.iloc[:450])
+    assert candles.index[400] not in buffer.frame().index
+    assert validator.counts['invalid_ohlc'] == 1  # unchanged resends are not recounted
+
+    # The provider corrects the minute in its next windows
+    buffer.merge(validator.validate(candles.iloc[390:451]))
+
+    pd.testing.assert_frame_equal(buffer.frame(), candles.iloc[:451], check_freq=False)
+    assert validator.counts['invalid_ohlc'] == 1
+    assert validator.quarantined_frame().empty
+
+
+def test_corrected_resend_that_still_fails_replaces_its_entry():
+    candles = weekday_candles(300)
+    candles.iloc[250, candles.columns.get_loc('high')] = candles.iloc[250]['low'] - 0.1
+    validator, _ = stream(candles)
+
+    candles.iloc[250, candles.columns.get_loc('high')] -= 0.1
+    validator.validate(candles.iloc[240:])
+
+    quarantined = validator.quarantined_frame()
+    assert list(quarantined.index) == [candles.index[250]]
+    assert quarantined['high'].iloc[0] == candles.iloc[250]['high']
+    assert validator.counts['invalid_ohlc'] == 2
@@ -0,0 +1,122 @@
+"""Token-bucket rate limiter: window bounds, daily quota, persistence."""
+
+import json
+import threading
+import time
+
+import numpy as np
+
+from ratelimit import RateLimiter
+from testing import FakeClock
+
+LIMITS = {'alpha_vantage': {'rate': 5 / 60, 'burst': 5, 'daily': 25},
+          'twelve_data': {'rate': 8 / 60, 'burst': 8, 'daily': 800}}
+
+
+def test_greedy_caller_never_beats_the_bucket_or_quota():
+    clock = FakeClock()
+    limiter = RateLimiter(LIMITS, clock=clock.time, sleep=clock.sleep)
+    end = clock.now + 30 * 3600
+    grants = {source: [] for source in LIMITS}
+    while clock.now < end:
+        for source in LIMITS:
+            if limiter.can_call(source):
+                assert limiter.acquire(source)
+                grants[source].append(clock.now)
+        clock.sleep(max(min(limiter.available_in(source) for source in LIMITS), 1e-3))
+
+    for source, limit in LIMITS.items():
+        stamps = np.array(grants[source])
+        for window in (60.0, 3600.0):
+            counts = np.searchsorted(stamps, stamps + window, side='left') - np.arange(len(stamps))
+            assert counts.max() <= limit['burst'] + limit['rate'] * window + 1e-9
+        per_day = np.bincount((stamps // 86400).astype(np.int64) - int(stamps[0] // 86400))
+        assert per_day.max() == limit['daily']
+
+
+def test_spent_quota_is_refused():
+    clock = FakeClock()
+    limiter = RateLimiter(LIMITS, clock=clock.time, sleep=clock.sleep)
+    for _ in range(25):
+        assert limiter.acquire('alpha_vantage')
+    assert not limiter.acquire('alpha_vantage')
+    assert limiter.available_in('alpha_vantage') > 3600
+    assert limiter.acquire('unlimited')
+
+
+def test_cancelled_wait_hands_tokens_back():
+    clock = FakeClock()
+    limiter = RateLimiter(LIMITS, clock=clock.time, sleep=clock.sleep)
+    while limiter.can_call('alpha_vantage'):
+        limiter.acquire('alpha_vantage')
+    before = limiter.usage()['alpha_vantage']
+    cancel = threading.Event()
+    cancel.set()
+
+    assert not limiter.acquire('alpha_vantage', cancel=cancel)
+    after = limiter.usage()['alpha_vantage']
+    assert after['used_today'] == before['used_today']
+    assert after['tokens'] == before['tokens']
+
+
+def test_timeout_skips_without_spending():
+    clock = FakeClock()
+    limiter = RateLimiter(LIMITS, clock=clock.time, sleep=clock.sleep)
+    while limiter.can_call('alpha_vantage'):
+        limiter.acquire('alpha_vantage')
+    used = limiter.usage()['alpha_vantage']['used_today']
+
+    assert not limiter.acquire('alpha_vantage', timeout=1.0)
+    assert limiter.usage()['alpha_vantage']['used_today'] == used
+
+
+def test_state_saved_on_interval_and_restored(tmp_path):
+    state_file = str(tmp_path / 'limits.json')
+    clock = FakeClock()
+    first = RateLimiter(LIMITS, state_file, clock=clock.time, sleep=clock.sleep, save_interval=60)
+    for _ in range(3):
+        first.acquire('alpha_vantage')
+    assert not (tmp_path / 'limits.json').exists()  # not rewritten per token
+
+    clock.sleep(60)
+    first.acquire('alpha_vantage')
+    with open(state_file) as f:
+        assert json.load(f)['alpha_vantage']['used_today'] == 4
+    assert not (tmp_path / 'limits.json.tmp').exists()
+
+    first.acquire('alpha_vantage')
+    used = first.usage()['alpha_vantage']
+    first.save()  # shutdown
+    clock.sleep(30)
+    restored = RateLimiter(LIMITS, state_file, clock=clock.time).usage()['alpha_vantage']
+    assert restored['used_today'] == used['used_today'] == 5
+    assert abs(restored['tokens'] - min(5, used['tokens'] + 30 * 5 / 60)) < 1e-9
+
+
+def test_unreadable_state_is_ignored(tmp_path):
+    state_file = tmp_path / 'limits.json'
+    state_file.write_text('{not json')
+    limiter = RateLimiter(LIMITS, str(state_file), clock=FakeClock().time)
+    assert limiter.usage()['alpha_vantage']['tokens'] == 5
+
+
+def test_threads_share_one_bucket():
+    rate, burst = 500.0, 20
+    limiter = RateLimiter({'shared': {'rate': rate, 'burst': burst}})
+    granted, stop, lock = [], threading.Event(), threading.Lock()
+
+    def worker():
+        while not stop.is_set():
+            if limiter.acquire('shared', timeout=0.05):
+                with lock:
+                    granted.append(time.monotonic())
+
+    workers = [threading.Thread(target=worker) for _ in range(8)]
+    started = time.monotonic()
+    for thread in workers:
+        thread.start()
+    time.sleep(0.3)
+    stop.set()
+    for thread in workers:
+        thread.join()
+    assert len(granted) <= burst + rate * (time.monotonic() - started) * 1.02
@@ -0,0 +1,49 @@
+"""Historical replay: same bars and bar_closed events as a resample, failures surface."""
+
+import pandas as pd
+import pytest
+
+from aggregation import TIMEFRAMES, resample_ohlcv
+from replay import ReplayEngine
+from testing import synthetic_candles
+
+CANDLES = synthetic_candles(1200, start='2024-01-08 18:00', seed=1)
+
+
+@pytest.mark.parametrize('step', [1, None])  # None: a day per poll
+def test_replay_matches_resample(aggregator, step):
+    closed = []
+    subscription = aggregator.events.subscribe(closed.append, kinds=['bar_closed'],
+                                               maxsize=10 ** 6)
+    stats = ReplayEngine(aggregator, {'EURJPY': CANDLES}, step=step).run()
+    subscription.close()
+    subscription.join()
+
+    assert stats['candles'] == stats['merged'] == len(CANDLES)
+    assert stats['polls'] == (len(CANDLES) if step == 1 else 2)
+    assert not subscription.dropped
+    for tf_name, freq in TIMEFRAMES.items():
+        expected = resample_ohlcv(CANDLES, freq)
+        pd.testing.assert_frame_equal(
+            aggregator.timeframes[tf_name], expected.tail(aggregator.BUFFER_SIZES[tf_name]),
+            check_freq=False, check_dtype=False, obj=tf_name)
+        events = [event[3:9] for event in closed if event.timeframe == tf_name]
+        assert events == list(expected.itertuples(name=None)), tf_name
+
+
+def test_ingest_failure_stops_the_replay(aggregator, monkeypatch):
+    live_clock = aggregator.clock
+    ingest = aggregator._ingest
+    polls = []
+
+    def failing_ingest(batch, source, persist=True):
+        polls.append(len(batch))
+        if len(polls) == 3:
+            raise ValueError('merge failed')
+        return ingest(batch, source, persist)
+
+    monkeypatch.setattr(aggregator, '_ingest', failing_ingest)
+    with pytest.raises(ValueError):
+        ReplayEngine(aggregator, {'EURJPY': CANDLES}, step=60).run()
+    assert len(polls) == 3
+    assert aggregator.clock is live_clock
@@ -0,0 +1,205 @@
+"""Provider response cache: closed vs live windows, LRU bound, coalescing."""
+
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from respcache import ResponseCache, interval_seconds
+from testing import synthetic_candles
+
+START = pd.Timestamp('2024-01-08 00:00')
+
+
+class Provider:
+    """Provider call recording the symbols asked for."""
+
+    def __init__(self, candles):
+        self.candles = candles
+        self.calls = []
+
+    def __call__(self, missing):
+        self.calls.append(list(missing))
+        return {symbol: self.candles for symbol in missing if symbol != 'EMPTY'}
+
+
+@pytest.fixture
+def clock():
+    now = [START.value / 1e9 + 7 * 86400]
+    return now
+
+
+def ending_at(last, count=100):
+    candles = synthetic_candles(count, gap_ratio=0)
+    candles.index = pd.date_range(end=last, periods=count, freq='1min', name=candles.index.name)
+    return candles
+
+
+def cache_in(directory, clock, **kwargs):
+    return ResponseCache(str(directory), clock=lambda: clock[0], **kwargs)
+
+
+def test_interval_seconds():
+    assert interval_seconds('1m') == interval_seconds('1min') == 60
+    assert interval_seconds('1day') == 86400
+    assert interval_seconds('bogus') is None
+
+
+def test_closed_windows_never_expire(tmp_path, clock):
+    cache = cache_in(tmp_path, clock)
+    candles = synthetic_candles(1440, start=str(START), gap_ratio=0)
+    provider = Provider(candles)
+    end = START + pd.Timedelta(days=1)
+
+    first = cache.fetch('twelve_data', ['EURJPY', 'EMPTY'], '1min', 'start/end', provider, end=end)
+    clock[0] += 30 * 86400
+    second = cache.fetch('twelve_data', ['EURJPY', 'EMPTY'], '1min', 'start/end', provider, end=end)
+
+    assert provider.calls == [['EURJPY', 'EMPTY']]
+    assert list(second) == ['EURJPY']  # the empty answer is cached too
+    pd.testing.assert_frame_equal(second['EURJPY'], first['EURJPY'], check_freq=False)
+    assert cache.stats()['providers']['twelve_data']['hits'] == 2
+
+
+def test_only_missing_symbols_are_requested(tmp_path, clock):
+    cache = cache_in(tmp_path, clock)
+    provider = Provider(synthetic_candles(100, start=str(START), gap_ratio=0))
+    end = START + pd.Timedelta(days=1)
+    cache.fetch('twelve_data', ['EURJPY'], '1min', 'w', provider, end=end, per_symbol=True)
+
+    result = cache.fetch('twelve_data', ['EURJPY', 'USDJPY', 'EURUSD'], '1min', 'w', provider,
+                         end=end, per_symbol=True)
+
+    assert provider.calls == [['EURJPY'], ['USDJPY', 'EURUSD']]
+    assert set(result) == {'EURJPY', 'USDJPY', 'EURUSD'}
+    assert cache.stats()['providers']['twelve_data']['saved'] == 1
+
+
+def test_live_edge_reused_until_the_next_close(tmp_path, clock):
+    cache = cache_in(tmp_path, clock, live_ttl=30)
+    minute = int(clock[0] // 60) * 60
+    clock[0] = minute + 5  # the candle stamped a minute ago closed 5s ago
+    provider = Provider(ending_at(pd.Timestamp(minute - 60, unit='s')))
+
+    polls = []
+    for offset in (0, 20, 20, 30):  # t+5, t+25, t+45 (ttl), t+75 (next close)
+        clock[0] += offset
+        before = len(provider.calls)
+        cache.fetch('yfinance', ['EURJPY'], '1m', 'period=1d', provider)
+        polls.append(len(provider.calls) - before)
+    assert polls == [1, 0, 1, 1]
+
+
+def test_live_edge_without_the_latest_candle_is_not_stored(tmp_path, clock):
+    cache = cache_in(tmp_path, clock)
+    minute = int(clock[0] // 60) * 60
+    clock[0] = minute + 5
+    provider = Provider(ending_at(pd.Timestamp(minute - 120, unit='s')))
+
+    cache.fetch('yfinance', ['EURJPY'], '1m', 'period=1d', provider)
+    cache.fetch('yfinance', ['EURJPY'], '1m', 'period=1d', provider)
+
+    assert len(provider.calls) == 2
+    assert cache.stats()['entries'] == 0
+
+
+def test_lru_bound_and_restart_scan(tmp_path, clock):
+    candles = synthetic_candles(1000, start=str(START), gap_ratio=0)
+    provider = Provider(candles)
+    end = START + pd.Timedelta(days=1)
+    cache = cache_in(tmp_path, clock)
+    cache.fetch('p', ['A'], '1min', 'w', provider, end=end)
+    entry = cache.stats()['bytes']
+
+    cache = cache_in(tmp_path, clock, max_bytes=int(entry * 2.5))
+    for symbol in ['B', 'C']:
+        time.sleep(0.01)  # distinct mtimes
+        cache.fetch('p', [symbol], '1min', 'w', provider, end=end)
+    assert cache.stats()['entries'] == 2 and cache.stats()['evictions'] == 1  # A was oldest
+
+    time.sleep(0.01)
+    cache.fetch('p', ['B'], '1min', 'w', provider, end=end)  # B now most recently used
+    restarted = cache_in(tmp_path, clock, max_bytes=int(entry * 2.5))
+    time.sleep(0.01)
+    restarted.fetch('p', ['D'], '1min', 'w', provider, end=end)
+
+    calls = len(provider.calls)
+    restarted.fetch('p', ['B'], '1min', 'w', provider, end=end)
+    assert len(provider.calls) == calls  # kept across the restart
+    restarted.fetch('p', ['C'], '1min', 'w', provider, end=end)
+    assert len(provider.calls) == calls + 1  # evicted as least recently used
+    assert restarted.stats()['bytes'] <= entry * 2.5
+
+
+def test_unreadable_entry_is_a_miss(tmp_path, clock):
+    cache = cache_in(tmp_path, clock)
+    provider = Provider(synthetic_candles(100, start=str(START), gap_ratio=0))
+    end = START + pd.Timedelta(days=1)
+    cache.fetch('p', ['A'], '1min', 'w', provider, end=end)
+    for name in os.listdir(tmp_path):
+        with open(tmp_path / name, 'r+b') as f:
+            f.truncate(10)
+
+    assert 'A' in cache.fetch('p', ['A'], '1min', 'w', provider, end=end)
+    assert len(provider.calls) == 2
+
+
+def test_identical_requests_are_coalesced():
+    cache = ResponseCache(None)
+    candles = synthetic_candles(100, gap_ratio=0)
+    calls = []
+
+    def slow_call(missing):
+        calls.append(missing)
+        time.sleep(0.2)
+        return {symbol: candles for symbol in missing}
+
+    clients = 8
+    barrier = threading.Barrier(clients)
+    answers = []
+
+    def client():
+        barrier.wait()
+        answers.append(cache.fetch('twelve_data', ['EURJPY', 'USDJPY'], '1min', 'w', slow_call,
+                                   per_symbol=True))
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1 and len(answers) == clients
+    assert all(set(answer) == {'EURJPY', 'USDJPY'} for answer in answers)
+    counters = cache.stats()['providers']['twelve_data']
+    assert counters['coalesced'] == clients - 1
+    assert counters['saved'] == 2 * (clients - 1)
+
+
+def test_errors_reach_every_waiter():
+    cache = ResponseCache(None)
+    started = threading.Event()
+
+    def failing_call(missing):
+        started.set()
+        time.sleep(0.1)
+        raise ConnectionError('provider down')
+
+    errors = []
+
+    def client():
+        try:
+            cache.fetch('p', ['A'], '1min', 'w', failing_call)
+        except ConnectionError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=client)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=client)
+    follower.start()
+    leader.join()
+    follower.join()
+    assert len(errors) == 2
+    assert cache.stats()['providers']['p']['coalesced'] == 1
@@ -0,0 +1,160 @@
+"""1M ring buffer: merge semantics against the old concat path."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ringbuffer import CandleRingBuffer, select_rows
+from testing import synthetic_candles
+
+
+def test_merge_matches_sliding_window():
+    # Window wraps the 2x capacity columns many times, with revisions of
+    # the last stored candle on a third of the ticks
+    rng = np.random.default_rng(0)
+    capacity = 300
+    history = synthetic_candles(capacity + 3000)
+    ring = CandleRingBuffer(capacity)
+    end = capacity
+    ring.load(history.iloc[:end])
+
+    while end < len(history):
+        if rng.random() < 0.3:
+            row = history.index[end - 1]
+            history.loc[row, 'close'] += 0.001
+            history.loc[row, 'high'] = max(history.at[row, 'high'], history.at[row, 'close'])
+        end = min(end + int(rng.integers(1, 4)), len(history))
+        ring.merge(history.iloc[max(0, end - 100):end])
+        pd.testing.assert_frame_equal(ring.frame(), history.iloc[max(0, end - capacity):end],
+                                      check_exact=True, check_freq=False)
+
+
+def test_merge_reports_appends_and_revisions():
+    candles = synthetic_candles(120, gap_ratio=0)
+    ring = CandleRingBuffer(1000)
+    ring.load(candles.iloc[:100])
+
+    update = candles.iloc[90:110].copy()
+    update.iloc[5, update.columns.get_loc('close')] += 0.01
+    update.iloc[7, update.columns.get_loc('volume')] += 1
+    appended, revised, since = ring.merge(update)
+    assert (appended, revised, since) == (10, 2, update.index[5])
+
+    # Resending identical rows changes nothing
+    assert ring.merge(update) == (0, 0, None)
+
+
+def test_unsorted_duplicates_keep_the_last_row():
+    candles = synthetic_candles(50, gap_ratio=0)
+    ring = CandleRingBuffer(100)
+    ring.load(candles.iloc[:40])
+    late = candles.iloc[40:].copy()
+    resent = late.iloc[[3]].copy()
+    resent['close'] += 1.0
+    resent['high'] += 1.0
+    ring.merge(pd.concat([late.iloc[::-1], resent]))
+
+    expected = candles.copy()
+    expected.iloc[43] = resent.iloc[0]
+    pd.testing.assert_frame_equal(ring.frame(), expected, check_freq=False)
+
+
+def test_float_volume_promotes_like_concat():
+    candles = synthetic_candles(40, gap_ratio=0)
+    ring = CandleRingBuffer(100)
+    ring.load(candles.iloc[:30])
+    assert ring.frame()['volume'].dtype.kind == 'i'
+    tail = candles.iloc[30:].copy()
+    tail['volume'] = tail['volume'] + 0.5
+    ring.merge(tail)
+    assert ring.frame()['volume'].dtype == np.float64
+    assert ring.frame()['volume'].iloc[-1] == tail['volume'].iloc[-1]
+
+
+def test_load_keeps_the_last_capacity_rows():
+    candles = synthetic_candles(500)
+    ring = CandleRingBuffer(200)
+    assert ring.load(candles) == 200
+    pd.testing.assert_frame_equal(ring.frame(), candles.iloc[-200:], check_freq=False)
+    assert ring.last_timestamp == candles.index[-1]
+
+
+def test_select_rows():
+    candles = synthetic_candles(100)
+    assert select_rows(candles, since=candles.index[89]).index[0] == candles.index[90]
+    assert len(select_rows(candles, last_n=5)) == 5
+    assert len(select_rows(candles, since=candles.index[97], last_n=5)) == 2
+
+
+def test_rejects_non_positive_capacity():
+    with pytest.raises(ValueError):
+        CandleRingBuffer(0)
+
+
+def _revise_last(ring, candles, times=1):
+    last = candles.iloc[-1:].copy()
+    for _ in range(times):
+        last['close'] += 0.001
+        last['high'] = np.maximum(last['high'], last['close'])
+        ring.merge(last)
+
+
+def test_revision_without_readers_stays_in_place():
+    candles = synthetic_candles(1000, gap_ratio=0)
+    ring = CandleRingBuffer(1000)
+    ring.load(candles)
+    arrays = {col: id(values) for col, values in ring._columns.items()}
+    _revise_last(ring, candles, times=50)
+    assert {col: id(values) for col, values in ring._columns.items()} == arrays
+    assert ring.frame()['close'].iloc[-1] == pytest.approx(candles['close'].iloc[-1] + 0.05)
+
+
+def test_revision_cost_is_independent_of_capacity():
+    import time
+
+    def slowest_revision(capacity):
+        candles = synthetic_candles(capacity, gap_ratio=0)
+        ring = CandleRingBuffer(capacity)
+        ring.load(candles)
+        times = []
+        for _ in range(30):
+            started = time.perf_counter()
+            _revise_last(ring, candles)
+            times.append(time.perf_counter() - started)
+        return max(times)
+
+    # Moving 1M rows of six columns to fresh arrays takes ~25ms; a revision
+    # in place takes about as long at any capacity
+    small, large = slowest_revision(1_000), slowest_revision(1_000_000)
+    assert large < small * 4 + 0.005
+
+
+def test_handed_out_frames_never_change():
+    candles = synthetic_candles(200, gap_ratio=0)
+    ring = CandleRingBuffer(150)
+    ring.load(candles.iloc[:100])
+    frame = ring.frame()
+    tail = ring.snapshot(last_n=10)  # slice sharing the frame's arrays
+    before, tail_before = frame.copy(), tail.copy()
+
+    _revise_last(ring, candles.iloc[:100], times=3)
+    ring.merge(candles.iloc[100:])  # appends and wraps
+
+    pd.testing.assert_frame_equal(frame, before)
+    pd.testing.assert_frame_equal(tail, tail_before)
+    assert ring.frame()['close'].iloc[99] != before['close'].iloc[-1]
+    assert not frame['close'].to_numpy().flags.writeable
+
+
+def test_late_fill_is_inserted():
+    history = synthetic_candles(500, gap_ratio=0)
+    ring = CandleRingBuffer(400)
+    holes = history.drop(history.index[[300, 301]])
+    ring.load(holes)
+    frame = ring.frame()
+
+    appended, revised, since = ring.merge(history.iloc[290:])
+
+    assert (appended, revised, since) == (0, 2, history.index[300])
+    pd.testing.assert_frame_equal(ring.frame(), history.iloc[-400:], check_freq=False)
+    pd.testing.assert_frame_equal(frame, holes.iloc[-400:], check_freq=False)
@@ -0,0 +1,115 @@
+"""Poll scheduler: close alignment, quota, retry budget, delay learning, weekend pause."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scheduler import PollScheduler
+
+FRIDAY = pd.Timestamp('2024-01-05 12:00').value / 1e9
+
+
+def minute_stamp(seconds):
+    return pd.Timestamp(int(seconds // 60) * 60, unit='s')
+
+
+@pytest.fixture
+def clock():
+    return [FRIDAY]
+
+
+def scheduler_on(clock, **kwargs):
+    kwargs.setdefault('jitter', 0.0)
+    return PollScheduler(clock=lambda: clock[0], publication_delay=5.0, **kwargs)
+
+
+def test_caught_up_polls_after_the_next_close(clock):
+    scheduler = scheduler_on(clock)
+    clock[0] = FRIDAY + 20
+    held = minute_stamp(FRIDAY - 60)  # the last closed candle
+    assert scheduler.next_poll(held) == FRIDAY + 60 + 5
+
+
+def test_retry_budget_defers_a_late_candle(clock):
+    scheduler = scheduler_on(clock, retry_base=4.0, max_retries=2, step=0.0)
+    held = minute_stamp(FRIDAY - 60)
+    clock[0] = FRIDAY + 65  # the candle stamped FRIDAY closed, not served yet
+
+    polls = []
+    for _ in range(4):
+        due = scheduler.next_poll(held)
+        polls.append(due - FRIDAY)
+        clock[0] = due
+        scheduler.observe(held, due)
+    # First poll at close + delay, two retries, then the next close + delay
+    assert polls == [65, 69, 77, 125]
+    assert scheduler.deferred == 1
+
+    # The next candle starts a fresh budget
+    assert scheduler.attempts == 1
+    assert scheduler.next_poll(held) == clock[0] + 4.0
+
+
+def simulate(clock, scheduler, delays):
+    """Poll a provider publishing the candle of minute ``i`` ``delays[i]`` seconds after its close."""
+    closes = FRIDAY + 60 * np.arange(1, len(delays) + 1)
+    available = np.maximum.accumulate(closes + delays)  # published in order
+    held, last = minute_stamp(FRIDAY - 60), minute_stamp(closes[-1] - 60)
+    while held < last:
+        clock[0] = scheduler.next_poll(held)
+        served = int(available.searchsorted(clock[0], side='right'))
+        newest = minute_stamp(closes[served - 1] - 60) if served else held
+        scheduler.observe(newest, clock[0], 'yfinance' if newest > held else None)
+        held = newest
+
+
+def test_one_call_per_close_by_default(clock):
+    delays = np.random.default_rng(0).lognormal(np.log(6.0), 0.5, 240)
+    delays[::40] = 45.0  # a few late candles
+    scheduler = scheduler_on(clock)
+    simulate(clock, scheduler, delays)
+    # No retries: at most one poll per candle close, a late candle comes
+    # with the next one
+    assert scheduler.polls <= len(delays)
+    assert scheduler.deferred >= 6
+
+    # Retries are what spend quota
+    retry_clock = [FRIDAY]
+    retrying = scheduler_on(retry_clock, max_retries=1)
+    simulate(retry_clock, retrying, delays)
+    assert retrying.polls > len(delays)
+
+
+def test_delay_learned_from_first_polls(clock):
+    scheduler = scheduler_on(clock, quantile=0.9, step=1.0)
+    scheduler.observe(minute_stamp(FRIDAY - 60), FRIDAY + 5, 'yfinance')  # on time
+    assert scheduler.delay('yfinance') == pytest.approx(4.9)
+    held = minute_stamp(FRIDAY - 60)
+    scheduler.observe(held, FRIDAY + 65)  # first poll for the FRIDAY candle misses
+    assert scheduler.delay() == pytest.approx(5.9)
+    scheduler.observe(held, FRIDAY + 69)  # retries and late hits say nothing
+    scheduler.observe(minute_stamp(FRIDAY), FRIDAY + 90, 'yfinance')
+    assert scheduler.delay() == pytest.approx(5.9)
+    assert scheduler.stats()['empty_polls'] == 2
+
+    # Settles where 90% of first polls find a candle published 10s after its close
+    scheduler = scheduler_on(clock, quantile=0.9, step=1.0, max_retries=0)
+    simulate(clock, scheduler, np.full(600, 10.0))
+    assert 9.0 <= scheduler.delay('yfinance') <= 11.0
+    assert scheduler.empty_polls / scheduler.polls == pytest.approx(0.1, abs=0.03)
+
+
+def test_nothing_polled_over_the_weekend(clock):
+    scheduler = scheduler_on(clock)
+    close = pd.Timestamp('2024-01-05 21:59')  # last candle of the week
+    clock[0] = pd.Timestamp('2024-01-06 03:00').value / 1e9
+    due = scheduler.next_poll(close)
+    # First session candle (Sunday 22:00) closes a minute later
+    assert due == pd.Timestamp('2024-01-07 22:01').value / 1e9 + 5
+    assert not scheduler.stale(close)
+
+
+def test_rate_limit_budget_delays_the_poll(clock):
+    scheduler = scheduler_on(clock)
+    clock[0] = FRIDAY + 20
+    assert scheduler.next_poll(minute_stamp(FRIDAY - 60), budget=100) == FRIDAY + 120
@@ -0,0 +1,140 @@
+"""Shared-memory candle bus: windows, rewrites and the seqlock."""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sharedbus import _SEQ, SharedCandleBus, SharedCandleReader
+from testing import synthetic_candles
+
+SYMBOL = 'EURJPY'
+
+
+@pytest.fixture
+def bus():
+    bus = SharedCandleBus({SYMBOL: {'1M': 100, '15M': 10}})
+    reader = SharedCandleReader(bus.name)
+    yield bus, reader
+    reader.close()
+    bus.close()
+
+
+def assert_view(reader, frame, timeframe='1M'):
+    view = reader.read(SYMBOL, timeframe).frame()
+    np.testing.assert_array_equal(view.index.asi8, frame.index.as_unit('ns').asi8)
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        np.testing.assert_array_equal(view[col].to_numpy(), frame[col].to_numpy(dtype=np.float64))
+
+
+def test_window_follows_publishes(bus):
+    bus, reader = bus
+    candles = synthetic_candles(1000, gap_ratio=0)
+    for end in range(50, len(candles), 7):
+        frame = candles.iloc[max(0, end - 100):end]
+        bus.publish(SYMBOL, '1M', frame)
+        bus.commit()
+        assert_view(reader, frame)
+    assert reader.generation == len(range(50, len(candles), 7))
+    assert reader.read(SYMBOL, '15M').columns['ts'].size == 0
+
+
+def test_appends_write_only_new_rows_and_keep_views_valid(bus):
+    bus, reader = bus
+    candles = synthetic_candles(200, gap_ratio=0)
+    bus.publish(SYMBOL, '1M', candles.iloc[:100])
+    snapshot = reader.read(SYMBOL, '1M')
+    before = snapshot.copy()
+
+    assert bus.publish(SYMBOL, '1M', candles.iloc[3:103]) == 3
+    assert snapshot.valid()
+    pd.testing.assert_frame_equal(snapshot.frame(), before)
+    assert_view(reader, candles.iloc[3:103])
+
+
+def test_revision_rewrites_and_invalidates(bus):
+    bus, reader = bus
+    candles = synthetic_candles(120, gap_ratio=0)
+    bus.publish(SYMBOL, '1M', candles.iloc[:100])
+    snapshot = reader.read(SYMBOL, '1M')
+
+    candles.iloc[95, candles.columns.get_loc('close')] += 0.01
+    written = bus.publish(SYMBOL, '1M', candles.iloc[:100], since=candles.index[95])
+
+    assert written == 5
+    assert not snapshot.valid()
+    assert snapshot.copy() is None
+    assert_view(reader, candles.iloc[:100])
+    assert bus.stats()['rewrites'] == 1
+
+
+def test_window_moves_back_to_the_start(bus):
+    bus, reader = bus
+    candles = synthetic_candles(400, gap_ratio=0)
+    bus.publish(SYMBOL, '1M', candles.iloc[:100])
+    snapshot = reader.read(SYMBOL, '1M')
+    rewrites = 0
+    for end in range(101, 400):
+        bus.publish(SYMBOL, '1M', candles.iloc[end - 100:end])
+        rewrites = bus.stats()['rewrites']
+        if rewrites:
+            break
+    # The window slid through 2 x capacity columns, then moved once
+    assert end == 201 and rewrites == 1
+    assert not snapshot.valid()
+    assert_view(reader, candles.iloc[end - 100:end])
+
+
+def test_last_n(bus):
+    bus, reader = bus
+    candles = synthetic_candles(100, gap_ratio=0)
+    bus.publish(SYMBOL, '1M', candles)
+    tail = reader.read(SYMBOL, '1M', last_n=10).frame()
+    np.testing.assert_array_equal(tail['close'].to_numpy(), candles['close'].to_numpy()[-10:])
+
+
+def test_read_waits_for_the_writer(bus):
+    bus, reader = bus
+    candles = synthetic_candles(100, gap_ratio=0)
+    bus.publish(SYMBOL, '1M', candles)
+    control = bus.slots[(SYMBOL, '1M')].control
+    control[_SEQ] += 1  # a write in progress
+    views = []
+    thread = threading.Thread(target=lambda: views.append(reader.read(SYMBOL, '1M')))
+    thread.start()
+    time.sleep(0.05)
+    assert not views and reader.retries > 0
+    control[_SEQ] += 1
+    thread.join(5)
+    assert len(views[0]) == 100
+
+
+def test_wait_for_generation(bus):
+    bus, reader = bus
+    assert reader.wait(0, timeout=0.01) == 0
+    threading.Timer(0.02, bus.commit).start()
+    assert reader.wait(0, timeout=5) == 1
+    assert reader.published_at > 0
+
+
+def test_reader_in_another_process(bus):
+    bus, reader = bus
+    candles = synthetic_candles(100, gap_ratio=0)
+    bus.publish(SYMBOL, '1M', candles)
+    bus.commit()
+    script = (f"from sharedbus import SharedCandleReader\n"
+              f"reader = SharedCandleReader({bus.name!r})\n"
+              f"print(reader.generation, float(reader.read({SYMBOL!r}, '1M').columns['close'][-1]))\n")
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    out = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True,
+                         text=True, timeout=120, check=True).stdout.split()
+    assert out == ['1', repr(float(candles['close'].iloc[-1]))]
+    # The child exiting must not unlink the block
+    again = SharedCandleReader(bus.name)
+    assert again.generation == 1
+    again.close()
@@ -0,0 +1,125 @@
+"""Warm-restart snapshot: staleness and damage checks, identical warm restarts."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from journal import CandleJournal
+from snapshot import load_snapshot, write_snapshot
+from testing import synthetic_candles
+
+CANDLES = synthetic_candles(3000, start='2024-01-08 00:00', gap_ratio=0)
+
+
+@pytest.fixture
+def journaled(tmp_path):
+    """Snapshot stamped with a journal and its checkpoint."""
+    journal = CandleJournal(str(tmp_path / 'candles.journal'),
+                            str(tmp_path / 'candles.checkpoint'), fsync='never')
+    journal.checkpoint(CANDLES.iloc[:1000], {})
+    journal.append(CANDLES.iloc[:1500], 'yfinance')
+    arrays = {'close': CANDLES['close'].to_numpy(), 'ts': CANDLES.index.asi8}
+    path = str(tmp_path / 'state.snapshot')
+    write_snapshot(path, {'symbols': ['EURJPY']}, dict(arrays), [
+        journal.journal_file, journal.checkpoint_file, str(tmp_path / 'missing.db-wal')])
+    yield path, journal, arrays
+    journal.close()
+
+
+def test_current_snapshot_round_trips(journaled):
+    path, _, arrays = journaled
+    meta, loaded = load_snapshot(path)
+    assert meta == {'symbols': ['EURJPY']}
+    for name, values in arrays.items():
+        np.testing.assert_array_equal(loaded[name], values)
+        assert not loaded[name].flags.writeable
+
+
+def test_rejected_after_a_journal_append(journaled):
+    path, journal, _ = journaled
+    journal.append(CANDLES.iloc[:1501], 'yfinance')
+    assert load_snapshot(path) is None
+
+
+def test_rejected_once_a_missing_source_appears(journaled, tmp_path):
+    path = journaled[0]
+    (tmp_path / 'missing.db-wal').write_bytes(b'')
+    assert load_snapshot(path) is None
+
+
+@pytest.mark.parametrize('damage', ['truncate', 'magic', 'header'])
+def test_rejected_when_damaged(journaled, damage):
+    path = journaled[0]
+    with open(path, 'r+b') as f:
+        data = f.read()
+        if damage == 'truncate':
+            f.truncate(len(data) - 100)
+        elif damage == 'magic':
+            f.seek(0)
+            f.write(b'XXXX')
+        else:
+            f.seek(8)
+            f.write(b'}')
+    assert load_snapshot(path) is None
+
+
+def shut_down(aggregator):
+    """The main() shutdown sequence."""
+    aggregator._save_state(checkpoint=True)
+    aggregator._save_to_database()
+    aggregator._save_history()
+    aggregator.close()
+    return aggregator.save_snapshot()
+
+
+def restart():
+    import data_fetch
+    return data_fetch.MultiSourceForexAggregator(['EUR/JPY'])
+
+
+def assert_same_state(restored, original):
+    pd.testing.assert_frame_equal(restored.candles_1m, original.candles_1m)
+    assert restored.timeframes.keys() == original.timeframes.keys()
+    for tf_name, bars in original.timeframes.items():
+        pd.testing.assert_frame_equal(restored.timeframes[tf_name], bars, obj=tf_name)
+
+
+def test_warm_restart_restores_identical_state(aggregator):
+    aggregator._ingest({'EURJPY': CANDLES.iloc[:2000]}, 'yfinance')
+    for end in range(2010, 2101, 10):
+        aggregator._ingest({'EURJPY': CANDLES.iloc[end - 30:end]}, 'yfinance')
+    assert shut_down(aggregator)
+    assert len(aggregator.candles_1m) == 2100 and len(aggregator.timeframes['1H']) == 34
+
+    warm = restart()
+    assert warm._snapshot is not None
+    assert warm.load_state()
+    assert_same_state(warm, aggregator)
+
+    # The restored journal position keeps appending where it left off:
+    # stop without a checkpoint and recover from checkpoint + journal
+    warm._ingest({'EURJPY': CANDLES.iloc[2070:2200]}, 'yfinance')
+    warm.close()
+    cold = restart()
+    cold._snapshot = None  # force checkpoint + journal recovery
+    assert cold.load_state()
+    assert len(cold.candles_1m) == 2200
+    assert_same_state(cold, warm)
+    cold.close()
+
+
+def test_stale_snapshot_falls_back_to_the_journal(aggregator):
+    aggregator._ingest({'EURJPY': CANDLES.iloc[:2000]}, 'yfinance')
+    assert shut_down(aggregator)
+
+    # Another writer appends to the journal after the snapshot was taken
+    journal = aggregator.journals['EURJPY']
+    later = CandleJournal(journal.journal_file, journal.checkpoint_file, fsync='never')
+    later.append(CANDLES.iloc[2000:2100], 'yfinance')
+    later.close()
+
+    restarted = restart()
+    assert restarted._snapshot is None
+    assert restarted.load_state()
+    pd.testing.assert_frame_equal(restarted.candles_1m, CANDLES.iloc[:2100], check_freq=False)
+    restarted.close()
@@ -0,0 +1,183 @@
+"""SQLite candle storage: watermarked flushes, legacy migration and range reads."""
+
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from storage import CandleDatabase
+from testing import synthetic_candles
+
+TABLE = 'EURJPY_1M'
+PRICES = ['open', 'high', 'low', 'close']
+
+
+def legacy_frame(candles, source='yfinance'):
+    """Candles as the old save path wrote them: TEXT timestamps and a source column."""
+    frame = candles.reset_index().rename(columns={candles.index.name: 'timestamp'})
+    frame['timestamp'] = frame['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    frame['source'] = source
+    return frame
+
+
+def open_database(path):
+    database = CandleDatabase(str(path), [TABLE])
+    database.init_schema()
+    return database
+
+
+def assert_rows(rows, candles):
+    np.testing.assert_array_equal(rows['timestamp'], candles.index.to_numpy(dtype='datetime64[s]'))
+    for col in PRICES + ['volume']:
+        np.testing.assert_array_equal(rows[col], candles[col].to_numpy(dtype=np.float64))
+
+
+def test_unkeyed_text_table_is_migrated(tmp_path):
+    candles = synthetic_candles(500)
+    with sqlite3.connect(tmp_path / 'candles.db') as conn:
+        # The original to_sql(if_exists='replace') path: no key, TEXT timestamps
+        legacy_frame(candles).to_sql(TABLE, conn, index=False)
+
+    database = open_database(tmp_path / 'candles.db')
+    columns = {col[1]: col[2] for col in database.conn.execute(f"PRAGMA table_info({TABLE})")}
+    assert columns['timestamp'] == 'INTEGER'
+    assert_rows(database.query_range(TABLE), candles)
+    assert database.watermarks[TABLE] == candles.index[-1]
+    tables = {row[0] for row in database.conn.execute("SELECT name FROM sqlite_master")}
+    assert f'{TABLE}_legacy' not in tables
+    database.close()
+
+    # Already migrated: a restart leaves the table alone
+    database = open_database(tmp_path / 'candles.db')
+    assert_rows(database.query_range(TABLE), candles)
+    database.close()
+
+
+def test_keyed_text_table_is_migrated(tmp_path):
+    candles = synthetic_candles(300)
+    with sqlite3.connect(tmp_path / 'candles.db') as conn:
+        conn.execute(f"""
+            CREATE TABLE {TABLE} (
+                timestamp TEXT PRIMARY KEY, open REAL NOT NULL, high REAL NOT NULL,
+                low REAL NOT NULL, close REAL NOT NULL, volume INTEGER DEFAULT 0,
+                source TEXT NOT NULL, created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        frame = legacy_frame(candles, 'twelve_data')
+        conn.executemany(
+            f"INSERT INTO {TABLE} (timestamp, open, high, low, close, volume, source) "
+            f"VALUES (?, ?, ?, ?, ?, ?, ?)",
+            frame[['timestamp'] + PRICES + ['volume', 'source']].itertuples(index=False, name=None))
+
+    database = open_database(tmp_path / 'candles.db')
+    assert_rows(database.query_range(TABLE), candles)
+    sources = database.conn.execute(f"SELECT DISTINCT source FROM {TABLE}").fetchall()
+    assert sources == [('twelve_data',)]
+    database.close()
+
+
+def test_unparseable_rows_are_dropped(tmp_path):
+    candles = synthetic_candles(100)
+    frame = legacy_frame(candles)
+    frame.loc[10, 'timestamp'] = 'not a date'
+    frame.loc[20, 'timestamp'] = None
+    frame.loc[30, 'close'] = None
+    with sqlite3.connect(tmp_path / 'candles.db') as conn:
+        frame.to_sql(TABLE, conn, index=False)
+
+    database = open_database(tmp_path / 'candles.db')
+    assert_rows(database.query_range(TABLE), candles.drop(candles.index[[10, 20, 30]]))
+    database.close()
+
+
+def test_query_range_bounds_after_migration(tmp_path):
+    candles = synthetic_candles(1000)
+    with sqlite3.connect(tmp_path / 'candles.db') as conn:
+        legacy_frame(candles).to_sql(TABLE, conn, index=False)
+    database = open_database(tmp_path / 'candles.db')
+
+    start, end = candles.index[100], candles.index[400]
+    assert_rows(database.query_range(TABLE, start, end), candles.loc[start:end])  # inclusive
+    assert_rows(database.query_range(TABLE, end=start), candles.loc[:start])
+    assert_rows(database.query_range(TABLE, start=end), candles.loc[end:])
+    # Bounds between stored minutes
+    between = start + pd.Timedelta(seconds=30)
+    assert database.query_range(TABLE, between, between).size == 0
+    assert database.query_range(TABLE, between)['timestamp'][0] == candles.index[101]
+    database.close()
+
+
+def stored(database):
+    rows = database.conn.execute(
+        f"SELECT timestamp, close, source FROM {TABLE} ORDER BY timestamp").fetchall()
+    return {pd.Timestamp(ts, unit='s'): (close, source) for ts, close, source in rows}
+
+
+def test_flush_writes_only_rows_past_the_watermark(tmp_path):
+    candles = synthetic_candles(200)
+    database = open_database(tmp_path / 'candles.db')
+    assert database.flush({TABLE: (candles.iloc[:100], 'yfinance')}) == 100
+    assert database.watermarks[TABLE] == candles.index[99]
+
+    # Overlapping window: only the 50 new rows are written, the overlap is
+    # not re-upserted even though its values changed
+    window = candles.iloc[50:150].copy()
+    window['close'] += 1.0
+    assert database.flush({TABLE: (window, 'twelve_data')}) == 50
+    rows = stored(database)
+    assert rows[candles.index[60]] == (candles['close'].iloc[60], 'yfinance')
+    assert rows[candles.index[120]] == (window['close'].loc[candles.index[120]], 'twelve_data')
+    assert database.flush({TABLE: (window, 'twelve_data')}) == 0
+    assert len(rows) == 150
+    database.close()
+
+
+def test_rewind_rewrites_a_revised_closed_row(tmp_path):
+    candles = synthetic_candles(100)
+    database = open_database(tmp_path / 'candles.db')
+    database.flush({TABLE: (candles, 'yfinance')})
+
+    revised = candles.copy()
+    since = candles.index[90]
+    revised.loc[since, 'close'] += 0.5
+    database.rewind(TABLE, since)
+    assert database.pending_rows(TABLE, revised).index[0] == since
+    assert database.flush({TABLE: (revised, 'twelve_data')}) == 10
+
+    rows = stored(database)
+    assert len(rows) == 100  # updated through ON CONFLICT, not duplicated
+    assert rows[since] == (revised['close'].loc[since], 'twelve_data')
+    assert rows[candles.index[89]][1] == 'yfinance'
+    assert database.watermarks[TABLE] == candles.index[-1]
+
+    # Rewinding past the watermark is a no-op
+    database.rewind(TABLE, candles.index[-1] + pd.Timedelta(minutes=5))
+    assert database.flush({TABLE: (revised, 'yfinance')}) == 0
+    database.close()
+
+
+def test_watermarks_round_trip_across_reopening(tmp_path):
+    tables = [TABLE, 'EURJPY_15M']
+    candles = synthetic_candles(150)
+    database = CandleDatabase(str(tmp_path / 'candles.db'), tables)
+    database.init_schema()
+    database.flush({TABLE: (candles.iloc[:100], 'yfinance')})
+    saved = database.export_watermarks()
+    database.close()
+    assert saved == {TABLE: candles.index[99].value, 'EURJPY_15M': None}
+
+    reopened = CandleDatabase(str(tmp_path / 'candles.db'), tables)
+    assert not reopened.restore_watermarks({TABLE: saved[TABLE]})  # missing a table
+    assert reopened.restore_watermarks(saved)
+    assert reopened.conn is None  # no schema pass, the connection opens on first flush
+    assert reopened.export_watermarks() == saved
+
+    assert reopened.flush({TABLE: (candles, 'yfinance')}) == 50
+    assert len(stored(reopened)) == 150
+    reopened.close()
+
+    # A schema pass reads the same watermark back from the table
+    scanned = CandleDatabase(str(tmp_path / 'candles.db'), tables)
+    scanned.init_schema()
+    assert scanned.watermarks == {TABLE: candles.index[-1], 'EURJPY_15M': None}
+    scanned.close()
@@ -0,0 +1,141 @@
+"""Tiered range reads: cold/hot stitching, the settled-segment cache and invalidation."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregation import TIMEFRAMES, aggregate_columns, resample_ohlcv
+from history import frame_columns
+from testing import synthetic_candles
+from tiered import TieredStore
+
+CANDLES = synthetic_candles(120 * 1300, start='2024-01-02 00:00', seed=3)
+HOT_ROWS = 500  # the live 1M buffer
+
+
+class ColdStore:
+    """ColdReader over stored 1M columns, aggregating like the history store."""
+
+    def __init__(self, candles):
+        self.columns = {col: values.copy() for col, values in frame_columns(candles).items()}
+        self.calls = []
+
+    def __call__(self, symbol, timeframe, start, end):
+        self.calls.append((timeframe, start, end))
+        stamps = self.columns['ts']
+        lo, hi = stamps.searchsorted(start), stamps.searchsorted(end)
+        columns = {col: values[lo:hi].copy() for col, values in self.columns.items()}
+        if timeframe == '1M':
+            return columns
+        return aggregate_columns(columns, TIMEFRAMES[timeframe], end)
+
+
+def hot_reader(candles_1m):
+    """HotReader over a 1M buffer and the closed bars built from it."""
+    frames = {'1M': candles_1m}
+    frames.update({tf_name: resample_ohlcv(candles_1m, freq) for tf_name, freq in TIMEFRAMES.items()})
+    return lambda symbol, timeframe: frames[timeframe]
+
+
+def tiers(candles=CANDLES, hot_rows=HOT_ROWS):
+    # The history holds every flushed candle, the buffer's included
+    cold = ColdStore(candles)
+    return TieredStore(hot_reader(candles.iloc[len(candles) - hot_rows:]), cold), cold
+
+
+def reference(timeframe, start, end=None, candles=CANDLES):
+    bars = candles if timeframe == '1M' else resample_ohlcv(candles, TIMEFRAMES[timeframe])
+    bars = bars[bars.index >= pd.Timestamp(start)]
+    if end is not None:
+        bars = bars[bars.index < pd.Timestamp(end)]
+    return bars.set_axis(bars.index.as_unit('ns'))  # store columns are epoch ns
+
+
+def assert_bars(bars, expected):
+    pd.testing.assert_frame_equal(bars, expected, check_dtype=False, check_freq=False,
+                                  check_names=False)
+
+
+@pytest.mark.parametrize('timeframe', ['1M'] + list(TIMEFRAMES))
+def test_stitched_range_equals_one_resample(timeframe):
+    store, _ = tiers()
+    for start in [CANDLES.index[0], CANDLES.index[-3000] + pd.Timedelta(seconds=30)]:
+        expected = reference(timeframe, start)
+        assert_bars(store.get_range('EURJPY', timeframe, start), expected)
+        assert_bars(store.get_range('EURJPY', timeframe, start), expected)  # from the cache
+
+    # Ranges ending in the cold tier, and inside the buffer
+    for end in [CANDLES.index[-5000], CANDLES.index[-100]]:
+        start = CANDLES.index[-20000]
+        assert_bars(store.get_range('EURJPY', timeframe, start, end),
+                    reference(timeframe, start, end))
+
+
+@pytest.mark.parametrize('first_hot', ['2024-04-30 13:37', '2024-04-30 14:00', '2024-04-29 00:00'])
+def test_partial_bars_before_the_first_hot_candle(first_hot):
+    # The buffer starts mid-bar (or on a bar edge): the bars it holds only
+    # part of come from the cold tier instead
+    candles = CANDLES[CANDLES.index < pd.Timestamp('2024-05-02')]
+    hot_rows = len(candles) - candles.index.searchsorted(pd.Timestamp(first_hot))
+    store, _ = tiers(candles, hot_rows)
+    start = pd.Timestamp('2024-04-25')
+    for timeframe in ['1M'] + list(TIMEFRAMES):
+        assert_bars(store.get_range('EURJPY', timeframe, start),
+                    reference(timeframe, start, candles=candles))
+
+
+def test_no_closed_hot_bar_reads_cold_up_to_the_newest_candle():
+    store, cold = tiers(hot_rows=30)  # not a single closed 1H bar in memory
+    start = CANDLES.index[-3000]
+    assert_bars(store.get_range('EURJPY', '1H', start), reference('1H', start))
+    # Nothing past the newest buffered candle was asked of the cold tier
+    assert cold.calls[-1][2] == CANDLES.index[-1].value + 1
+
+
+def test_only_settled_segments_are_cached():
+    store, cold = tiers()
+    first_hot = CANDLES.index[-HOT_ROWS].value
+    store.get_range('EURJPY', '1M', CANDLES.index[0])
+    assert store.segments
+    for symbol, timeframe, segment in store.segments:
+        assert segment + 7 * 86_400_000_000_000 <= first_hot  # one-week 1M segments
+
+    # The cached segments are not read again, the one reaching into the
+    # buffer is: a revision there shows up on the next read
+    calls = len(cold.calls)
+    cold.columns['close'][-HOT_ROWS - 10] += 1.0
+    bars = store.get_range('EURJPY', '1M', CANDLES.index[0])
+    assert len(cold.calls) == calls + 1 and store.hits == len(store.segments)
+    assert bars['close'].iloc[-HOT_ROWS - 10] == cold.columns['close'][-HOT_ROWS - 10]
+
+
+def test_nothing_is_cached_without_a_buffer():
+    cold = ColdStore(CANDLES)
+    store = TieredStore(lambda symbol, timeframe: CANDLES.iloc[:0], cold)
+    start, end = CANDLES.index[0], CANDLES.index[-1000]
+    assert_bars(store.get_range('EURJPY', '1H', start, end), reference('1H', start, end))
+    assert not store.segments and store.cached_bytes == 0
+
+
+def test_invalidate_drops_cached_segments():
+    store, cold = tiers()
+    start = CANDLES.index[0]
+    store.get_range('EURJPY', '1M', start)
+    store.get_range('EURJPY', '15M', start)
+    store.get_range('USDJPY', '1M', start)
+    cached = store.stats()
+    assert cached['bytes'] == sum(values.nbytes for columns in store.segments.values()
+                                  for values in columns.values())
+
+    # A backfill rewrote old EURJPY candles: stale until invalidated
+    cold.columns['close'][0] += 1.0
+    assert store.get_range('EURJPY', '1M', start)['close'].iloc[0] == CANDLES['close'].iloc[0]
+    store.invalidate('EURJPY')
+    assert {key[0] for key in store.segments} == {'USDJPY'}
+    assert 0 < store.cached_bytes < cached['bytes']
+    assert store.get_range('EURJPY', '1M', start)['close'].iloc[0] == cold.columns['close'][0]
+    # Other symbols keep their segments
+    assert store.get_range('USDJPY', '1M', start)['close'].iloc[0] == CANDLES['close'].iloc[0]
+
+    store.invalidate()
+    assert not store.segments and store.cached_bytes == 0
@@ -0,0 +1,154 @@
+"""
+Tiered Candle Storage
+=====================
+
+One range query over the in-memory buffers (hot tier) and the on-disk
+history (cold tier), so a strategy asking for 200 daily bars does not need
+to know that the buffers only hold the last few hundred minutes.
+
+- Hot: the 1M ring buffer and the closed timeframe bars in memory.
+- Cold: everything already spilled to disk (the columnar history, or the
+  SQLite tables without pyarrow), read in fixed, aligned segments.
+
+Cold reads are cut into segments of whole weeks aligned to the W-MON bins
+(which start on Tuesdays), so every bar of every timeframe lies inside a
+single segment and a segment always holds complete bars. Segments ending
+before the first hot 1M candle can no longer change (revisions only reach
+back into the buffer), so they are kept in an LRU cache bounded by bytes.
+``invalidate`` drops cached segments after a backfill rewrote old data.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from history import COLUMNS, columns_frame, empty_columns, frame_columns
+
+_NS_PER_WEEK = 7 * 86_400_000_000_000
+_SEGMENT_ORIGIN = 5 * 86_400_000_000_000  # 1970-01-06, a Tuesday
+
+# Weeks per cold segment: ~10k 1M candles, a quarter of anything coarser
+SEGMENT_WEEKS = {'1M': 1}
+DEFAULT_SEGMENT_WEEKS = 13
+
+ColdReader = Callable[[str, str, int, int], Dict[str, np.ndarray]]
+HotReader = Callable[[str, str], pd.DataFrame]
+
+SegmentKey = Tuple[str, str, int]
+
+
+def _slice(columns: Dict[str, np.ndarray], start: int, end: int) -> Dict[str, np.ndarray]:
+    stamps = columns['ts']
+    lo, hi = stamps.searchsorted(start), stamps.searchsorted(end)
+    return {col: values[lo:hi] for col, values in columns.items()}
+
+
+class TieredStore:
+    """Range queries stitching cold on-disk segments to the hot in-memory bars."""
+
+    def __init__(self, hot: HotReader, cold: ColdReader, max_bytes: int = 64 * 2 ** 20):
+        """
+        Args:
+            hot: ``hot(symbol, timeframe)`` -> in-memory candles or closed bars
+            cold: ``cold(symbol, timeframe, start_ns, end_ns)`` -> complete
+                stored bars in [start, end) as ``COLUMNS`` arrays
+            max_bytes: Size bound of the cold segment cache
+        """
+        self.hot = hot
+        self.cold = cold
+        self.max_bytes = max_bytes
+        self.segments: 'OrderedDict[SegmentKey, Dict[str, np.ndarray]]' = OrderedDict()
+        self.cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get_range(self, symbol: str, timeframe: str, start, end=None) -> pd.DataFrame:
+        """
+        Bars of ``timeframe`` with start <= timestamp < end from both tiers.
+
+        Args:
+            symbol: Symbol key, e.g. 'EURJPY'
+            timeframe: '1M' or a TIMEFRAMES key
+            start: First bar timestamp to include (naive UTC)
+            end: End of the range, exclusive (None = up to the latest bar)
+        """
+        start_ns = pd.Timestamp(start).as_unit('ns').value
+        end_ns = pd.Timestamp(end).as_unit('ns').value if end is not None else 2 ** 63 - 1
+
+        hot_frame = self.hot(symbol, timeframe)
+        hot = frame_columns(hot_frame) if len(hot_frame) else empty_columns()
+        hot_1m = hot_frame if timeframe == '1M' else self.hot(symbol, '1M')
+        if timeframe != '1M' and len(hot_1m):
+            # Bars opening before the buffer's first candle may be partial
+            hot = _slice(hot, pd.Timestamp(hot_1m.index[0]).as_unit('ns').value, 2 ** 63 - 1)
+        if len(hot['ts']):
+            boundary = int(hot['ts'][0])
+        elif len(hot_1m):
+            # No closed bar in memory yet: cold covers up to the newest candle
+            boundary = pd.Timestamp(hot_1m.index[-1]).as_unit('ns').value + 1
+        else:
+            # Nothing in memory: the cold tier holds every bar
+            boundary = 2 ** 63 - 1
+        # Revisions only reach back into the buffer, so segments wholly
+        # before its first candle are settled (nothing is cached without one)
+        settled = pd.Timestamp(hot_1m.index[0]).as_unit('ns').value if len(hot_1m) else 0
+
+        parts = []
+        cold_end = min(end_ns, boundary)
+        if start_ns < cold_end:
+            width = SEGMENT_WEEKS.get(timeframe, DEFAULT_SEGMENT_WEEKS) * _NS_PER_WEEK
+            segment = _SEGMENT_ORIGIN + (start_ns - _SEGMENT_ORIGIN) // width * width
+            while segment < cold_end:
+                seg_end = segment + width
+                if seg_end <= settled:
+                    columns = self._segment(symbol, timeframe, segment, seg_end)
+                else:
+                    columns = self.cold(symbol, timeframe, segment, min(seg_end, boundary))
+                parts.append(_slice(columns, start_ns, cold_end))
+                segment = seg_end
+        parts.append(_slice(hot, max(start_ns, boundary), end_ns))
+
+        columns = {col: np.concatenate([part[col] for part in parts]) for col in COLUMNS}
+        return columns_frame(columns)
+
+    def invalidate(self, symbol: Optional[str] = None) -> None:
+        """Drop cached cold segments (of one symbol, or all)."""
+        with self.lock:
+            for key in [key for key in self.segments if symbol is None or key[0] == symbol]:
+                self.cached_bytes -= self._size(self.segments.pop(key))
+
+    def stats(self) -> Dict[str, int]:
+        return {'segments': len(self.segments), 'bytes': self.cached_bytes,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def _segment(self, symbol: str, timeframe: str, start: int, end: int) -> Dict[str, np.ndarray]:
+        key = (symbol, timeframe, start)
+        with self.lock:
+            columns = self.segments.get(key)
+            if columns is not None:
+                self.segments.move_to_end(key)
+                self.hits += 1
+                return columns
+            self.misses += 1
+
+        columns = self.cold(symbol, timeframe, start, end)
+        for values in columns.values():
+            values.flags.writeable = False
+        with self.lock:
+            if key not in self.segments:
+                self.segments[key] = columns
+                self.cached_bytes += self._size(columns)
+            while self.cached_bytes > self.max_bytes and len(self.segments) > 1:
+                _, evicted = self.segments.popitem(last=False)
+                self.cached_bytes -= self._size(evicted)
+                self.evictions += 1
+        return columns
+
+    @staticmethod
+    def _size(columns: Dict[str, np.ndarray]) -> int:
+        return sum(values.nbytes for values in columns.values())